@@ -0,0 +1,94 @@
+"""
+Machine-readable benchmark results and run-over-run comparison for
+bench_suite.py and bench_load.py. A result file is JSON:
+
+    {"meta": {"python": "3.11.4", "machine": "...", "cpus": 8, ...},
+     "results": {"movement.predict": {"unit": "ms", "p50": 4.1, "p95": 5.3, "p99": 6.0,
+                                      "mean": 4.4, "runs": 50, "params": {"model": "stand-in"}}, ...}}
+
+Benchmarks are compared on p50. One whose p50 grew by more than the
+threshold (0.2 = 20%) over the baseline is a regression; results whose
+params differ (more officers, another model file) are not compared.
+"""
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+REGRESSION = 'REGRESSION'
+IMPROVED = 'improved'
+UNCHANGED = 'ok'
+NEW = 'new'
+NOT_COMPARABLE = 'params changed'
+
+
+def summarize(timings, **params):
+    """Result entry for a list of per-call timings in seconds"""
+    ms = np.asarray(timings, dtype=float) * 1000.0
+    return {
+        'unit': 'ms',
+        'p50': float(np.percentile(ms, 50)),
+        'p95': float(np.percentile(ms, 95)),
+        'p99': float(np.percentile(ms, 99)),
+        'mean': float(ms.mean()),
+        'runs': int(ms.size),
+        'params': params,
+    }
+
+
+def environment():
+    import django
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'machine': platform.node(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def save_results(path, results, meta=None):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'meta': meta if meta is not None else environment(), 'results': results}, f, indent=2,
+                  sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare(baseline, current, threshold):
+    """
+    [(name, baseline p50, current p50, relative change, verdict)] for every
+    benchmark in `current`. The change is None where there is nothing to
+    compare against.
+    """
+    rows = []
+    for name, result in current.items():
+        old = baseline.get(name)
+        if old is None:
+            rows.append((name, None, result['p50'], None, NEW))
+            continue
+        if old.get('params') != result.get('params'):
+            rows.append((name, old['p50'], result['p50'], None, NOT_COMPARABLE))
+            continue
+        change = (result['p50'] - old['p50']) / old['p50'] if old['p50'] > 0 else 0.0
+        if change > threshold:
+            verdict = REGRESSION
+        elif change < -threshold:
+            verdict = IMPROVED
+        else:
+            verdict = UNCHANGED
+        rows.append((name, old['p50'], result['p50'], change, verdict))
+    return rows
+
+
+def regressions(rows):
+    return [row[0] for row in rows if row[4] == REGRESSION]
@@ -0,0 +1,90 @@
+"""
+Per-clip audio feature extraction time: the shared-spectrogram
+FastAudioFeatureExtractor versus the original per-feature extractor.
+Also reports the largest difference in any feature, in units of that
+feature's standard deviation in feature_scaler.pkl (i.e. after scaling).
+
+    python -m benchmarks.bench_audio_features [--repeats 5]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import percentile
+from emergency.ml_predictor import FRAME_SERIES, FastAudioFeatureExtractor
+from emergency.reference_clips import CLIPS, SAMPLE_RATE, load_clip
+from emergency.reference_features import ReferenceAudioFeatureExtractor
+
+
+def time_extractor(extractor, audio, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        features = extractor.extract_features(audio, SAMPLE_RATE)
+        timings.append(time.perf_counter() - start)
+    return percentile(timings, 50) * 1000, features
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def feature_scales():
+    import os
+    import pickle
+
+    from django.conf import settings
+
+    path = os.path.join(settings.BASE_DIR, 'ml_models', 'feature_scaler.pkl')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as f:
+        scaler = pickle.load(f)
+    return dict(zip(scaler.feature_names_in_, scaler.scale_))
+
+
+def max_scaled_difference(expected, actual, scales):
+    return max(abs(actual[k] - v) / scales.get(k, 1.0) for k, v in expected.items())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    scales = feature_scales()
+    reference = ReferenceAudioFeatureExtractor()
+    fast = FastAudioFeatureExtractor()
+
+    # First calls pay for imports, numba compilation and filterbank caches
+    warm = load_clip('tone')
+    reference.extract_features(warm, SAMPLE_RATE)
+    fast.extract_features(warm, SAMPLE_RATE)
+
+    print(f"median of {args.repeats} runs per clip")
+    print(f"{'clip':<20}{'seconds':>8}{'reference ms':>14}{'shared ms':>11}{'speed-up':>10}{'max diff/std':>14}")
+    totals = [0.0, 0.0]
+    for name in CLIPS:
+        audio = load_clip(name)
+        ref_ms, expected = time_extractor(reference, audio, args.repeats)
+        fast_ms, actual = time_extractor(fast, audio, args.repeats)
+        totals[0] += ref_ms
+        totals[1] += fast_ms
+        print(f"{name:<20}{len(audio) / SAMPLE_RATE:>8.1f}{ref_ms:>14.1f}{fast_ms:>11.1f}"
+              f"{ref_ms / fast_ms:>9.2f}x{max_scaled_difference(expected, actual, scales):>14.2e}")
+    print(f"{'total':<28}{totals[0]:>14.1f}{totals[1]:>11.1f}{totals[0] / totals[1]:>9.2f}x")
+
+    # Statistics alone: 18 per-frame series of a 5 s clip, one at a time vs. one block
+    series = np.random.default_rng(0).normal(size=(len(FRAME_SERIES), 216))
+    looped = percentile([_timed(lambda: [reference.extract_statistical_features(row, p)
+                                         for row, p in zip(series, FRAME_SERIES)]) for _ in range(50)], 50)
+    block = percentile([_timed(lambda: fast.extract_statistical_block(series, FRAME_SERIES)) for _ in range(50)], 50)
+    print(f"\nstatistics for {len(FRAME_SERIES)} frame series: per-series {looped * 1000:.2f} ms, "
+          f"block {block * 1000:.2f} ms ({looped / block:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Loading a clip recorded at 44.1 or 48 kHz: librosa.load (decode the file,
+then soxr_hq) versus decode_audio_file with each ML_AUDIO_RESAMPLER
+choice. Also reports how far each resampler moves the XGBoost inputs
+from the soxr_hq ones, as the largest difference in any feature in units
+of its standard deviation in feature_scaler.pkl, and the largest change
+in threat probability.
+
+    python -m benchmarks.bench_audio_resampling [--repeats 10] [--seconds 30]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import percentile
+from benchmarks.bench_audio_features import feature_scales, max_scaled_difference
+from emergency.audio_io import RESAMPLERS, decode_audio_file, polyphase_filter, resample
+from emergency.ml_predictor import FastAudioFeatureExtractor, MLPredictor
+from emergency.reference_clips import CLIPS
+
+NATIVE_RATES = (44100, 48000)
+
+
+def median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return percentile(timings, 50) * 1000
+
+
+def main():
+    import librosa
+    import soundfile as sf
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=30.0,
+                        help='length of the recording on disk; only the first 5 s are used')
+    args = parser.parse_args()
+
+    scales = feature_scales()
+    extractor = FastAudioFeatureExtractor()
+    predictor = MLPredictor.get_instance()
+    score = predictor._audio_models_loaded()
+
+    print(f"median of {args.repeats} runs, {args.seconds:.0f} s WAV on disk")
+    for native_rate in NATIVE_RATES:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'clip.wav')
+            sf.write(path, CLIPS['speech_like'](native_rate, seconds=args.seconds), native_rate, subtype='PCM_16')
+
+            print(f"\n{native_rate} Hz -> 22050 Hz")
+            print(f"{'loader':<34}{'ms':>8}")
+            librosa.load(path, sr=22050, duration=5)
+            print(f"{'librosa.load (soxr_hq)':<34}"
+                  f"{median_ms(lambda: librosa.load(path, sr=22050, duration=5), args.repeats):>8.2f}")
+            for method in RESAMPLERS:
+                decode = lambda: resample(*decode_audio_file(path, native_rate, 5), 22050, method)
+                decode()
+                print(f"{'decode_audio_file + ' + method:<34}{median_ms(decode, args.repeats):>8.2f}")
+
+        # Drift of the model inputs across every synthetic clip
+        print(f"{'resampler':<12}{'max diff/std':>14}{'max |dp|':>10}")
+        expected = {}
+        for name, clip in CLIPS.items():
+            audio = resample(clip(native_rate).astype('float32'), native_rate, 22050, 'soxr_hq')
+            expected[name] = extractor.extract_features(audio, 22050)
+        for method in RESAMPLERS:
+            worst_feature = worst_probability = 0.0
+            for name, clip in CLIPS.items():
+                audio = resample(clip(native_rate).astype('float32'), native_rate, 22050, method)
+                actual = extractor.extract_features(audio, 22050)
+                worst_feature = max(worst_feature, max_scaled_difference(expected[name], actual, scales))
+                if score:
+                    worst_probability = max(worst_probability, abs(
+                        predictor.score_audio_features(actual)['threat_probability']
+                        - predictor.score_audio_features(expected[name])['threat_probability']))
+            print(f"{method:<12}{worst_feature:>14.2e}{worst_probability if score else float('nan'):>10.4f}")
+
+    print(f"\npolyphase filters cached: {polyphase_filter.cache_info().currsize}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Scoring extracted audio features with the XGBoost threat model: the
+previous path (one-row DataFrame, scaler.transform, predict and
+predict_proba) versus MLPredictor.score_audio_features (NumPy scaling,
+one booster call), and clips per second when scored in batches.
+
+    python -m benchmarks.bench_audio_scoring [--repeats 200] [--batch 1,8,64]
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile
+from emergency.ml_predictor import MLPredictor
+from emergency.reference_clips import CLIPS, SAMPLE_RATE, load_clip
+from emergency.reference_features import ReferenceAudioFeatureExtractor
+from emergency.tests.test_audio_scoring import pandas_score
+
+
+def time_per_call(function, repeats):
+    function()  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--batch', default='1,8,64', help='comma-separated batch sizes')
+    args = parser.parse_args()
+
+    predictor = MLPredictor.get_instance()
+    if not predictor._audio_models_loaded():
+        raise SystemExit('Audio model files not available')
+    extractor = ReferenceAudioFeatureExtractor()
+    rows = [extractor.extract_features(load_clip(name), SAMPLE_RATE) for name in CLIPS]
+    model, scaler = predictor._audio_model, predictor._audio_scaler
+
+    print(f"{'per clip':<12}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, score in (
+        ('pandas', lambda: [pandas_score(model, scaler, features) for features in rows]),
+        ('booster', lambda: [predictor.score_audio_features(features) for features in rows]),
+    ):
+        timings = [t / len(rows) for t in time_per_call(score, args.repeats)]
+        print(f"{name:<12}{percentile(timings, 50) * 1000:>9.3f}{percentile(timings, 95) * 1000:>9.3f}")
+
+    print(f"\n{'batch':<12}{'clips/s':>10}")
+    for size in [int(b) for b in args.batch.split(',')]:
+        batch = [rows[i % len(rows)] for i in range(size)]
+        timings = time_per_call(lambda: predictor.score_audio_batch(batch), max(10, args.repeats // 4))
+        print(f"{size:<12}{size / percentile(timings, 50):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
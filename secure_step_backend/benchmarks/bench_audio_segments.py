@@ -0,0 +1,80 @@
+"""
+Scoring a long clip in 5-second segments (ML_AUDIO_SEGMENTED) versus the
+first 5 seconds only, and what the shared STFT, the batched XGBoost call
+and the segment pool each contribute.
+
+    python -m benchmarks.bench_audio_segments [--seconds 30] [--repeats 5] [--workers 1,2,4]
+
+The pool only helps with more than one core: librosa and NumPy release
+the GIL for part of each segment, not all of it.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import percentile
+
+import numpy as np
+from django.test import override_settings
+
+import emergency.ml_predictor as ml_predictor
+from emergency.ml_predictor import (
+    HOP_LENGTH, FastAudioFeatureExtractor, MLPredictor, aggregate_segment_results, segment_starts,
+)
+from emergency.reference_clips import CLIPS, SAMPLE_RATE, load_clip
+
+
+def median_seconds(function, repeats):
+    function()  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return percentile(timings, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated segment pool sizes')
+    args = parser.parse_args()
+
+    predictor = MLPredictor.get_instance()
+    if not predictor._audio_models_loaded():
+        raise SystemExit('Audio model files not available')
+
+    names = [name for name in CLIPS if name != 'short_clip']
+    clips = [load_clip(names[i % len(names)]) for i in range(int(np.ceil(args.seconds / 5)))]
+    audio = np.concatenate(clips)[:int(args.seconds * SAMPLE_RATE)]
+    extractor = FastAudioFeatureExtractor(segmented=True)
+    segment = int(extractor.duration * SAMPLE_RATE)
+    hop = max(1, round(extractor.segment_hop * SAMPLE_RATE / HOP_LENGTH)) * HOP_LENGTH
+    starts = segment_starts(len(audio), segment, hop)
+
+    def separate():
+        # Every segment through extract_features and scored on its own
+        segments = [{'start': s / SAMPLE_RATE, 'end': (s + segment) / SAMPLE_RATE,
+                     'features': extractor.extract_features(audio[s:s + segment], SAMPLE_RATE)} for s in starts]
+        return aggregate_segment_results(segments, [predictor.score_audio_features(s['features']) for s in segments])
+
+    print(f"{args.seconds:g} s clip, {len(starts)} segments, {os.cpu_count()} CPU(s)")
+    print(f"{'mode':<36}{'ms':>9}")
+    rows = [
+        ('first 5 s only (previous behaviour)', lambda: predictor.predict_audio_signal(audio[:segment], SAMPLE_RATE, segmented=False)),
+        ('segments, separate STFTs and calls', separate),
+    ]
+    for workers in [int(w) for w in args.workers.split(',')]:
+        def shared(workers=workers):
+            with override_settings(ML_AUDIO_SEGMENT_WORKERS=workers, ML_AUDIO_PARALLEL_SEGMENTS=2):
+                return predictor.predict_audio_signal(audio, SAMPLE_RATE, segmented=True)
+        rows.append((f'segments, shared STFT, {workers} worker(s)', shared))
+
+    for name, function in rows:
+        ml_predictor._segment_executor = None  # rebuilt with this row's pool size
+        print(f"{name:<36}{median_seconds(function, args.repeats) * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Decode stage of predict_audio / predict_combined under concurrent load:
+the old temp-file round trip (write the upload to disk, librosa.load it
+back, delete it) versus decoding the upload in memory with audio_io.
+Reports latency and the bytes each request reads and writes through
+system calls (/proc/self/io rchar / wchar).
+
+    python -m benchmarks.bench_audio_upload [--requests 20] [--format wav|pcm|m4a|m4a-faststart]
+
+Container formats (m4a) need ffmpeg on the machine; the in-memory path
+pipes them through it, the old path went through audioread's ffmpeg.
+`m4a` is AAC with the moov atom after mdat, the layout the Android app
+records; `m4a-faststart` has moov up front and can be read from a pipe.
+"""
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+import soundfile as sf
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from benchmarks.common import percentile, run_concurrent
+from emergency.audio_io import decode_audio_upload
+from emergency.reference_clips import load_clip
+
+CONCURRENCY_LEVELS = [1, 4, 16]
+
+
+def make_upload(fmt):
+    audio = load_clip('speech_like', 44100)
+    if fmt == 'pcm':
+        data = (audio * 32767).astype('<i2').tobytes()
+        return lambda: SimpleUploadedFile('clip.pcm', data, content_type='audio/pcm')
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, 44100, format='WAV', subtype='PCM_16')
+    data = buffer.getvalue()
+    if fmt.startswith('m4a'):
+        data = encode_m4a(data, faststart=fmt == 'm4a-faststart')
+        return lambda: SimpleUploadedFile('clip.m4a', data, content_type='audio/mp4')
+    return lambda: SimpleUploadedFile('clip.wav', data, content_type='audio/wav')
+
+
+def encode_m4a(wav, faststart):
+    """AAC in an MP4 container; ffmpeg's mp4 muxer writes moov last unless asked for faststart"""
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'clip.m4a')
+        command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-f', 'wav', '-i', 'pipe:0', '-c:a', 'aac']
+        if faststart:
+            command += ['-movflags', '+faststart']
+        subprocess.run(command + [output], input=wav, check=True)
+        with open(output, 'rb') as f:
+            return f.read()
+
+
+def decode_via_temp_file(upload):
+    """The previous view code"""
+    import librosa
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.m4a') as tmp:
+        for chunk in upload.chunks():
+            tmp.write(chunk)
+        tmp_path = tmp.name
+    try:
+        if upload.name.endswith('.pcm'):
+            # librosa cannot read headerless PCM; read it back and resample the same way
+            audio = np.fromfile(tmp_path, dtype='<i2').astype(np.float32) / 32768
+            return librosa.resample(audio, orig_sr=44100, target_sr=22050, res_type='soxr_hq'), 22050
+        return librosa.load(tmp_path, sr=22050, duration=5)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def decode_in_memory(upload):
+    if upload.name.endswith('.pcm'):
+        upload.content_type_extra = {'rate': '44100'}
+    return decode_audio_upload(upload)
+
+
+def io_counters():
+    counters = {}
+    with open('/proc/self/io') as f:
+        for line in f:
+            key, value = line.split(':')
+            counters[key] = int(value)
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20, help='requests per client thread')
+    parser.add_argument('--format', choices=['wav', 'pcm', 'm4a', 'm4a-faststart'], default='wav')
+    args = parser.parse_args()
+    if args.format.startswith('m4a') and shutil.which('ffmpeg') is None:
+        parser.error("--format m4a needs ffmpeg on the PATH")
+
+    new_upload = make_upload(args.format)
+    size = new_upload().size
+    for decode in (decode_via_temp_file, decode_in_memory):
+        decode(new_upload())  # warm-up
+
+    print(f"{args.format} upload of {size / 1024:.0f} KB (5 s, 44.1 kHz), decoded to 22.05 kHz float32")
+    print(f"{'path':<12}{'clients':>8}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>8}{'read KB/req':>13}{'write KB/req':>14}")
+    for name, decode in (('temp file', decode_via_temp_file), ('in memory', decode_in_memory)):
+        for concurrency in CONCURRENCY_LEVELS:
+            before = io_counters()
+            latencies, wall = run_concurrent(lambda: decode(new_upload()), concurrency, args.requests)
+            after = io_counters()
+            n = len(latencies)
+            print(f"{name:<12}{concurrency:>8}{percentile(latencies, 50) * 1000:>9.1f}"
+                  f"{percentile(latencies, 99) * 1000:>9.1f}{n / wall:>8.1f}"
+                  f"{(after['rchar'] - before['rchar']) / n / 1024:>13.1f}"
+                  f"{(after['wchar'] - before['wchar']) / n / 1024:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
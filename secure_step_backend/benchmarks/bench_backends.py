@@ -0,0 +1,89 @@
+"""
+Single-request latency of the movement model under each inference backend.
+
+    python -m benchmarks.bench_backends [--requests 200]
+
+Uses the files in ml_models/ when they exist. Without
+bilstm_action_model.h5 a stand-in BiLSTM is exported to a temporary
+directory and every backend is measured on that.
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+
+from benchmarks.common import build_standin_bilstm, percentile, random_window
+from emergency.movement_backends import BACKENDS, EXPORTERS, MODEL_FILES, QUANTIZED_BACKENDS, load_movement_backend
+
+
+def prepare_model_dir():
+    base_path = os.path.join(settings.BASE_DIR, 'ml_models')
+    if os.path.exists(os.path.join(base_path, MODEL_FILES['keras'])):
+        return base_path
+
+    print("bilstm_action_model.h5 not found - exporting a stand-in BiLSTM")
+    base_path = tempfile.mkdtemp(prefix='movement-backends-')
+    model = build_standin_bilstm(20)
+    model.save(os.path.join(base_path, MODEL_FILES['keras']))
+
+    # The quantized TFLite exports fold in the scaler, as convert_movement_model does
+    scaler = None
+    scaler_path = os.path.join(settings.BASE_DIR, 'ml_models', 'scaler.pkl')
+    if os.path.exists(scaler_path):
+        with open(scaler_path, 'rb') as f:
+            scaler = pickle.load(f)
+
+    for backend, export in EXPORTERS.items():
+        try:
+            if backend in QUANTIZED_BACKENDS:
+                if scaler is None:
+                    print(f"  skipping {backend} export: no scaler.pkl to fold in")
+                    continue
+                export(model, os.path.join(base_path, MODEL_FILES[backend]), scaler=scaler)
+            else:
+                export(model, os.path.join(base_path, MODEL_FILES[backend]))
+        except ImportError as e:
+            print(f"  skipping {backend} export: {e}")
+    return base_path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    base_path = prepare_model_dir()
+    window = random_window()[np.newaxis].astype(np.float32)
+
+    print(f"{'backend':<14}{'load s':>9}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}")
+    for name in BACKENDS:
+        start = time.perf_counter()
+        try:
+            backend = load_movement_backend(name, base_path)
+        except ImportError as e:
+            print(f"{name:<14}  unavailable ({e})")
+            continue
+        load_time = time.perf_counter() - start
+        if backend is None:
+            print(f"{name:<14}  no model file - run `manage.py convert_movement_model`")
+            continue
+
+        for _ in range(5):
+            backend.predict(window)
+
+        latencies = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            backend.predict(window)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        print(f"{name:<14}{load_time:>9.2f}{percentile(latencies, 50):>9.2f}"
+              f"{percentile(latencies, 99):>9.2f}{np.mean(latencies):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
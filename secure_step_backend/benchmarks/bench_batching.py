@@ -0,0 +1,56 @@
+"""
+Throughput vs. p99 latency of MLPredictor.predict with and without
+micro-batching, at several concurrency levels.
+
+    python -m benchmarks.bench_batching [--requests 40] [--windows 5,10,20]
+"""
+import argparse
+
+from django.test import override_settings
+
+from benchmarks.common import get_movement_predictor, percentile, random_window, run_concurrent
+
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+
+
+def bench(predictor, concurrency, requests_per_worker):
+    window = random_window().tolist()
+    latencies, wall = run_concurrent(lambda: predictor.predict(window), concurrency, requests_per_worker)
+    throughput = len(latencies) / wall
+    return throughput, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=40, help='requests per client thread')
+    parser.add_argument('--windows', default='5,10,20', help='batch windows to try, in ms')
+    parser.add_argument('--max-batch', type=int, default=64)
+    args = parser.parse_args()
+
+    predictor = get_movement_predictor()
+    predictor.predict(random_window().tolist())  # warm-up / graph tracing
+
+    configs = [('unbatched', dict(ML_BATCHING_ENABLED=False))]
+    for window_ms in [float(w) for w in args.windows.split(',')]:
+        configs.append((f'batched {window_ms:g}ms', dict(
+            ML_BATCHING_ENABLED=True,
+            ML_BATCH_MAX_WAIT_MS=window_ms,
+            ML_BATCH_MAX_SIZE=args.max_batch,
+        )))
+
+    print(f"{'mode':<16}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'avg batch':>11}")
+    for name, overrides in configs:
+        for concurrency in CONCURRENCY_LEVELS:
+            with override_settings(**overrides):
+                predictor._batcher = None
+                throughput, p50, p99 = bench(predictor, concurrency, args.requests)
+                batcher = predictor._batcher
+                avg_batch = batcher.average_batch_size if batcher else 1.0
+                if batcher:
+                    batcher.close()
+                    predictor._batcher = None
+            print(f"{name:<16}{concurrency:>8}{throughput:>10.1f}{p50:>10.1f}{p99:>10.1f}{avg_batch:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+End-to-end latency of /predict-combined/ (movement window + 5 s WAV clip)
+with the two models run one after the other (ML_COMBINED_CONCURRENT =
+False, the previous behaviour) versus concurrently on the branch pool.
+The feature cache is disabled so every request extracts audio features.
+
+    python -m benchmarks.bench_combined [--requests 40] [--clients 1,4] [--deadline-ms 150]
+
+The last mode sets a tight audio deadline to show the bounded response
+time (and how many requests come back with audio_result TIMEOUT).
+
+On a machine with a single core both branches compete for it, so the
+gain is bounded by how much of each branch runs outside the GIL.
+"""
+import argparse
+import json
+import os
+
+from benchmarks.common import get_movement_predictor, percentile, random_window, run_concurrent
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from emergency.reference_clips import load_clip, wav_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=40, help='requests per client')
+    parser.add_argument('--clients', default='1,4', help='comma-separated concurrency levels')
+    parser.add_argument('--deadline-ms', type=int, default=150, help='audio deadline for the last mode')
+    args = parser.parse_args()
+
+    get_movement_predictor()
+    movement = json.dumps(random_window().tolist())
+    clip = wav_bytes(load_clip('speech_like', 44100), 44100)
+
+    timeouts = []
+
+    def request():
+        response = APIClient().post('/api/emergency/predict-combined/', {
+            'movement_data': movement,
+            'audio_file': SimpleUploadedFile('clip.wav', clip, content_type='audio/wav'),
+        })
+        assert response.status_code == 200, response.content
+        if response.json()['audio_result']['status'] == 'TIMEOUT':
+            timeouts.append(1)
+
+    modes = [
+        ('sequential', False, 60.0),
+        ('concurrent', True, 60.0),
+        # The audio deadline bounds the response time when audio is slow
+        (f'deadline {args.deadline_ms}ms', True, args.deadline_ms / 1000),
+    ]
+    print(f"{os.cpu_count()} CPU(s), {args.requests} requests per client")
+    print(f"{'mode':<16}{'clients':>8}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>8}{'audio timeouts':>16}")
+    for clients in [int(c) for c in args.clients.split(',')]:
+        for mode, concurrent, audio_timeout in modes:
+            with override_settings(ML_COMBINED_CONCURRENT=concurrent, ML_AUDIO_FEATURE_CACHE='',
+                                   ML_COMBINED_AUDIO_TIMEOUT=audio_timeout):
+                for _ in range(3):
+                    request()  # warm up
+                timeouts.clear()
+                latencies, wall = run_concurrent(request, clients, args.requests)
+            print(f"{mode:<16}{clients:>8}{percentile(latencies, 50) * 1000:>9.1f}"
+                  f"{percentile(latencies, 99) * 1000:>9.1f}{len(latencies) / wall:>8.1f}"
+                  f"{len(timeouts):>10} / {len(latencies)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+predict_uploaded_audio with and without the audio feature cache: a clip
+seen for the first time (hash + decode + extract + XGBoost) versus the
+same clip uploaded again (hash + cache lookup + XGBoost).
+
+    python -m benchmarks.bench_feature_cache [--repeats 20]
+"""
+import argparse
+import time
+
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from benchmarks.common import percentile
+from emergency.feature_cache import get_audio_feature_cache
+from emergency.ml_predictor import FastAudioFeatureExtractor, get_predictor
+from emergency.reference_clips import CLIPS, load_clip, wav_bytes
+from emergency.views import predict_uploaded_audio
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    predictor = get_predictor()
+    cache = get_audio_feature_cache()
+    if cache is None:
+        raise SystemExit('ML_AUDIO_FEATURE_CACHE is disabled')
+    clips = {name: wav_bytes(load_clip(name, 44100), 44100) for name in CLIPS}
+    make_upload = lambda name: SimpleUploadedFile('clip.wav', clips[name], content_type='audio/wav')
+
+    predict_uploaded_audio(predictor, make_upload('tone'))  # warm up imports and filterbanks
+
+    timings = {'miss': [], 'hit': []}
+    for _ in range(args.repeats):
+        for name in CLIPS:
+            caches[cache.alias].delete_many([cache.key_for_upload(make_upload(name), FastAudioFeatureExtractor())])
+            for outcome in ('miss', 'hit'):
+                start = time.perf_counter()
+                predict_uploaded_audio(predictor, make_upload(name))
+                timings[outcome].append(time.perf_counter() - start)
+
+    print(f"{len(timings['miss'])} uploads of 5 s WAV clips (44.1 kHz)")
+    print(f"{'':<8}{'p50 ms':>9}{'p95 ms':>9}")
+    for outcome, values in timings.items():
+        print(f"{outcome:<8}{percentile(values, 50) * 1000:>9.2f}{percentile(values, 95) * 1000:>9.2f}")
+    print(f"speed-up on a repeated clip: {percentile(timings['miss'], 50) / percentile(timings['hit'], 50):.0f}x")
+    print(cache.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Memory and latency of the out-of-process inference service compared with
+the in-process MLPredictor singleton.
+
+    python -m benchmarks.bench_inference_service [--django-workers 4] [--pool-size 2]
+
+Memory: N simulated daphne workers each loading their own models, vs. the
+same N workers as thin clients plus a service pool that owns the models.
+Latency: single-request movement and audio-scoring round trips.
+"""
+import argparse
+import multiprocessing
+import queue
+import time
+
+from benchmarks.common import get_movement_predictor, percentile, random_window, rss_mb
+from emergency.inference_service import InferenceClient, InferenceService, RemotePredictor
+
+FACTORY = 'benchmarks.common.get_movement_predictor'
+
+
+def _django_worker(mode, address, ready, done):
+    import benchmarks.common  # noqa: F401  (django.setup)
+
+    if mode == 'in_process':
+        predictor = get_movement_predictor()
+    else:
+        predictor = RemotePredictor(InferenceClient(address=address))
+    predictor.predict(random_window())
+    ready.put(multiprocessing.current_process().pid)
+    done.wait()
+
+
+def measure_workers(mode, count, address=None):
+    ctx = multiprocessing.get_context('spawn')
+    ready, done = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_django_worker, args=(mode, address, ready, done)) for _ in range(count)]
+    for p in procs:
+        p.start()
+    pids = []
+    while len(pids) < count:
+        try:
+            pids.append(ready.get(timeout=5))
+        except queue.Empty:
+            dead = [p for p in procs if p.exitcode is not None]
+            if dead:
+                done.set()
+                raise RuntimeError(f"{len(dead)} worker(s) exited early (exit code {dead[0].exitcode}) - out of memory?")
+    total = sum(rss_mb(pid) for pid in pids)
+    done.set()
+    for p in procs:
+        p.join()
+    return total
+
+
+def measure_latency(predictor, audio_features, requests):
+    window = random_window()
+    movement, audio = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        predictor.predict(window)
+        movement.append((time.perf_counter() - start) * 1000)
+
+        if audio_features is not None:
+            start = time.perf_counter()
+            predictor.score_audio_features(audio_features)
+            audio.append((time.perf_counter() - start) * 1000)
+    return movement, audio
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--django-workers', type=int, default=4)
+    parser.add_argument('--pool-size', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+
+    local = get_movement_predictor()
+    audio_features = None
+    if local._audio_scaler is not None:
+        audio_features = dict(zip(local.audio_feature_names(), local._audio_scaler.mean_))
+
+    service = InferenceService(address='127.0.0.1:0', pool_size=args.pool_size,
+                               timeout=10, predictor_factory=FACTORY).start()
+    service.serve_in_background()
+    remote = RemotePredictor(InferenceClient(address=service.address, timeout=10))
+
+    print("MEMORY (RSS, MB)")
+    in_process = measure_workers('in_process', args.django_workers)
+    clients = measure_workers('service', args.django_workers, service.address)
+    pool = sum(rss_mb(pid) for pid in service.worker_pids)
+    print(f"  in-process: {args.django_workers} workers with models      {in_process:8.0f}")
+    print(f"  service:    {args.django_workers} thin workers + {args.pool_size} model workers "
+          f"{clients + pool:8.0f}  ({clients:.0f} + {pool:.0f})")
+
+    print("LATENCY (ms)")
+    for name, predictor in [('in-process', local), ('service', remote)]:
+        measure_latency(predictor, audio_features, 5)
+        movement, audio = measure_latency(predictor, audio_features, args.requests)
+        line = f"  {name:<11} movement p50 {percentile(movement, 50):7.2f}  p99 {percentile(movement, 99):7.2f}"
+        if audio:
+            line += f"   audio scoring p50 {percentile(audio, 50):6.2f}  p99 {percentile(audio, 99):6.2f}"
+        print(line)
+
+    service.close()
+
+
+if __name__ == '__main__':
+    main()
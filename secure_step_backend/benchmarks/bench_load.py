@@ -0,0 +1,327 @@
+"""
+End-to-end load: simulated civilian devices and police officers using the
+HTTP API and WebSockets at the same time.
+
+    devices     POST predict-combined/ every --predict-interval seconds with a
+                synthetic sensor window and WAV clip, and trigger/ after a
+                prediction with probability --trigger-rate
+    dispatcher  for every alert, GET police/nearest/<id>/ and POST
+                police/dispatch/assign/ (what the web dashboard does)
+    officers    keep ws/police/<officer_id>/ open, POST police/officers/location/
+                every --location-interval seconds, and accept and later resolve
+                the tasks they are sent
+
+The backend is the project's ASGI application, driven in this process
+through channels' test communicators, with the in-memory channel layer,
+the locmem email backend, eager Celery tasks and a temporary SQLite
+database. No server, Redis or SMTP is needed. Clients and backend share
+the CPU, so compare runs on the same machine rather than reading the
+numbers as production latencies.
+
+Reports p50/p95/p99 per endpoint and the WebSocket delivery times:
+
+    alert -> officer   trigger/ sent until new_emergency arrives at each officer
+    assign -> officer  dispatch/assign/ sent until new_task arrives at the officer
+
+    python -m benchmarks.bench_load [--devices 10] [--officers 5] [--duration 60] [--output load.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import warnings
+from collections import Counter, defaultdict
+
+from benchmarks.common import get_movement_predictor, percentile, random_window, stub_services, test_database
+from benchmarks.baseline import save_results, summarize
+
+import numpy as np
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from benchmarks.bench_suite import CENTER
+
+API = '/api/emergency/'
+GRACE_SECONDS = 3.0  # after the run, for deliveries still in flight
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.alerts_sent = {}       # alert_id -> when trigger/ was sent
+        self.alert_deliveries = []  # (alert_id, officer_id, when new_emergency arrived)
+        self.tasks_sent = {}        # task_id -> when dispatch/assign/ was sent
+        self.task_deliveries = {}   # task_id -> when new_task arrived
+        self.no_officer = 0
+
+    def delivery_latencies(self):
+        alerts = [received - self.alerts_sent[alert_id] for alert_id, _, received in self.alert_deliveries
+                  if alert_id in self.alerts_sent]
+        tasks = [received - self.tasks_sent[task_id] for task_id, received in self.task_deliveries.items()
+                 if task_id in self.tasks_sent]
+        return alerts, tasks
+
+
+class Client:
+    """Authenticated HTTP calls against the ASGI application, timed per endpoint"""
+
+    def __init__(self, application, stats, timeout):
+        self.application = application
+        self.stats = stats
+        self.timeout = timeout
+
+    async def call(self, endpoint, method, path, token, body=b'', content_type='application/json'):
+        headers = [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())]
+        if body:
+            headers += [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]
+        communicator = HttpCommunicator(self.application, method, API + path, body=body, headers=headers)
+        start = time.perf_counter()
+        try:
+            response = await communicator.get_response(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.errors[endpoint]['timeout'] += 1
+            return None, None
+        self.stats.latencies[endpoint].append(time.perf_counter() - start)
+        await communicator.wait(self.timeout)  # let Django finish the request (signals, disconnect listener)
+        if response['status'] >= 400:
+            self.stats.errors[endpoint][response['status']] += 1
+        try:
+            return response['status'], json.loads(response['body'] or b'null')
+        except ValueError:
+            return response['status'], None
+
+    async def send_json(self, endpoint, method, path, token, data):
+        return await self.call(endpoint, method, path, token, json.dumps(data).encode())
+
+
+# ============================================================================
+# SETUP
+# ============================================================================
+
+def create_accounts(devices, officers):
+    from django.contrib.auth import get_user_model
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from emergency.models import PoliceOfficer
+
+    User = get_user_model()
+    token = lambda user: str(RefreshToken.for_user(user).access_token)
+
+    citizens = User.objects.bulk_create([
+        User(username=f'device{i}', email=f'device{i}@load.local', full_name=f'Device {i}', password='!')
+        for i in range(devices)
+    ])
+    officer_users = User.objects.bulk_create([
+        User(username=f'officer{i}', email=f'officer{i}@load.local', full_name=f'Officer {i}',
+             role='mobile_officer', password='!')
+        for i in range(officers)
+    ])
+    profiles = PoliceOfficer.objects.bulk_create([
+        PoliceOfficer(user=user, badge_number=f'L{i:05d}', status='available',
+                      current_latitude=CENTER[0], current_longitude=CENTER[1])
+        for i, user in enumerate(officer_users)
+    ])
+    dispatcher = User.objects.create(username='dispatcher', email='dispatcher@load.local',
+                                     full_name='Dispatcher', password='!')
+    return ([(user.id, token(user)) for user in citizens],
+            [(profile.id, token(user)) for profile, user in zip(profiles, officer_users)],
+            token(dispatcher))
+
+
+def combined_bodies(count, rng):
+    """Multipart predict-combined/ bodies: a sensor window and a 5 s WAV clip each"""
+    from emergency.reference_clips import CLIPS, load_clip, wav_bytes
+
+    clips = [wav_bytes(load_clip(name, 22050), 22050) for name in CLIPS]
+    return [
+        encode_multipart(BOUNDARY, {
+            'movement_data': json.dumps(random_window(rng).tolist()),
+            'audio_file': SimpleUploadedFile('clip.wav', clips[i % len(clips)], content_type='audio/wav'),
+        })
+        for i in range(count)
+    ]
+
+
+# ============================================================================
+# SIMULATED CLIENTS
+# ============================================================================
+
+async def device(client, user_id, token, bodies, alerts, args, deadline, seed):
+    rng = random.Random(seed)
+    await asyncio.sleep(rng.uniform(0, args.predict_interval))
+    while time.perf_counter() < deadline:
+        await client.call('predict-combined', 'POST', 'predict-combined/', token, next(bodies), MULTIPART_CONTENT)
+        if rng.random() < args.trigger_rate:
+            sent = time.perf_counter()
+            status, body = await client.send_json('trigger', 'POST', 'trigger/', token, {
+                'alert_type': 'automatic',
+                'location_latitude': f'{CENTER[0] + rng.uniform(-0.2, 0.2):.6f}',
+                'location_longitude': f'{CENTER[1] + rng.uniform(-0.2, 0.2):.6f}',
+                'location_address': f'Device {user_id}',
+                'description': 'Load test',
+            })
+            if status == 201:
+                client.stats.alerts_sent[body['alert']['id']] = sent
+                await alerts.put(body['alert']['id'])
+        await asyncio.sleep(args.predict_interval * rng.uniform(0.8, 1.2))
+
+
+async def dispatcher(client, token, alerts):
+    while True:
+        alert_id = await alerts.get()
+        status, body = await client.call('police/nearest', 'GET', f'police/nearest/{alert_id}/', token)
+        if status != 200:
+            client.stats.no_officer += status == 404
+            continue
+        sent = time.perf_counter()
+        status, body = await client.send_json('police/dispatch/assign', 'POST', 'police/dispatch/assign/', token,
+                                              {'officer_id': body['officer']['id'], 'emergency_id': alert_id})
+        if status == 201:
+            client.stats.tasks_sent[body['task_id']] = sent
+
+
+async def officer(client, application, officer_id, token, args, deadline, seed):
+    rng = random.Random(seed)
+    socket = WebsocketCommunicator(application, f'/ws/police/{officer_id}/')
+    connected, _ = await socket.connect(timeout=client.timeout)
+    if not connected:
+        client.stats.errors['ws/police']['refused'] += 1
+        return
+    handling = set()
+
+    async def handle_task(task_id):
+        path = f'police/dispatch/tasks/{task_id}/status/'
+        await client.send_json('police/dispatch/tasks/status', 'PUT', path, token, {'status': 'accepted'})
+        await asyncio.sleep(args.task_seconds * rng.uniform(0.5, 1.5))
+        await client.send_json('police/dispatch/tasks/status', 'PUT', path, token, {'status': 'resolved'})
+
+    async def listen():
+        while True:
+            message = json.loads(await socket.receive_from(timeout=args.duration + 3600))
+            received = time.perf_counter()
+            if message['type'] == 'new_emergency':
+                client.stats.alert_deliveries.append((message['data']['alert_id'], officer_id, received))
+            elif message['type'] == 'new_task':
+                client.stats.task_deliveries[message['task_id']] = received
+                task = asyncio.ensure_future(handle_task(message['task_id']))
+                handling.add(task)
+                task.add_done_callback(handling.discard)
+
+    listener = asyncio.ensure_future(listen())
+    latitude, longitude = CENTER[0] + rng.uniform(-0.2, 0.2), CENTER[1] + rng.uniform(-0.2, 0.2)
+    await asyncio.sleep(rng.uniform(0, args.location_interval))
+    while time.perf_counter() < deadline:
+        latitude += rng.uniform(-0.002, 0.002)
+        longitude += rng.uniform(-0.002, 0.002)
+        await client.send_json('police/officers/location', 'POST', 'police/officers/location/', token,
+                               {'latitude': round(latitude, 6), 'longitude': round(longitude, 6)})
+        await asyncio.sleep(args.location_interval * rng.uniform(0.8, 1.2))
+
+    await asyncio.sleep(GRACE_SECONDS)
+    for task in [listener, *handling]:
+        task.cancel()
+    await asyncio.gather(listener, *handling, return_exceptions=True)
+    await socket.disconnect()
+
+
+async def run_load(application, devices, officers, dispatcher_token, bodies, args):
+    stats = LoadStats()
+    client = Client(application, stats, args.timeout)
+    alerts = asyncio.Queue()
+
+    # One request first, so model loading is not part of the numbers
+    await client.call('warm-up', 'POST', 'predict-combined/', devices[0][1], next(bodies), MULTIPART_CONTENT)
+    stats.latencies.pop('warm-up', None)
+    stats.errors.pop('warm-up', None)
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    dispatch = asyncio.ensure_future(dispatcher(client, dispatcher_token, alerts))
+    await asyncio.gather(
+        *(officer(client, application, officer_id, token, args, deadline, seed=1000 + i)
+          for i, (officer_id, token) in enumerate(officers)),
+        *(device(client, user_id, token, bodies, alerts, args, deadline, seed=i)
+          for i, (user_id, token) in enumerate(devices)),
+    )
+    dispatch.cancel()
+    await asyncio.gather(dispatch, return_exceptions=True)
+    return stats, time.perf_counter() - start
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def report(stats, elapsed, args):
+    config = {name: getattr(args, name) for name in (
+        'devices', 'officers', 'duration', 'predict_interval', 'trigger_rate', 'location_interval', 'task_seconds')}
+    results = {}
+    print(f"\n{'endpoint':<32}{'requests':>9}{'errors':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint in sorted(set(stats.latencies) | set(stats.errors)):
+        timings = stats.latencies[endpoint]
+        errors = sum(stats.errors[endpoint].values())
+        ms = [t * 1000 for t in timings]
+        print(f"{endpoint:<32}{len(timings):>9}{errors:>8}{len(timings) / elapsed:>8.1f}"
+              f"{percentile(ms, 50):>9.1f}{percentile(ms, 95):>9.1f}{percentile(ms, 99):>9.1f}")
+        if timings:
+            results[f'http.{endpoint}'] = dict(summarize(timings, **config), errors=errors)
+
+    alerts, tasks = stats.delivery_latencies()
+    print(f"\n{'WebSocket delivery':<32}{'messages':>9}{'missing':>8}{'':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, delays, expected in (('alert -> officer', alerts, len(stats.alerts_sent) * args.officers),
+                                   ('assign -> officer', tasks, len(stats.tasks_sent))):
+        ms = [t * 1000 for t in delays]
+        print(f"{name:<32}{len(delays):>9}{expected - len(delays):>8}{'':>8}"
+              f"{percentile(ms, 50):>9.1f}{percentile(ms, 95):>9.1f}{percentile(ms, 99):>9.1f}")
+        if delays:
+            results[f"ws.{name.replace(' -> ', '_to_')}"] = dict(summarize(delays, **config),
+                                                                 missing=expected - len(delays))
+    if stats.no_officer:
+        print(f"⚠️  {stats.no_officer} alert(s) found no available officer")
+    for endpoint, counts in stats.errors.items():
+        for error, count in counts.items():
+            print(f"⚠️  {endpoint}: {count} x {error}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', type=int, default=10)
+    parser.add_argument('--officers', type=int, default=5)
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds of load')
+    parser.add_argument('--predict-interval', type=float, default=3.0, help='seconds between device predictions')
+    parser.add_argument('--trigger-rate', type=float, default=0.05, help='chance a prediction is followed by trigger/')
+    parser.add_argument('--location-interval', type=float, default=5.0, help='seconds between officer locations')
+    parser.add_argument('--task-seconds', type=float, default=5.0, help='time from accepting a task to resolving it')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--output', default=None, help='write the results as JSON (see baseline.py)')
+    args = parser.parse_args()
+
+    from secure_step_backend.asgi import application
+
+    # The development SECRET_KEY is short; PyJWT would warn on every request
+    warnings.filterwarnings('ignore', message='The HMAC key')
+
+    get_movement_predictor()
+    database = os.path.join(tempfile.mkdtemp(prefix='bench-load-'), 'load.sqlite3')
+    with stub_services(), test_database(database):
+        devices, officers, dispatcher_token = create_accounts(args.devices, args.officers)
+        bodies = itertools.cycle(combined_bodies(8, np.random.default_rng(0)))
+        print(f"🏃 {args.devices} devices, {args.officers} officers, {args.duration:g} s")
+        stats, elapsed = asyncio.run(run_load(application, devices, officers, dispatcher_token, bodies, args))
+    shutil.rmtree(os.path.dirname(database), ignore_errors=True)
+
+    results = report(stats, elapsed, args)
+    if args.output:
+        save_results(args.output, results)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Request size and server-side decode time of a sensor window sent as JSON
+versus the binary encodings in emergency.sensor_codec. Decoding goes
+through DRF request parsing with the same parsers as predict_movement,
+up to the float32 array handed to the predictor.
+
+    python -m benchmarks.bench_sensor_payloads [--frames 50] [--iterations 2000]
+"""
+import argparse
+import gzip
+import json
+import time
+
+from benchmarks.common import percentile, random_window
+
+import numpy as np
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from emergency.parsers import SensorWindowParser
+from emergency.sensor_codec import encode_sensor_window
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes([JSONParser, FormParser, MultiPartParser, SensorWindowParser])
+def decode_only(request):
+    payload = request.data
+    data = payload if isinstance(payload, np.ndarray) else payload.get('data')
+    window = np.asarray(data, dtype=np.float32).reshape(-1, 12)
+    return Response({'frames': window.shape[0]})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    frames = np.concatenate([random_window() for _ in range(-(-args.frames // 50))])[:args.frames]
+    json_body = json.dumps({'data': frames.tolist()}).encode()
+
+    payloads = [
+        ('json', json_body, 'application/json', {}),
+        ('json + gzip*', gzip.compress(json_body), 'application/json', {}),
+        ('raw float32', frames.astype('<f4').tobytes(), 'application/octet-stream', {}),
+        ('framed float32', encode_sensor_window(frames), 'application/octet-stream', {}),
+        ('framed f32 gzip', encode_sensor_window(frames, compress=True), 'application/octet-stream', {}),
+        ('framed int16', encode_sensor_window(frames, dtype='int16'), 'application/octet-stream', {}),
+        ('int16 + gzip', gzip.compress(encode_sensor_window(frames, dtype='int16')),
+         'application/octet-stream', {'HTTP_CONTENT_ENCODING': 'gzip'}),
+    ]
+
+    factory = APIRequestFactory()
+    print(f"{args.frames} frames x 12 channels, {args.iterations} requests each")
+    print("* JSON is not gzip-decoded by the server; the size is shown for comparison only\n")
+    print(f"{'payload':<18}{'bytes':>8}{'p50 us':>10}{'p99 us':>10}")
+    for name, body, content_type, extra in payloads:
+        timings = []
+        if not name.endswith('*'):
+            for _ in range(args.iterations):
+                request = factory.post('/', body, content_type=content_type, **extra)
+                start = time.perf_counter()
+                response = decode_only(request)
+                timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.data
+        p50 = f"{percentile(timings, 50) * 1e6:.1f}" if timings else '-'
+        p99 = f"{percentile(timings, 99) * 1e6:.1f}" if timings else '-'
+        print(f"{name:<18}{len(body):>8}{p50:>10}{p99:>10}")
+
+
+if __name__ == '__main__':
+    main()
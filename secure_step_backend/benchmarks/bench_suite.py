@@ -0,0 +1,329 @@
+"""
+Micro-benchmarks of the backend's hot paths, with results saved as JSON
+and compared against a baseline from an earlier run:
+
+    movement.predict            MLPredictor.predict on one 50 x 12 window
+    audio.extract               FastAudioFeatureExtractor on a 5 s clip
+    audio.score                 MLPredictor.score_audio_features (scaler + XGBoost)
+    audio.predict_audio         MLPredictor.predict_audio on a WAV file (decode + extract + score)
+    geo.calculate_distance      calculate_distance from one emergency to every officer
+    geo.get_nearest_officer     the get_nearest_officer view over the officers in the database
+    serializer.alerts           EmergencyAlertSerializer(many=True) over the admin alert list
+    consumer.emergency_alert    PoliceConsumer.emergency_alert (JSON encoding + send)
+    consumer.officer_location   UserConsumer.officer_location (JSON encoding + send)
+
+Everything runs in-process: a throwaway in-memory test database, the
+in-memory channel layer and the locmem email backend, so no Redis or SMTP
+server is needed.
+
+    python -m benchmarks.bench_suite                       # run, compare with the saved baseline
+    python -m benchmarks.bench_suite --save-baseline       # run and make this run the baseline
+    python -m benchmarks.bench_suite --only geo,serializer --officers 5000 --output run.json
+
+The default baseline is benchmarks/baselines/<hostname>.json, since
+timings are only comparable on the same machine. The script exits with
+status 1 when a benchmark's p50 is slower than the baseline by more than
+--threshold percent.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import get_movement_predictor, random_window, stub_services, test_database
+from benchmarks.baseline import compare, environment, load_results, regressions, save_results, summarize
+
+import numpy as np
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Around Islamabad, where the test data lives
+CENTER = (33.6844, 73.0479)
+
+
+def time_calls(function, repeats, warmup=2):
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+# ============================================================================
+# ML
+# ============================================================================
+
+def bench_movement(args):
+    predictor = get_movement_predictor()
+    rng = np.random.default_rng(0)
+    windows = itertools.cycle([random_window(rng).tolist() for _ in range(16)])
+    timings = time_calls(lambda: predictor.predict(next(windows)), args.repeats)
+    model = 'bilstm_action_model.h5' if os.path.exists(os.path.join(predictor.base_path, 'bilstm_action_model.h5')) \
+        else 'stand-in'
+    return {'movement.predict': summarize(timings, model=model)}
+
+
+def bench_audio(args):
+    from emergency.ml_predictor import FastAudioFeatureExtractor, MLPredictor
+    from emergency.reference_clips import CLIPS, load_clip, wav_bytes
+
+    sr = 22050
+    clips = [load_clip(name, sr) for name in CLIPS]
+    extractor = FastAudioFeatureExtractor()
+    clip_cycle = itertools.cycle(clips)
+    results = {'audio.extract': summarize(
+        time_calls(lambda: extractor.extract_features(next(clip_cycle), sr), args.repeats),
+        clip_seconds=round(len(clips[0]) / sr, 2), sample_rate=sr)}
+
+    predictor = MLPredictor.get_instance()
+    if not predictor._audio_models_loaded():
+        print("⚠️  Audio model files not available - skipping audio.score and audio.predict_audio")
+        return results
+
+    rows = itertools.cycle([extractor.extract_features(clip, sr) for clip in clips])
+    results['audio.score'] = summarize(time_calls(lambda: predictor.score_audio_features(next(rows)), args.repeats))
+
+    folder = tempfile.mkdtemp(prefix='bench-audio-')
+    try:
+        paths = []
+        for name, clip in zip(CLIPS, clips):
+            paths.append(os.path.join(folder, f'{name}.wav'))
+            with open(paths[-1], 'wb') as f:
+                f.write(wav_bytes(clip, sr))
+        path_cycle = itertools.cycle(paths)
+        results['audio.predict_audio'] = summarize(
+            time_calls(lambda: predictor.predict_audio(next(path_cycle)), args.repeats),
+            format='wav', sample_rate=sr)
+    finally:
+        shutil.rmtree(folder)
+    return results
+
+
+# ============================================================================
+# DATABASE AND API
+# ============================================================================
+
+def create_officers(count, rng):
+    from django.contrib.auth import get_user_model
+    from emergency.models import PoliceOfficer
+
+    User = get_user_model()
+    users = User.objects.bulk_create([
+        User(username=f'officer{i}', email=f'officer{i}@bench.local', full_name=f'Officer {i}',
+             role='mobile_officer', password='!')
+        for i in range(count)
+    ])
+    statuses = ['available', 'on_patrol', 'busy', 'offline']
+    PoliceOfficer.objects.bulk_create([
+        PoliceOfficer(user=user, badge_number=f'B{i:06d}', is_active=True, status=statuses[i % len(statuses)],
+                      current_latitude=round(CENTER[0] + rng.uniform(-0.3, 0.3), 8),
+                      current_longitude=round(CENTER[1] + rng.uniform(-0.3, 0.3), 8))
+        for i, user in enumerate(users)
+    ])
+
+
+def create_alerts(count, rng):
+    from django.contrib.auth import get_user_model
+    from emergency.models import EmergencyAlert
+
+    User = get_user_model()
+    citizens = User.objects.bulk_create([
+        User(username=f'citizen{i}', email=f'citizen{i}@bench.local', full_name=f'Citizen {i}', password='!')
+        for i in range(max(1, count // 10))
+    ])
+    EmergencyAlert.objects.bulk_create([
+        EmergencyAlert(user=citizens[i % len(citizens)], alert_type=['panic', 'automatic', 'manual'][i % 3],
+                       status=['active', 'resolved', 'false_alarm'][i % 3],
+                       location_latitude=round(CENTER[0] + rng.uniform(-0.3, 0.3), 8),
+                       location_longitude=round(CENTER[1] + rng.uniform(-0.3, 0.3), 8),
+                       location_address=f'Street {i}, Islamabad', description='Benchmark alert')
+        for i in range(count)
+    ])
+    return citizens[0]
+
+
+def bench_geo(args):
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from emergency.models import EmergencyAlert, PoliceOfficer
+    from emergency.police_views import calculate_distance, get_nearest_officer
+
+    officers = [(float(lat), float(lon)) for lat, lon in
+                PoliceOfficer.objects.values_list('current_latitude', 'current_longitude')]
+    emergency = EmergencyAlert.objects.first()
+    lat, lon = float(emergency.location_latitude), float(emergency.location_longitude)
+
+    def sweep():
+        return min(calculate_distance(lat, lon, officer_lat, officer_lon) for officer_lat, officer_lon in officers)
+
+    factory = APIRequestFactory()
+    user = emergency.user
+
+    def nearest():
+        request = factory.get(f'/api/emergency/police/nearest/{emergency.id}/')
+        force_authenticate(request, user=user)
+        response = get_nearest_officer(request, emergency_id=emergency.id)
+        assert response.status_code == 200, response.data
+        response.render()
+
+    return {
+        'geo.calculate_distance': summarize(time_calls(sweep, args.repeats), officers=len(officers)),
+        'geo.get_nearest_officer': summarize(time_calls(nearest, args.repeats), officers=len(officers)),
+    }
+
+
+def bench_serializer(args):
+    from emergency.models import EmergencyAlert
+    from emergency.serializers import EmergencyAlertSerializer
+
+    # The admin_emergency_alerts queryset, evaluated fresh on every call like a request would
+    def serialize():
+        return EmergencyAlertSerializer(EmergencyAlert.objects.all().order_by('-created_at'), many=True).data
+
+    repeats = max(5, args.repeats // 5)
+    return {'serializer.alerts': summarize(time_calls(serialize, repeats), alerts=EmergencyAlert.objects.count())}
+
+
+# ============================================================================
+# CONSUMERS
+# ============================================================================
+
+def time_async_calls(handler, event, repeats, inner=200, warmup=2):
+    """Per-call timings of an async handler, each averaged over `inner` calls to get above timer noise"""
+    async def run():
+        for _ in range(warmup):
+            await handler(event)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(inner):
+                await handler(event)
+            timings.append((time.perf_counter() - start) / inner)
+        return timings
+
+    return asyncio.run(run())
+
+
+def stub_send(consumer):
+    """Swallow what the consumer would write to its socket"""
+    async def send(text_data=None, bytes_data=None, close=False):
+        consumer.sent += 1
+
+    consumer.sent = 0
+    consumer.send = send
+    return consumer
+
+
+def bench_consumers(args):
+    from emergency.consumers import PoliceConsumer, UserConsumer
+
+    police = stub_send(PoliceConsumer())
+    police.officer_id = 1
+    user = stub_send(UserConsumer())
+    user.user_id = 1
+
+    alert = {
+        'type': 'emergency_alert', 'alert_id': 4711, 'user_id': 42, 'user_name': 'Citizen 42',
+        'location': 'Street 12, F-7 Markaz, Islamabad',
+        'coordinates': {'latitude': CENTER[0], 'longitude': CENTER[1]},
+        'timestamp': '2024-05-01T12:00:00+00:00',
+    }
+    location = {
+        'type': 'officer_location', 'officer_id': 7, 'officer_name': 'Officer 7', 'badge_number': 'B000007',
+        'emergency_id': 4711, 'coordinates': {'latitude': CENTER[0] + 0.01, 'longitude': CENTER[1] - 0.02},
+        'eta': 4, 'timestamp': '2024-05-01T12:00:05+00:00',
+    }
+    return {
+        'consumer.emergency_alert': summarize(time_async_calls(police.emergency_alert, alert, args.repeats)),
+        'consumer.officer_location': summarize(time_async_calls(user.officer_location, location, args.repeats)),
+    }
+
+
+BENCHMARKS = {
+    'movement': bench_movement,
+    'audio': bench_audio,
+    'geo': bench_geo,
+    'serializer': bench_serializer,
+    'consumer': bench_consumers,
+}
+NEEDS_DATABASE = {'geo', 'serializer'}
+
+
+def run(groups, args):
+    results = {}
+    with stub_services():
+        for group in groups:
+            if group in NEEDS_DATABASE:
+                continue
+            print(f"⏱  {group}")
+            results.update(BENCHMARKS[group](args))
+
+        database_groups = [group for group in groups if group in NEEDS_DATABASE]
+        if database_groups:
+            with test_database():
+                rng = np.random.default_rng(0)
+                create_officers(args.officers, rng)
+                create_alerts(args.alerts, rng)
+                for group in database_groups:
+                    print(f"⏱  {group}")
+                    results.update(BENCHMARKS[group](args))
+    return results
+
+
+def print_results(results, rows):
+    compared = {row[0]: row for row in rows}
+    print(f"\n{'benchmark':<28}{'p50 ms':>10}{'p95 ms':>10}{'baseline':>10}{'change':>9}  ")
+    for name, result in results.items():
+        _, old, _, change, verdict = compared.get(name, (name, None, None, None, ''))
+        old_text = f"{old:.4f}" if old is not None else '-'
+        change_text = f"{change * 100:+.1f}%" if change is not None else '-'
+        print(f"{name:<28}{result['p50']:>10.4f}{result['p95']:>10.4f}{old_text:>10}{change_text:>9}  {verdict}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help=f"comma-separated groups: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--officers', type=int, default=1000)
+    parser.add_argument('--alerts', type=int, default=1000)
+    parser.add_argument('--baseline', default=os.path.join(BASELINE_DIR, f'{platform.node() or "local"}.json'))
+    parser.add_argument('--save-baseline', action='store_true', help='write this run to --baseline')
+    parser.add_argument('--output', default=None, help='also write this run to a JSON file')
+    parser.add_argument('--threshold', type=float, default=20.0, help='regression threshold on p50, in percent')
+    args = parser.parse_args()
+
+    groups = [group.strip() for group in args.only.split(',') if group.strip()]
+    unknown = [group for group in groups if group not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmark group(s): {', '.join(unknown)}")
+
+    results = run(groups, args)
+    meta = environment()
+    if args.output:
+        save_results(args.output, results, meta)
+
+    rows = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        rows = compare(load_results(args.baseline), results, args.threshold / 100.0)
+    print_results(results, rows)
+
+    if args.save_baseline:
+        save_results(args.baseline, results, meta)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+    elif not rows:
+        print(f"\nNo baseline at {args.baseline}; create one with --save-baseline")
+
+    slower = regressions(rows)
+    if slower:
+        raise SystemExit(f"❌ {len(slower)} regression(s) over {args.threshold:g}%: {', '.join(slower)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Throughput and tail latency of several server processes on one box, for
+different per-process thread budgets (ML_THREADS, see
+emergency/thread_budget.py).
+
+Every worker is a separate spawned process that loads the models and then
+serves requests back to back: a batch of 8 movement windows plus feature
+extraction and XGBoost scoring of one 5 s clip. ML_THREADS=0 is each
+library's default (a thread per core in every library).
+
+    python -m benchmarks.bench_thread_budget [--workers 1,2,4] [--threads 0,1,2] [--requests 30]
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+
+from benchmarks.common import percentile
+
+
+def serve(barrier, results, requests):
+    from benchmarks.common import get_movement_predictor, random_window
+    from emergency.ml_predictor import FastAudioFeatureExtractor
+    from emergency.reference_clips import SAMPLE_RATE, load_clip
+
+    predictor = get_movement_predictor()
+    extractor = FastAudioFeatureExtractor()
+    clip = load_clip('speech_like')
+    windows = [random_window() for _ in range(8)]
+
+    def request():
+        predictor.predict_batch(windows)
+        predictor.score_audio_features(extractor.extract_features(clip, SAMPLE_RATE))
+
+    for _ in range(3):
+        request()  # warm up
+
+    barrier.wait()
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        request()
+        latencies.append(time.perf_counter() - start)
+    results.put(latencies)
+
+
+def run(workers, threads, requests):
+    """(latencies, wall seconds) for `workers` processes with ML_THREADS=threads"""
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+
+    # Spawned processes read their settings from the environment
+    os.environ['ML_THREADS'] = str(threads)
+    processes = [context.Process(target=serve, args=(barrier, results, requests)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    latencies = []
+    for _ in range(workers):
+        latencies.extend(results.get())
+    wall = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return latencies, wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated process counts')
+    parser.add_argument('--threads', default='0,1,2', help='comma-separated ML_THREADS values (0 = defaults)')
+    parser.add_argument('--requests', type=int, default=30, help='requests per worker')
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(',')]
+    thread_counts = [int(t) for t in args.threads.split(',')]
+
+    print(f"{os.cpu_count()} CPU(s), {args.requests} requests per worker")
+    print(f"{'workers':>8}{'threads':>9}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    for workers, threads in itertools.product(worker_counts, thread_counts):
+        latencies, wall = run(workers, threads, args.requests)
+        print(f"{workers:>8}{threads or 'default':>9}{len(latencies) / wall:>8.1f}"
+              f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 99) * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
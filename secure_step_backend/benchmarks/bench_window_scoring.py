@@ -0,0 +1,51 @@
+"""
+Scoring a long recording: one predict_windows call versus one predict call
+per 50-frame window (what clients had to do before).
+
+    python -m benchmarks.bench_window_scoring [--seconds 10,30,60] [--stride 10] [--repeats 5]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import get_movement_predictor, percentile, random_window
+from emergency.ml_predictor import window_starts
+
+
+def recording(frames):
+    return np.concatenate([random_window() for _ in range(-(-frames // 50))])[:frames]
+
+
+def time_calls(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return percentile(timings, 50) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', default='10,30,60', help='recording lengths at 10 Hz')
+    parser.add_argument('--stride', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    predictor = get_movement_predictor()
+    predictor.predict(random_window())  # warm-up / graph tracing
+
+    print(f"stride {args.stride} frames, median of {args.repeats} runs")
+    print(f"{'seconds':>8}{'windows':>9}{'per-window ms':>15}{'batched ms':>12}{'speed-up':>10}")
+    for seconds in [int(s) for s in args.seconds.split(',')]:
+        frames = recording(seconds * 10)
+        starts = window_starts(len(frames), args.stride)
+
+        looped = time_calls(lambda: [predictor.predict(frames[s:s + 50]) for s in starts], args.repeats)
+        batched = time_calls(lambda: predictor.predict_windows(frames, args.stride), args.repeats)
+        print(f"{seconds:>8}{len(starts):>9}{looped:>15.1f}{batched:>12.1f}{looped / batched:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Shared helpers for the benchmark scripts in this folder.
+
+Run the scripts from the secure_step_backend directory, e.g.
+    python -m benchmarks.bench_batching
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import django
+
+sys.path.append(os.getcwd())
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'secure_step_backend.settings')
+django.setup()
+
+import numpy as np
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) if samples else 0.0
+
+
+def random_window(rng=None):
+    """One 50 x 12 sensor window with the same value ranges as test_movement.py"""
+    rng = rng or np.random.default_rng()
+    window = np.empty((50, 12))
+    window[:, 0:3] = rng.uniform(-2, 2, (50, 3))       # gyro
+    window[:, 3:6] = rng.uniform(-10, 10, (50, 3))     # accel
+    window[:, 6] = rng.uniform(-90, 90, 50)            # pitch
+    window[:, 7] = rng.uniform(-180, 180, 50)          # roll
+    window[:, 8:12] = [25.0, 170.0, 70.0, 24.2]        # age, height, weight, bmi
+    return window
+
+
+def build_standin_bilstm(num_classes):
+    """
+    BiLSTM with the movement model's input/output shape, used when
+    bilstm_action_model.h5 is not present on the benchmark machine.
+    """
+    import tensorflow as tf
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(50, 12)),
+        tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(64, return_sequences=True)),
+        tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(32)),
+        tf.keras.layers.Dense(64, activation='relu'),
+        tf.keras.layers.Dense(num_classes, activation='softmax'),
+    ])
+    return model
+
+
+def get_movement_predictor():
+    """MLPredictor with a movement model, falling back to a stand-in BiLSTM"""
+    from emergency.ml_predictor import MLPredictor
+    from emergency.model_state import READY
+    from emergency.movement_backends import KerasBackend
+
+    predictor = MLPredictor.get_instance()
+    if predictor._model is None:
+        print("bilstm_action_model.h5 not found - benchmarking a stand-in BiLSTM")
+        model = build_standin_bilstm(len(predictor._label_encoder.classes_))
+        # A background retry of the failed load would put _model back to None
+        state = predictor.model_states['movement']
+        state.cancel_retry()
+        predictor._model = KerasBackend(model)
+        state.state = READY
+    return predictor
+
+
+def run_concurrent(fn, concurrency, requests_per_worker):
+    """
+    Call fn() from `concurrency` threads and time every call.
+    Returns (latencies_in_seconds, wall_clock_seconds).
+    """
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def worker():
+        local = []
+        barrier.wait()
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            fn()
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+def rss_mb(pid=None):
+    """Resident set size of a process in MB (Linux /proc only)"""
+    path = f"/proc/{pid or os.getpid()}/status"
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return float('nan')
+
+
+# In-process stand-ins for Redis (channel layer) and SMTP
+STUB_SETTINGS = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+}
+
+
+@contextmanager
+def stub_services():
+    """STUB_SETTINGS, with Celery tasks run eagerly instead of queued on Redis"""
+    from django.test.utils import override_settings
+    from secure_step_backend.celery import app as celery_app
+
+    eager = celery_app.conf.task_always_eager
+    celery_app.conf.task_always_eager = True
+    try:
+        with override_settings(**STUB_SETTINGS):
+            yield
+    finally:
+        celery_app.conf.task_always_eager = eager
+
+
+@contextmanager
+def test_database(name=None):
+    """
+    A throwaway test database for the duration of the block: in-memory by
+    default, or the SQLite file `name` (needed when several threads write).
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    if name:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = name
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
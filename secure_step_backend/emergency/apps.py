@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class EmergencyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'emergency'
\ No newline at end of file
+    name = 'emergency'
+
+    def ready(self):
+        # Opt-in: only processes that serve predictions should set this, so
+        # Celery workers and management commands never load the ML stack.
+        if getattr(settings, 'ML_WARMUP_ON_STARTUP', False):
+            from .ml_predictor import start_background_warm_up
+            start_background_warm_up()
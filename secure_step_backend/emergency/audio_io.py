@@ -0,0 +1,300 @@
+"""
+Decoding uploaded audio clips straight from memory.
+
+The prediction views used to copy every upload into a temporary .m4a
+file so librosa could read it back from disk. decode_audio_upload turns
+the upload into a mono float32 signal at the extractor's sample rate
+without that round trip:
+
+    raw PCM     file part with Content-Type `audio/pcm` (or a .pcm name).
+                Optional content-type parameters: rate (default 22050),
+                format (s16le | f32le, default s16le), channels (default 1).
+                No container at all; one np.frombuffer.
+    WAV / FLAC  decoded by soundfile from an in-memory buffer.
+    / OGG
+    anything    (m4a/AAC from the apps, mp3, ...) piped through ffmpeg.
+    else        Uploads Django already spooled to disk are passed by path.
+                MP4 files with the index at the end cannot be read from a
+                pipe; only those still go through a temporary file. The
+                Android recorder writes its m4a files that way (moov after
+                mdat), so the top-level atoms are checked first and those
+                uploads skip the pipe attempt.
+
+Every path reproduces librosa.load(path, sr=22050, duration=5): the same
+int16 -> float conversion and channel averaging. Only the first
+`duration` seconds are decoded, at the file's native rate, and then
+resampled with ML_AUDIO_RESAMPLER (soxr_hq, librosa's default, unless
+configured otherwise).
+"""
+import io
+import logging
+import math
+import re
+import subprocess
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Containers soundfile (libsndfile) decodes from a buffer
+SOUNDFILE_MAGIC = (b'RIFF', b'RIFX', b'fLaC', b'OggS', b'FORM')
+
+PCM_CONTENT_TYPES = ('audio/pcm', 'audio/x-pcm')
+PCM_FORMATS = {'s16le': '<i2', 'f32le': '<f4'}
+
+# ffmpeg's names for the channel layouts it reports on stderr
+CHANNEL_LAYOUTS = {
+    'mono': 1, 'stereo': 2, '2.1': 3, '3.0': 3, 'quad': 4, '4.0': 4,
+    '5.0': 5, '5.1': 6, '6.1': 7, '7.1': 8,
+}
+FFMPEG_AUDIO_STREAM = re.compile(r'Audio: .*?(\d+) Hz, ([^,]+)')
+
+FFMPEG_TIMEOUT = 10
+
+# 'soxr_*' are librosa.resample's soxr qualities; 'polyphase' is
+# scipy.signal.resample_poly with a filter designed once per rate pair
+RESAMPLERS = ('soxr_vhq', 'soxr_hq', 'soxr_mq', 'soxr_lq', 'soxr_qq', 'polyphase')
+
+
+class AudioDecodeError(ValueError):
+    pass
+
+
+def decode_audio_upload(upload, sample_rate=22050, duration=5):
+    """Decode a Django UploadedFile into (mono float32 signal, sample_rate)"""
+    path = upload.temporary_file_path() if hasattr(upload, 'temporary_file_path') else None
+    upload.seek(0)
+    return decode_audio(
+        upload.read(),
+        content_type=getattr(upload, 'content_type', None),
+        params=getattr(upload, 'content_type_extra', None),
+        name=getattr(upload, 'name', None),
+        path=path,
+        sample_rate=sample_rate,
+        duration=duration,
+    )
+
+
+def decode_audio(data, content_type=None, params=None, name=None, path=None, sample_rate=22050, duration=5):
+    """
+    Decode an encoded clip held in memory. `path` is an on-disk copy of
+    the same bytes, if one already exists.
+    """
+    if not data:
+        raise AudioDecodeError("Empty audio upload")
+
+    if (content_type or '').lower() in PCM_CONTENT_TYPES or (name or '').lower().endswith('.pcm'):
+        audio, native_rate = decode_pcm(data, params or {}, duration)
+    elif data[:4] in SOUNDFILE_MAGIC:
+        audio, native_rate = _decode_soundfile(data, duration)
+    else:
+        audio, native_rate = _decode_ffmpeg(data, path, duration, suffix=_suffix(name))
+
+    return resample(audio, native_rate, sample_rate), sample_rate
+
+
+def decode_audio_file(path, sample_rate=22050, duration=5):
+    """FastAudioFeatureExtractor.load_audio: decode the first `duration` seconds of a file on disk"""
+    try:
+        audio, native_rate = _decode_soundfile(path, duration)
+    except AudioDecodeError:
+        try:
+            audio, native_rate = _decode_ffmpeg(None, path, duration, suffix=None)
+        except AudioDecodeError:
+            # No ffmpeg, or a format it rejects - try librosa's audioread
+            # backends at the native rate
+            audio, native_rate = _decode_librosa(path, duration)
+    return resample(audio, native_rate, sample_rate), sample_rate
+
+
+def decode_pcm(data, params, duration=5):
+    """Headerless little-endian PCM -> (mono float32 signal, its sample rate)"""
+    fmt = str(params.get('format', 's16le')).lower()
+    if fmt not in PCM_FORMATS:
+        raise AudioDecodeError(f"Unsupported PCM format '{fmt}'. Use one of: {', '.join(PCM_FORMATS)}")
+    try:
+        rate = int(params.get('rate', 22050))
+        channels = int(params.get('channels', 1))
+    except (TypeError, ValueError):
+        raise AudioDecodeError("PCM rate and channels must be integers")
+    if rate <= 0 or channels <= 0:
+        raise AudioDecodeError("PCM rate and channels must be positive")
+
+    frame_bytes = np.dtype(PCM_FORMATS[fmt]).itemsize * channels
+    usable = min(len(data) - len(data) % frame_bytes, int(rate * duration) * frame_bytes)
+    if usable == 0:
+        raise AudioDecodeError("PCM payload shorter than one frame")
+
+    samples = np.frombuffer(data, dtype=PCM_FORMATS[fmt], count=usable // np.dtype(PCM_FORMATS[fmt]).itemsize)
+    return _to_mono(_to_float(samples), channels), rate
+
+
+def _decode_soundfile(source, duration):
+    import soundfile as sf
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        with sf.SoundFile(source) as f:
+            native_rate = f.samplerate
+            frames = f.read(frames=int(native_rate * duration), dtype='float32', always_2d=True)
+    except (sf.LibsndfileError, RuntimeError) as e:
+        raise AudioDecodeError(f"Could not decode audio: {e}")
+    return frames.mean(axis=1) if frames.shape[1] > 1 else frames[:, 0], native_rate
+
+
+def _decode_ffmpeg(data, path, duration, suffix):
+    try:
+        if path:
+            result = _run_ffmpeg(path, None, duration)
+        elif mp4_index_at_end(data):
+            result = _run_ffmpeg_from_temp_file(data, duration, suffix)
+        else:
+            result = _run_ffmpeg('pipe:0', data, duration)
+            if result.returncode != 0:
+                # An MP4 the atom scan did not recognise may still need
+                # seeking - retry from a temporary file
+                logger.info("ffmpeg could not decode the upload from a pipe, retrying from a temporary file")
+                result = _run_ffmpeg_from_temp_file(data, duration, suffix)
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is required to decode this audio format")
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError(f"ffmpeg did not finish within {FFMPEG_TIMEOUT}s")
+
+    stderr = result.stderr.decode('utf-8', 'replace')
+    if result.returncode != 0:
+        raise AudioDecodeError(f"ffmpeg failed: {stderr.strip().splitlines()[-1] if stderr.strip() else result.returncode}")
+
+    match = FFMPEG_AUDIO_STREAM.search(stderr)
+    if not match:
+        raise AudioDecodeError("No audio stream found")
+    native_rate = int(match.group(1))
+    layout = match.group(2).strip()
+    channels = CHANNEL_LAYOUTS.get(layout)
+    if channels is None:
+        counted = re.match(r'(\d+) channels', layout)
+        if not counted:
+            raise AudioDecodeError(f"Unsupported channel layout '{layout}'")
+        channels = int(counted.group(1))
+
+    samples = np.frombuffer(result.stdout, dtype='<i2')
+    samples = samples[:len(samples) - len(samples) % channels][:int(native_rate * duration) * channels]
+    return _to_mono(_to_float(samples), channels), native_rate
+
+
+def _run_ffmpeg_from_temp_file(data, duration, suffix):
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        tmp.write(data)
+        tmp.flush()
+        return _run_ffmpeg(tmp.name, None, duration)
+
+
+def mp4_index_at_end(data):
+    """
+    True for an MP4/M4A whose moov atom (the sample index) comes after
+    mdat, which ffmpeg can only read from a seekable file. Walks the
+    top-level atom headers only, so it costs a few slices per upload.
+    """
+    if data[4:8] != b'ftyp':
+        return False
+    offset, end = 0, len(data)
+    while offset + 8 <= end:
+        size = int.from_bytes(data[offset:offset + 4], 'big')
+        kind = bytes(data[offset + 4:offset + 8])
+        if kind == b'moov':
+            return False
+        if kind == b'mdat':
+            return True
+        if size == 1:
+            # 64-bit size after the type
+            if offset + 16 > end:
+                break
+            size = int.from_bytes(data[offset + 8:offset + 16], 'big')
+        elif size == 0:
+            # Runs to the end of the file
+            break
+        if size < 8:
+            break
+        offset += size
+    return False
+
+
+def _decode_librosa(path, duration):
+    import librosa
+
+    try:
+        return librosa.load(path, sr=None, duration=duration)
+    except Exception as e:
+        raise AudioDecodeError(f"Could not decode audio: {e}")
+
+
+def _run_ffmpeg(source, data, duration):
+    # Native rate and channels as 16-bit PCM, like librosa's audioread path
+    command = [
+        'ffmpeg', '-hide_banner', '-nostats', '-i', source,
+        '-t', str(duration), '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1',
+    ]
+    return subprocess.run(
+        command,
+        input=data,
+        stdin=None if data is not None else subprocess.DEVNULL,
+        capture_output=True,
+        timeout=FFMPEG_TIMEOUT,
+    )
+
+
+def _to_float(samples):
+    if samples.dtype.kind == 'f':
+        return samples.astype(np.float32)
+    return (samples * np.float32(1.0 / 32768)).astype(np.float32)
+
+
+def _to_mono(samples, channels):
+    if channels == 1:
+        return samples
+    return samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+
+
+def resample(audio, native_rate, sample_rate, method=None):
+    """Resample to the extractor's rate with ML_AUDIO_RESAMPLER (or `method`)"""
+    method = method or getattr(settings, 'ML_AUDIO_RESAMPLER', 'soxr_hq')
+    if method not in RESAMPLERS:
+        raise ValueError(f"Unknown resampler '{method}'. Choose one of: {', '.join(RESAMPLERS)}")
+    if native_rate == sample_rate:
+        return audio
+
+    if method == 'polyphase':
+        from scipy.signal import resample_poly
+
+        divisor = math.gcd(int(native_rate), int(sample_rate))
+        up, down = int(sample_rate) // divisor, int(native_rate) // divisor
+        resampled = resample_poly(audio, up, down, window=polyphase_filter(up, down))
+        return resampled.astype(np.float32)
+
+    import librosa
+
+    return librosa.resample(audio, orig_sr=native_rate, target_sr=sample_rate, res_type=method)
+
+
+@lru_cache(maxsize=16)
+def polyphase_filter(up, down):
+    """
+    The Kaiser low-pass resample_poly designs by default for up/down.
+    Designing it (6401 taps for 48 kHz -> 22.05 kHz) costs more than
+    filtering a clip, so it is built once per rate pair.
+    """
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    taps.setflags(write=False)
+    return taps
+
+
+def _suffix(name):
+    if name and '.' in name:
+        return '.' + name.rsplit('.', 1)[-1].lower()
+    return '.m4a'
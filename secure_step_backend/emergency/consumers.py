@@ -1,9 +1,15 @@
 import json
+import numpy as np
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.conf import settings
 import logging
 
+from .ml_predictor import get_predictor
+from .sensor_codec import CHANNELS, SensorPayloadError, decode_sensor_window
+
 logger = logging.getLogger(__name__)
 
 
@@ -172,3 +178,129 @@ class UserConsumer(AsyncWebsocketConsumer):
             'type': 'threat_resolved',
             'message': 'Your emergency has been marked as resolved'
         }))
+
+
+class MovementStreamConsumer(AsyncWebsocketConsumer):
+    """
+    Streaming movement detection
+    The app connects to: ws://backend/ws/movement/{user_id}/
+
+    Frames are sent as they are sampled, either as JSON
+        {"type": "frames", "frames": [[12 values], ...]}   (or "frame": [12 values])
+    or as a binary message in the sensor_codec format. The last 50 frames
+    are kept in a per-connection ring buffer and the model runs on them
+    every ML_STREAM_INFERENCE_STRIDE new frames. Results come back as
+        {"type": "prediction", "frames_received": n, "result": {...}}
+    """
+
+    WINDOW_SIZE = 50
+
+    async def connect(self):
+        self.user_id = self.scope['url_route']['kwargs'].get('user_id')
+        self.stride = max(1, getattr(settings, 'ML_STREAM_INFERENCE_STRIDE', 10))
+        self.max_frames_per_message = getattr(settings, 'ML_STREAM_MAX_FRAMES_PER_MESSAGE', 50)
+        self._reset_buffer()
+
+        await self.accept()
+        logger.info(f"✅ User {self.user_id} started a movement stream")
+
+    async def disconnect(self, close_code):
+        self.buffer = None
+        logger.info(f"❌ User {self.user_id} movement stream closed after {getattr(self, 'frames_received', 0)} frames")
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            if bytes_data is not None:
+                frames = decode_sensor_window(bytes_data)
+            else:
+                frames = self._parse_text(text_data)
+                if frames is None:
+                    return
+        except (ValueError, TypeError) as e:
+            await self.send_error(str(e))
+            return
+
+        if len(frames) > self.max_frames_per_message:
+            await self.send_error(f"At most {self.max_frames_per_message} frames per message, got {len(frames)}")
+            return
+
+        self._append(frames)
+        if self.frames_filled == self.WINDOW_SIZE and self.frames_since_inference >= self.stride:
+            self.frames_since_inference = 0
+            await self.run_inference()
+
+    def _parse_text(self, text_data):
+        data = json.loads(text_data)
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+        message_type = data.get('type', 'frames')
+
+        if message_type == 'reset':
+            self._reset_buffer()
+            return None
+        if message_type != 'frames':
+            raise ValueError(f"Unknown message type '{message_type}'")
+
+        frames = data['frames'] if 'frames' in data else [data.get('frame')]
+        frames = np.asarray(frames, dtype=np.float32)
+        if frames.ndim != 2 or frames.shape[1] != CHANNELS:
+            raise ValueError(f"Each frame must have {CHANNELS} values")
+        return frames
+
+    def _reset_buffer(self):
+        self.buffer = np.zeros((self.WINDOW_SIZE, CHANNELS), dtype=np.float32)
+        self.head = 0  # index of the oldest frame once the buffer is full
+        self.frames_filled = 0
+        self.frames_since_inference = 0
+        self.frames_received = 0
+
+    def _append(self, frames):
+        count = len(frames)
+        self.frames_received += count
+        self.frames_since_inference += count
+
+        if count >= self.WINDOW_SIZE:
+            self.buffer[:] = frames[-self.WINDOW_SIZE:]
+            self.head = 0
+            self.frames_filled = self.WINDOW_SIZE
+            return
+
+        end = self.head + count
+        if end <= self.WINDOW_SIZE:
+            self.buffer[self.head:end] = frames
+        else:
+            split = self.WINDOW_SIZE - self.head
+            self.buffer[self.head:] = frames[:split]
+            self.buffer[:end - self.WINDOW_SIZE] = frames[split:]
+        self.head = end % self.WINDOW_SIZE
+        self.frames_filled = min(self.WINDOW_SIZE, self.frames_filled + count)
+
+    def current_window(self):
+        """The buffered frames, oldest first"""
+        return np.concatenate((self.buffer[self.head:], self.buffer[:self.head]))
+
+    async def run_inference(self):
+        window = self.current_window()
+        try:
+            # Not thread-sensitive, so concurrent streams can share a batch
+            result = await sync_to_async(_predict_window, thread_sensitive=False)(window)
+        except Exception as e:
+            logger.error(f"Stream prediction error for user {self.user_id}: {e}")
+            await self.send_error(f"Prediction failed: {e}")
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'prediction',
+            'frames_received': self.frames_received,
+            'result': result
+        }))
+
+    async def send_error(self, message):
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'message': message
+        }))
+
+
+def _predict_window(window):
+    return get_predictor().predict(window)
@@ -0,0 +1,130 @@
+"""
+Extracted audio features, cached by the content of the uploaded clip.
+
+Clients retry after timeouts and often send the same clip to
+/predict-audio/ and then /predict-combined/. The features of a clip only
+depend on its bytes and the extraction settings, so they are cached in
+the Django cache under
+
+    sha256(FEATURE_VERSION, extraction settings, content type, bytes)
+
+and a repeated upload goes straight to scaling and XGBoost. The cache
+alias (ML_AUDIO_FEATURE_CACHE) is a bounded LRU with a TTL: locmem per
+process by default, or Redis shared by every worker when
+ML_AUDIO_FEATURE_CACHE_URL is set. Hit and miss counters live in the
+same cache, so with Redis they cover all workers.
+"""
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Bump when FastAudioFeatureExtractor's output changes, to orphan old entries
+FEATURE_VERSION = 1
+
+KEY_PREFIX = 'audio-features'
+COUNTERS = ('hits', 'misses')
+
+
+class AudioFeatureCache:
+    def __init__(self, alias=None, timeout=None):
+        self.alias = alias or settings.ML_AUDIO_FEATURE_CACHE
+        self.cache = caches[self.alias]
+        self.timeout = timeout if timeout is not None else settings.ML_AUDIO_FEATURE_CACHE_TTL
+
+    def key_for_upload(self, upload, extractor):
+        """Content key for a Django UploadedFile, hashed chunk by chunk"""
+        digest = hashlib.sha256()
+        digest.update(self._config_signature(
+            extractor, getattr(upload, 'content_type', None), getattr(upload, 'content_type_extra', None),
+        ))
+        upload.seek(0)
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        upload.seek(0)
+        return f'{KEY_PREFIX}:{digest.hexdigest()}'
+
+    def key_for_bytes(self, data, extractor, content_type=None, params=None):
+        digest = hashlib.sha256(self._config_signature(extractor, content_type, params))
+        digest.update(data)
+        return f'{KEY_PREFIX}:{digest.hexdigest()}'
+
+    def get(self, key):
+        """The cached feature dict, or None. Counts a hit or a miss."""
+        try:
+            features = self.cache.get(key)
+        except Exception as e:
+            # An unreachable Redis must not fail the prediction
+            logger.warning(f"Audio feature cache unavailable: {e}")
+            return None
+        self._count('hits' if features is not None else 'misses')
+        return features
+
+    def set(self, key, features):
+        try:
+            self.cache.set(key, features, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Audio feature cache unavailable: {e}")
+
+    def stats(self):
+        try:
+            counts = self.cache.get_many([self._counter_key(name) for name in COUNTERS])
+        except Exception as e:
+            return {'alias': self.alias, 'error': str(e)}
+        hits = counts.get(self._counter_key('hits'), 0)
+        misses = counts.get(self._counter_key('misses'), 0)
+        return {
+            'alias': self.alias,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'ttl_seconds': self.timeout,
+        }
+
+    def reset_stats(self):
+        self.cache.delete_many([self._counter_key(name) for name in COUNTERS])
+
+    @staticmethod
+    def _config_signature(extractor, content_type, params):
+        # The content type matters for headerless PCM, whose rate, format
+        # and channel count come from the Content-Type parameters
+        params = ';'.join(f'{k}={v}' for k, v in sorted((params or {}).items()))
+        resampler = getattr(settings, 'ML_AUDIO_RESAMPLER', 'soxr_hq')
+        # Segmented clips cache a list of per-segment features
+        segments = f'{extractor.segment_hop}/{extractor.max_duration}' if extractor.segmented else '-'
+        return (
+            f'{FEATURE_VERSION}|{extractor.sample_rate}|{extractor.duration}|{extractor.tempo_mode}'
+            f'|{segments}|{resampler}|{(content_type or "").lower()}|{params}|'
+        ).encode()
+
+    def _counter_key(self, name):
+        return f'{KEY_PREFIX}:stats:{name}'
+
+    def _count(self, name):
+        key = self._counter_key(name)
+        try:
+            # add() is a no-op when the counter exists; incr() is atomic on Redis
+            self.cache.add(key, 0, timeout=None)
+            self.cache.incr(key)
+        except Exception:
+            pass
+
+
+_feature_cache = None
+_feature_cache_lock = threading.Lock()
+
+
+def get_audio_feature_cache():
+    """The shared AudioFeatureCache, or None when caching is disabled"""
+    global _feature_cache
+    if not getattr(settings, 'ML_AUDIO_FEATURE_CACHE', None):
+        return None
+    if _feature_cache is None:
+        with _feature_cache_lock:
+            if _feature_cache is None:
+                _feature_cache = AudioFeatureCache()
+    return _feature_cache
@@ -0,0 +1,230 @@
+"""
+Golden outputs of the inference pipeline, checked in under
+emergency/tests/golden/ so a faster feature extractor, scaler or model
+path can be compared against fixed numbers instead of only the code it
+replaces:
+
+    audio.json     per reference clip: the feature dict of the training-time
+                   extractor (reference_features.py), the scaled feature row
+                   and P(threat)
+    movement.npz   reference sensor windows, the scaled windows, and the
+                   movement model's probabilities for them
+
+Reference clips are the synthetic clips in reference_clips.py (pinned by
+a checksum of the generated signal) plus any recorded clip dropped into
+tests/golden/clips/. Reference windows are synthetic motions plus any
+(frames, 12) .npy recording in tests/golden/windows/.
+
+Outputs that depend on a model file are stored with the sha256 of that
+file and only compared while the same file is loaded: retraining a model
+means running `manage.py golden_parity --update`, not loosening a test.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .ml_predictor import AUDIO_MODEL_NATIVE_FILE, WINDOW_FRAMES
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), 'tests', 'golden')
+AUDIO_FILE = 'audio.json'
+MOVEMENT_FILE = 'movement.npz'
+
+# How far an alternative implementation may drift from the goldens
+FEATURE_RTOL, FEATURE_ATOL = 1e-5, 1e-6
+SCALED_ATOL = 1e-4
+PROBABILITY_ATOL = 1e-5
+
+
+def file_sha256(path):
+    if not path or not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def signal_sha256(audio):
+    return hashlib.sha256(np.ascontiguousarray(audio, dtype=np.float32).tobytes()).hexdigest()
+
+
+# ============================================================================
+# REFERENCE INPUTS
+# ============================================================================
+
+def reference_clips(golden_dir=GOLDEN_DIR):
+    """{name: (float32 signal, sample rate)} for the synthetic and recorded clips"""
+    from .ml_predictor import FastAudioFeatureExtractor
+    from .reference_clips import CLIPS, SAMPLE_RATE, load_clip
+
+    clips = {name: (load_clip(name), SAMPLE_RATE) for name in CLIPS}
+    clip_dir = os.path.join(golden_dir, 'clips')
+    if os.path.isdir(clip_dir):
+        loader = FastAudioFeatureExtractor()
+        for filename in sorted(os.listdir(clip_dir)):
+            audio, sr = loader.load_audio(os.path.join(clip_dir, filename))
+            if audio is not None:
+                clips[f'clips/{filename}'] = (audio, sr)
+    return clips
+
+
+def synthetic_windows():
+    """Deterministic 50 x 12 windows: noise, still, walking-like, impact and slow-drift motions"""
+    rng = np.random.default_rng(2024)
+    t = np.arange(WINDOW_FRAMES) / 25.0  # 25 Hz
+    profile = np.array([25.0, 170.0, 70.0, 24.2])  # age, height, weight, bmi
+
+    def window(gyro, accel, pitch, roll):
+        return np.column_stack([gyro, accel, pitch, roll, np.tile(profile, (WINDOW_FRAMES, 1))])
+
+    windows = []
+    for _ in range(4):  # the ranges test_movement.py uses
+        windows.append(window(rng.uniform(-2, 2, (50, 3)), rng.uniform(-10, 10, (50, 3)),
+                              rng.uniform(-90, 90, 50), rng.uniform(-180, 180, 50)))
+    # Phone lying still: gated as idle
+    windows.append(window(np.zeros((50, 3)), np.tile([0.0, 0.0, 9.81], (50, 1)), np.zeros(50), np.zeros(50)))
+    for freq in (1.5, 2.8):  # walking and running cadence
+        swing = np.sin(2 * np.pi * freq * t)
+        windows.append(window(np.outer(swing, [0.8, 0.3, 0.2]), np.outer(swing, [2.0, 1.0, 4.0]) + [0, 0, 9.81],
+                              15 * swing, 5 * swing))
+    # A sharp impact half-way through
+    impact = np.exp(-((t - 1.0) ** 2) / 0.002)
+    windows.append(window(np.outer(impact, [4.0, -3.0, 2.0]), np.outer(impact, [25.0, -18.0, 30.0]) + [0, 0, 9.81],
+                          40 * impact, -60 * impact))
+    # Slow drift with sensor noise
+    drift = np.linspace(0, 1, WINDOW_FRAMES)
+    windows.append(window(0.05 * rng.normal(size=(50, 3)), np.outer(drift, [3.0, 0.0, -3.0]) + [0, 0, 9.81],
+                          30 * drift, 10 * drift))
+    return np.stack(windows).astype(np.float32)
+
+
+def reference_windows(golden_dir=GOLDEN_DIR):
+    windows = [synthetic_windows()]
+    window_dir = os.path.join(golden_dir, 'windows')
+    if os.path.isdir(window_dir):
+        from .ml_predictor import sliding_windows
+
+        for filename in sorted(os.listdir(window_dir)):
+            if filename.endswith('.npy'):
+                recording = np.load(os.path.join(window_dir, filename)).astype(np.float32)
+                windows.append(np.asarray(sliding_windows(recording, WINDOW_FRAMES)))
+    return np.concatenate(windows)
+
+
+# ============================================================================
+# BUILDING AND LOADING
+# ============================================================================
+
+def model_paths(predictor):
+    """The files each group's goldens are keyed by, as MLPredictor loads them"""
+    base = predictor.base_path
+    audio_model = os.path.join(base, AUDIO_MODEL_NATIVE_FILE)
+    if not os.path.exists(audio_model):
+        audio_model = os.path.join(base, 'xgboost_threat_model.pkl')
+    return {
+        'audio_scaler': os.path.join(base, 'feature_scaler.pkl'),
+        'audio_model': audio_model,
+        'movement_scaler': os.path.join(base, 'scaler.pkl'),
+        'movement_model': os.path.join(base, 'bilstm_action_model.h5'),
+    }
+
+
+def build_golden(predictor, golden_dir=GOLDEN_DIR):
+    """Compute and write the golden files from the reference extractor and `predictor`'s models"""
+    from .reference_features import ReferenceAudioFeatureExtractor
+
+    os.makedirs(golden_dir, exist_ok=True)
+    checksums = {name: file_sha256(path) for name, path in model_paths(predictor).items()}
+
+    reference = ReferenceAudioFeatureExtractor()
+    clips = {}
+    for name, (audio, sr) in reference_clips(golden_dir).items():
+        features = {key: float(value) for key, value in reference.extract_features(audio, sr).items()}
+        clips[name] = {'signal_sha256': signal_sha256(audio), 'sample_rate': sr, 'features': features}
+    if all(clip['features']['tempo'] == 0 for clip in clips.values()):
+        # What estimate_tempo falls back to when beat_track raises, as it
+        # does with librosa 0.10.1 on scipy >= 1.13
+        raise ValueError("The reference extractor produced tempo 0 for every clip - the beat tracker is "
+                         "probably failing (librosa 0.10.1 needs scipy < 1.13). Not writing goldens.")
+
+    if predictor._audio_models_loaded():
+        scorer = predictor._get_audio_scorer()
+        matrix = scorer.matrix([clip['features'] for clip in clips.values()])
+        scaled = scorer.scale_rows(matrix)
+        probabilities = np.asarray(scorer.threat_probabilities(matrix), dtype=np.float32).reshape(-1)
+        for clip, row, p in zip(clips.values(), scaled, probabilities):
+            clip['scaled'] = [float(v) for v in row]
+            clip['threat_probability'] = float(p)
+
+    with open(os.path.join(golden_dir, AUDIO_FILE), 'w') as f:
+        json.dump({'audio_scaler_sha256': checksums['audio_scaler'], 'audio_model_sha256': checksums['audio_model'],
+                   'feature_names': list(next(iter(clips.values()))['features']), 'clips': clips}, f, indent=1)
+
+    windows = reference_windows(golden_dir)
+    arrays = {'windows': windows}
+    if predictor._scaler is not None:
+        arrays['scaled'] = predictor._scaler.transform(windows.reshape(-1, 12)).reshape(windows.shape).astype(np.float32)
+        arrays['movement_scaler_sha256'] = np.array(checksums['movement_scaler'])
+    if predictor._model is not None and predictor._scaler is not None:
+        arrays['probabilities'] = movement_probabilities(predictor, windows)
+        arrays['movement_model_sha256'] = np.array(checksums['movement_model'])
+    np.savez_compressed(os.path.join(golden_dir, MOVEMENT_FILE), **arrays)
+    return clips, arrays
+
+
+def movement_probabilities(predictor, windows):
+    """The movement model's probabilities for raw windows, through the predictor's own scaling"""
+    model_input = predictor._scale_frames(windows.reshape(-1, 12)).reshape(windows.shape).astype(np.float32)
+    return np.asarray(predictor._movement_probabilities(model_input), dtype=np.float32)
+
+
+def load_golden(golden_dir=GOLDEN_DIR):
+    """(audio golden dict, movement golden dict of arrays)"""
+    with open(os.path.join(golden_dir, AUDIO_FILE)) as f:
+        audio = json.load(f)
+    with np.load(os.path.join(golden_dir, MOVEMENT_FILE)) as archive:
+        movement = {name: archive[name] for name in archive.files}
+    for key in ('movement_scaler_sha256', 'movement_model_sha256'):
+        if key in movement:
+            movement[key] = str(movement[key])
+    return audio, movement
+
+
+# ============================================================================
+# COMPARING
+# ============================================================================
+
+def feature_deviations(expected_rows, actual_rows):
+    """
+    {feature: (max absolute deviation, max relative deviation)} over the
+    clips. A feature missing from or added by the new pipeline is reported
+    with infinite deviation.
+    """
+    deviations = {}
+    for expected, actual in zip(expected_rows, actual_rows):
+        for name in set(expected) | set(actual):
+            if name not in expected or name not in actual:
+                deviations[name] = (np.inf, np.inf)
+                continue
+            a, b = float(actual[name]), float(expected[name])
+            if np.isnan(a) and np.isnan(b):
+                continue
+            # NaN on one side only (e.g. tempo in 'constant' mode) counts as infinite
+            absolute = abs(a - b) if not (np.isnan(a) or np.isnan(b)) else np.inf
+            relative = absolute / max(abs(b), FEATURE_ATOL) if np.isfinite(absolute) else np.inf
+            previous = deviations.get(name, (0.0, 0.0))
+            deviations[name] = (max(previous[0], absolute), max(previous[1], relative))
+    return deviations
+
+
+def within_feature_tolerance(expected_rows, actual_rows):
+    for expected, actual in zip(expected_rows, actual_rows):
+        if list(actual) != list(expected):
+            return False
+        for name, value in expected.items():
+            if not np.isclose(actual[name], value, rtol=FEATURE_RTOL, atol=FEATURE_ATOL, equal_nan=True):
+                return False
+    return True
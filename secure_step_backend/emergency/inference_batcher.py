@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class InferenceBatcher:
+    """
+    Micro-batching queue in front of a model.
+
+    Callers submit single inputs from any thread. A background worker
+    collects everything that arrives within `max_wait_ms` of the first
+    queued item (or until `max_batch_size` items are waiting), runs one
+    batched forward pass through `predict_fn` and hands every caller its
+    own row of the output.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=10, name='inference-batcher'):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._closed = False
+
+        # Simple counters, handy for benchmarks and debugging
+        self.batches_run = 0
+        self.items_run = 0
+
+    def submit(self, item):
+        """Queue a single input and return a Future for its output row"""
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def predict(self, item, timeout=None):
+        """Submit a single input and block until its output is ready"""
+        return self.submit(item).result(timeout=timeout)
+
+    def close(self):
+        """Stop the worker thread once the queued items are drained"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+    @property
+    def average_batch_size(self):
+        return self.items_run / self.batches_run if self.batches_run else 0.0
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    entry = self._queue.get(timeout=remaining)
+                else:
+                    entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if entry is None:
+                # Shutdown sentinel - finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(entry)
+
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect_batch(first)
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+
+            try:
+                outputs = self.predict_fn(np.stack(items))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_run += len(batch)
+
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
@@ -0,0 +1,493 @@
+"""
+Out-of-process inference service.
+
+`manage.py run_inference_service` starts a pool of worker processes that
+own the movement and audio models. Django processes running with
+ML_INFERENCE_MODE = 'service' talk to it over a local socket through
+RemotePredictor, so each daphne worker no longer holds its own copy of
+TensorFlow and XGBoost, and slow inference does not block the process
+serving WebSocket traffic.
+
+Wire protocol (multiprocessing.connection, authenticated):
+    client -> service   (kind, shape, dtype, timeout) then the raw array bytes;
+                        audio feature rows are sent in the service scaler's
+                        feature order (kind 'audio_feature_names')
+    service -> client   ('ok', result) | ('timeout', message) | ('error', message)
+                        | ('unavailable', (group, model state snapshot))
+
+A worker whose model group is not loaded answers 'unavailable', which the
+client raises as ModelUnavailable so the views return the same 503 as
+with the in-process predictor.
+
+Inside the service every worker has a fixed shared-memory slot. The
+request bytes are copied straight from the socket into that slot and the
+worker reads them as a NumPy view, so inputs are never pickled. A worker
+that dies (OOM kill, a crash inside TensorFlow), or is still busy a full
+timeout after its request timed out, is restarted into the same slot;
+the request it was running gets an error reply.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing import AuthenticationError, get_context
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from django.conf import settings
+
+from .gating import gate_audio, gate_movement, score_ungated
+from .model_state import ModelState, ModelUnavailable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREDICTOR_FACTORY = 'emergency.ml_predictor.MLPredictor.get_instance'
+
+# Large enough for a few hundred sensor windows or audio feature rows
+DEFAULT_SLOT_BYTES = 1024 * 1024
+
+# Extra time the client waits on top of the service-side timeout,
+# so the service gets to report the timeout itself
+CLIENT_GRACE_SECONDS = 0.5
+
+# Pause before retrying a worker restart that failed
+RESPAWN_DELAY_SECONDS = 5.0
+
+
+class InferenceServiceError(Exception):
+    pass
+
+
+class InferenceTimeout(InferenceServiceError):
+    pass
+
+
+def parse_address(address):
+    """'host:port' -> (host, port); anything else is used as a socket path"""
+    if isinstance(address, (tuple, list)):
+        return tuple(address)
+    host, sep, port = str(address).rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return str(address)
+
+
+def service_authkey():
+    authkey = getattr(settings, 'ML_SERVICE_AUTHKEY', '') or settings.SECRET_KEY
+    return authkey.encode()
+
+
+# ============================================================================
+# WORKER PROCESS
+# ============================================================================
+
+def _run_request(predictor, kind, array):
+    if kind == 'movement':
+        return predictor.predict(array)
+    if kind == 'movement_batch':
+        return predictor.predict_batch(array)
+    if kind == 'audio_features':
+        names = predictor.audio_feature_names()
+        if len(names) != array.shape[-1]:
+            raise ValueError(f"Expected {len(names)} audio features, got {array.shape[-1]}")
+        # One clip (features,) or several (clips, features), in scaler order
+        results = predictor.score_audio_batch(array.reshape(-1, len(names)))
+        return results[0] if array.ndim == 1 else results
+    if kind == 'audio_feature_names':
+        return predictor.audio_feature_names()
+    if kind == 'model_states':
+        return predictor.model_status()
+    raise ValueError(f"Unknown request kind '{kind}'")
+
+
+def _worker_main(conn, shm_name, predictor_factory):
+    import django
+    django.setup()
+
+    from django.utils.module_loading import import_string
+
+    # Spawned workers share the parent's resource tracker, which unlinks the
+    # block when the service shuts down
+    shm = SharedMemory(name=shm_name)
+
+    try:
+        predictor = import_string(predictor_factory)()
+        conn.send(('ready', os.getpid()))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+        return
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        kind, shape, dtype, nbytes = message
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf[:nbytes]).copy()
+        try:
+            conn.send(('ok', _run_request(predictor, kind, array)))
+        except ModelUnavailable as e:
+            conn.send(('unavailable', (e.state.name, e.state.snapshot())))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+    shm.close()
+
+
+class _Worker:
+    def __init__(self, ctx, index, predictor_factory, slot_bytes):
+        self.index = index
+        self.ctx = ctx
+        self.predictor_factory = predictor_factory
+        self.shm = SharedMemory(create=True, size=slot_bytes)
+        self._spawn()
+
+    def _spawn(self):
+        self.conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.shm.name, self.predictor_factory),
+            name=f'inference-worker-{self.index}',
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.pid = None
+
+    def restart(self):
+        """Replace the process (dead or wedged) with a new one on the same slot"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        self._spawn()
+
+    def wait_ready(self, timeout):
+        try:
+            if not self.conn.poll(timeout):
+                raise InferenceServiceError(f"Worker {self.index} did not start within {timeout}s")
+            status, payload = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise InferenceServiceError(f"Worker {self.index} exited during startup: {e!r}")
+        if status != 'ready':
+            raise InferenceServiceError(f"Worker {self.index} failed to start: {payload}")
+        self.pid = payload
+
+    def submit(self, kind, shape, dtype, body):
+        self.shm.buf[:len(body)] = body
+        self.conn.send((kind, shape, dtype, len(body)))
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, EOFError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+# ============================================================================
+# SERVICE
+# ============================================================================
+
+class InferenceService:
+    def __init__(self, address=None, pool_size=None, timeout=None,
+                 predictor_factory=DEFAULT_PREDICTOR_FACTORY, slot_bytes=DEFAULT_SLOT_BYTES):
+        self.address = parse_address(address or settings.ML_SERVICE_ADDRESS)
+        self.pool_size = pool_size or settings.ML_SERVICE_POOL_SIZE
+        self.timeout = timeout or settings.ML_SERVICE_TIMEOUT
+        self.predictor_factory = predictor_factory
+        self.slot_bytes = slot_bytes
+
+        self._workers = []
+        self._idle = queue.Queue()
+        self._listener = None
+        self._closed = threading.Event()
+        self.startup_timeout = 300
+
+    def start(self, startup_timeout=300):
+        self.startup_timeout = startup_timeout
+        ctx = get_context('spawn')
+        self._workers = [
+            _Worker(ctx, i, self.predictor_factory, self.slot_bytes)
+            for i in range(self.pool_size)
+        ]
+        try:
+            for worker in self._workers:
+                worker.wait_ready(startup_timeout)
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+
+        self._listener = Listener(self.address, authkey=service_authkey())
+        self.address = self._listener.address
+        logger.info(f"Inference service listening on {self.address} with {self.pool_size} workers")
+        return self
+
+    def serve_forever(self):
+        if self._listener is None:
+            self.start()
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed.is_set():
+                    break
+                continue
+            threading.Thread(target=self._handle_client, args=(conn,), daemon=True).start()
+
+    def serve_in_background(self):
+        thread = threading.Thread(target=self.serve_forever, name='inference-service', daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.close()
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+
+    @property
+    def worker_pids(self):
+        return [worker.pid for worker in self._workers]
+
+    def _handle_client(self, conn):
+        with conn:
+            while not self._closed.is_set():
+                try:
+                    kind, shape, dtype, timeout = conn.recv()
+                    body = conn.recv_bytes()
+                except (EOFError, OSError):
+                    return
+
+                if len(body) > self.slot_bytes:
+                    reply = ('error', f"Request of {len(body)} bytes exceeds the {self.slot_bytes} byte slot")
+                else:
+                    reply = self._dispatch(kind, shape, dtype, body, timeout or self.timeout)
+
+                try:
+                    conn.send(reply)
+                except (OSError, EOFError):
+                    return
+
+    def _dispatch(self, kind, shape, dtype, body, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return ('timeout', f"No inference worker free within {timeout}s")
+            if worker.process.is_alive():
+                break
+            # Died while idle (OOM kill, segfault): restart it and try the next one
+            self._replace(worker)
+
+        try:
+            worker.submit(kind, shape, dtype, body)
+            remaining = max(0.0, deadline - time.monotonic())
+            if not worker.conn.poll(remaining):
+                # The worker is still busy with this request; only return it to the
+                # pool once its stale reply has been drained
+                threading.Thread(target=self._drain, args=(worker, timeout), daemon=True).start()
+                return ('timeout', f"Inference did not finish within {timeout}s")
+            reply = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self._replace(worker)
+            return ('error', f"Inference worker {worker.index} died during the request: {e!r}")
+
+        self._idle.put(worker)
+        return reply
+
+    def _drain(self, worker, timeout):
+        # A worker still busy after another full timeout is wedged, not slow:
+        # kill it rather than lose its slot for good
+        try:
+            if not worker.conn.poll(timeout):
+                self._replace(worker, reason=f"did not finish a request within {2 * timeout}s")
+                return
+            worker.conn.recv()
+        except (EOFError, OSError):
+            self._replace(worker)
+            return
+        self._idle.put(worker)
+
+    def _replace(self, worker, reason='died'):
+        logger.warning(f"Inference worker {worker.index} (pid {worker.pid}) {reason}, restarting it")
+        threading.Thread(target=self._respawn, args=(worker,), name=f'inference-respawn-{worker.index}',
+                         daemon=True).start()
+
+    def _respawn(self, worker):
+        while not self._closed.is_set():
+            try:
+                worker.restart()
+                worker.wait_ready(self.startup_timeout)
+            except Exception as e:
+                logger.error(f"Restarting inference worker {worker.index} failed: {e}")
+                self._closed.wait(RESPAWN_DELAY_SECONDS)
+                continue
+            if not self._closed.is_set():
+                self._idle.put(worker)
+            return
+
+
+# ============================================================================
+# CLIENT (used inside Django processes)
+# ============================================================================
+
+class InferenceClient:
+    """Pooled, thread-safe connections to a running inference service"""
+
+    def __init__(self, address=None, timeout=None):
+        self.address = parse_address(address or settings.ML_SERVICE_ADDRESS)
+        self.timeout = timeout or settings.ML_SERVICE_TIMEOUT
+        self._idle = queue.LifoQueue()
+
+    def call(self, kind, array, timeout=None):
+        timeout = timeout or self.timeout
+        array = np.ascontiguousarray(array)
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = Client(self.address, authkey=service_authkey())
+            except OSError as e:
+                raise InferenceServiceError(f"Inference service unreachable at {self.address}: {e}")
+
+        try:
+            conn.send((kind, array.shape, array.dtype.str, timeout))
+            conn.send_bytes(memoryview(array).cast('B'))
+            if not conn.poll(timeout + CLIENT_GRACE_SECONDS):
+                # A late reply would be read by the next caller - drop the connection
+                conn.close()
+                raise InferenceTimeout(f"No reply from inference service within {timeout}s")
+            status, payload = conn.recv()
+        except (EOFError, OSError) as e:
+            conn.close()
+            raise InferenceServiceError(f"Lost connection to inference service: {e}")
+
+        self._idle.put(conn)
+        if status == 'ok':
+            return payload
+        if status == 'timeout':
+            raise InferenceTimeout(payload)
+        if status == 'unavailable':
+            group, snapshot = payload
+            raise ModelUnavailable(ModelState.from_snapshot(group, snapshot))
+        raise InferenceServiceError(payload)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RemotePredictor:
+    """Same interface as MLPredictor, backed by the inference service"""
+
+    def __init__(self, client=None):
+        self.client = client or InferenceClient()
+        self._feature_names = None
+
+    def predict(self, data):
+        # Gated inputs are answered here, without a round trip to the service
+        gated = gate_movement(data)
+        if gated is not None:
+            return gated
+        window = np.asarray(data, dtype=np.float32).reshape(-1, 12)
+        return self.client.call('movement', window)
+
+    def predict_batch(self, windows):
+        if len(windows) == 0:
+            return []
+        batch = np.asarray(windows, dtype=np.float32).reshape(len(windows), -1, 12)
+        return score_ungated(batch, lambda moving: self.client.call('movement_batch', moving))
+
+    def predict_windows(self, data, stride):
+        from .ml_predictor import build_windows_response, sliding_windows, window_starts
+
+        frames = np.asarray(data, dtype=np.float32).reshape(-1, 12)
+        starts = window_starts(len(frames), stride)
+        results = self.predict_batch(sliding_windows(frames, stride))
+        return build_windows_response(results, starts, stride)
+
+    def audio_feature_names(self):
+        """The service's audio scaler feature order, fetched once"""
+        if self._feature_names is None:
+            self._feature_names = self.client.call('audio_feature_names', np.zeros(0))
+        return self._feature_names
+
+    def score_audio_features(self, features):
+        from .ml_predictor import feature_matrix
+
+        return self.client.call('audio_features', feature_matrix([features], self.audio_feature_names())[0])
+
+    def model_status(self):
+        """Model states of one service worker"""
+        return self.client.call('model_states', np.zeros(0))
+
+    def score_audio_batch(self, rows):
+        if len(rows) == 0:
+            return []
+        if not isinstance(rows, np.ndarray):
+            from .ml_predictor import feature_matrix
+
+            rows = feature_matrix(rows, self.audio_feature_names())
+        return self.client.call('audio_features', rows.reshape(len(rows), -1))
+
+    def predict_audio(self, audio_file_path, segmented=None):
+        return self._predict_audio(lambda extractor: extractor.extract_all_features(audio_file_path), segmented)
+
+    def predict_audio_signal(self, audio, sr, segmented=None):
+        gated = gate_audio(audio)
+        if gated is not None:
+            return gated
+        return self._predict_audio(lambda extractor: extractor.extract_clip_features(audio, sr), segmented)
+
+    def predict_audio_features(self, features):
+        return self._predict_audio(lambda extractor: features)
+
+    def _predict_audio(self, extract, segmented=None):
+        # Feature extraction stays in this process; only the scaled
+        # XGBoost scoring runs in the service
+        from .ml_predictor import FastAudioFeatureExtractor, score_audio_clip
+
+        try:
+            features = extract(FastAudioFeatureExtractor(segmented=segmented))
+            if features is None:
+                raise Exception("Could not extract features from audio file")
+            return score_audio_clip(self, features)
+        except Exception as e:
+            print(f"Audio prediction error: {e}")
+            return {
+                'error': str(e),
+                'is_threat': False,
+                'confidence': 0.0,
+                'status': 'ERROR'
+            }
+
+
+_remote_predictor = None
+_remote_predictor_lock = threading.Lock()
+
+
+def get_remote_predictor():
+    global _remote_predictor
+    if _remote_predictor is None:
+        with _remote_predictor_lock:
+            if _remote_predictor is None:
+                _remote_predictor = RemotePredictor()
+    return _remote_predictor
@@ -0,0 +1,333 @@
+import csv
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from emergency.management.commands.evaluate_tempo_modes import AUDIO_EXTENSIONS
+from emergency.ml_predictor import WINDOW_FRAMES, FastAudioFeatureExtractor, MLPredictor, score_audio_clip, sliding_windows
+from emergency.model_state import READY
+
+MOVEMENT_EXTENSIONS = ('.npz', '.npy', '.csv')
+
+COLUMNS = ('sample_id', 'kind', 'source', 'index', 'action', 'is_threat', 'confidence',
+           'threat_probability', 'status', 'error')
+
+
+# ============================================================================
+# INPUTS
+# ============================================================================
+
+def as_windows(array, stride):
+    """
+    (n, 50, 12) windows from an array that already holds windows, holds them
+    flattened to 600 columns, or is a recording of (frames, 12)
+    """
+    array = np.asarray(array)
+    if array.ndim == 3 and array.shape[1:] == (WINDOW_FRAMES, 12):
+        return array
+    if array.ndim == 2 and array.shape[1] == WINDOW_FRAMES * 12:
+        return array.reshape(-1, WINDOW_FRAMES, 12)
+    if array.ndim == 2 and array.shape[1] == 12:
+        return sliding_windows(array, stride) if len(array) >= WINDOW_FRAMES else array[:0].reshape(0, WINDOW_FRAMES, 12)
+    raise ValueError(f"expected windows (n, 50, 12), (n, 600) or a recording (frames, 12), got shape {array.shape}")
+
+
+def movement_arrays(path):
+    """(name, array) pairs of a sensor file; .npy files are memory-mapped, not read into memory"""
+    if path.endswith('.npz'):
+        with np.load(path) as archive:
+            for name in archive.files:
+                yield name, archive[name]
+    elif path.endswith('.npy'):
+        yield None, np.load(path, mmap_mode='r')
+    else:
+        array = np.genfromtxt(path, delimiter=',', dtype=np.float32)
+        yield None, array[~np.isnan(array).all(axis=-1)] if array.ndim == 2 else array
+
+
+def find_inputs(paths):
+    """Sensor files and audio clips among `paths` (files or folders, searched recursively)"""
+    movement, audio = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        elif os.path.exists(path):
+            files = [path]
+        else:
+            raise CommandError(f"Not found: {path}")
+        for file_path in files:
+            extension = os.path.splitext(file_path)[1].lower()
+            if extension in MOVEMENT_EXTENSIONS:
+                movement.append(file_path)
+            elif extension in AUDIO_EXTENSIONS:
+                audio.append(file_path)
+    return movement, audio
+
+
+# ============================================================================
+# AUDIO WORKERS
+# ============================================================================
+
+_extractor = None
+
+
+def init_audio_worker(segmented, pool=True):
+    global _extractor
+    if pool:
+        import django
+
+        django.setup()
+        # One BLAS thread per worker: the pool is the parallelism
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(limits=1)
+        except ImportError:
+            pass
+    _extractor = FastAudioFeatureExtractor(segmented=segmented)
+
+
+def extract_clip(path):
+    """(path, features, None) for a clip, or (path, None, result) when it is gated or unreadable"""
+    from emergency.gating import gate_audio
+
+    audio, sr = _extractor.load_audio(path)
+    if audio is None:
+        return path, None, {'error': 'could not decode clip', 'is_threat': False, 'confidence': 0.0,
+                            'status': 'ERROR'}
+    gated = gate_audio(audio)
+    if gated is not None:
+        return path, None, gated
+    try:
+        return path, _extractor.extract_clip_features(audio, sr), None
+    except Exception as e:
+        return path, None, {'error': str(e), 'is_threat': False, 'confidence': 0.0, 'status': 'ERROR'}
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+class CSVOutput:
+    """Appends rows to a CSV file, flushed after every chunk"""
+
+    def __init__(self, path):
+        self.path = path
+        # A row cut off by an interruption is dropped, and scored again
+        if os.path.exists(path):
+            with open(path, 'rb+') as f:
+                data = f.read()
+                if data and not data.endswith(b'\n'):
+                    f.truncate(data.rfind(b'\n') + 1)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, COLUMNS)
+        if new:
+            self.writer.writeheader()
+
+    def done(self):
+        with open(self.path, newline='') as f:
+            return {row['sample_id'] for row in csv.DictReader(f)}
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetOutput:
+    """
+    A folder of Parquet files, one per chunk. A Parquet file is only
+    readable once closed, so each part is written to a temporary name and
+    renamed: an interruption never leaves a broken part behind.
+    pandas.read_parquet(path) reads the folder as one table.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise CommandError("Parquet output needs the optional `pyarrow` package (or use a .csv output)")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = len(self._part_files())
+
+    def _part_files(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith('part-') and name.endswith('.parquet'))
+
+    def done(self):
+        import pyarrow.parquet as pq
+
+        done = set()
+        for name in self._part_files():
+            done.update(pq.read_table(os.path.join(self.path, name), columns=['sample_id']).column(0).to_pylist())
+        return done
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(rows, schema=pa.schema([
+            ('sample_id', pa.string()), ('kind', pa.string()), ('source', pa.string()), ('index', pa.int64()),
+            ('action', pa.string()), ('is_threat', pa.bool_()), ('confidence', pa.float64()),
+            ('threat_probability', pa.float64()), ('status', pa.string()), ('error', pa.string()),
+        ]))
+        target = os.path.join(self.path, f'part-{self.parts:05d}.parquet')
+        pq.write_table(table, target + '.tmp')
+        os.replace(target + '.tmp', target)
+        self.parts += 1
+
+    def close(self):
+        pass
+
+
+def result_row(sample_id, kind, source, index, result):
+    return {
+        'sample_id': sample_id,
+        'kind': kind,
+        'source': source,
+        'index': index,
+        'action': result.get('action'),
+        'is_threat': bool(result.get('is_threat', False)),
+        'confidence': float(result.get('confidence', 0.0)),
+        'threat_probability': result.get('threat_probability'),
+        'status': result.get('status'),
+        'error': result.get('error'),
+    }
+
+
+# ============================================================================
+# COMMAND
+# ============================================================================
+
+class Command(BaseCommand):
+    help = ('Score recorded sensor windows (.npz, .npy, .csv) and audio clips through the movement and audio '
+            'models, in chunks, writing predictions to CSV or Parquet as it goes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('inputs', nargs='+', help='Sensor files, audio clips, or folders of them')
+        parser.add_argument('--output', required=True,
+                            help='Predictions file: .csv, or .parquet (a folder of part files, needs pyarrow)')
+        parser.add_argument('--chunk-size', type=int, default=512, help='Windows or clips scored per chunk')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes extracting audio features (default: one per CPU; 1 = in this process)')
+        parser.add_argument('--stride', type=int, default=None,
+                            help='Window stride for (frames, 12) recordings (default: ML_WINDOW_STRIDE)')
+        parser.add_argument('--segmented', action='store_true',
+                            help='Score whole clips in segments (default: ML_AUDIO_SEGMENTED)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip samples already in --output and append to it (otherwise it must not exist)')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        output_path = options['output']
+        if os.path.exists(output_path) and not options['resume']:
+            raise CommandError(f"{output_path} already exists; pass --resume to continue it")
+
+        movement, audio = find_inputs(options['inputs'])
+        if not movement and not audio:
+            raise CommandError("No sensor files or audio clips found")
+
+        predictor = MLPredictor.get_instance()
+        if movement and predictor.model_status()['movement']['state'] != READY:
+            raise CommandError("Movement model not loaded")
+        if audio and not predictor._audio_models_loaded():
+            raise CommandError("Audio model or scaler not loaded")
+
+        output = ParquetOutput(output_path) if output_path.endswith('.parquet') else CSVOutput(output_path)
+        try:
+            done = output.done() if options['resume'] else set()
+            if done:
+                self.stdout.write(f"↩️  Resuming: {len(done)} samples already scored")
+            if movement:
+                stride = options['stride'] or getattr(settings, 'ML_WINDOW_STRIDE', 10)
+                self.score_movement(predictor, movement, output, done, options['chunk_size'], stride)
+            if audio:
+                segmented = options['segmented'] or None
+                self.score_audio(predictor, audio, output, done, options['chunk_size'], options['workers'], segmented)
+        finally:
+            output.close()
+
+    def source_name(self, path):
+        # Absolute, so --resume recognises a sample whichever inputs name it
+        return os.path.abspath(path)
+
+    def report(self, label, count, started, final=False):
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0.0
+        line = f"{label}: {count} scored in {elapsed:.1f}s ({rate:.1f} samples/s)"
+        self.stdout.write(self.style.SUCCESS(f"✅ {line}") if final else f"   {line}")
+
+    def score_movement(self, predictor, paths, output, done, chunk_size, stride):
+        self.stdout.write(f"🏃 Scoring sensor windows from {len(paths)} file(s)...")
+        started, count = time.perf_counter(), 0
+        for path in paths:
+            source = self.source_name(path)
+            try:
+                for name, array in movement_arrays(path):
+                    prefix = f"{source}:{name}" if name is not None else source
+                    windows = as_windows(array, stride)
+                    for first in range(0, len(windows), chunk_size):
+                        indices = [i for i in range(first, min(first + chunk_size, len(windows)))
+                                   if f"{prefix}:{i}" not in done]
+                        if not indices:
+                            continue
+                        results = predictor.predict_batch(np.asarray(windows[indices], dtype=np.float32))
+                        output.write([result_row(f"{prefix}:{i}", 'movement', prefix, i, result)
+                                      for i, result in zip(indices, results)])
+                        count += len(indices)
+                        self.report('movement', count, started)
+            except ValueError as e:
+                self.stdout.write(self.style.WARNING(f"⚠️  Skipping {source}: {e}"))
+        self.report('movement', count, started, final=True)
+
+    def score_audio(self, predictor, paths, output, done, chunk_size, workers, segmented):
+        pending = [path for path in paths if self.source_name(path) not in done]
+        workers = workers or os.cpu_count() or 1
+        self.stdout.write(f"🎧 Scoring {len(pending)} clip(s) with {workers} extraction process(es)...")
+        started, count = time.perf_counter(), 0
+
+        pool = None
+        if workers > 1 and len(pending) > 1:
+            # Spawned, not forked: TensorFlow's threads are already running here
+            pool = multiprocessing.get_context('spawn').Pool(workers, init_audio_worker, (segmented,))
+            extracted = pool.imap(extract_clip, pending, chunksize=max(1, min(16, chunk_size // workers)))
+        else:
+            init_audio_worker(segmented, pool=False)
+            extracted = map(extract_clip, pending)
+
+        try:
+            chunk = []
+            for item in extracted:
+                chunk.append(item)
+                if len(chunk) == chunk_size:
+                    count += self.score_audio_chunk(predictor, chunk, output)
+                    chunk = []
+                    self.report('audio', count, started)
+            if chunk:
+                count += self.score_audio_chunk(predictor, chunk, output)
+        finally:
+            if pool is not None:
+                pool.terminate()
+        self.report('audio', count, started, final=True)
+
+    def score_audio_chunk(self, predictor, chunk, output):
+        """Score a chunk of extracted clips; single-segment feature rows go through one booster call"""
+        results = {path: result for path, features, result in chunk if result is not None}
+        rows = [(path, features) for path, features, _ in chunk if isinstance(features, dict)]
+        if rows:
+            for (path, _), result in zip(rows, predictor.score_audio_batch([features for _, features in rows])):
+                results[path] = result
+        for path, features, _ in chunk:
+            if isinstance(features, list):
+                results[path] = score_audio_clip(predictor, features)
+
+        output.write([result_row(self.source_name(path), 'audio', self.source_name(path), 0, results[path])
+                      for path, _, _ in chunk])
+        return len(chunk)
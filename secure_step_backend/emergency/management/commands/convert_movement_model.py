@@ -0,0 +1,76 @@
+import os
+import pickle
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from emergency.movement_backends import EXPORTERS, MODEL_FILES, QUANTIZED_BACKENDS, _load_keras_model
+
+
+class Command(BaseCommand):
+    help = ('Convert bilstm_action_model.h5 into SavedModel, TFLite (float, float16 and int8) and ONNX files '
+            'for the fast inference backends')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            default=os.path.join(settings.BASE_DIR, 'ml_models', MODEL_FILES['keras']),
+            help='Path to the Keras .h5 model',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=None,
+            help='Where to write the converted files (defaults to the input directory)',
+        )
+        parser.add_argument(
+            '--scaler',
+            default=None,
+            help='scaler.pkl to fold into the quantized TFLite models (defaults to the one next to the input)',
+        )
+        parser.add_argument(
+            '--backends',
+            default=','.join(EXPORTERS),
+            help=f"Comma-separated backends to export for ({', '.join(EXPORTERS)})",
+        )
+
+    def handle(self, *args, **options):
+        input_path = options['input']
+        output_dir = options['output_dir'] or os.path.dirname(os.path.abspath(input_path))
+        backends = [b.strip() for b in options['backends'].split(',') if b.strip()]
+
+        unknown = [b for b in backends if b not in EXPORTERS]
+        if unknown:
+            raise CommandError(f"Unknown backend(s): {', '.join(unknown)}")
+        if not os.path.exists(input_path):
+            raise CommandError(f"Model not found: {input_path}")
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.stdout.write(f"🔧 Loading {input_path}...")
+        model = _load_keras_model(input_path)
+
+        scaler = None
+        if any(b in QUANTIZED_BACKENDS for b in backends):
+            scaler_path = options['scaler'] or os.path.join(os.path.dirname(os.path.abspath(input_path)), 'scaler.pkl')
+            if not os.path.exists(scaler_path):
+                raise CommandError(f"Scaler not found: {scaler_path} (needed by {', '.join(QUANTIZED_BACKENDS)})")
+            with open(scaler_path, 'rb') as f:
+                scaler = pickle.load(f)
+
+        failed = []
+        for backend in backends:
+            target = os.path.join(output_dir, MODEL_FILES[backend])
+            try:
+                if backend in QUANTIZED_BACKENDS:
+                    EXPORTERS[backend](model, target, scaler=scaler)
+                else:
+                    EXPORTERS[backend](model, target)
+                self.stdout.write(self.style.SUCCESS(f"✅ {backend}: {target}"))
+            except ImportError as e:
+                failed.append(backend)
+                self.stdout.write(self.style.WARNING(f"⚠️  {backend}: missing dependency ({e})"))
+            except Exception as e:
+                failed.append(backend)
+                self.stdout.write(self.style.ERROR(f"❌ {backend}: {e}"))
+
+        if failed:
+            raise CommandError(f"Conversion failed for: {', '.join(failed)}")
@@ -0,0 +1,201 @@
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from emergency.gating import audio_level_db, movement_activity
+from emergency.management.commands.evaluate_tempo_modes import AUDIO_EXTENSIONS, LABEL_FOLDERS
+from emergency.ml_predictor import WINDOW_FRAMES, FastAudioFeatureExtractor, MLPredictor, sliding_windows
+
+MOVEMENT_EXTENSIONS = ('.csv', '.npy')
+
+
+def parse_thresholds(value):
+    try:
+        return [float(v) for v in str(value).split(',') if v.strip()]
+    except ValueError:
+        raise CommandError(f"Thresholds must be numbers, got '{value}'")
+
+
+def load_recording(path):
+    """(frames, 12) float32 from a .npy array or a CSV with an optional header row"""
+    if path.endswith('.npy'):
+        frames = np.load(path)
+    else:
+        frames = np.genfromtxt(path, delimiter=',', dtype=np.float32)
+        frames = frames[~np.isnan(frames).all(axis=-1)] if frames.ndim == 2 else frames
+    frames = np.asarray(frames, dtype=np.float32)
+    if frames.ndim != 2 or frames.shape[1] != 12:
+        raise ValueError(f"expected 12 columns, got shape {frames.shape}")
+    return frames
+
+
+class Command(BaseCommand):
+    help = ('Evaluate the silence / low-motion gates on labeled recordings: '
+            'false-negative rate and compute saved for each threshold')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'data_dir',
+            help="Folder with 'audio/' and/or 'movement/' sub-folders, each holding 'threat/' and "
+                 "'safe/' (or 'non_threat/') folders. Movement recordings are .npy or .csv (frames x 12).",
+        )
+        parser.add_argument('--audio-rms-db', default=None,
+                            help='Comma-separated audio thresholds in dBFS (default: ML_GATE_AUDIO_RMS_DB)')
+        parser.add_argument('--gyro-std', default=None,
+                            help='Comma-separated gyroscope std thresholds (default: ML_GATE_GYRO_STD)')
+        parser.add_argument('--accel-range', default=None,
+                            help='Comma-separated |acceleration| range thresholds (default: ML_GATE_ACCEL_RANGE)')
+        parser.add_argument('--stride', type=int, default=None,
+                            help='Window stride for movement recordings (default: ML_WINDOW_STRIDE)')
+
+    def handle(self, *args, **options):
+        data_dir = options['data_dir']
+        if not os.path.isdir(data_dir):
+            raise CommandError(f"Not a directory: {data_dir}")
+
+        predictor = MLPredictor.get_instance()
+        evaluated = False
+
+        audio_clips = self.find_files(os.path.join(data_dir, 'audio'), AUDIO_EXTENSIONS)
+        if audio_clips:
+            if not predictor._audio_models_loaded():
+                raise CommandError("Audio model or scaler not loaded")
+            thresholds = parse_thresholds(options['audio_rms_db'] or settings.ML_GATE_AUDIO_RMS_DB)
+            self.evaluate_audio(predictor, audio_clips, thresholds)
+            evaluated = True
+
+        recordings = self.find_files(os.path.join(data_dir, 'movement'), MOVEMENT_EXTENSIONS)
+        if recordings:
+            gyro = parse_thresholds(options['gyro_std'] or settings.ML_GATE_GYRO_STD)
+            accel = parse_thresholds(options['accel_range'] or settings.ML_GATE_ACCEL_RANGE)
+            stride = options['stride'] or getattr(settings, 'ML_WINDOW_STRIDE', 10)
+            self.evaluate_movement(predictor, recordings, gyro, accel, stride)
+            evaluated = True
+
+        if not evaluated:
+            raise CommandError(f"No labeled audio clips or movement recordings found in {data_dir}")
+
+    def find_files(self, folder, extensions):
+        files = []
+        for name, label in LABEL_FOLDERS.items():
+            path = os.path.join(folder, name)
+            if not os.path.isdir(path):
+                continue
+            for filename in sorted(os.listdir(path)):
+                if filename.lower().endswith(extensions):
+                    files.append((os.path.join(path, filename), label))
+        return files
+
+    # ------------------------------------------------------------------ audio
+
+    def evaluate_audio(self, predictor, clips, thresholds):
+        self.stdout.write(f"🎧 Scoring {len(clips)} audio clips...")
+        extractor = FastAudioFeatureExtractor()
+        labels, levels, threats, model_times, gate_times = [], [], [], [], []
+        for path, label in clips:
+            audio, sr = extractor.load_audio(path)
+            if audio is None:
+                self.stdout.write(self.style.WARNING(f"⚠️  Skipping unreadable clip {path}"))
+                continue
+
+            start = time.perf_counter()
+            levels.append(audio_level_db(audio))
+            gate_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            threats.append(predictor.score_audio_features(extractor.extract_features(audio, sr))['is_threat'])
+            model_times.append(time.perf_counter() - start)
+            labels.append(label)
+
+        if not labels:
+            raise CommandError("No readable audio clips")
+        labels, levels, threats = np.array(labels), np.array(levels), np.array(threats)
+        self.report(
+            'audio clips', labels, threats, np.array(model_times), np.sum(gate_times),
+            [(f"{t:g} dBFS", levels < t, threats & ~(levels < t)) for t in thresholds],
+        )
+
+    # --------------------------------------------------------------- movement
+
+    def evaluate_movement(self, predictor, recordings, gyro_thresholds, accel_thresholds, stride):
+        try:
+            predictor._ensure_movement_models()
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"⚠️  Skipping movement: {e}"))
+            return
+
+        self.stdout.write(f"🏃 Scoring {len(recordings)} movement recordings (stride {stride})...")
+        labels, owners, activity, threats, model_times, gate_time = [], [], [], [], [], 0.0
+        for path, label in recordings:
+            try:
+                frames = load_recording(path)
+            except (OSError, ValueError) as e:
+                self.stdout.write(self.style.WARNING(f"⚠️  Skipping {path}: {e}"))
+                continue
+            if len(frames) < WINDOW_FRAMES:
+                self.stdout.write(self.style.WARNING(f"⚠️  Skipping {path}: fewer than {WINDOW_FRAMES} frames"))
+                continue
+
+            windows = sliding_windows(frames, stride)
+            start = time.perf_counter()
+            activity.append(np.stack(movement_activity(windows), axis=1))
+            gate_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = predictor._score_batch(windows)
+            elapsed = time.perf_counter() - start
+            model_times.extend([elapsed / len(windows)] * len(windows))
+
+            threats.extend(result['is_threat'] for result in results)
+            owners.extend([len(labels)] * len(windows))
+            labels.append(label)
+
+        if not labels:
+            raise CommandError("No usable movement recordings")
+
+        # A recording counts as detected when any of its windows is a threat
+        labels, owners, threats = np.array(labels), np.array(owners), np.array(threats)
+        activity = np.concatenate(activity)
+        per_recording = lambda window_flags: np.bincount(owners, weights=window_flags, minlength=len(labels)) > 0
+        rows = []
+        for gyro in gyro_thresholds:
+            for accel in accel_thresholds:
+                still = (activity[:, 0] < gyro) & (activity[:, 1] < accel)
+                rows.append((f"gyro<{gyro:g} accel<{accel:g}", still, per_recording(threats & ~still)))
+        self.report(
+            'movement recordings', labels, per_recording(threats), np.array(model_times), gate_time, rows,
+            unit=f"windows ({len(owners)} total)",
+        )
+
+    # ----------------------------------------------------------------- report
+
+    def report(self, kind, labels, detected, model_times, gate_time, rows, unit=None):
+        """
+        `detected` is the threat decision per item without gating. Each row
+        is (threshold label, gated mask over the timed units, decision per
+        item with gating).
+        """
+        threat = labels == 1
+        base_fnr = np.mean(~detected[threat]) if threat.any() else float('nan')
+
+        self.stdout.write(
+            f"\n{len(labels)} {kind} ({int(threat.sum())} threat, {int((~threat).sum())} safe). "
+            f"False-negative rate without gating: {base_fnr:.3f}"
+        )
+        self.stdout.write(f"{'threshold':<28}{'gated':>8}{'FNR':>8}{'missed':>8}{'FP cut':>8}{'saved':>8}")
+        for name, gated_units, detected_with_gate in rows:
+            fnr = np.mean(~detected_with_gate[threat]) if threat.any() else float('nan')
+            suppressed = detected & ~detected_with_gate
+            saved = (model_times[gated_units].sum() - gate_time) / model_times.sum()
+            self.stdout.write(
+                f"{name:<28}{gated_units.mean():>7.1%}{fnr:>8.3f}{int(np.sum(suppressed & threat)):>8}"
+                f"{int(np.sum(suppressed & ~threat)):>8}{saved:>7.1%}"
+            )
+        self.stdout.write(
+            "missed: threats the model caught that the gate answers SAFE; "
+            "FP cut: false alarms on safe items the gate removes"
+            + (f"; 'gated' and 'saved' are over {unit}" if unit else '')
+        )
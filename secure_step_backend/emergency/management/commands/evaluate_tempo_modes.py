@@ -0,0 +1,115 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from emergency.ml_predictor import TEMPO_MODES, FastAudioFeatureExtractor, MLPredictor
+
+AUDIO_EXTENSIONS = ('.wav', '.m4a', '.mp3', '.ogg', '.flac', '.aac')
+
+# Sub-folder name -> ground-truth label (1 = threat)
+LABEL_FOLDERS = {'threat': 1, 'safe': 0, 'non_threat': 0}
+
+
+class Command(BaseCommand):
+    help = 'Compare the audio tempo modes on a labeled clip set: extraction time, accuracy and threat-probability drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'data_dir',
+            help="Folder with 'threat/' and 'safe/' (or 'non_threat/') sub-folders of audio clips",
+        )
+        parser.add_argument(
+            '--modes',
+            default=','.join(TEMPO_MODES),
+            help=f"Comma-separated tempo modes to evaluate ({', '.join(TEMPO_MODES)})",
+        )
+        parser.add_argument(
+            '--baseline',
+            default='beat_track',
+            help='Mode the probability drift and decision flips are measured against',
+        )
+
+    def handle(self, *args, **options):
+        modes = [m.strip() for m in options['modes'].split(',') if m.strip()]
+        baseline = options['baseline']
+        unknown = [m for m in modes + [baseline] if m not in TEMPO_MODES]
+        if unknown:
+            raise CommandError(f"Unknown tempo mode(s): {', '.join(unknown)}")
+        if baseline not in modes:
+            modes.insert(0, baseline)
+
+        clips = self.find_clips(options['data_dir'])
+        if not clips:
+            raise CommandError(f"No labeled clips found in {options['data_dir']}")
+
+        predictor = MLPredictor.get_instance()
+        if not predictor._audio_models_loaded():
+            raise CommandError("Audio model or scaler not loaded")
+
+        self.stdout.write(f"🎧 Decoding {len(clips)} clips...")
+        loader = FastAudioFeatureExtractor()
+        decoded = []
+        for path, label in clips:
+            audio, sr = loader.load_audio(path)
+            if audio is None:
+                self.stdout.write(self.style.WARNING(f"⚠️  Skipping unreadable clip {path}"))
+                continue
+            decoded.append((path, label, audio, sr))
+
+        labels = np.array([label for _, label, _, _ in decoded])
+        results = {}
+        for mode in modes:
+            extractor = FastAudioFeatureExtractor(tempo_mode=mode)
+            extractor.extract_features(decoded[0][2], decoded[0][3])  # warm caches / numba
+
+            probabilities, tempos, timings = [], [], []
+            for _, _, audio, sr in decoded:
+                start = time.perf_counter()
+                features = extractor.extract_features(audio, sr)
+                timings.append(time.perf_counter() - start)
+                tempos.append(features['tempo'])
+                probabilities.append(predictor.score_audio_features(features)['threat_probability'])
+            results[mode] = (np.array(probabilities), np.array(tempos), np.array(timings))
+
+        self.report(results, labels, baseline)
+
+    def find_clips(self, data_dir):
+        if not os.path.isdir(data_dir):
+            raise CommandError(f"Not a directory: {data_dir}")
+
+        clips = []
+        for folder, label in LABEL_FOLDERS.items():
+            folder_path = os.path.join(data_dir, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for name in sorted(os.listdir(folder_path)):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    clips.append((os.path.join(folder_path, name), label))
+        return clips
+
+    def report(self, results, labels, baseline):
+        base_probs = results[baseline][0]
+        base_ms = np.median(results[baseline][2]) * 1000
+
+        self.stdout.write(f"\n{len(labels)} clips ({int(labels.sum())} threat, {int((labels == 0).sum())} safe), "
+                          f"drift measured against '{baseline}'\n")
+        self.stdout.write(f"{'mode':<12}{'median ms':>10}{'vs base':>9}{'accuracy':>10}"
+                          f"{'mean |dp|':>11}{'max |dp|':>10}{'flips':>7}{'tempo=0':>9}")
+        for mode, (probs, tempos, timings) in results.items():
+            median_ms = np.median(timings) * 1000
+            accuracy = np.mean((probs > 0.5) == (labels == 1))
+            drift = np.abs(probs - base_probs)
+            flips = int(np.sum((probs > 0.5) != (base_probs > 0.5)))
+            zero_tempo = int(np.sum(tempos == 0))
+            self.stdout.write(
+                f"{mode:<12}{median_ms:>10.1f}{base_ms / median_ms:>8.2f}x{accuracy:>10.3f}"
+                f"{drift.mean():>11.4f}{drift.max():>10.4f}{flips:>7}{zero_tempo:>9}"
+            )
+
+        if np.all(results[baseline][1] == 0):
+            self.stdout.write(self.style.WARNING(
+                f"\n⚠️  '{baseline}' produced tempo 0 for every clip - the beat tracker is probably failing "
+                "(librosa 0.10.1 needs scipy < 1.13). Its probabilities are not the trained behaviour."
+            ))
@@ -0,0 +1,40 @@
+import os
+import pickle
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from emergency.ml_predictor import AUDIO_MODEL_NATIVE_FILE
+
+
+class Command(BaseCommand):
+    help = 'Save the pickled XGBoost audio model in XGBoost\'s own format, which loads faster and across versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            default=os.path.join(settings.BASE_DIR, 'ml_models', 'xgboost_threat_model.pkl'),
+            help='Path to the pickled XGBClassifier',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=None,
+            help='Where to write the model (defaults to the input directory, e.g. a version under ml_models/versions/)',
+        )
+
+    def handle(self, *args, **options):
+        input_path = options['input']
+        output_dir = options['output_dir'] or os.path.dirname(os.path.abspath(input_path))
+        if not os.path.exists(input_path):
+            raise CommandError(f"Model not found: {input_path}")
+
+        self.stdout.write(f"🔧 Loading {input_path}...")
+        with open(input_path, 'rb') as f:
+            model = pickle.load(f)
+        if not hasattr(model, 'save_model'):
+            raise CommandError(f"{type(model).__name__} is not an XGBoost model")
+
+        os.makedirs(output_dir, exist_ok=True)
+        target = os.path.join(output_dir, AUDIO_MODEL_NATIVE_FILE)
+        model.save_model(target)
+        self.stdout.write(self.style.SUCCESS(f"✅ {target} ({os.path.getsize(target) / 1024:.0f} KB)"))
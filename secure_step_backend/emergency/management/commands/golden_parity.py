@@ -0,0 +1,183 @@
+import importlib
+import os
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from emergency.golden import (
+    FEATURE_ATOL, FEATURE_RTOL, GOLDEN_DIR, PROBABILITY_ATOL, SCALED_ATOL, build_golden, feature_deviations,
+    file_sha256, load_golden, model_paths, movement_probabilities, reference_clips, signal_sha256,
+    within_feature_tolerance,
+)
+from emergency.management.commands.evaluate_tempo_modes import AUDIO_EXTENSIONS
+from emergency.ml_predictor import TEMPO_MODES, FastAudioFeatureExtractor, MLPredictor
+from emergency.reference_features import ReferenceAudioFeatureExtractor
+
+EXTRACTORS = {
+    'reference': ReferenceAudioFeatureExtractor,
+    'fast': FastAudioFeatureExtractor,
+    **{f'fast-{mode}': (lambda mode=mode: FastAudioFeatureExtractor(tempo_mode=mode)) for mode in TEMPO_MODES},
+}
+
+
+def load_extractor(name):
+    """A named extractor, or 'package.module:Class' for any class with extract_features(audio, sr)"""
+    if name in EXTRACTORS:
+        return EXTRACTORS[name]()
+    module_name, _, attribute = name.partition(':')
+    if not attribute:
+        raise CommandError(f"Unknown extractor '{name}'. Use one of {', '.join(EXTRACTORS)} or module:Class")
+    try:
+        return getattr(importlib.import_module(module_name), attribute)()
+    except (ImportError, AttributeError) as e:
+        raise CommandError(f"Cannot load extractor '{name}': {e}")
+
+
+class Command(BaseCommand):
+    help = ('Check the inference pipeline against the checked-in golden outputs (features, scaled inputs, '
+            'probabilities), or run two feature extractors side by side and report the largest per-feature deviation')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--new', default='fast',
+                            help=f"Extractor under test: {', '.join(EXTRACTORS)}, or module:Class (default: fast)")
+        parser.add_argument('--old', default=None,
+                            help='Run this extractor side by side with --new instead of using the stored goldens')
+        parser.add_argument('--clips', default=None, help='With --old, also compare on the clips in this folder')
+        parser.add_argument('--top', type=int, default=10, help='Features listed, largest deviation first')
+        parser.add_argument('--golden-dir', default=GOLDEN_DIR, help='Where the golden files are')
+        parser.add_argument('--update', action='store_true',
+                            help='Recompute the golden files from the reference extractor and the loaded models')
+
+    def handle(self, *args, **options):
+        golden_dir = options['golden_dir']
+        if options['update']:
+            try:
+                clips, arrays = build_golden(MLPredictor.get_instance(), golden_dir)
+            except ValueError as e:
+                raise CommandError(str(e))
+            stored = ', '.join(name for name in ('scaled', 'probabilities') if name in arrays)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Golden outputs written to {golden_dir}: {len(clips)} clips, {len(arrays['windows'])} windows"
+                f"{f' ({stored})' if stored else ''}"))
+            if 'probabilities' not in arrays:
+                self.stdout.write(self.style.WARNING("⚠️  Movement model not loaded: no movement probabilities stored"))
+            return
+
+        new = load_extractor(options['new'])
+        if options['old']:
+            self.side_by_side(load_extractor(options['old']), new, options)
+        else:
+            self.check_golden(new, golden_dir, options['top'])
+
+    # ------------------------------------------------------------ old vs new
+
+    def side_by_side(self, old, new, options):
+        clips = reference_clips(options['golden_dir'])
+        if options['clips']:
+            if not os.path.isdir(options['clips']):
+                raise CommandError(f"Not a directory: {options['clips']}")
+            loader = FastAudioFeatureExtractor()
+            for filename in sorted(os.listdir(options['clips'])):
+                if filename.lower().endswith(AUDIO_EXTENSIONS):
+                    audio, sr = loader.load_audio(os.path.join(options['clips'], filename))
+                    if audio is not None:
+                        clips[filename] = (audio, sr)
+
+        self.stdout.write(f"🎧 {options['old']} vs {options['new']} on {len(clips)} clips")
+        old_rows = [old.extract_features(audio, sr) for audio, sr in clips.values()]
+        new_rows = [new.extract_features(audio, sr) for audio, sr in clips.values()]
+        self.print_deviations(feature_deviations(old_rows, new_rows), options['top'])
+
+        predictor = MLPredictor.get_instance()
+        if predictor._audio_models_loaded():
+            scorer = predictor._get_audio_scorer()
+            p_old = scorer.threat_probabilities(scorer.matrix(old_rows))
+            p_new = scorer.threat_probabilities(scorer.matrix(new_rows))
+            flips = int(np.sum((np.asarray(p_old) > 0.5) != (np.asarray(p_new) > 0.5)))
+            self.stdout.write(f"P(threat): max deviation {np.abs(np.asarray(p_old) - p_new).max():.3g}, "
+                              f"{flips} decision flip(s)")
+
+    # ---------------------------------------------------------------- golden
+
+    def check_golden(self, new, golden_dir, top):
+        try:
+            audio, movement = load_golden(golden_dir)
+        except FileNotFoundError:
+            raise CommandError(f"No golden files in {golden_dir}; create them with --update")
+
+        predictor = MLPredictor.get_instance()
+        checksums = {name: file_sha256(path) for name, path in model_paths(predictor).items()}
+        failures = []
+
+        def check(label, deviation, tolerance):
+            ok = deviation <= tolerance
+            mark = '✅' if ok else '❌'
+            self.stdout.write(f"{mark} {label}: max deviation {deviation:.3g} (tolerance {tolerance:g})")
+            if not ok:
+                failures.append(label)
+
+        def skip(label, reason):
+            self.stdout.write(self.style.WARNING(f"⚠️  {label}: skipped ({reason})"))
+
+        # Inputs: a changed clip generator would make every comparison below meaningless
+        clips = reference_clips(golden_dir)
+        changed = [name for name, clip in audio['clips'].items()
+                   if name not in clips or signal_sha256(clips[name][0]) != clip['signal_sha256']]
+        if changed:
+            raise CommandError(f"Reference clips changed since the goldens were built: {', '.join(changed)}")
+
+        names = list(audio['clips'])
+        expected = [audio['clips'][name]['features'] for name in names]
+        actual = [new.extract_features(*clips[name]) for name in names]
+        deviations = feature_deviations(expected, actual)
+        self.print_deviations(deviations, top)
+        ok = within_feature_tolerance(expected, actual)
+        self.stdout.write(f"{'✅' if ok else '❌'} audio features: rtol {FEATURE_RTOL:g}, atol {FEATURE_ATOL:g}")
+        if not ok:
+            failures.append('audio features')
+
+        if not predictor._audio_models_loaded():
+            skip('audio scaling and P(threat)', 'audio models not loaded')
+        elif checksums['audio_scaler'] != audio['audio_scaler_sha256'] or 'scaled' not in audio['clips'][names[0]]:
+            skip('audio scaling and P(threat)', 'feature_scaler.pkl differs from the goldens')
+        else:
+            scorer = predictor._get_audio_scorer()
+            matrix = scorer.matrix(expected)
+            scaled = np.array([audio['clips'][name]['scaled'] for name in names])
+            check('audio scaled features', float(np.abs(scorer.scale_rows(matrix) - scaled).max()), SCALED_ATOL)
+            if checksums['audio_model'] != audio['audio_model_sha256']:
+                skip('audio P(threat)', 'audio model file differs from the goldens')
+            else:
+                probabilities = np.array([audio['clips'][name]['threat_probability'] for name in names])
+                check('audio P(threat)', float(np.abs(scorer.threat_probabilities(matrix) - probabilities).max()),
+                      PROBABILITY_ATOL)
+
+        windows = movement['windows']
+        if predictor._scaler is None or 'scaled' not in movement:
+            skip('movement scaling', 'scaler.pkl not loaded')
+        elif checksums['movement_scaler'] != movement.get('movement_scaler_sha256'):
+            skip('movement scaling', 'scaler.pkl differs from the goldens')
+        else:
+            scaled = predictor._scaler.transform(windows.reshape(-1, 12)).reshape(windows.shape)
+            check('movement scaled windows', float(np.abs(scaled - movement['scaled']).max()), SCALED_ATOL)
+
+        if predictor._model is None:
+            skip('movement probabilities', 'movement model not loaded')
+        elif 'probabilities' not in movement or checksums['movement_model'] != movement.get('movement_model_sha256'):
+            skip('movement probabilities', 'no goldens for this movement model; run --update')
+        else:
+            probabilities = movement_probabilities(predictor, windows)
+            check(f"movement probabilities ({getattr(predictor._model, 'name', 'model')})",
+                  float(np.abs(probabilities - movement['probabilities']).max()), PROBABILITY_ATOL)
+
+        if failures:
+            raise CommandError(f"Parity check failed: {', '.join(failures)}")
+
+    def print_deviations(self, deviations, top):
+        ranked = sorted(deviations.items(), key=lambda item: (item[1][1], item[1][0]), reverse=True)
+        self.stdout.write(f"{'feature':<24}{'max abs':>12}{'max rel':>12}")
+        for name, (absolute, relative) in ranked[:top]:
+            self.stdout.write(f"{name:<24}{absolute:>12.3g}{relative:>12.3g}")
+        if ranked:
+            worst = max(absolute for absolute, _ in deviations.values())
+            self.stdout.write(f"{len(ranked)} features, largest absolute deviation {worst:.3g}")
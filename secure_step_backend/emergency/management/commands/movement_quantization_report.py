@@ -0,0 +1,196 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from emergency.management.commands.evaluate_gating import MOVEMENT_EXTENSIONS, load_recording
+from emergency.ml_predictor import WINDOW_FRAMES, MLPredictor, sliding_windows
+from emergency.movement_backends import (
+    EXPORTERS, MODEL_FILES, QUANTIZED_BACKENDS, _load_keras_model, load_movement_backend,
+)
+
+# Compared against the Keras float model, in this order
+VARIANTS = ('tflite',) + tuple(QUANTIZED_BACKENDS)
+
+
+def file_size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def compare_predictions(reference, candidate, class_names, threat_labels):
+    """
+    Agreement of `candidate` probabilities with the float model's
+    `reference`, overall, on the threat verdict, and per class (by the
+    class the float model predicted).
+    """
+    expected, predicted = reference.argmax(axis=1), candidate.argmax(axis=1)
+    is_threat = np.array([name in threat_labels for name in class_names])
+
+    per_class = {}
+    for index, name in enumerate(class_names):
+        rows = expected == index
+        count = int(rows.sum())
+        per_class[name] = {
+            'windows': count,
+            'agreement': float((predicted[rows] == index).mean()) if count else None,
+            'threat': bool(is_threat[index]),
+        }
+    return {
+        'agreement': float((predicted == expected).mean()),
+        'threat_agreement': float((is_threat[predicted] == is_threat[expected]).mean()),
+        'max_probability_error': float(np.abs(candidate - reference).max()),
+        'per_class': per_class,
+    }
+
+
+def measure_latency(backend, window, requests):
+    """Single-window latencies in ms after a short warm-up"""
+    for _ in range(5):
+        backend.predict(window)
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        backend.predict(window)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': float(np.percentile(latencies, 50)), 'p99_ms': float(np.percentile(latencies, 99)),
+            'mean_ms': float(np.mean(latencies))}
+
+
+class Command(BaseCommand):
+    help = ('Export float16 and int8 TFLite variants of the movement model and compare them with the float '
+            'model: per-class agreement, model size, load time and per-inference latency')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input-dir',
+            default=os.path.join(settings.BASE_DIR, 'ml_models'),
+            help='Folder with bilstm_action_model.h5, scaler.pkl and label_encoder.pkl',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=None,
+            help='Keep the exported files here (e.g. the input dir, to serve them); defaults to a temp dir',
+        )
+        parser.add_argument(
+            '--recordings',
+            default=None,
+            help='Folder of raw recordings (.npy or .csv, frames x 12) to take windows from. Without it, '
+                 'windows are drawn from the distribution the scaler was fitted on.',
+        )
+        parser.add_argument('--windows', type=int, default=1000, help='Windows to compare on')
+        parser.add_argument('--requests', type=int, default=200, help='Single-window calls timed per model')
+        parser.add_argument('--json', default=None, help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        input_dir = options['input_dir']
+        paths = {name: os.path.join(input_dir, name) for name in (MODEL_FILES['keras'], 'scaler.pkl', 'label_encoder.pkl')}
+        missing = [name for name, path in paths.items() if not os.path.exists(path)]
+        if missing:
+            raise CommandError(f"Not found in {input_dir}: {', '.join(missing)}")
+
+        with open(paths['scaler.pkl'], 'rb') as f:
+            scaler = pickle.load(f)
+        with open(paths['label_encoder.pkl'], 'rb') as f:
+            class_names = [str(name) for name in pickle.load(f).classes_]
+
+        raw = self.reference_windows(options['recordings'], scaler, options['windows'])
+        scaled = scaler.transform(raw.reshape(-1, raw.shape[-1])).reshape(raw.shape).astype(np.float32)
+        self.stdout.write(f"🔧 Comparing on {len(raw)} windows")
+
+        output_dir = options['output_dir'] or tempfile.mkdtemp(prefix='movement-quantized-')
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            report = self.build_report(input_dir, output_dir, scaler, class_names, raw, scaled, options['requests'])
+        finally:
+            if not options['output_dir']:
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+        self.print_report(report)
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Report written to {options['json']}"))
+
+    def reference_windows(self, recordings_dir, scaler, count):
+        rng = np.random.default_rng(0)
+        if recordings_dir:
+            if not os.path.isdir(recordings_dir):
+                raise CommandError(f"Not a directory: {recordings_dir}")
+            windows = []
+            for root, _, files in os.walk(recordings_dir):
+                for name in sorted(files):
+                    if name.endswith(MOVEMENT_EXTENSIONS):
+                        frames = load_recording(os.path.join(root, name))
+                        if len(frames) >= WINDOW_FRAMES:
+                            windows.append(sliding_windows(frames, WINDOW_FRAMES // 5))
+            if not windows:
+                raise CommandError(f"No recordings of at least {WINDOW_FRAMES} frames in {recordings_dir}")
+            windows = np.concatenate(windows)
+            if len(windows) > count:
+                windows = windows[rng.choice(len(windows), count, replace=False)]
+            return windows.astype(np.float32)
+
+        # Scaled values ~ N(0, 1) per feature, mapped back to sensor units
+        samples = rng.normal(size=(count * WINDOW_FRAMES, scaler.n_features_in_))
+        return scaler.inverse_transform(samples).reshape(count, WINDOW_FRAMES, -1).astype(np.float32)
+
+    def build_report(self, input_dir, output_dir, scaler, class_names, raw, scaled, requests):
+        h5_path = os.path.join(input_dir, MODEL_FILES['keras'])
+        keras_model = _load_keras_model(h5_path)
+        for name in VARIANTS:
+            target = os.path.join(output_dir, MODEL_FILES[name])
+            self.stdout.write(f"🔧 Exporting {name}...")
+            if name in QUANTIZED_BACKENDS:
+                EXPORTERS[name](keras_model, target, scaler=scaler)
+            else:
+                EXPORTERS[name](keras_model, target)
+        if os.path.abspath(output_dir) != os.path.abspath(input_dir):
+            shutil.copy(h5_path, output_dir)
+
+        models = {}
+        for name in ('keras',) + VARIANTS:
+            start = time.perf_counter()
+            backend = load_movement_backend(name, output_dir, num_threads=1)
+            load_seconds = time.perf_counter() - start
+
+            inputs = raw if backend.takes_raw_windows else scaled
+            probabilities = np.concatenate([backend.predict(inputs[i:i + 64]) for i in range(0, len(inputs), 64)])
+            if name == 'keras':
+                reference = probabilities
+
+            models[name] = {
+                'size_mb': round(file_size_mb(os.path.join(output_dir, MODEL_FILES[name])), 3),
+                'load_seconds': round(load_seconds, 3),
+                **measure_latency(backend, inputs[:1], requests),
+                **compare_predictions(reference, probabilities, class_names, MLPredictor.THREAT_LABELS),
+            }
+        return {'windows': len(raw), 'models': models}
+
+    def print_report(self, report):
+        models = report['models']
+        self.stdout.write(f"\n{'model':<14}{'size MB':>9}{'load s':>8}{'p50 ms':>8}{'p99 ms':>8}"
+                          f"{'agree':>8}{'threat':>8}{'max dp':>8}")
+        for name, row in models.items():
+            self.stdout.write(f"{name:<14}{row['size_mb']:>9.2f}{row['load_seconds']:>8.2f}{row['p50_ms']:>8.2f}"
+                              f"{row['p99_ms']:>8.2f}{row['agreement']:>8.1%}{row['threat_agreement']:>8.1%}"
+                              f"{row['max_probability_error']:>8.4f}")
+
+        # Per-class agreement of each variant, threat classes marked with *
+        variants = [name for name in models if name != 'keras']
+        self.stdout.write(f"\n{'class':<24}{'windows':>8}" + ''.join(f"{name:>13}" for name in variants))
+        for class_name, row in models['keras']['per_class'].items():
+            label = f"{class_name}{' *' if row['threat'] else ''}"
+            cells = []
+            for name in variants:
+                agreement = models[name]['per_class'][class_name]['agreement']
+                cells.append(f"{agreement:>13.1%}" if agreement is not None else f"{'-':>13}")
+            self.stdout.write(f"{label:<24}{row['windows']:>8}" + ''.join(cells))
+        self.stdout.write("* threat class (MLPredictor.THREAT_LABELS)")
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from emergency.inference_service import DEFAULT_PREDICTOR_FACTORY, InferenceService
+
+
+class Command(BaseCommand):
+    help = 'Run the out-of-process ML inference service used when ML_INFERENCE_MODE = "service"'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=settings.ML_SERVICE_ADDRESS,
+                            help='host:port or socket path to listen on')
+        parser.add_argument('--workers', type=int, default=settings.ML_SERVICE_POOL_SIZE,
+                            help='Number of inference worker processes')
+        parser.add_argument('--timeout', type=float, default=settings.ML_SERVICE_TIMEOUT,
+                            help='Per-request timeout in seconds')
+        parser.add_argument('--predictor-factory', default=DEFAULT_PREDICTOR_FACTORY,
+                            help='Dotted path of a callable returning the predictor each worker uses')
+
+    def handle(self, *args, **options):
+        service = InferenceService(
+            address=options['address'],
+            pool_size=options['workers'],
+            timeout=options['timeout'],
+            predictor_factory=options['predictor_factory'],
+        )
+        self.stdout.write(f"🔧 Starting {options['workers']} inference workers...")
+        service.start()
+        self.stdout.write(self.style.SUCCESS(f"✅ Inference service listening on {service.address}"))
+
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Shutting down inference service...")
+        finally:
+            service.close()
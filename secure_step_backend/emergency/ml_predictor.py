@@ -1,42 +1,336 @@
 import os
 import pickle
+import threading
+import time
 import numpy as np
-import tensorflow as tf
-import xgboost as xgb
-import librosa
-from scipy import stats
-import pandas as pd
+from collections import Counter
+from functools import lru_cache
 from django.conf import settings
 
+from .gating import gate_audio, gate_movement, score_ungated
+from .inference_batcher import InferenceBatcher
+from .model_state import LOADING, ModelState, ModelUnavailable
+from .movement_backends import load_movement_backend
+from .thread_budget import apply_thread_budget, limit_xgboost_threads, thread_limits
+
+# NOTE: tensorflow, xgboost, librosa and scipy are imported inside the
+# functions that use them. This module is imported by emergency.views, and
+# processes that never run inference (Celery workers, management commands,
+# contact/dispatch-only workers) should not pay for loading the ML stack.
+
+WINDOW_FRAMES = 50
+
+# Loaded, and reported on by /ready/, separately
+MODEL_GROUPS = ('movement', 'audio')
+
+# The audio model in XGBoost's UBJSON format, preferred over the pickle
+AUDIO_MODEL_NATIVE_FILE = 'xgboost_threat_model.ubj'
+
+# Windows scored per forward pass by predict_windows, so a very long
+# recording does not turn into one huge model input
+MAX_WINDOWS_PER_PASS = 256
+
+
+def window_starts(num_frames, stride):
+    """
+    Start offsets of the 50-frame windows taken every `stride` frames.
+    Windows are aligned to the end of the recording, so the newest frames
+    are always scored; up to stride - 1 of the oldest frames may be skipped.
+    """
+    if num_frames < WINDOW_FRAMES:
+        raise ValueError(f"Need at least {WINDOW_FRAMES} frames, got {num_frames}")
+    if stride < 1:
+        raise ValueError(f"Stride must be at least 1, got {stride}")
+
+    last = num_frames - WINDOW_FRAMES
+    return np.arange(last % stride, last + 1, stride)
+
+
+def sliding_windows(frames, stride):
+    """
+    (N, 12) frames -> (windows, 50, 12) overlapping windows, matching
+    window_starts. The result is a strided view of `frames`, not a copy.
+    """
+    frames = np.asarray(frames).reshape(-1, 12)
+    first = window_starts(len(frames), stride)[0]
+    view = np.lib.stride_tricks.sliding_window_view(frames, (WINDOW_FRAMES, 12))[:, 0]
+    return view[first::stride]
+
+
+def aggregate_window_results(results):
+    """
+    Overall verdict for a recording scored window by window: a threat if
+    any window is a threat, otherwise the most frequent action.
+    """
+    threat_windows = [r for r in results if r['is_threat']]
+    candidates = threat_windows or results
+
+    counts = Counter(r['action'] for r in candidates)
+    action = max(counts, key=lambda a: (counts[a], max(r['confidence'] for r in candidates if r['action'] == a)))
+    confidences = [r['confidence'] for r in candidates if r['action'] == action]
+    is_threat = bool(threat_windows)
+
+    return {
+        'action': action,
+        'confidence': float(np.mean(confidences)),
+        'is_threat': is_threat,
+        'status': 'THREAT' if is_threat else 'SAFE',
+        'num_windows': len(results),
+        'threat_windows': len(threat_windows)
+    }
+
+
+def build_windows_response(results, starts, stride):
+    windows = [
+        dict(result, start_frame=int(start), end_frame=int(start) + WINDOW_FRAMES)
+        for start, result in zip(starts, results)
+    ]
+    return {
+        'stride': stride,
+        'windows': windows,
+        'aggregate': aggregate_window_results(results)
+    }
+
+
 # ============================================================================
 # OPTIMIZED FEATURE EXTRACTION
 # ============================================================================
+
+# librosa's defaults for every feature the audio model was trained on
+N_FFT = 2048
+HOP_LENGTH = 512
+
+STAT_NAMES = ('mean', 'std', 'min', 'max', 'median', 'q25', 'q75', 'skew', 'kurtosis')
+
+# Per-frame series summarised with STAT_NAMES, in feature order
+FRAME_SERIES = (
+    ['spec_cent', 'spec_roll', 'spec_bw']
+    + [f'mfcc_{i}' for i in range(13)]
+    + ['zcr', 'rms']
+)
+
+
+@lru_cache(maxsize=8)
+def mel_filterbank(sr, n_fft):
+    """librosa's default mel filterbank, built once per (sr, n_fft)"""
+    import librosa
+
+    basis = librosa.filters.mel(sr=sr, n_fft=n_fft)
+    basis.setflags(write=False)
+    return basis
+
+
+@lru_cache(maxsize=128)
+def chroma_filterbank(sr, n_fft, tuning):
+    """
+    Chroma filterbank for an estimated tuning. estimate_tuning works in
+    steps of 0.01 bins, so only about a hundred distinct banks exist.
+    """
+    import librosa
+
+    basis = librosa.filters.chroma(sr=sr, n_fft=n_fft, tuning=tuning)
+    basis.setflags(write=False)
+    return basis
+
+
+# 'beat_track' - the full beat tracker, as in training (only its tempo is kept)
+# 'autocorr'   - the tempo the beat tracker starts from: the autocorrelation
+#                tempogram of the onset envelope, without the beat-tracking pass
+# 'constant'   - no estimate; tempo is imputed with the scaler mean when scoring
+TEMPO_MODES = ('beat_track', 'autocorr', 'constant')
+
+# librosa.feature.tempo's autocorrelation window, in seconds
+TEMPO_AC_SIZE = 8.0
+
+
+def onset_tempogram(onset_env, sr, hop_length=HOP_LENGTH):
+    """
+    librosa.feature.tempogram with the settings librosa.feature.tempo uses.
+    librosa autocorrelates a strided view at FFT length 2 * win - 1 (687
+    for the 344-frame window, a slow size); here the windowed frames are
+    contiguous rows and the FFT is zero-padded to a fast length, which
+    gives the same linear autocorrelation.
+    """
+    import librosa
+    from scipy import fft
+
+    win_length = librosa.time_to_frames(TEMPO_AC_SIZE, sr=sr, hop_length=hop_length).item()
+    window = librosa.filters.get_window('hann', win_length, fftbins=True)
+
+    n = len(onset_env)
+    padded = np.pad(onset_env, win_length // 2, mode='linear_ramp', end_values=0)
+    frames = np.lib.stride_tricks.sliding_window_view(padded, win_length)[:n] * window
+
+    n_fft = fft.next_fast_len(2 * win_length - 1, real=True)
+    spectrum = np.fft.rfft(frames, n=n_fft, axis=-1)
+    autocorr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_fft, axis=-1)[:, :win_length]
+    return librosa.util.normalize(autocorr.T, norm=np.inf, axis=-2)
+
+
+def segment_starts(num_samples, segment_samples, hop_samples):
+    """
+    Start offsets of the segments a long clip is scored in. A clip no longer
+    than one segment is a single segment. The last segment is moved back (to
+    a multiple of HOP_LENGTH) so the end of the clip is always covered, up to
+    HOP_LENGTH - 1 samples.
+    """
+    if num_samples <= segment_samples:
+        return np.array([0])
+    last = num_samples - segment_samples
+    starts = np.arange(0, last + 1, hop_samples)
+    final = last - last % HOP_LENGTH
+    return np.append(starts, final) if final > starts[-1] else starts
+
+
+def segment_spectrogram(clip, S, mel_power, first, sr):
+    """
+    Magnitude STFT and mel power of `clip`, sliced from those of the whole
+    recording, where the clip starts at frame `first` (its start is a
+    multiple of HOP_LENGTH). Frames whose window reaches past either end of
+    the clip see zero padding in the clip's own STFT, so those few frames
+    are recomputed from the clip.
+    """
+    import librosa
+
+    frames = 1 + len(clip) // HOP_LENGTH
+    head = N_FFT // 2 // HOP_LENGTH
+    tail = (len(clip) - N_FFT // 2) // HOP_LENGTH + 1
+
+    S = S[:, first:first + frames].copy()
+    mel_power = mel_power[:, first:first + frames].copy()
+
+    S[:, :head] = np.abs(librosa.stft(clip[:N_FFT], n_fft=N_FFT, hop_length=HOP_LENGTH))[:, :head]
+    # Zeros after the clip are what its own STFT pads with; they only keep
+    # the slice at least N_FFT long
+    tail_clip = np.pad(clip[tail * HOP_LENGTH - N_FFT // 2:], (0, N_FFT))
+    S[:, tail:] = np.abs(librosa.stft(tail_clip, n_fft=N_FFT, hop_length=HOP_LENGTH))[:, head:head + frames - tail]
+
+    basis = mel_filterbank(sr, N_FFT)
+    mel_power[:, :head] = basis @ S[:, :head] ** 2
+    mel_power[:, tail:] = basis @ S[:, tail:] ** 2
+    return S, mel_power
+
+
+def aggregate_segment_results(segments, results):
+    """
+    Overall verdict for a clip scored segment by segment: a threat if any
+    segment is, with the probability and confidence of the most threatening
+    segment and the mean probability over all of them.
+    """
+    probabilities = [r['threat_probability'] for r in results]
+    worst = results[int(np.argmax(probabilities))]
+    threat_segments = sum(r['is_threat'] for r in results)
+    is_threat = bool(threat_segments)
+
+    return {
+        'is_threat': is_threat,
+        'confidence': worst['confidence'],
+        'threat_probability': worst['threat_probability'],
+        'mean_threat_probability': float(np.mean(probabilities)),
+        'status': 'THREAT' if is_threat else 'SAFE',
+        'num_segments': len(results),
+        'threat_segments': threat_segments,
+        'segments': [
+            {'start': segment['start'], 'end': segment['end'],
+             'threat_probability': result['threat_probability'], 'is_threat': result['is_threat']}
+            for segment, result in zip(segments, results)
+        ],
+    }
+
+
+def score_audio_clip(predictor, features):
+    """
+    Score the output of FastAudioFeatureExtractor.extract_clip_features:
+    one feature dict, or a list of segments scored in one batch
+    """
+    if isinstance(features, list):
+        results = predictor.score_audio_batch([segment['features'] for segment in features])
+        return aggregate_segment_results(features, results)
+    return predictor.score_audio_features(features)
+
+
+_segment_executor = None
+_segment_executor_lock = threading.Lock()
+
+
+def get_segment_executor():
+    """Thread pool for per-segment feature extraction, or None with a single worker"""
+    global _segment_executor
+    workers = (getattr(settings, 'ML_AUDIO_SEGMENT_WORKERS', 0) or getattr(settings, 'ML_THREADS', 0)
+               or os.cpu_count() or 1)
+    if workers < 2:
+        return None
+    if _segment_executor is None:
+        with _segment_executor_lock:
+            if _segment_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _segment_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='audio-segments')
+    return _segment_executor
+
+
 class FastAudioFeatureExtractor:
-    def __init__(self, sample_rate=22050, duration=5):
+    def __init__(self, sample_rate=22050, duration=5, tempo_mode=None, segmented=None):
         self.sample_rate = sample_rate
         self.duration = duration
+        self.tempo_mode = tempo_mode or getattr(settings, 'ML_AUDIO_TEMPO_MODE', 'beat_track')
+        if self.tempo_mode not in TEMPO_MODES:
+            raise ValueError(f"Unknown tempo mode '{self.tempo_mode}'. Choose one of: {', '.join(TEMPO_MODES)}")
+
+        # Segmented: the whole clip, up to max_duration seconds, is cut into
+        # `duration`-second segments every `segment_hop` seconds
+        self.segmented = getattr(settings, 'ML_AUDIO_SEGMENTED', False) if segmented is None else segmented
+        self.segment_hop = getattr(settings, 'ML_AUDIO_SEGMENT_HOP', 2.5)
+        self.max_duration = getattr(settings, 'ML_AUDIO_MAX_DURATION', 60.0)
+
+    @property
+    def decode_duration(self):
+        """Seconds of each clip to decode"""
+        return self.max_duration if self.segmented else self.duration
 
     def load_audio(self, file_path):
-        """Load audio file with duration limit"""
+        """
+        Load audio file with duration limit. Only the first `duration`
+        seconds (`max_duration` when segmented) are decoded, at the native
+        rate, then resampled with ML_AUDIO_RESAMPLER.
+        """
+        from .audio_io import decode_audio_file
+
         try:
-            audio, sr = librosa.load(file_path, sr=self.sample_rate, duration=self.duration)
-            return audio, sr
+            return decode_audio_file(file_path, self.sample_rate, self.decode_duration)
         except Exception as e:
             return None, None
 
     def extract_statistical_features(self, data, prefix=""):
         """Extract statistical features quickly"""
-        return {
-            f'{prefix}_mean': np.mean(data),
-            f'{prefix}_std': np.std(data),
-            f'{prefix}_min': np.min(data),
-            f'{prefix}_max': np.max(data),
-            f'{prefix}_median': np.median(data),
-            f'{prefix}_q25': np.percentile(data, 25),
-            f'{prefix}_q75': np.percentile(data, 75),
-            f'{prefix}_skew': stats.skew(data),
-            f'{prefix}_kurtosis': stats.kurtosis(data),
-        }
+        return self.extract_statistical_block(np.atleast_2d(data), [prefix])[0]
+
+    def extract_statistical_block(self, series, prefixes):
+        """
+        Statistics for several equal-length series at once. `series` is
+        shaped (len(prefixes), frames); every statistic is one reduction
+        along the frame axis. Returns one feature dict per row.
+        """
+        from scipy import stats
+
+        series = np.asarray(series)
+        q25, median, q75 = np.percentile(series, [25, 50, 75], axis=1)
+        columns = (
+            series.mean(axis=1),
+            series.std(axis=1),
+            series.min(axis=1),
+            series.max(axis=1),
+            median,
+            q25,
+            q75,
+            stats.skew(series, axis=1),
+            stats.kurtosis(series, axis=1),
+        )
+        rows = np.column_stack(columns).tolist()
+
+        return [
+            {f'{prefix}_{name}': value for name, value in zip(STAT_NAMES, row)}
+            for prefix, row in zip(prefixes, rows)
+        ]
 
     def extract_all_features(self, file_path):
         """Extract comprehensive audio features - OPTIMIZED"""
@@ -44,51 +338,235 @@ class FastAudioFeatureExtractor:
         if audio is None:
             return None
 
+        return self.extract_clip_features(audio, sr)
+
+    def extract_clip_features(self, audio, sr):
+        """extract_features, or extract_segment_features when segmented"""
+        if self.segmented:
+            return self.extract_segment_features(audio, sr)
+        return self.extract_features(audio, sr)
+
+    def extract_segment_features(self, audio, sr):
+        """
+        Features of every `duration`-second segment of a clip, as a list of
+        {'start', 'end', 'features'} dicts (times in seconds).
+
+        Segment starts are rounded to a multiple of HOP_LENGTH so every
+        segment's STFT frames are frames of one STFT of the whole clip; only
+        the frames at segment edges are recomputed. Long clips extract the
+        segments on the segment pool.
+        """
+        import librosa
+
+        segment = int(sr * self.duration)
+        hop = max(1, round(self.segment_hop * sr / HOP_LENGTH)) * HOP_LENGTH
+        starts = segment_starts(len(audio), segment, hop)
+
+        def entry(start, features):
+            end = min(start + segment, len(audio))
+            return {'start': round(start / sr, 3), 'end': round(end / sr, 3), 'features': features}
+
+        if len(starts) == 1:
+            return [entry(0, self.extract_features(audio[:segment], sr))]
+
+        S = np.abs(librosa.stft(audio, n_fft=N_FFT, hop_length=HOP_LENGTH))
+        mel_power = mel_filterbank(sr, N_FFT) @ S ** 2
+
+        def extract(start):
+            clip = audio[start:start + segment]
+            clip_S, clip_mel_power = segment_spectrogram(clip, S, mel_power, start // HOP_LENGTH, sr)
+            return entry(start, self.features_from_spectrogram(clip, clip_S, sr, clip_mel_power))
+
+        executor = get_segment_executor() if len(starts) >= getattr(settings, 'ML_AUDIO_PARALLEL_SEGMENTS', 4) else None
+        if executor is None:
+            return [extract(start) for start in starts]
+        return list(executor.map(extract, starts))
+
+    def extract_features(self, audio, sr):
+        """
+        Extract comprehensive audio features from an already-decoded signal.
+
+        One magnitude STFT is shared by every spectral feature, and the mel
+        and chroma filterbanks are built once per process. The values match
+        the per-feature librosa calls the models were trained with (see
+        reference_features.py).
+        """
+        import librosa
+
+        # Shared spectrogram - same framing as librosa's feature defaults
+        S = np.abs(librosa.stft(audio, n_fft=N_FFT, hop_length=HOP_LENGTH))
+        return self.features_from_spectrogram(audio, S, sr)
+
+    def features_from_spectrogram(self, audio, S, sr, mel_power=None):
+        """
+        extract_features given the magnitude STFT `S` of `audio` and,
+        optionally, its mel power (mel filterbank @ S ** 2)
+        """
+        import librosa
+
         features = {}
 
         # 1. BASIC AUDIO STATISTICS
         features.update(self.extract_statistical_features(audio, 'audio'))
 
+        power = S ** 2
+        if mel_power is None:
+            mel_power = mel_filterbank(sr, N_FFT) @ power
+
         # 2. SPECTRAL FEATURES
-        spec_cent = librosa.feature.spectral_centroid(y=audio, sr=sr)[0]
-        features.update(self.extract_statistical_features(spec_cent, 'spec_cent'))
+        spec_cent = librosa.feature.spectral_centroid(S=S, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+        spec_roll = librosa.feature.spectral_rolloff(S=S, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+        spec_bw = librosa.feature.spectral_bandwidth(
+            S=S, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH, centroid=spec_cent
+        )
+
+        # 3. MFCC FEATURES (the log-mel spectrogram is reused for tempo below)
+        log_mel = librosa.power_to_db(mel_power)
+        mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=13)
 
-        spec_roll = librosa.feature.spectral_rolloff(y=audio, sr=sr)[0]
-        features.update(self.extract_statistical_features(spec_roll, 'spec_roll'))
+        # 4. ZERO CROSSING RATE (time domain)
+        zcr = librosa.feature.zero_crossing_rate(audio, frame_length=N_FFT, hop_length=HOP_LENGTH)
 
-        spec_bw = librosa.feature.spectral_bandwidth(y=audio, sr=sr)[0]
-        features.update(self.extract_statistical_features(spec_bw, 'spec_bw'))
+        # 5. RMS ENERGY (time domain - the spectrogram version is windowed and differs)
+        rms = librosa.feature.rms(y=audio, frame_length=N_FFT, hop_length=HOP_LENGTH)
 
-        # 3. MFCC FEATURES
-        mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
-        for i in range(13):
-            features.update(self.extract_statistical_features(mfccs[i], f'mfcc_{i}'))
+        # Every per-frame series has one value per STFT frame, so the
+        # statistics for all 18 of them are computed in one block
+        frame_stats = self.extract_statistical_block(
+            np.vstack([spec_cent, spec_roll, spec_bw, mfccs, zcr, rms]), FRAME_SERIES
+        )
+        for block in frame_stats[:16]:  # spectral + MFCC
+            features.update(block)
 
-        # 4. CHROMA FEATURES
-        chroma = librosa.feature.chroma_stft(y=audio, sr=sr)
+        # 6. CHROMA FEATURES (the models expect these keys before ZCR and RMS)
+        tuning = librosa.estimate_tuning(S=power, sr=sr, n_fft=N_FFT, bins_per_octave=12)
+        chroma = librosa.util.normalize(chroma_filterbank(sr, N_FFT, float(tuning)) @ power, norm=np.inf, axis=-2)
         features['chroma_mean'] = np.mean(chroma)
         features['chroma_std'] = np.std(chroma)
         features['chroma_max'] = np.max(chroma)
 
-        # 5. ZERO CROSSING RATE
-        zcr = librosa.feature.zero_crossing_rate(audio)[0]
-        features.update(self.extract_statistical_features(zcr, 'zcr'))
-
-        # 6. RMS ENERGY
-        rms = librosa.feature.rms(y=audio)[0]
-        features.update(self.extract_statistical_features(rms, 'rms'))
+        for block in frame_stats[16:]:  # ZCR + RMS
+            features.update(block)
 
         # 7. TEMPO
+        features['tempo'] = self.estimate_tempo(log_mel, sr)
+
+        return features
+
+    def estimate_tempo(self, log_mel, sr):
+        """Tempo feature from the shared log-mel spectrogram, per self.tempo_mode"""
+        import librosa
+
+        if self.tempo_mode == 'constant':
+            return np.nan
+
         try:
-            tempo, _ = librosa.beat.beat_track(y=audio, sr=sr)
-            if isinstance(tempo, np.ndarray):
-                features['tempo'] = float(tempo[0]) if len(tempo) > 0 else 0.0
+            # beat_track's onset envelope is built from this same log-mel
+            onset_env = librosa.onset.onset_strength(S=log_mel, sr=sr, hop_length=HOP_LENGTH, aggregate=np.median)
+            if self.tempo_mode == 'autocorr':
+                if not onset_env.any():
+                    return 0.0  # beat_track reports 0 here too
+                tempo = librosa.feature.tempo(tg=onset_tempogram(onset_env, sr), sr=sr, hop_length=HOP_LENGTH)
             else:
-                features['tempo'] = float(tempo) if tempo else 0.0
+                tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
+
+            if isinstance(tempo, np.ndarray):
+                return float(tempo[0]) if len(tempo) > 0 else 0.0
+            return float(tempo) if tempo else 0.0
         except:
-            features['tempo'] = 0.0
+            return 0.0
+
+
+# ============================================================================
+# AUDIO SCORING
+# ============================================================================
+
+def feature_matrix(rows, feature_names):
+    """(n, features) float64 matrix from feature dicts, columns in `feature_names` order"""
+    matrix = np.empty((len(rows), len(feature_names)), dtype=np.float64)
+    for i, features in enumerate(rows):
+        if len(features) != len(feature_names):
+            raise ValueError(f"Expected {len(feature_names)} audio features, got {len(features)}")
+        try:
+            matrix[i] = [features[name] for name in feature_names]
+        except KeyError as e:
+            raise ValueError(f"Missing audio feature {e}")
+    return matrix
+
+
+class AudioScorer:
+    """
+    Scaler + XGBoost threat model applied to feature rows with plain NumPy.
+
+    The feature order, means and scales are read from the fitted
+    StandardScaler once; each batch is one contiguous float32 matrix and
+    one booster call (`inplace_predict`), which gives P(threat) for every
+    row. The label is derived from that probability the way
+    XGBClassifier.predict does (p > 0.5), so the booster is traversed once
+    instead of twice and no DataFrame is built.
+
+    Scaling is done in float64 and cast to float32 afterwards, which is
+    what sklearn + XGBoost did before, so scores are unchanged.
+    """
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+        self.feature_names = tuple(scaler.feature_names_in_)
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+
+        size = len(self.feature_names)
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        self.mean = np.zeros(size) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = np.ones(size) if scale is None else np.asarray(scale, dtype=np.float64)
+
+        # Only binary:logistic boosters return P(threat) from inplace_predict;
+        # anything else goes through the estimator's own predict_proba
+        self.booster = None
+        if hasattr(model, 'get_booster') and getattr(model, 'objective', None) == 'binary:logistic':
+            self.booster = model.get_booster()
+            best = getattr(model, 'best_iteration', None)
+            self.iteration_range = (0, best + 1) if best is not None else (0, 0)
+            self.missing = getattr(model, 'missing', np.nan)
+
+    def matrix(self, rows):
+        """(n, features) float64 matrix from feature dicts, in scaler order"""
+        return feature_matrix(rows, self.feature_names)
+
+    def scale_rows(self, matrix):
+        scaled = (np.asarray(matrix, dtype=np.float64).reshape(-1, len(self.feature_names)) - self.mean) / self.scale
+        # tempo is NaN in 'constant' mode: impute the training mean, i.e.
+        # scale it to 0. Other NaNs (skew/kurtosis of a silent clip) are
+        # left to the booster's missing-value handling, as before
+        tempo = self.index.get('tempo')
+        if tempo is not None:
+            column = scaled[:, tempo]
+            column[np.isnan(column)] = 0.0
+        return np.ascontiguousarray(scaled, dtype=np.float32)
+
+    def threat_probabilities(self, matrix):
+        scaled = self.scale_rows(matrix)
+        if self.booster is not None:
+            return self.booster.inplace_predict(scaled, iteration_range=self.iteration_range, missing=self.missing)
+        if hasattr(self.model, 'predict_proba'):
+            return self.model.predict_proba(scaled)[:, 1]
+        # Label-only models: probability is the label itself
+        return np.asarray(self.model.predict(scaled), dtype=np.float32)
+
+    def score(self, matrix):
+        """Result dicts for an (n, features) matrix of raw features in scaler order"""
+        results = []
+        for p in np.asarray(self.threat_probabilities(matrix), dtype=np.float32).reshape(-1):
+            is_threat = bool(p > 0.5)
+            results.append({
+                'is_threat': is_threat,
+                'confidence': float(p if is_threat else np.float32(1) - p),
+                'threat_probability': float(p),
+                'status': 'THREAT' if is_threat else 'SAFE'
+            })
+        return results
 
-        return features
 
 class MLPredictor:
     _instance = None
@@ -98,82 +576,155 @@ class MLPredictor:
     _audio_model = None
     _audio_scaler = None
     _audio_encoder = None
+    _audio_scorer = None
     
     THREAT_LABELS = ['bear hug', 'dragging', 'gutt kick', 'hair pull', 
                      'knee pressure', 'neck grab', 'punch', 'push', 
                      'slap', 'wrist grab']
 
+    _instance_lock = threading.Lock()
+
     @classmethod
     def get_instance(cls):
+        # Double-checked so concurrent first requests load the models only once
         if cls._instance is None:
-            cls._instance = cls()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, base_path=None, groups=MODEL_GROUPS):
+        # Other model versions are separate predictors over their own
+        # directory, holding only the groups they serve (see model_registry)
+        self.base_path = base_path or os.path.join(settings.BASE_DIR, 'ml_models')
+        self.groups = tuple(groups)
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
+        self.model_states = {name: ModelState(name) for name in self.groups}
         self.load_models()
 
     def load_models(self):
-        try:
-            base_path = os.path.join(settings.BASE_DIR, 'ml_models')
-            
-            model_path = os.path.join(base_path, 'bilstm_action_model.h5')
-            scaler_path = os.path.join(base_path, 'scaler.pkl')
-            encoder_path = os.path.join(base_path, 'label_encoder.pkl')
+        """
+        Load every model group, recording its state. A group that fails is
+        retried in the background with backoff (see model_state).
+        """
+        # Thread limits go in before TensorFlow / XGBoost start their pools
+        apply_thread_budget()
+        for name in self.groups:
+            self._load_group(name)
 
-            if os.path.exists(model_path):
-                self._model = tf.keras.models.load_model(model_path)
-                print(f"Model loaded from {model_path}")
-            
-            if os.path.exists(scaler_path):
-                with open(scaler_path, 'rb') as f:
-                    self._scaler = pickle.load(f)
-                print(f"Scaler loaded from {scaler_path}")
-
-            if os.path.exists(encoder_path):
-                with open(encoder_path, 'rb') as f:
-                    self._label_encoder = pickle.load(f)
-                print(f"Label encoder loaded from {encoder_path}")
-
-            # Audio Model Loading
-            audio_model_path = os.path.join(base_path, 'xgboost_threat_model.pkl')
-            audio_scaler_path = os.path.join(base_path, 'feature_scaler.pkl')
-
-            if os.path.exists(audio_model_path):
-                with open(audio_model_path, 'rb') as f:
-                    self._audio_model = pickle.load(f)
-                print(f"Audio model loaded from {audio_model_path}")
-            else:
-                print("Audio model not found (skipping)")
+    def _load_group(self, name):
+        loader = self._load_movement_models if name == 'movement' else self._load_audio_models
+        return self.model_states[name].load(loader, on_retry=lambda: self._retry_group(name))
 
-            if os.path.exists(audio_scaler_path):
-                with open(audio_scaler_path, 'rb') as f:
-                    self._audio_scaler = pickle.load(f)
-                print(f"Audio scaler loaded from {audio_scaler_path}")
-            else:
-                print("Audio scaler not found (skipping)")
-                
-        except Exception as e:
-            print(f"Error loading ML models: {e}")
+    def _retry_group(self, name):
+        if self._load_group(name):
+            try:
+                self.warm_up()
+            except Exception as e:
+                print(f"ML warm-up failed: {e}")
 
-    def predict(self, data):
+    def _load_movement_models(self):
+        base_path = self.base_path
+        scaler_path = os.path.join(base_path, 'scaler.pkl')
+        encoder_path = os.path.join(base_path, 'label_encoder.pkl')
+
+        backend = getattr(settings, 'ML_MOVEMENT_BACKEND', 'keras')
+        self._model = load_movement_backend(backend, base_path, thread_limits()['tf_intra_op'])
+        if self._model:
+            print(f"Model loaded from {base_path} ({backend} backend)")
+
+        if os.path.exists(scaler_path):
+            with open(scaler_path, 'rb') as f:
+                self._scaler = pickle.load(f)
+            print(f"Scaler loaded from {scaler_path}")
+
+        if os.path.exists(encoder_path):
+            with open(encoder_path, 'rb') as f:
+                self._label_encoder = pickle.load(f)
+            print(f"Label encoder loaded from {encoder_path}")
+
+        missing = [label for label, loaded in (
+            (f'{backend} movement model', self._model), ('scaler.pkl', self._scaler),
+            ('label_encoder.pkl', self._label_encoder),
+        ) if not loaded]
+        if missing:
+            raise FileNotFoundError(f"Not found in {base_path}: {', '.join(missing)}")
+
+    def _load_audio_models(self):
+        base_path = self.base_path
+        audio_model_path = os.path.join(base_path, 'xgboost_threat_model.pkl')
+        audio_scaler_path = os.path.join(base_path, 'feature_scaler.pkl')
+        # XGBoost's own format (manage.py export_audio_model) loads faster than
+        # the pickle and across XGBoost versions
+        native_path = os.path.join(base_path, AUDIO_MODEL_NATIVE_FILE)
+
+        if os.path.exists(native_path):
+            from xgboost import XGBClassifier
+
+            model = XGBClassifier()
+            model.load_model(native_path)
+            self._audio_model = limit_xgboost_threads(model)
+            audio_model_path = native_path
+            print(f"Audio model loaded from {native_path}")
+        elif os.path.exists(audio_model_path):
+            with open(audio_model_path, 'rb') as f:
+                self._audio_model = limit_xgboost_threads(pickle.load(f))
+            print(f"Audio model loaded from {audio_model_path}")
+        else:
+            print("Audio model not found (skipping)")
+
+        if os.path.exists(audio_scaler_path):
+            with open(audio_scaler_path, 'rb') as f:
+                self._audio_scaler = pickle.load(f)
+            print(f"Audio scaler loaded from {audio_scaler_path}")
+        else:
+            print("Audio scaler not found (skipping)")
+
+        missing = [os.path.basename(path) for path, loaded in (
+            (audio_model_path, self._audio_model), (audio_scaler_path, self._audio_scaler),
+        ) if not loaded]
+        if missing:
+            raise FileNotFoundError(f"Not found in {base_path}: {', '.join(missing)}")
+
+    def model_status(self):
+        """State, load time and memory of each model group"""
+        return {name: state.snapshot() for name, state in self.model_states.items()}
+
+    def close(self):
+        """Stop pending load retries and the batcher thread of a predictor being dropped"""
+        for state in self.model_states.values():
+            state.cancel_retry()
+        if self._batcher is not None:
+            self._batcher.close()
+
+    def _ensure_movement_models(self):
+        # Never loads in the request path: failed loads are retried in the background
         if not (self._model and self._scaler and self._label_encoder):
-            # Try loading again if not loaded
-            self.load_models()
-            if not (self._model and self._scaler and self._label_encoder):
-                raise Exception("ML models not loaded. Please ensure files are in 'ml_models' directory.")
+            raise ModelUnavailable(self.model_states['movement'])
 
+    def _scale_window(self, data):
         # Data shape expected: [50, 12]
         # Normalize
         data_flat = np.array(data).reshape(-1, 12)
-        data_scaled = self._scaler.transform(data_flat).reshape(1, 50, 12)
-        
-        # Predict
-        prediction = self._model.predict(data_scaled, verbose=0)
-        predicted_class = int(np.argmax(prediction))
-        confidence = float(np.max(prediction))
+        return self._scale_frames(data_flat).reshape(50, 12)
+
+    def _scale_frames(self, frames):
+        # Quantized backends have the scaler folded into the model
+        if getattr(self._model, 'takes_raw_windows', False):
+            return np.asarray(frames, dtype=np.float32)
+        return self._scaler.transform(frames)
+
+    def _movement_probabilities(self, batch):
+        """Run one forward pass over a (batch, 50, 12) array of scaled windows"""
+        return self._model.predict(batch)
+
+    def _movement_result(self, probabilities):
+        predicted_class = int(np.argmax(probabilities))
+        confidence = float(np.max(probabilities))
         action = self._label_encoder.inverse_transform([predicted_class])[0]
         is_threat = action in self.THREAT_LABELS
-        
+
         return {
             'action': action,
             'confidence': confidence,
@@ -181,52 +732,138 @@ class MLPredictor:
             'status': 'THREAT' if is_threat else 'SAFE'
         }
 
-    def predict_audio(self, audio_file_path):
+    def _get_batcher(self):
+        if self._batcher is None:
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = InferenceBatcher(
+                        self._movement_probabilities,
+                        max_batch_size=getattr(settings, 'ML_BATCH_MAX_SIZE', 32),
+                        max_wait_ms=getattr(settings, 'ML_BATCH_MAX_WAIT_MS', 10),
+                        name='movement-batcher',
+                    )
+        return self._batcher
+
+    def predict(self, data):
+        gated = gate_movement(data)
+        if gated is not None:
+            return gated
+
+        self._ensure_movement_models()
+        data_scaled = self._scale_window(data)
+
+        # Predict
+        if getattr(settings, 'ML_BATCHING_ENABLED', False):
+            probabilities = self._get_batcher().predict(data_scaled)
+        else:
+            probabilities = self._movement_probabilities(data_scaled[np.newaxis])[0]
+
+        return self._movement_result(probabilities)
+
+    def predict_batch(self, windows):
+        """
+        Predict several [50, 12] windows with a single forward pass.
+        Returns one result dict per window, in order.
+        """
+        if len(windows) == 0:
+            return []
+        return score_ungated(np.asarray(windows, dtype=np.float32).reshape(len(windows), -1, 12), self._score_batch)
+
+    def _score_batch(self, windows):
+        self._ensure_movement_models()
+        batch = np.stack([self._scale_window(window) for window in windows])
+        probabilities = self._movement_probabilities(batch)
+        return [self._movement_result(row) for row in probabilities]
+
+    def predict_windows(self, data, stride):
+        """
+        Score every 50-frame window of a recording of any length >= 50,
+        taken every `stride` frames. The frames are scaled once and all
+        windows go through the model in batched passes.
+        """
+        self._ensure_movement_models()
+        frames = np.asarray(data, dtype=np.float32).reshape(-1, 12)
+        starts = window_starts(len(frames), stride)
+
+        # The scaler is per-feature, so scaling the whole recording once gives
+        # the same values as scaling every overlapping window separately
+        scaled = self._scale_frames(frames).astype(np.float32)
+        results = score_ungated(sliding_windows(frames, stride), self._score_scaled, sliding_windows(scaled, stride))
+        return build_windows_response(results, starts, stride)
+
+    def _score_scaled(self, windows):
+        probabilities = np.concatenate([
+            self._movement_probabilities(windows[i:i + MAX_WINDOWS_PER_PASS])
+            for i in range(0, len(windows), MAX_WINDOWS_PER_PASS)
+        ])
+        return [self._movement_result(row) for row in probabilities]
+
+    def _audio_models_loaded(self):
+        return bool(self._audio_model and self._audio_scaler)
+
+    def audio_feature_names(self):
+        """Feature names in the order the audio scaler was fitted with"""
+        return list(self._audio_scaler.feature_names_in_)
+
+    def _get_audio_scorer(self):
+        # Rebuilt whenever the audio model or scaler object is replaced
+        scorer = self._audio_scorer
+        if scorer is None or scorer.model is not self._audio_model or scorer.scaler is not self._audio_scaler:
+            scorer = self._audio_scorer = AudioScorer(self._audio_model, self._audio_scaler)
+        return scorer
+
+    def score_audio_features(self, features):
+        """Scale an extracted feature dict and run the XGBoost threat model on it"""
+        return self.score_audio_batch([features])[0]
+
+    def score_audio_batch(self, rows):
+        """
+        Score several clips in one booster call. `rows` is a list of feature
+        dicts, or an (n, features) array already in audio_feature_names() order.
+        """
+        scorer = self._get_audio_scorer()
+        if len(rows) == 0:
+            return []
+        matrix = rows if isinstance(rows, np.ndarray) else scorer.matrix(rows)
+        return scorer.score(matrix)
+
+    def predict_audio(self, audio_file_path, segmented=None):
         """
         Predict if audio is a threat using XGBoost model.
         Uses FastAudioFeatureExtractor and separate scaler.
+        With `segmented` (default: ML_AUDIO_SEGMENTED) the whole clip is
+        scored in 5-second segments instead of only its first 5 seconds.
+        """
+        return self._predict_audio(lambda extractor: extractor.extract_all_features(audio_file_path), segmented)
+
+    def predict_audio_signal(self, audio, sr, segmented=None):
+        """predict_audio for a clip that is already decoded (see audio_io)"""
+        gated = gate_audio(audio)
+        if gated is not None:
+            return gated
+        return self._predict_audio(lambda extractor: extractor.extract_clip_features(audio, sr), segmented)
+
+    def predict_audio_features(self, features):
         """
-        if not (self._audio_model and self._audio_scaler):
-            self.load_models()
-            if not (self._audio_model and self._audio_scaler):
-                return {'error': 'Audio model or scaler not loaded', 'is_threat': False, 'confidence': 0.0}
+        predict_audio for features already extracted (e.g. from the feature
+        cache): a feature dict or a list of segments
+        """
+        return self._predict_audio(lambda extractor: features)
+
+    def _predict_audio(self, extract, segmented=None):
+        if not self._audio_models_loaded():
+            return {'error': str(ModelUnavailable(self.model_states['audio'])), 'is_threat': False,
+                    'confidence': 0.0, 'status': 'UNAVAILABLE'}
 
         try:
             # 1. Extract Features
-            extractor = FastAudioFeatureExtractor()
-            features = extractor.extract_all_features(audio_file_path)
+            features = extract(FastAudioFeatureExtractor(segmented=segmented))
             
             if features is None:
                 raise Exception("Could not extract features from audio file")
 
-            # 2. Prepare for Model
-            # Remove label/filename if present (though extract_all_features doesn't add them)
-            features_df = pd.DataFrame([features])
-            
-            # 3. Scale Features
-            features_scaled = self._audio_scaler.transform(features_df)
-            
-            # 4. Predict
-            prediction = self._audio_model.predict(features_scaled)[0]
-            
-            # Try to get probabilities
-            try:
-                probs = self._audio_model.predict_proba(features_scaled)[0]
-                # Assuming class 1 is Threat
-                threat_prob = float(probs[1])
-                confidence = threat_prob if prediction == 1 else float(probs[0])
-            except:
-                confidence = 1.0
-                threat_prob = 1.0 if prediction == 1 else 0.0
-            
-            is_threat = int(prediction) == 1
-            
-            return {
-                'is_threat': is_threat,
-                'confidence': confidence,
-                'threat_probability': threat_prob,
-                'status': 'THREAT' if is_threat else 'SAFE'
-            }
+            # 2. Scale + Predict
+            return score_audio_clip(self, features)
             
         except Exception as e:
             print(f"Audio prediction error: {e}")
@@ -236,3 +873,76 @@ class MLPredictor:
                 'confidence': 0.0,
                 'status': 'ERROR'
             }
+
+    def warm_up(self):
+        """
+        Run one dummy inference through each loaded model so graph tracing,
+        numba compilation and lazy imports happen before the first real request.
+        """
+        if self._model is not None:
+            start = time.perf_counter()
+            self._movement_probabilities(np.zeros((1, 50, 12), dtype=np.float32))
+            print(f"Movement model warmed up in {time.perf_counter() - start:.2f}s")
+
+        if self._audio_model is not None and self._audio_scaler is not None:
+            start = time.perf_counter()
+            extractor = FastAudioFeatureExtractor()
+            rng = np.random.default_rng(0)
+            noise = rng.uniform(-0.1, 0.1, extractor.sample_rate).astype(np.float32)
+            self.score_audio_features(extractor.extract_features(noise, extractor.sample_rate))
+            print(f"Audio model warmed up in {time.perf_counter() - start:.2f}s")
+
+
+def get_predictor(request=None):
+    """
+    The predictor views should use: the in-process MLPredictor singleton, or
+    a client for the out-of-process inference service when
+    ML_INFERENCE_MODE = 'service'. Given the request, another model version
+    may serve it (header, cohort or shadow; see model_registry), which
+    raises ModelVersionError (a ValueError) for an unknown version.
+    """
+    if getattr(settings, 'ML_INFERENCE_MODE', 'in_process') == 'service':
+        from .inference_service import get_remote_predictor
+        return get_remote_predictor()
+    if request is not None:
+        from .model_registry import get_model_registry
+        return get_model_registry().predictor_for(request)
+    return MLPredictor.get_instance()
+
+
+def get_model_status():
+    """
+    Model states for the readiness endpoint, without blocking on a load:
+    a worker that has not created its predictor yet starts loading on a
+    background thread and reports 'loading'.
+    """
+    if getattr(settings, 'ML_INFERENCE_MODE', 'in_process') == 'service':
+        from .inference_service import get_remote_predictor
+        return get_remote_predictor().model_status()
+
+    instance = MLPredictor._instance
+    if instance is None:
+        start_background_warm_up()
+        return {name: {'state': LOADING} for name in MODEL_GROUPS}
+    return instance.model_status()
+
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+
+def start_background_warm_up():
+    """Load the models and warm them up on a daemon thread (once per process)"""
+    global _warm_up_thread
+
+    def run():
+        try:
+            MLPredictor.get_instance().warm_up()
+        except Exception as e:
+            print(f"ML warm-up failed: {e}")
+
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=run, name='ml-warm-up', daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
@@ -0,0 +1,397 @@
+"""
+Several versions of the movement and audio models in one process.
+
+The default version is ml_models/ itself, served by the MLPredictor
+singleton as before. Other versions are directories with the same file
+names under ML_MODEL_VERSIONS_DIR (default ml_models/versions/):
+
+    ml_models/versions/v2/bilstm_action_model.h5, scaler.pkl, label_encoder.pkl
+    ml_models/versions/audio-2025-06/xgboost_threat_model.ubj, feature_scaler.pkl
+
+A version may hold only one group. Each (group, version) is its own
+MLPredictor, loaded on first use. Each request picks a version per group:
+
+    header   X-Model-Version: v2                  both groups, where v2 has them
+             X-Model-Version: movement=v2,audio=v3
+    cohort   ML_MODEL_COHORTS = {"movement": {"v2": 10}} sends a stable 10%
+             of authenticated users to movement v2
+    default  everything else
+
+Loaded versions other than the default are kept within
+ML_MODEL_MEMORY_BUDGET_MB, evicting the least recently used. A version is
+sized by the memory its load added to the process, or by its files on
+disk before it has loaded.
+
+ML_MODEL_SHADOW = {"movement": "v2"} also scores a sample
+(ML_MODEL_SHADOW_RATE) of the requests on v2 in the background, and
+records how often it agrees with the version that answered. A shadow
+version only loads when it fits in the budget as it is, so it never
+evicts a serving version; workers without room skip it.
+/api/emergency/admin/model-registry/ reports versions, memory and
+shadow agreement.
+
+The versions directory is scanned once and the result reused for
+ML_MODEL_VERSIONS_TTL seconds, so requests do not list it on every call.
+A version dropped into the directory is picked up after that TTL, or at
+once with a POST to the admin view.
+"""
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .ml_predictor import MODEL_GROUPS, AUDIO_MODEL_NATIVE_FILE, MLPredictor
+from .movement_backends import MODEL_FILES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERSION = 'default'
+
+VERSION_HEADER = 'HTTP_X_MODEL_VERSION'
+
+# A version directory serves a group when it has these files (any one of a tuple)
+GROUP_FILES = {
+    'movement': ('scaler.pkl', 'label_encoder.pkl', tuple(MODEL_FILES.values())),
+    'audio': ('feature_scaler.pkl', (AUDIO_MODEL_NATIVE_FILE, 'xgboost_threat_model.pkl')),
+}
+
+# Which predictor method serves each call, and how shadow results are compared
+MOVEMENT_METHODS = ('predict', 'predict_batch', 'predict_windows')
+AUDIO_METHODS = (
+    'predict_audio', 'predict_audio_signal', 'predict_audio_features',
+    'score_audio_features', 'score_audio_batch', 'audio_feature_names',
+)
+AGREEMENT_KEYS = {'movement': 'action', 'audio': 'is_threat'}
+
+# Shadow calls waiting for the shadow thread beyond this are dropped
+MAX_PENDING_SHADOW = 8
+
+
+class ModelVersionError(ValueError):
+    pass
+
+
+def versions_dir():
+    return getattr(settings, 'ML_MODEL_VERSIONS_DIR', '') or os.path.join(settings.BASE_DIR, 'ml_models', 'versions')
+
+
+def version_path(version):
+    if version == DEFAULT_VERSION:
+        return os.path.join(settings.BASE_DIR, 'ml_models')
+    return os.path.join(versions_dir(), version)
+
+
+def group_files(path, group):
+    """The files of `group` in a version directory, or None when it does not serve the group"""
+    found = []
+    for names in GROUP_FILES[group]:
+        names = names if isinstance(names, tuple) else (names,)
+        present = [os.path.join(path, n) for n in names if os.path.exists(os.path.join(path, n))]
+        if not present:
+            return None
+        found.extend(present)
+    return found
+
+
+def scan_versions():
+    """{group: versions that serve it, the default first} from the versions directory"""
+    found = {group: [DEFAULT_VERSION] for group in MODEL_GROUPS}
+    if os.path.isdir(versions_dir()):
+        for name in sorted(os.listdir(versions_dir())):
+            for group in MODEL_GROUPS:
+                if group_files(version_path(name), group):
+                    found[group].append(name)
+    return found
+
+
+def disk_size_mb(paths):
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        else:
+            total += os.path.getsize(path)
+    return total / (1024 * 1024)
+
+
+def parse_version_header(value):
+    """'v2' -> {'*': 'v2'}; 'movement=v2,audio=v3' -> {'movement': 'v2', 'audio': 'v3'}"""
+    selected = {}
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        group, _, version = part.rpartition('=')
+        group = group.strip() or '*'
+        if group != '*' and group not in MODEL_GROUPS:
+            raise ModelVersionError(f"Unknown model group '{group}' in X-Model-Version")
+        selected[group] = version.strip()
+    return selected
+
+
+def cohort_version(group, user_id):
+    """The version ML_MODEL_COHORTS assigns this user for `group`, if any"""
+    cohorts = getattr(settings, 'ML_MODEL_COHORTS', {}).get(group, {})
+    if not cohorts or user_id is None:
+        return None
+    bucket = int(hashlib.sha256(f'{group}:{user_id}'.encode()).hexdigest(), 16) % 100
+    for version, percent in sorted(cohorts.items()):
+        if bucket < percent:
+            return version
+        bucket -= percent
+    return None
+
+
+class RoutedPredictor:
+    """
+    The predictor for one request: movement calls go to the movement
+    version, audio calls to the audio version, and a sample of them is
+    repeated on the shadow versions.
+    """
+
+    def __init__(self, registry, versions):
+        self.registry = registry
+        self.versions = versions
+
+    def __getattr__(self, name):
+        if name in MOVEMENT_METHODS:
+            group = 'movement'
+        elif name in AUDIO_METHODS:
+            group = 'audio'
+        else:
+            raise AttributeError(name)
+        method = getattr(self.registry.get(group, self.versions[group]), name)
+
+        def call(*args, **kwargs):
+            result = method(*args, **kwargs)
+            self.registry.shadow(group, self.versions[group], name, args, kwargs, result)
+            return result
+        return call
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaded = OrderedDict()  # (group, version) -> MLPredictor, least recently used first
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._shadow_executor = None
+        self._shadow_pending = 0
+        self._shadow_stats = {}
+        self._versions = None  # (versions dir, scanned at, {group: [versions]})
+
+    # ------------------------------------------------------------ versions
+
+    def versions(self, group):
+        """Versions that serve `group`, the default first"""
+        return self._available()[group]
+
+    def refresh_versions(self):
+        """Rescan the versions directory now instead of when the TTL runs out"""
+        scanned = scan_versions()
+        with self._lock:
+            self._versions = (versions_dir(), time.monotonic(), scanned)
+        return scanned
+
+    def _available(self):
+        cached = self._versions
+        ttl = getattr(settings, 'ML_MODEL_VERSIONS_TTL', 60.0)
+        if cached is None or cached[0] != versions_dir() or time.monotonic() - cached[1] >= ttl:
+            return self.refresh_versions()
+        return cached[2]
+
+    def select(self, request=None):
+        """
+        {group: version} for a request, from the X-Model-Version header,
+        then the user's cohort, then the default
+        """
+        header = parse_version_header(request.META.get(VERSION_HEADER)) if request is not None else {}
+        user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+
+        available = self._available()
+        if '*' in header and not any(header['*'] in versions for versions in available.values()):
+            raise ModelVersionError(f"No model version '{header['*']}'")
+
+        selected = {}
+        for group in MODEL_GROUPS:
+            version = header.get(group)
+            if version is None and header.get('*') in available[group]:
+                version = header['*']
+            if version is None:
+                version = cohort_version(group, user_id) or DEFAULT_VERSION
+                # A cohort pointing at a version this worker lacks falls back
+                if version not in available[group]:
+                    version = DEFAULT_VERSION
+            if version not in available[group]:
+                raise ModelVersionError(f"No {group} model version '{version}'")
+            selected[group] = version
+        return selected
+
+    def predictor_for(self, request=None):
+        """The MLPredictor singleton, or a RoutedPredictor when any group uses another version"""
+        versions = self.select(request)
+        if all(v == DEFAULT_VERSION for v in versions.values()) and not self._shadow_config():
+            return MLPredictor.get_instance()
+        return RoutedPredictor(self, versions)
+
+    # ------------------------------------------------------------- loading
+
+    def get(self, group, version, evict=True):
+        """
+        The loaded predictor for (group, version). With evict=False a version
+        that does not fit in the remaining budget is not loaded (returns None).
+        """
+        if version == DEFAULT_VERSION:
+            return MLPredictor.get_instance()
+
+        key = (group, version)
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                return self._loaded[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if key in self._loaded:
+                    return self._loaded[key]
+                path = version_path(version)
+                files = group_files(path, group)
+                if files is None:
+                    raise ModelVersionError(f"No {group} model version '{version}'")
+                if not self._make_room(disk_size_mb(files), evict):
+                    return None
+
+            predictor = MLPredictor(base_path=path, groups=(group,))
+            with self._lock:
+                self._loaded[key] = predictor
+                self._make_room(0, evict=True)
+            return predictor
+
+    def _memory_mb(self, key):
+        predictor = self._loaded[key]
+        measured = predictor.model_states[key[0]].memory_mb
+        if measured and measured > 0:
+            return measured
+        return disk_size_mb(group_files(predictor.base_path, key[0]) or [])
+
+    def _make_room(self, needed_mb, evict):
+        """Evict least recently used versions until needed_mb more fits the budget"""
+        budget = getattr(settings, 'ML_MODEL_MEMORY_BUDGET_MB', 0)
+        if not budget:
+            return True
+        used = sum(self._memory_mb(key) for key in self._loaded)
+        if not evict:
+            return used + needed_mb <= budget
+        while self._loaded and used + needed_mb > budget:
+            key = next(iter(self._loaded))
+            used -= self._memory_mb(key)
+            self._loaded.pop(key).close()
+            logger.info(f"Evicted {key[0]} model version '{key[1]}' to stay within {budget} MB")
+        if used + needed_mb > budget:
+            logger.warning(f"Model versions need {used + needed_mb:.0f} MB, over the {budget} MB budget")
+        return True
+
+    # -------------------------------------------------------------- shadow
+
+    def _shadow_config(self):
+        return getattr(settings, 'ML_MODEL_SHADOW', {})
+
+    def shadow(self, group, version, method, args, kwargs, result):
+        """Repeat a call on the group's shadow version in the background"""
+        shadow_version = self._shadow_config().get(group)
+        if not shadow_version or shadow_version == version or not isinstance(result, (dict, list)):
+            return
+        if random.random() >= getattr(settings, 'ML_MODEL_SHADOW_RATE', 1.0):
+            return
+
+        with self._lock:
+            stats = self._stats(group, shadow_version, version)
+            if self._shadow_pending >= MAX_PENDING_SHADOW:
+                stats['dropped'] += 1
+                return
+            self._shadow_pending += 1
+            if self._shadow_executor is None:
+                self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-shadow')
+
+        self._shadow_executor.submit(self._run_shadow, group, shadow_version, version, method, args, kwargs, result)
+
+    def _run_shadow(self, group, shadow_version, version, method, args, kwargs, result):
+        try:
+            predictor = self.get(group, shadow_version, evict=False)
+            if predictor is None:
+                with self._lock:
+                    self._stats(group, shadow_version, version)['skipped_memory'] += 1
+                return
+            shadow_result = getattr(predictor, method)(*args, **kwargs)
+            self._compare(group, shadow_version, version, result, shadow_result)
+        except Exception as e:
+            logger.warning(f"Shadow {group} model '{shadow_version}' failed: {e}")
+            with self._lock:
+                self._stats(group, shadow_version, version)['errors'] += 1
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+
+    def _compare(self, group, shadow_version, version, result, shadow_result):
+        # predict_windows answers with an aggregate, batches with a list
+        pairs = zip(result, shadow_result) if isinstance(result, list) else [(result, shadow_result)]
+        key = AGREEMENT_KEYS[group]
+        with self._lock:
+            stats = self._stats(group, shadow_version, version)
+            for served, shadowed in pairs:
+                served, shadowed = served.get('aggregate', served), shadowed.get('aggregate', shadowed)
+                if key not in served or key not in shadowed:
+                    continue
+                stats['compared'] += 1
+                stats['agreed'] += served[key] == shadowed[key]
+                stats['confidence_delta'] += abs(served.get('confidence', 0.0) - shadowed.get('confidence', 0.0))
+
+    def _stats(self, group, shadow_version, version):
+        return self._shadow_stats.setdefault((group, shadow_version, version), {
+            'compared': 0, 'agreed': 0, 'confidence_delta': 0.0, 'dropped': 0, 'skipped_memory': 0, 'errors': 0,
+        })
+
+    # -------------------------------------------------------------- report
+
+    def report(self):
+        with self._lock:
+            loaded = [
+                {'group': group, 'version': version, 'memory_mb': round(self._memory_mb((group, version)), 1),
+                 'state': predictor.model_states[group].state}
+                for (group, version), predictor in self._loaded.items()
+            ]
+            shadow = []
+            for (group, shadow_version, version), stats in self._shadow_stats.items():
+                compared = stats['compared']
+                shadow.append(dict(
+                    stats, group=group, shadow_version=shadow_version, serving_version=version,
+                    agreement=round(stats['agreed'] / compared, 4) if compared else None,
+                    confidence_delta=round(stats['confidence_delta'] / compared, 4) if compared else None,
+                ))
+        return {
+            'versions': self._available(),
+            'loaded': loaded,
+            'memory_budget_mb': getattr(settings, 'ML_MODEL_MEMORY_BUDGET_MB', 0),
+            'shadow': shadow,
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,130 @@
+"""
+Load state of each model group in a predictor process.
+
+    loading  the first load (or a retry) is running
+    ready    every file of the group loaded
+    failed   a file is missing or did not load; a retry is scheduled on a
+             background thread after ML_MODEL_RETRY_BASE seconds, doubling
+             up to ML_MODEL_RETRY_MAX
+
+Requests never load models themselves: while a group is not ready they
+fail fast with ModelUnavailable (a 503 from the views), instead of
+re-running load_model and the pickle loads on every request.
+/api/emergency/ready/ reports these states for load balancers.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class ModelUnavailable(Exception):
+    def __init__(self, state):
+        self.state = state
+        retry = f", retrying in {state.retry_in():.0f}s" if state.state == FAILED else ''
+        super().__init__(f"{state.name} models {state.state}{retry}: {state.error or 'not loaded yet'}")
+
+
+def rss_mb():
+    """Resident set size of this process in MB (Linux /proc only)"""
+    try:
+        with open(f"/proc/{os.getpid()}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+class ModelState:
+    def __init__(self, name):
+        self.name = name
+        self.state = LOADING
+        self.error = None
+        self.attempts = 0
+        self.load_seconds = None
+        self.memory_mb = None
+        self.loaded_at = None
+        self.next_retry_at = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def load(self, loader, on_retry=None):
+        """
+        Run `loader` (which raises if the group cannot be used) and record
+        the outcome. On failure `on_retry` is called on a background thread
+        after the backoff delay.
+        """
+        with self._lock:
+            self.state = LOADING
+            self.attempts += 1
+            self.next_retry_at = None
+            memory = rss_mb()
+            start = time.perf_counter()
+            try:
+                loader()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                print(f"Loading {self.name} models failed (attempt {self.attempts}): {e}")
+                if on_retry is not None:
+                    self._schedule_retry(on_retry)
+                return False
+
+            self.state = READY
+            self.error = None
+            self.load_seconds = time.perf_counter() - start
+            after = rss_mb()
+            self.memory_mb = after - memory if memory is not None and after is not None else None
+            self.loaded_at = time.time()
+            return True
+
+    def retry_delay(self):
+        base = getattr(settings, 'ML_MODEL_RETRY_BASE', 5.0)
+        return min(base * 2 ** max(0, self.attempts - 1), getattr(settings, 'ML_MODEL_RETRY_MAX', 300.0))
+
+    def retry_in(self):
+        return max(0.0, self.next_retry_at - time.time()) if self.next_retry_at else 0.0
+
+    def _schedule_retry(self, retry):
+        delay = self.retry_delay()
+        self.next_retry_at = time.time() + delay
+        self._timer = threading.Timer(delay, retry)
+        self._timer.daemon = True
+        self._timer.name = f'{self.name}-model-retry'
+        self._timer.start()
+
+    def cancel_retry(self):
+        if self._timer is not None:
+            self._timer.cancel()
+
+    @classmethod
+    def from_snapshot(cls, name, snapshot):
+        """A copy of another process's state, e.g. an inference service worker's"""
+        state = cls(name)
+        for key in ('state', 'error', 'attempts', 'load_seconds', 'memory_mb', 'loaded_at'):
+            setattr(state, key, snapshot.get(key))
+        if snapshot.get('retry_in_seconds') is not None:
+            state.next_retry_at = time.time() + snapshot['retry_in_seconds']
+        return state
+
+    def snapshot(self):
+        return {
+            'state': self.state,
+            'error': self.error,
+            'attempts': self.attempts,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'memory_mb': round(self.memory_mb, 1) if self.memory_mb is not None else None,
+            'loaded_at': self.loaded_at,
+            'retry_in_seconds': round(self.retry_in(), 1) if self.state == FAILED else None,
+        }
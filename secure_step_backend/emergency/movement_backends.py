@@ -0,0 +1,269 @@
+"""
+Inference backends for the BiLSTM movement model.
+
+Every backend exposes `predict(batch)`, taking a float32 array of scaled
+windows shaped (batch, 50, 12) and returning class probabilities shaped
+(batch, num_classes). The backend is chosen with the ML_MOVEMENT_BACKEND
+setting; `manage.py convert_movement_model` produces the files the
+non-Keras backends need from bilstm_action_model.h5.
+
+The quantized TFLite backends (float16 weights, or int8 weights with
+dynamic-range kernels) have scaler.pkl folded into the graph: they take
+the raw sensor windows instead, so the files must be re-exported whenever
+the scaler changes. `manage.py movement_quantization_report` compares
+them against the float model.
+"""
+import os
+import threading
+from functools import partial
+
+import numpy as np
+
+WINDOW_SHAPE = (50, 12)
+
+MODEL_FILES = {
+    'keras': 'bilstm_action_model.h5',
+    'tf_function': 'bilstm_action_model_savedmodel',
+    'tflite': 'bilstm_action_model.tflite',
+    'onnx': 'bilstm_action_model.onnx',
+    'tflite_fp16': 'bilstm_action_model_fp16.tflite',
+    'tflite_int8': 'bilstm_action_model_int8.tflite',
+}
+
+# Quantized backends and the TFLite quantization they are exported with
+QUANTIZED_BACKENDS = {'tflite_fp16': 'float16', 'tflite_int8': 'int8'}
+
+BACKENDS = tuple(MODEL_FILES)
+
+
+class KerasBackend:
+    """The original path: generic `model.predict`"""
+    name = 'keras'
+    # True for backends with the scaler inside the model (fed raw windows)
+    takes_raw_windows = False
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch):
+        return self.model.predict(np.asarray(batch, dtype=np.float32), verbose=0)
+
+
+class TFFunctionBackend:
+    """A concrete `tf.function` with a fixed (None, 50, 12) input signature"""
+    name = 'tf_function'
+    takes_raw_windows = False
+
+    def __init__(self, concrete_fn):
+        self.concrete_fn = concrete_fn
+
+    @classmethod
+    def from_keras(cls, model):
+        import tensorflow as tf
+
+        fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec((None,) + WINDOW_SHAPE, tf.float32)],
+        )
+        return cls(fn.get_concrete_function())
+
+    @classmethod
+    def from_saved_model(cls, path):
+        import tensorflow as tf
+
+        loaded = tf.saved_model.load(path)
+        backend = cls(loaded.signatures['serving_default'])
+        backend._loaded = loaded  # keep the variables alive
+        return backend
+
+    def predict(self, batch):
+        import tensorflow as tf
+
+        outputs = self.concrete_fn(tf.constant(batch, dtype=tf.float32))
+        if isinstance(outputs, dict):
+            outputs = next(iter(outputs.values()))
+        return outputs.numpy()
+
+
+class TFLiteBackend:
+    """
+    TFLite interpreter. The converted graph uses fused LSTM kernels with a
+    fixed batch of one, so batches are run one window at a time. The
+    interpreter is not thread-safe, hence the lock.
+    """
+    name = 'tflite'
+    takes_raw_windows = False
+
+    def __init__(self, path, num_threads=None):
+        import tensorflow as tf
+
+        self.interpreter = tf.lite.Interpreter(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input_index = self.interpreter.get_input_details()[0]['index']
+        self._output_index = self.interpreter.get_output_details()[0]['index']
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        outputs = []
+        with self._lock:
+            for window in batch:
+                self.interpreter.set_tensor(self._input_index, window[np.newaxis])
+                self.interpreter.invoke()
+                outputs.append(self.interpreter.get_tensor(self._output_index)[0].copy())
+        return np.stack(outputs)
+
+
+class QuantizedTFLiteBackend(TFLiteBackend):
+    """A quantized TFLite export that scales the raw windows itself"""
+    takes_raw_windows = True
+
+    def __init__(self, path, num_threads=None, name='tflite_int8'):
+        super().__init__(path, num_threads)
+        self.name = name
+
+
+class ONNXBackend:
+    """ONNX Runtime session (needs the optional `onnxruntime` package)"""
+    name = 'onnx'
+    takes_raw_windows = False
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+def load_movement_backend(name, base_path, num_threads=None):
+    """
+    Load the movement model from `base_path` through the named backend.
+    Returns None when the files for that backend are not there.
+    `num_threads` sizes the TFLite / ONNX Runtime thread pools (the
+    TensorFlow backends use the process-wide pools, see thread_budget).
+    """
+    if name not in MODEL_FILES:
+        raise ValueError(f"Unknown movement backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+
+    path = os.path.join(base_path, MODEL_FILES[name])
+    h5_path = os.path.join(base_path, MODEL_FILES['keras'])
+
+    if name == 'tf_function':
+        if os.path.isdir(path):
+            return TFFunctionBackend.from_saved_model(path)
+        # No exported SavedModel yet - trace the Keras model instead
+        if os.path.exists(h5_path):
+            return TFFunctionBackend.from_keras(_load_keras_model(h5_path))
+        return None
+
+    if not os.path.exists(path):
+        return None
+
+    if name == 'keras':
+        return KerasBackend(_load_keras_model(path))
+    if name == 'tflite':
+        return TFLiteBackend(path, num_threads)
+    if name in QUANTIZED_BACKENDS:
+        return QuantizedTFLiteBackend(path, num_threads, name)
+    return ONNXBackend(path, num_threads)
+
+
+def _load_keras_model(path):
+    import tensorflow as tf
+
+    return tf.keras.models.load_model(path)
+
+
+# ============================================================================
+# CONVERSION (used by `manage.py convert_movement_model`)
+# ============================================================================
+
+def export_saved_model(model, path):
+    import tensorflow as tf
+
+    backend = TFFunctionBackend.from_keras(model)
+    tf.saved_model.save(model, path, signatures=backend.concrete_fn)
+    return path
+
+
+def export_tflite(model, path):
+    with open(path, 'wb') as f:
+        f.write(_tflite_converter(model).convert())
+    return path
+
+
+def export_quantized_tflite(model, path, quantization, scaler):
+    """
+    TFLite model with `scaler` applied inside the graph and its weights
+    stored as float16 or int8. int8 uses dynamic-range quantization: the
+    LSTM weights are int8 and activations stay float, since full-integer
+    LSTM kernels need calibration data we do not ship.
+    """
+    import tensorflow as tf
+
+    gain, offset = scaler_affine(scaler)
+    converter = _tflite_converter(model, gain, offset)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    # The newer MLIR quantizer leaves the fused LSTM weights in float32 for
+    # int8, and never returns for float16 (TensorFlow 2.15)
+    converter.experimental_new_dynamic_range_quantizer = False
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization != 'int8':
+        raise ValueError(f"Unknown quantization '{quantization}'")
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+
+def scaler_affine(scaler, num_features=WINDOW_SHAPE[1]):
+    """
+    (gain, offset) with scaler.transform(x) == x * gain + offset, for the
+    per-feature scalers sklearn provides (StandardScaler, MinMaxScaler, ...).
+    """
+    offset = scaler.transform(np.zeros((1, num_features)))[0]
+    gain = scaler.transform(np.ones((1, num_features)))[0] - offset
+
+    probe = np.random.default_rng(0).normal(size=(8, num_features)) * 10
+    if not np.allclose(scaler.transform(probe), probe * gain + offset, rtol=1e-5, atol=1e-6):
+        raise ValueError(f"{type(scaler).__name__} is not a per-feature affine transform; it cannot be folded")
+    return gain.astype(np.float32), offset.astype(np.float32)
+
+
+def _tflite_converter(model, gain=None, offset=None):
+    import tensorflow as tf
+
+    if gain is None:
+        forward = lambda x: model(x, training=False)
+    else:
+        gain, offset = tf.constant(gain), tf.constant(offset)
+        forward = lambda x: model(x * gain + offset, training=False)
+
+    fn = tf.function(forward, input_signature=[tf.TensorSpec((1,) + WINDOW_SHAPE, tf.float32)])
+    return tf.lite.TFLiteConverter.from_concrete_functions([fn.get_concrete_function()], model)
+
+
+def export_onnx(model, path):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = [tf.TensorSpec((None,) + WINDOW_SHAPE, tf.float32, name='window')]
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=path)
+    return path
+
+
+EXPORTERS = {
+    'tf_function': export_saved_model,
+    'tflite': export_tflite,
+    'onnx': export_onnx,
+    # Also take scaler=, the fitted scaler.pkl to fold in
+    'tflite_fp16': partial(export_quantized_tflite, quantization='float16'),
+    'tflite_int8': partial(export_quantized_tflite, quantization='int8'),
+}
@@ -0,0 +1,21 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .sensor_codec import SensorPayloadError, decode_sensor_window
+
+
+class SensorWindowParser(BaseParser):
+    """
+    Parses a binary sensor window (see sensor_codec) into a float32 array
+    shaped (frames, 12). request.data is the array itself.
+    """
+    media_type = 'application/octet-stream'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        content_encoding = request.META.get('HTTP_CONTENT_ENCODING') if request is not None else None
+
+        try:
+            return decode_sensor_window(stream.read(), content_encoding)
+        except SensorPayloadError as e:
+            raise ParseError(f"Invalid sensor payload: {e}")
@@ -0,0 +1,81 @@
+"""
+Deterministic synthetic clips: the reference inputs of the golden
+regression files (golden.py), and the clips the audio tests and
+benchmarks score. No recorded clips ship with the repo, so these cover
+the signal types the threat model sees: tones, speech-like formant
+sweeps, noise, sharp transients, near-silence and clips shorter than the
+5 s window.
+"""
+import io
+
+import numpy as np
+
+SAMPLE_RATE = 22050
+
+
+def _time(seconds, sr):
+    return np.arange(int(seconds * sr)) / sr
+
+
+def tone(sr=SAMPLE_RATE, seconds=5.0):
+    t = _time(seconds, sr)
+    return 0.3 * np.sin(2 * np.pi * 440 * t) + 0.1 * np.sin(2 * np.pi * 660 * t)
+
+
+def speech_like(sr=SAMPLE_RATE, seconds=5.0, seed=1):
+    """Glottal-pulse buzz through moving formants, with syllable envelopes"""
+    rng = np.random.default_rng(seed)
+    t = _time(seconds, sr)
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    buzz = np.sign(np.sin(2 * np.pi * np.cumsum(pitch) / sr))
+    formant = np.sin(2 * np.pi * (500 + 300 * np.sin(2 * np.pi * 1.3 * t)) * t)
+    envelope = np.clip(np.sin(2 * np.pi * 3.0 * t), 0, None) ** 2
+    return 0.2 * envelope * (0.6 * buzz + 0.4 * formant) + 0.01 * rng.normal(size=t.size)
+
+
+def scream_like(sr=SAMPLE_RATE, seconds=5.0, seed=2):
+    """Loud, high, rough pitch glide"""
+    rng = np.random.default_rng(seed)
+    t = _time(seconds, sr)
+    pitch = 900 + 400 * np.sin(2 * np.pi * 0.4 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    return 0.7 * np.tanh(3 * np.sin(phase)) + 0.05 * rng.normal(size=t.size)
+
+
+def noise_with_impacts(sr=SAMPLE_RATE, seconds=5.0, seed=3):
+    rng = np.random.default_rng(seed)
+    y = 0.05 * rng.normal(size=int(seconds * sr))
+    for start in rng.integers(0, len(y) - sr // 10, 12):
+        y[start:start + sr // 10] += rng.normal(size=sr // 10) * np.exp(-np.arange(sr // 10) / 300.0)
+    return y
+
+
+def near_silence(sr=SAMPLE_RATE, seconds=5.0, seed=4):
+    return 1e-4 * np.random.default_rng(seed).normal(size=int(seconds * sr))
+
+
+def short_clip(sr=SAMPLE_RATE):
+    return speech_like(sr, seconds=1.2, seed=5)
+
+
+CLIPS = {
+    'tone': tone,
+    'speech_like': speech_like,
+    'scream_like': scream_like,
+    'noise_with_impacts': noise_with_impacts,
+    'near_silence': near_silence,
+    'short_clip': short_clip,
+}
+
+
+def load_clip(name, sr=SAMPLE_RATE):
+    return CLIPS[name](sr).astype(np.float32)
+
+
+def wav_bytes(audio, sr, subtype='PCM_16'):
+    """A clip encoded as a WAV file in memory, as the apps upload it"""
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sr, format='WAV', subtype=subtype)
+    return buffer.getvalue()
@@ -0,0 +1,96 @@
+"""
+The audio feature extractor exactly as the XGBoost threat model was
+trained with it: every librosa feature computed independently from the
+raw signal.
+
+Kept only as a reference. The golden tests and feature benchmarks check
+FastAudioFeatureExtractor against it; nothing in the request path uses it.
+"""
+import numpy as np
+
+
+class ReferenceAudioFeatureExtractor:
+    def __init__(self, sample_rate=22050, duration=5):
+        self.sample_rate = sample_rate
+        self.duration = duration
+
+    def load_audio(self, file_path):
+        """Load audio file with duration limit"""
+        import librosa
+
+        try:
+            audio, sr = librosa.load(file_path, sr=self.sample_rate, duration=self.duration)
+            return audio, sr
+        except Exception as e:
+            return None, None
+
+    def extract_statistical_features(self, data, prefix=""):
+        from scipy import stats
+
+        return {
+            f'{prefix}_mean': np.mean(data),
+            f'{prefix}_std': np.std(data),
+            f'{prefix}_min': np.min(data),
+            f'{prefix}_max': np.max(data),
+            f'{prefix}_median': np.median(data),
+            f'{prefix}_q25': np.percentile(data, 25),
+            f'{prefix}_q75': np.percentile(data, 75),
+            f'{prefix}_skew': stats.skew(data),
+            f'{prefix}_kurtosis': stats.kurtosis(data),
+        }
+
+    def extract_all_features(self, file_path):
+        audio, sr = self.load_audio(file_path)
+        if audio is None:
+            return None
+
+        return self.extract_features(audio, sr)
+
+    def extract_features(self, audio, sr):
+        import librosa
+
+        features = {}
+
+        # 1. BASIC AUDIO STATISTICS
+        features.update(self.extract_statistical_features(audio, 'audio'))
+
+        # 2. SPECTRAL FEATURES
+        spec_cent = librosa.feature.spectral_centroid(y=audio, sr=sr)[0]
+        features.update(self.extract_statistical_features(spec_cent, 'spec_cent'))
+
+        spec_roll = librosa.feature.spectral_rolloff(y=audio, sr=sr)[0]
+        features.update(self.extract_statistical_features(spec_roll, 'spec_roll'))
+
+        spec_bw = librosa.feature.spectral_bandwidth(y=audio, sr=sr)[0]
+        features.update(self.extract_statistical_features(spec_bw, 'spec_bw'))
+
+        # 3. MFCC FEATURES
+        mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
+        for i in range(13):
+            features.update(self.extract_statistical_features(mfccs[i], f'mfcc_{i}'))
+
+        # 4. CHROMA FEATURES
+        chroma = librosa.feature.chroma_stft(y=audio, sr=sr)
+        features['chroma_mean'] = np.mean(chroma)
+        features['chroma_std'] = np.std(chroma)
+        features['chroma_max'] = np.max(chroma)
+
+        # 5. ZERO CROSSING RATE
+        zcr = librosa.feature.zero_crossing_rate(audio)[0]
+        features.update(self.extract_statistical_features(zcr, 'zcr'))
+
+        # 6. RMS ENERGY
+        rms = librosa.feature.rms(y=audio)[0]
+        features.update(self.extract_statistical_features(rms, 'rms'))
+
+        # 7. TEMPO
+        try:
+            tempo, _ = librosa.beat.beat_track(y=audio, sr=sr)
+            if isinstance(tempo, np.ndarray):
+                features['tempo'] = float(tempo[0]) if len(tempo) > 0 else 0.0
+            else:
+                features['tempo'] = float(tempo) if tempo else 0.0
+        except:
+            features['tempo'] = 0.0
+
+        return features
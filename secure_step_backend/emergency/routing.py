@@ -8,6 +8,9 @@ websocket_urlpatterns = [
     # User WebSocket - connects with user_id
     re_path(r'ws/user/(?P<user_id>\d+)/$', consumers.UserConsumer.as_asgi()),
     
+    # Streaming movement detection - sensor frames in, predictions out
+    re_path(r'ws/movement/(?P<user_id>\d+)/$', consumers.MovementStreamConsumer.as_asgi()),
+    
     # Legacy police dashboard (for web dashboard without officer_id)
     re_path(r'ws/police/$', consumers.PoliceConsumer.as_asgi()),
 ]
\ No newline at end of file
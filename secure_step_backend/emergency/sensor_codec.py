@@ -0,0 +1,147 @@
+"""
+Compact binary encoding for sensor windows.
+
+The prediction endpoints accept a window either as nested JSON lists or
+as bytes in one of these layouts:
+
+    raw      little-endian float32 values, frame-major (frames x 12)
+    framed   12-byte header, optional per-channel scales, then the values
+
+    header   magic b'SSW1' | dtype (u8) | flags (u8) | frames (u16)
+             | channels (u16) | reserved (u16)
+    dtype    1 = float32, 2 = int16 (value = int16 * scale[channel])
+    flags    bit 0 = the values after the header are gzip-compressed
+    scales   `channels` little-endian float32s, int16 payloads only
+
+Either layout can also be gzip-compressed as a whole with
+Content-Encoding: gzip. Without that header the gzip magic bytes are only
+trusted when the body inflates to a framed window: a raw float32 window
+may itself start with 1f 8b. Decoding is a single np.frombuffer call
+with no per-element Python work.
+"""
+import gzip
+import io
+import struct
+
+import numpy as np
+
+CHANNELS = 12
+
+MAGIC = b'SSW1'
+HEADER = struct.Struct('<4sBBHHH')
+
+DTYPE_FLOAT32 = 1
+DTYPE_INT16 = 2
+FLAG_GZIP = 0x01
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Decompressed payloads above this are rejected (~250 s of frames at 10 Hz)
+MAX_DECODED_BYTES = 2500 * CHANNELS * 4
+
+
+class SensorPayloadError(ValueError):
+    pass
+
+
+def _gunzip(data):
+    # Bounded read so a small compressed body can't expand without limit
+    try:
+        with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+            out = f.read(MAX_DECODED_BYTES + 1)
+    except (OSError, EOFError) as e:
+        raise SensorPayloadError(f"Invalid gzip data: {e}")
+    if len(out) > MAX_DECODED_BYTES:
+        raise SensorPayloadError("Sensor payload too large")
+    return out
+
+
+def decode_sensor_window(payload, content_encoding=None):
+    """
+    Decode a binary sensor window into a float32 array shaped (frames, 12).
+    Raises SensorPayloadError for malformed payloads.
+    """
+    payload = memoryview(payload).cast('B')
+
+    if (content_encoding or '').lower() == 'gzip':
+        payload = memoryview(_gunzip(payload))
+    elif payload[:2] == GZIP_MAGIC:
+        try:
+            inflated = _gunzip(payload)
+        except SensorPayloadError:
+            inflated = b''
+        if inflated[:4] == MAGIC:
+            payload = memoryview(inflated)
+
+    if payload[:4] == MAGIC:
+        return _decode_framed(payload)
+
+    if len(payload) > MAX_DECODED_BYTES:
+        raise SensorPayloadError("Sensor payload too large")
+    if len(payload) == 0 or len(payload) % (CHANNELS * 4):
+        raise SensorPayloadError(
+            f"Raw float32 payload must be a whole number of {CHANNELS}-channel frames "
+            f"({CHANNELS * 4} bytes each), got {len(payload)} bytes"
+        )
+    return np.frombuffer(payload, dtype='<f4').reshape(-1, CHANNELS)
+
+
+def _decode_framed(payload):
+    if len(payload) < HEADER.size:
+        raise SensorPayloadError("Truncated sensor payload header")
+
+    _, dtype, flags, frames, channels, _ = HEADER.unpack_from(payload)
+    if channels != CHANNELS:
+        raise SensorPayloadError(f"Expected {CHANNELS} channels, got {channels}")
+    if dtype not in (DTYPE_FLOAT32, DTYPE_INT16):
+        raise SensorPayloadError(f"Unknown sensor dtype code {dtype}")
+
+    offset = HEADER.size
+    scales = None
+    if dtype == DTYPE_INT16:
+        scales_end = offset + channels * 4
+        if len(payload) < scales_end:
+            raise SensorPayloadError("Truncated int16 scale header")
+        scales = np.frombuffer(payload[offset:scales_end], dtype='<f4')
+        offset = scales_end
+
+    body = payload[offset:]
+    if flags & FLAG_GZIP:
+        body = memoryview(_gunzip(body))
+
+    itemsize = 4 if dtype == DTYPE_FLOAT32 else 2
+    expected = frames * channels * itemsize
+    if len(body) != expected:
+        raise SensorPayloadError(f"Header says {frames} frames ({expected} bytes), got {len(body)} bytes")
+
+    if dtype == DTYPE_FLOAT32:
+        return np.frombuffer(body, dtype='<f4').reshape(frames, channels)
+
+    values = np.frombuffer(body, dtype='<i2').reshape(frames, channels)
+    return values.astype(np.float32) * scales
+
+
+def encode_sensor_window(window, dtype='float32', compress=False):
+    """
+    Encode a (frames, 12) window in the framed layout. Used by tests,
+    benchmarks and Python clients; the mobile apps build the same bytes.
+    """
+    window = np.asarray(window, dtype=np.float32).reshape(-1, CHANNELS)
+    frames = window.shape[0]
+    flags = FLAG_GZIP if compress else 0
+
+    if dtype == 'float32':
+        header = HEADER.pack(MAGIC, DTYPE_FLOAT32, flags, frames, CHANNELS, 0)
+        body = window.astype('<f4').tobytes()
+    elif dtype == 'int16':
+        peak = np.abs(window).max(axis=0)
+        scales = np.where(peak > 0, peak / 32767.0, 1.0).astype('<f4')
+        quantized = np.round(window / scales).astype('<i2')
+        header = HEADER.pack(MAGIC, DTYPE_INT16, flags, frames, CHANNELS, 0) + scales.tobytes()
+        body = quantized.tobytes()
+    else:
+        raise ValueError(f"Unsupported dtype '{dtype}'")
+
+    if compress:
+        body = gzip.compress(body, compresslevel=6)
+    return header + body
@@ -0,0 +1,139 @@
+import os
+import tempfile
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from emergency.ml_predictor import (
+    FastAudioFeatureExtractor, MLPredictor, chroma_filterbank, mel_filterbank, onset_tempogram,
+)
+from emergency.reference_clips import CLIPS, SAMPLE_RATE, load_clip
+from emergency.reference_features import ReferenceAudioFeatureExtractor
+
+
+class SharedSpectrogramGoldenTests(SimpleTestCase):
+    """The shared-STFT extractor must reproduce the training-time features"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        reference = ReferenceAudioFeatureExtractor()
+        cls.expected = {name: reference.extract_features(load_clip(name), SAMPLE_RATE) for name in CLIPS}
+
+    def test_features_match_reference_on_every_clip(self):
+        extractor = FastAudioFeatureExtractor()
+        for name in CLIPS:
+            with self.subTest(clip=name):
+                expected = self.expected[name]
+                actual = extractor.extract_features(load_clip(name), SAMPLE_RATE)
+
+                # The scaler checks feature names, so the order matters too
+                self.assertEqual(list(actual), list(expected))
+                for key, value in expected.items():
+                    np.testing.assert_allclose(actual[key], value, rtol=1e-5, atol=1e-6, err_msg=key)
+
+    def test_model_scores_are_unchanged(self):
+        predictor = MLPredictor.get_instance()
+        if not predictor._audio_models_loaded():
+            self.skipTest('Audio model files not available')
+
+        extractor = FastAudioFeatureExtractor()
+        for name in CLIPS:
+            with self.subTest(clip=name):
+                expected = predictor.score_audio_features(self.expected[name])
+                actual = predictor.score_audio_features(extractor.extract_features(load_clip(name), SAMPLE_RATE))
+                self.assertEqual(actual['is_threat'], expected['is_threat'])
+                self.assertAlmostEqual(actual['threat_probability'], expected['threat_probability'], places=5)
+
+    def test_filterbanks_are_built_once(self):
+        mel_filterbank.cache_clear()
+        chroma_filterbank.cache_clear()
+        extractor = FastAudioFeatureExtractor()
+        for _ in range(3):
+            extractor.extract_features(load_clip('tone'), SAMPLE_RATE)
+
+        self.assertEqual(mel_filterbank.cache_info().misses, 1)
+        self.assertEqual(chroma_filterbank.cache_info().misses, 1)
+        self.assertFalse(mel_filterbank(SAMPLE_RATE, 2048).flags.writeable)
+
+
+class TempoModeTests(SimpleTestCase):
+    def onset_envelope(self, name):
+        import librosa
+
+        power = np.abs(librosa.stft(load_clip(name))) ** 2
+        log_mel = librosa.power_to_db(mel_filterbank(SAMPLE_RATE, 2048) @ power)
+        return librosa.onset.onset_strength(S=log_mel, sr=SAMPLE_RATE, aggregate=np.median)
+
+    def test_fast_tempogram_matches_librosa(self):
+        import librosa
+
+        for name in CLIPS:
+            with self.subTest(clip=name):
+                onset_env = self.onset_envelope(name)
+                expected = librosa.feature.tempogram(onset_envelope=onset_env, sr=SAMPLE_RATE, win_length=344)
+                np.testing.assert_allclose(onset_tempogram(onset_env, SAMPLE_RATE), expected, atol=1e-12)
+
+    def test_autocorr_mode_gives_the_beat_tracker_tempo(self):
+        import librosa
+
+        # beat_track's reported tempo is librosa.feature.tempo on its onset envelope
+        extractor = FastAudioFeatureExtractor(tempo_mode='autocorr')
+        for name in CLIPS:
+            with self.subTest(clip=name):
+                onset_env = self.onset_envelope(name)
+                expected = librosa.feature.tempo(onset_envelope=onset_env, sr=SAMPLE_RATE)[0] if onset_env.any() else 0.0
+                self.assertEqual(extractor.extract_features(load_clip(name), SAMPLE_RATE)['tempo'], expected)
+
+    def test_autocorr_mode_on_silence(self):
+        features = FastAudioFeatureExtractor(tempo_mode='autocorr').extract_features(
+            np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE
+        )
+        self.assertEqual(features['tempo'], 0.0)
+
+    def test_constant_mode_is_imputed_with_the_scaler_mean(self):
+        predictor = MLPredictor.get_instance()
+        if not predictor._audio_models_loaded():
+            self.skipTest('Audio model files not available')
+
+        features = FastAudioFeatureExtractor(tempo_mode='constant').extract_features(
+            load_clip('speech_like'), SAMPLE_RATE
+        )
+        self.assertTrue(np.isnan(features['tempo']))
+
+        names = list(predictor._audio_scaler.feature_names_in_)
+        imputed = dict(features, tempo=predictor._audio_scaler.mean_[names.index('tempo')])
+        self.assertEqual(predictor.score_audio_features(features), predictor.score_audio_features(imputed))
+
+    @override_settings(ML_AUDIO_TEMPO_MODE='constant')
+    def test_mode_comes_from_settings(self):
+        self.assertEqual(FastAudioFeatureExtractor().tempo_mode, 'constant')
+        self.assertEqual(FastAudioFeatureExtractor(tempo_mode='autocorr').tempo_mode, 'autocorr')
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            FastAudioFeatureExtractor(tempo_mode='fast')
+
+
+class EvaluateTempoModesCommandTests(SimpleTestCase):
+    def test_report(self):
+        import soundfile as sf
+
+        if not MLPredictor.get_instance()._audio_models_loaded():
+            self.skipTest('Audio model files not available')
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            for folder, names in (('threat', ['scream_like', 'noise_with_impacts']), ('safe', ['tone', 'speech_like'])):
+                os.makedirs(os.path.join(data_dir, folder))
+                for name in names:
+                    sf.write(os.path.join(data_dir, folder, f'{name}.wav'), load_clip(name), SAMPLE_RATE)
+
+            out = StringIO()
+            call_command('evaluate_tempo_modes', data_dir, '--modes', 'autocorr,constant', stdout=out)
+
+        report = out.getvalue()
+        self.assertIn('4 clips (2 threat, 2 safe)', report)
+        for mode in ('beat_track', 'autocorr', 'constant'):
+            self.assertIn(mode, report)
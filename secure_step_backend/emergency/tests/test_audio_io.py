@@ -0,0 +1,323 @@
+import os
+import subprocess
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from emergency.audio_io import (
+    AudioDecodeError, decode_audio, decode_audio_file, decode_audio_upload, mp4_index_at_end, polyphase_filter,
+    resample,
+)
+from emergency.ml_predictor import FastAudioFeatureExtractor, MLPredictor
+from emergency.reference_clips import CLIPS, load_clip, wav_bytes
+
+
+def librosa_from_disk(data, suffix='.wav'):
+    """What the views did before: write a temp file and librosa.load it"""
+    import librosa
+
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        tmp.write(data)
+        tmp.flush()
+        return librosa.load(tmp.name, sr=22050, duration=5)
+
+
+def ffmpeg_result(samples, rate=44100, layout='mono', returncode=0):
+    stderr = f"Stream #0:0(und): Audio: aac (LC) (mp4a / 0x6134706D), {rate} Hz, {layout}, fltp, 96 kb/s\n"
+    return subprocess.CompletedProcess([], returncode, np.asarray(samples, dtype='<i2').tobytes(), stderr.encode())
+
+
+def mp4_atoms(*kinds, payload=8):
+    """Top-level MP4 atoms of the given types, each with `payload` zero bytes"""
+    return b''.join((8 + payload).to_bytes(4, 'big') + kind + b'\x00' * payload for kind in kinds)
+
+
+class DecodeAudioTests(SimpleTestCase):
+    def test_wav_matches_librosa_load_from_disk(self):
+        stereo = np.stack([load_clip('speech_like', 44100), load_clip('tone', 44100)], axis=1)
+        cases = [
+            (load_clip('speech_like'), 22050),
+            (load_clip('scream_like', 16000), 16000),
+            (np.concatenate([stereo, stereo]), 44100),  # 10 s, stereo: trimmed to 5 s and averaged
+        ]
+        for audio, sr in cases:
+            with self.subTest(sr=sr, shape=audio.shape):
+                data = wav_bytes(audio, sr)
+                expected, _ = librosa_from_disk(data)
+                actual, actual_sr = decode_audio(data, content_type='audio/wav')
+                self.assertEqual(actual_sr, 22050)
+                self.assertEqual(actual.dtype, np.float32)
+                np.testing.assert_array_equal(actual, expected)
+
+    def test_raw_pcm_fast_path(self):
+        audio = load_clip('tone')
+        pcm = np.round(audio * 32767).astype('<i2')
+        decoded, sr = decode_audio(pcm.tobytes(), content_type='audio/pcm', params={'rate': '22050'})
+        self.assertEqual(sr, 22050)
+        np.testing.assert_array_equal(decoded, pcm.astype(np.float32) / 32768)
+
+        # Same bytes, wrapped in a WAV header, decode to the same signal
+        wav, _ = decode_audio(wav_bytes(pcm, 22050))
+        np.testing.assert_array_equal(decoded, wav)
+
+    def test_raw_pcm_formats_rates_and_channels(self):
+        stereo = np.stack([load_clip('tone', 16000), np.zeros(80000, dtype=np.float32)], axis=1)
+        decoded, sr = decode_audio(
+            stereo.astype('<f4').tobytes(), name='clip.pcm', params={'rate': '16000', 'format': 'f32le', 'channels': '2'}
+        )
+        expected, _ = librosa_from_disk(wav_bytes(stereo, 16000, subtype='FLOAT'))
+        self.assertEqual(sr, 22050)
+        np.testing.assert_allclose(decoded, expected, atol=1e-6)
+
+    def test_bad_pcm(self):
+        with self.assertRaises(AudioDecodeError):
+            decode_audio(b'\x00', content_type='audio/pcm')
+        with self.assertRaises(AudioDecodeError):
+            decode_audio(b'\x00' * 100, content_type='audio/pcm', params={'format': 'u8'})
+        with self.assertRaises(AudioDecodeError):
+            decode_audio(b'\x00' * 100, content_type='audio/pcm', params={'rate': 'fast'})
+        with self.assertRaises(AudioDecodeError):
+            decode_audio(b'')
+
+    def test_corrupt_wav(self):
+        with self.assertRaises(AudioDecodeError):
+            decode_audio(b'RIFF' + b'\x00' * 60)
+
+
+class FfmpegDecodeTests(SimpleTestCase):
+    """Container formats (m4a from the apps) go through an ffmpeg pipe"""
+
+    M4A = b'\x00\x00\x00\x20ftypM4A ' + b'\x00' * 200
+
+    def test_decodes_from_a_pipe(self):
+        samples = (np.sin(np.arange(44100 * 6) / 20) * 20000).astype('<i2')
+        with mock.patch('emergency.audio_io.subprocess.run', return_value=ffmpeg_result(samples)) as run:
+            decoded, sr = decode_audio(self.M4A, name='clip.m4a')
+
+        command = run.call_args[0][0]
+        self.assertIn('pipe:0', command)
+        self.assertEqual(run.call_args[1]['input'], self.M4A)
+
+        import librosa
+        expected = librosa.resample(samples[:44100 * 5].astype(np.float32) / 32768, orig_sr=44100, target_sr=22050, res_type='soxr_hq')
+        self.assertEqual(sr, 22050)
+        np.testing.assert_array_equal(decoded, expected)
+
+    def test_stereo_is_averaged(self):
+        interleaved = np.array([[1000, 3000]] * 22050, dtype='<i2').ravel()
+        with mock.patch('emergency.audio_io.subprocess.run', return_value=ffmpeg_result(interleaved, 22050, 'stereo')):
+            decoded, _ = decode_audio(self.M4A)
+        np.testing.assert_allclose(decoded, 2000 / 32768)
+
+    def test_unseekable_mp4_falls_back_to_a_temp_file(self):
+        results = [ffmpeg_result([], returncode=1), ffmpeg_result(np.zeros(22050), 22050)]
+        with mock.patch('emergency.audio_io.subprocess.run', side_effect=results) as run:
+            decode_audio(self.M4A, name='clip.m4a')
+
+        self.assertEqual(run.call_count, 2)
+        retry = run.call_args_list[1]
+        self.assertTrue(retry[0][0][retry[0][0].index('-i') + 1].endswith('.m4a'))
+        self.assertIsNone(retry[1]['input'])
+
+    def test_mp4_with_the_index_at_the_end_skips_the_pipe(self):
+        # Android's recorder: ftyp, mdat, then moov
+        with mock.patch('emergency.audio_io.subprocess.run', return_value=ffmpeg_result(np.zeros(22050), 22050)) as run:
+            decode_audio(mp4_atoms(b'ftyp', b'mdat', b'moov'), name='clip.m4a')
+
+        self.assertEqual(run.call_count, 1)
+        command = run.call_args[0][0]
+        self.assertTrue(command[command.index('-i') + 1].endswith('.m4a'))
+        self.assertIsNone(run.call_args[1]['input'])
+
+    def test_faststart_mp4_is_piped(self):
+        data = mp4_atoms(b'ftyp', b'moov', b'mdat')
+        with mock.patch('emergency.audio_io.subprocess.run', return_value=ffmpeg_result(np.zeros(22050), 22050)) as run:
+            decode_audio(data, name='clip.m4a')
+
+        self.assertEqual(run.call_count, 1)
+        self.assertIn('pipe:0', run.call_args[0][0])
+        self.assertEqual(run.call_args[1]['input'], data)
+
+    def test_mp4_index_at_end(self):
+        self.assertTrue(mp4_index_at_end(mp4_atoms(b'ftyp', b'free', b'mdat', b'moov')))
+        self.assertFalse(mp4_index_at_end(mp4_atoms(b'ftyp', b'moov', b'mdat')))
+        self.assertFalse(mp4_index_at_end(b'ID3\x03' + b'\x00' * 100))
+        self.assertFalse(mp4_index_at_end(self.M4A))
+        # 64-bit mdat size, and an upload cut off inside mdat
+        large = mp4_atoms(b'ftyp') + (1).to_bytes(4, 'big') + b'mdat' + (24).to_bytes(8, 'big') + b'\x00' * 8
+        self.assertTrue(mp4_index_at_end(large + mp4_atoms(b'moov')))
+        self.assertTrue(mp4_index_at_end(mp4_atoms(b'ftyp', b'mdat')[:-4]))
+
+    def test_spooled_uploads_are_read_by_path(self):
+        upload = TemporaryUploadedFile('clip.m4a', 'audio/mp4', len(self.M4A), None)
+        upload.write(self.M4A)
+        upload.flush()
+        self.addCleanup(upload.close)
+
+        with mock.patch('emergency.audio_io.subprocess.run', return_value=ffmpeg_result(np.zeros(22050), 22050)) as run:
+            decode_audio_upload(upload)
+
+        self.assertEqual(run.call_count, 1)
+        self.assertIn(upload.temporary_file_path(), run.call_args[0][0])
+        self.assertIsNone(run.call_args[1]['input'])
+
+    def test_missing_ffmpeg(self):
+        with mock.patch('emergency.audio_io.subprocess.run', side_effect=FileNotFoundError('ffmpeg')):
+            with self.assertRaises(AudioDecodeError):
+                decode_audio(self.M4A)
+
+
+class DecodeAudioFileTests(SimpleTestCase):
+    """FastAudioFeatureExtractor.load_audio, for clips already on disk"""
+
+    def write(self, audio, sr, suffix='.wav'):
+        tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        tmp.write(wav_bytes(audio, sr))
+        tmp.close()
+        self.addCleanup(os.unlink, tmp.name)
+        return tmp.name
+
+    def test_matches_librosa_load(self):
+        import librosa
+
+        for sr in (22050, 44100, 48000):
+            with self.subTest(sr=sr):
+                path = self.write(np.tile(load_clip('speech_like', sr), 3), sr)  # 15 s, only 5 s decoded
+                expected, _ = librosa.load(path, sr=22050, duration=5)
+                actual, actual_sr = FastAudioFeatureExtractor().load_audio(path)
+                self.assertEqual(actual_sr, 22050)
+                np.testing.assert_array_equal(actual, expected)
+
+    def test_other_formats_go_through_ffmpeg(self):
+        path = self.write(np.zeros(100), 22050, suffix='.m4a')
+        with open(path, 'wb') as f:
+            f.write(FfmpegDecodeTests.M4A)
+
+        samples = np.zeros(44100 * 5, dtype='<i2')
+        with mock.patch('emergency.audio_io.subprocess.run', return_value=ffmpeg_result(samples)) as run:
+            audio, sr = decode_audio_file(path)
+        self.assertIn(path, run.call_args[0][0])
+        self.assertEqual((len(audio), sr), (22050 * 5, 22050))
+
+    def test_undecodable_file(self):
+        path = self.write(np.zeros(100), 22050, suffix='.m4a')
+        with open(path, 'wb') as f:
+            f.write(b'not audio')
+        with mock.patch('emergency.audio_io.subprocess.run', side_effect=FileNotFoundError('ffmpeg')):
+            self.assertEqual(FastAudioFeatureExtractor().load_audio(path), (None, None))
+
+
+class ResamplerTests(SimpleTestCase):
+    # Largest acceptable move of any XGBoost input (in feature_scaler
+    # standard deviations) and of the threat probability, versus soxr_hq.
+    # polyphase's wider transition band shifts the skew/kurtosis of the
+    # spectral series on noisy clips, but not the decisions.
+    DRIFT_TOLERANCES = {'soxr_mq': (0.25, 0.01), 'polyphase': (1.0, 0.05)}
+
+    def test_default_is_librosa_soxr_hq(self):
+        import librosa
+
+        audio = load_clip('speech_like', 44100).astype(np.float32)
+        np.testing.assert_array_equal(resample(audio, 44100, 22050), librosa.resample(audio, orig_sr=44100, target_sr=22050))
+
+    @override_settings(ML_AUDIO_RESAMPLER='polyphase')
+    def test_resampler_comes_from_settings(self):
+        audio = load_clip('speech_like', 48000).astype(np.float32)
+        resampled = resample(audio, 48000, 22050)
+        self.assertEqual(resampled.dtype, np.float32)
+        self.assertEqual(len(resampled), 22050 * 5)
+        self.assertFalse(np.array_equal(resampled, resample(audio, 48000, 22050, 'soxr_hq')))
+
+    def test_unknown_resampler(self):
+        with self.assertRaises(ValueError):
+            resample(np.zeros(100, dtype=np.float32), 44100, 22050, 'kaiser_best')
+
+    def test_polyphase_filter_is_designed_once_per_rate_pair(self):
+        from scipy.signal import resample_poly
+
+        polyphase_filter.cache_clear()
+        audio = load_clip('tone', 48000).astype(np.float32)
+        first = resample(audio, 48000, 22050, 'polyphase')
+        resample(audio, 48000, 22050, 'polyphase')
+        resample(audio, 44100, 22050, 'polyphase')
+        info = polyphase_filter.cache_info()
+        self.assertEqual((info.misses, info.hits), (2, 1))
+        self.assertFalse(polyphase_filter(147, 320).flags.writeable)
+        # Same filter resample_poly would design on every call
+        np.testing.assert_allclose(first, resample_poly(audio, 147, 320), rtol=1e-5, atol=1e-6)
+
+    def test_model_inputs_stay_within_tolerance(self):
+        predictor = MLPredictor.get_instance()
+        if not predictor._audio_models_loaded():
+            self.skipTest('Audio model files not available')
+
+        import pickle
+        from django.conf import settings
+        with open(os.path.join(settings.BASE_DIR, 'ml_models', 'feature_scaler.pkl'), 'rb') as f:
+            scales = dict(zip(*(lambda s: (s.feature_names_in_, s.scale_))(pickle.load(f))))
+
+        extractor = FastAudioFeatureExtractor()
+        for native_rate in (44100, 48000):
+            for name, clip in CLIPS.items():
+                audio = clip(native_rate).astype(np.float32)
+                expected = extractor.extract_features(resample(audio, native_rate, 22050, 'soxr_hq'), 22050)
+                expected_score = predictor.score_audio_features(expected)
+                for method, (max_feature_drift, max_probability_drift) in self.DRIFT_TOLERANCES.items():
+                    with self.subTest(rate=native_rate, clip=name, resampler=method):
+                        actual = extractor.extract_features(resample(audio, native_rate, 22050, method), 22050)
+                        # beat_track picks one of a set of discrete tempi; on clips with no
+                        # beat (noise, a scream) a tiny change can jump to another one, so
+                        # tempo only counts through P(threat) below
+                        drift = max(abs(actual[k] - v) / scales[k] for k, v in expected.items() if k != 'tempo')
+                        self.assertLess(drift, max_feature_drift)
+
+                        score = predictor.score_audio_features(actual)
+                        self.assertEqual(score['is_threat'], expected_score['is_threat'])
+                        self.assertLess(abs(score['threat_probability'] - expected_score['threat_probability']),
+                                        max_probability_drift)
+
+
+class AudioUploadViewTests(SimpleTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.predictor = mock.Mock()
+        self.predictor.predict.return_value = {'action': 'walking', 'confidence': 0.9, 'is_threat': False, 'status': 'SAFE'}
+        self.predictor.predict_audio_features.return_value = {'is_threat': True, 'confidence': 0.8, 'status': 'THREAT'}
+        patcher = mock.patch('emergency.views.get_predictor', return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(caches['audio_features'].clear)
+
+    def upload(self):
+        return SimpleUploadedFile('clip.wav', wav_bytes(load_clip('speech_like'), 22050), content_type='audio/wav')
+
+    def test_predict_audio_decodes_in_memory(self):
+        with mock.patch('tempfile.NamedTemporaryFile', side_effect=AssertionError('temp file used')):
+            response = self.client.post('/api/emergency/predict-audio/', {'file': self.upload()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'THREAT')
+        features = self.predictor.predict_audio_features.call_args[0][0]
+        self.assertEqual(list(features), list(FastAudioFeatureExtractor().extract_features(load_clip('speech_like'), 22050)))
+
+    def test_predict_combined_decodes_in_memory(self):
+        with mock.patch('tempfile.NamedTemporaryFile', side_effect=AssertionError('temp file used')):
+            response = self.client.post('/api/emergency/predict-combined/', {
+                'movement_data': '[' + ','.join(['[0,0,0,0,0,0,0,0,0,0,0,0]'] * 50) + ']',
+                'audio_file': self.upload(),
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.predictor.predict_audio_features.assert_called_once()
+
+    def test_undecodable_upload_reports_an_error(self):
+        bad = SimpleUploadedFile('clip.wav', b'RIFF' + b'\x00' * 60, content_type='audio/wav')
+        response = self.client.post('/api/emergency/predict-audio/', {'file': bad})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ERROR')
+        self.predictor.predict_audio_features.assert_not_called()
@@ -0,0 +1,109 @@
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from emergency.ml_predictor import AudioScorer, FastAudioFeatureExtractor, MLPredictor
+from emergency.reference_clips import CLIPS, SAMPLE_RATE, load_clip
+from emergency.reference_features import ReferenceAudioFeatureExtractor
+
+
+def pandas_score(model, scaler, features):
+    """The previous path: one-row DataFrame, scaler.transform, predict + predict_proba"""
+    tempo = features.get('tempo', 0.0)
+    if tempo != tempo:
+        # 'constant' tempo mode, imputed with the training mean
+        features = dict(features, tempo=scaler.mean_[list(scaler.feature_names_in_).index('tempo')])
+    scaled = scaler.transform(pd.DataFrame([features]))
+    prediction = model.predict(scaled)[0]
+    probs = model.predict_proba(scaled)[0]
+    return {
+        'is_threat': int(prediction) == 1,
+        'confidence': float(probs[1]) if prediction == 1 else float(probs[0]),
+        'threat_probability': float(probs[1]),
+        'status': 'THREAT' if prediction == 1 else 'SAFE',
+    }
+
+
+class AudioScorerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.predictor = MLPredictor.get_instance()
+        reference = ReferenceAudioFeatureExtractor()
+        constant = FastAudioFeatureExtractor(tempo_mode='constant')
+        cls.rows = [reference.extract_features(load_clip(name), SAMPLE_RATE) for name in CLIPS]
+        cls.rows += [constant.extract_features(load_clip(name), SAMPLE_RATE) for name in CLIPS]  # NaN tempo
+        cls.silent = reference.extract_features(np.zeros(SAMPLE_RATE * 5, dtype=np.float32), SAMPLE_RATE)
+        cls.rows.append(cls.silent)  # NaN skew and kurtosis
+
+    def setUp(self):
+        if not self.predictor._audio_models_loaded():
+            self.skipTest('Audio model files not available')
+
+    def test_matches_the_pandas_path(self):
+        model, scaler = self.predictor._audio_model, self.predictor._audio_scaler
+        for features in self.rows:
+            with self.subTest(tempo=features['tempo']):
+                self.assertEqual(self.predictor.score_audio_features(features),
+                                 pandas_score(model, scaler, features))
+
+    def test_batch_is_one_booster_call(self):
+        scorer = self.predictor._get_audio_scorer()
+        singles = [self.predictor.score_audio_features(features) for features in self.rows]
+
+        with mock.patch.object(scorer.booster, 'inplace_predict', wraps=scorer.booster.inplace_predict) as booster, \
+                mock.patch.object(self.predictor._audio_model, 'predict', side_effect=AssertionError('predict')):
+            batch = self.predictor.score_audio_batch(self.rows)
+            from_matrix = self.predictor.score_audio_batch(scorer.matrix(self.rows))
+
+        self.assertEqual(batch, singles)
+        self.assertEqual(from_matrix, singles)
+        self.assertEqual(booster.call_count, 2)
+        self.assertEqual(self.predictor.score_audio_batch([]), [])
+
+    def test_only_tempo_is_imputed(self):
+        scorer = self.predictor._get_audio_scorer()
+        missing = [name for name, value in self.silent.items() if value != value]
+        self.assertTrue(missing)
+        self.assertNotIn('tempo', missing)
+
+        scaled = scorer.scale_rows(scorer.matrix([self.silent]))[0]
+        for name in missing:
+            self.assertTrue(np.isnan(scaled[scorer.index[name]]), name)
+        constant = dict(self.silent, tempo=float('nan'))
+        self.assertEqual(scorer.scale_rows(scorer.matrix([constant]))[0][scorer.index['tempo']], 0.0)
+
+    def test_missing_feature(self):
+        features = dict(self.rows[0])
+        del features['tempo']
+        with self.assertRaises(ValueError):
+            self.predictor.score_audio_features(features)
+
+    def test_scorer_follows_model_swaps(self):
+        scorer = self.predictor._get_audio_scorer()
+        self.assertIs(self.predictor._get_audio_scorer(), scorer)
+        with mock.patch.object(MLPredictor, 'load_models'):
+            other = MLPredictor()
+        other._audio_model, other._audio_scaler = scorer.model, scorer.scaler
+        self.assertIsNot(other._get_audio_scorer(), scorer)
+
+
+class GenericModelTests(SimpleTestCase):
+    def test_estimators_without_a_booster_use_predict_proba(self):
+        rng = np.random.default_rng(0)
+        frame = pd.DataFrame(rng.normal(size=(200, 3)) * [1, 10, 100], columns=['a', 'b', 'c'])
+        labels = (frame['a'] + frame['b'] / 10 > 0).astype(int)
+        scaler = StandardScaler().fit(frame)
+        model = LogisticRegression().fit(scaler.transform(frame), labels)
+
+        scorer = AudioScorer(model, scaler)
+        self.assertIsNone(scorer.booster)
+        rows = frame.head(20).to_dict('records')
+        for features, result in zip(rows, scorer.score(scorer.matrix(rows))):
+            expected = pandas_score(model, scaler, features)
+            self.assertEqual(result['is_threat'], expected['is_threat'])
+            self.assertAlmostEqual(result['threat_probability'], expected['threat_probability'], places=6)
@@ -0,0 +1,137 @@
+from unittest import mock
+
+import numpy as np
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from emergency.feature_cache import AudioFeatureCache
+from emergency.ml_predictor import (
+    HOP_LENGTH, FastAudioFeatureExtractor, MLPredictor, aggregate_segment_results, segment_starts,
+)
+from emergency.reference_clips import SAMPLE_RATE, load_clip, wav_bytes
+
+SEGMENT = 5 * SAMPLE_RATE
+
+
+def long_clip():
+    """About 17.5 s: speech, a scream in the middle, noise, then a partial tone"""
+    return np.concatenate([
+        load_clip('speech_like'), load_clip('scream_like'), load_clip('noise_with_impacts'), load_clip('tone')[:55000],
+    ])
+
+
+def result(p):
+    return {'is_threat': p > 0.5, 'confidence': max(p, 1 - p), 'threat_probability': p,
+            'status': 'THREAT' if p > 0.5 else 'SAFE'}
+
+
+class SegmentStartsTests(SimpleTestCase):
+    def test_short_clip_is_one_segment(self):
+        np.testing.assert_array_equal(segment_starts(SEGMENT - 100, SEGMENT, 55296), [0])
+        np.testing.assert_array_equal(segment_starts(SEGMENT, SEGMENT, 55296), [0])
+
+    def test_end_of_the_clip_is_covered(self):
+        starts = segment_starts(4 * SEGMENT, SEGMENT, 55296)
+        self.assertEqual(list(starts[:-1]), list(range(0, 3 * SEGMENT, 55296)))
+        self.assertEqual(starts[-1] % HOP_LENGTH, 0)
+        self.assertLess(4 * SEGMENT - (starts[-1] + SEGMENT), HOP_LENGTH)
+
+
+class SegmentFeatureTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.audio = long_clip()
+        cls.extractor = FastAudioFeatureExtractor(segmented=True)
+        cls.segments = cls.extractor.extract_segment_features(cls.audio, SAMPLE_RATE)
+
+    def test_shared_spectrogram_matches_each_segment_on_its_own(self):
+        starts = segment_starts(len(self.audio), SEGMENT, 108 * HOP_LENGTH)
+        self.assertEqual(len(self.segments), len(starts))
+        for start, segment in zip(starts, self.segments):
+            with self.subTest(start=segment['start']):
+                expected = self.extractor.extract_features(self.audio[start:start + SEGMENT], SAMPLE_RATE)
+                self.assertEqual(list(segment['features']), list(expected))
+                for key, value in expected.items():
+                    np.testing.assert_allclose(segment['features'][key], value, rtol=1e-5, atol=1e-6, err_msg=key)
+
+        self.assertEqual(self.segments[0]['start'], 0.0)
+        self.assertLess(len(self.audio) / SAMPLE_RATE - self.segments[-1]['end'], HOP_LENGTH / SAMPLE_RATE)
+
+    def test_clip_shorter_than_a_segment(self):
+        clip = load_clip('short_clip')
+        segments = self.extractor.extract_segment_features(clip, SAMPLE_RATE)
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(segments[0]['features'], FastAudioFeatureExtractor().extract_features(clip, SAMPLE_RATE))
+
+    @override_settings(ML_AUDIO_SEGMENT_WORKERS=2, ML_AUDIO_PARALLEL_SEGMENTS=2)
+    def test_parallel_extraction_gives_the_same_segments(self):
+        with mock.patch('emergency.ml_predictor._segment_executor', None):
+            parallel = self.extractor.extract_segment_features(self.audio, SAMPLE_RATE)
+        self.assertEqual(parallel, self.segments)
+
+
+class SegmentScoringTests(SimpleTestCase):
+    def test_aggregate(self):
+        segments = [{'start': 0.0, 'end': 5.0}, {'start': 2.5, 'end': 7.5}, {'start': 5.0, 'end': 10.0}]
+        aggregate = aggregate_segment_results(segments, [result(0.1), result(0.9), result(0.2)])
+
+        self.assertTrue(aggregate['is_threat'])
+        self.assertEqual(aggregate['threat_probability'], 0.9)
+        self.assertAlmostEqual(aggregate['mean_threat_probability'], 0.4)
+        self.assertEqual(aggregate['confidence'], 0.9)
+        self.assertEqual((aggregate['num_segments'], aggregate['threat_segments']), (3, 1))
+        self.assertEqual(aggregate['segments'][1], {'start': 2.5, 'end': 7.5, 'threat_probability': 0.9, 'is_threat': True})
+
+        safe = aggregate_segment_results(segments, [result(0.1), result(0.3), result(0.2)])
+        self.assertEqual(safe['status'], 'SAFE')
+        self.assertAlmostEqual(safe['confidence'], 0.7)
+
+    def test_segments_are_scored_in_one_batch(self):
+        predictor = MLPredictor.get_instance()
+        if not predictor._audio_models_loaded():
+            self.skipTest('Audio model files not available')
+
+        audio = long_clip()
+        with mock.patch.object(predictor, 'score_audio_batch', wraps=predictor.score_audio_batch) as batch:
+            response = predictor.predict_audio_signal(audio, SAMPLE_RATE, segmented=True)
+
+        batch.assert_called_once()
+        self.assertEqual(response['num_segments'], len(segment_starts(len(audio), SEGMENT, 108 * HOP_LENGTH)))
+        probabilities = [s['threat_probability'] for s in response['segments']]
+        self.assertEqual(response['threat_probability'], max(probabilities))
+        # The first segment is what the unsegmented path scores
+        first = predictor.predict_audio_signal(audio[:SEGMENT], SAMPLE_RATE, segmented=False)
+        self.assertAlmostEqual(probabilities[0], first['threat_probability'], places=5)
+
+
+@override_settings(ML_AUDIO_SEGMENTED=True)
+class SegmentedUploadTests(SimpleTestCase):
+    def setUp(self):
+        self.predictor = mock.Mock()
+        self.predictor.predict_audio_features.return_value = {'is_threat': False, 'status': 'SAFE'}
+        patcher = mock.patch('emergency.views.get_predictor', return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(caches['audio_features'].clear)
+
+    def upload(self):
+        return SimpleUploadedFile('clip.wav', wav_bytes(long_clip(), SAMPLE_RATE), content_type='audio/wav')
+
+    def test_whole_upload_is_segmented_and_cached(self):
+        for _ in range(2):
+            response = APIClient().post('/api/emergency/predict-audio/', {'file': self.upload()})
+            self.assertEqual(response.status_code, 200)
+
+        first, second = [call[0][0] for call in self.predictor.predict_audio_features.call_args_list]
+        self.assertEqual([s['start'] for s in first], [0.0, 2.508, 5.016, 7.523, 10.031, 12.492])
+        self.assertEqual(second, first)
+
+    def test_cache_key_depends_on_segmentation(self):
+        cache = AudioFeatureCache('audio_features')
+        segmented = cache.key_for_bytes(b'clip', FastAudioFeatureExtractor())
+        self.assertNotEqual(segmented, cache.key_for_bytes(b'clip', FastAudioFeatureExtractor(segmented=False)))
+        with override_settings(ML_AUDIO_SEGMENT_HOP=1.0):
+            self.assertNotEqual(segmented, cache.key_for_bytes(b'clip', FastAudioFeatureExtractor()))
@@ -0,0 +1,155 @@
+import csv
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from emergency.management.commands.batch_score import as_windows
+from emergency.ml_predictor import MLPredictor
+from emergency.model_state import READY
+from emergency.reference_clips import CLIPS, SAMPLE_RATE, load_clip, wav_bytes
+from emergency.tests.test_inference_batcher import make_predictor
+from emergency.tests.test_window_scoring import ProjectionModel
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+class BatchScoreTestCase(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='batch-score-')
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.predictor = make_predictor(ProjectionModel())
+        self.predictor.model_states['movement'].state = READY
+        patcher = mock.patch.object(MLPredictor, 'get_instance', return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        rng = np.random.default_rng(0)
+        self.windows = rng.normal(size=(30, 50, 12)).astype(np.float32)
+        self.recording = rng.normal(size=(120, 12)).astype(np.float32)
+        self.sensors = os.path.join(self.dir, 'sensors')
+        os.makedirs(self.sensors)
+        np.savez(os.path.join(self.dir, 'sensors', 'session.npz'), windows=self.windows, recording=self.recording)
+        np.savetxt(os.path.join(self.dir, 'sensors', 'flat.csv'), self.windows[:4].reshape(4, -1), delimiter=',')
+        self.output = os.path.join(self.dir, 'predictions.csv')
+
+    def score(self, *inputs, **options):
+        call_command('batch_score', *inputs, output=self.output, stdout=StringIO(), **options)
+        return read_rows(self.output)
+
+
+class MovementBatchTests(BatchScoreTestCase):
+    def test_every_window_is_scored(self):
+        rows = self.score(os.path.join(self.dir, 'sensors'), chunk_size=8, stride=10)
+        by_id = {row['sample_id']: row for row in rows}
+        self.assertEqual(len(by_id), len(rows))
+
+        # 4 flattened CSV windows, 30 windows, 8 windows of the recording every 10 frames
+        self.assertEqual(len(rows), 4 + 30 + 8)
+        expected = self.predictor.predict_batch(self.windows)
+        for i, result in enumerate(expected):
+            row = by_id[f'{self.sensors}/session.npz:windows:{i}']
+            self.assertEqual((row['kind'], row['action']), ('movement', result['action']))
+            self.assertAlmostEqual(float(row['confidence']), result['confidence'], places=5)
+        self.assertEqual(by_id[f'{self.sensors}/flat.csv:3']['action'], expected[3]['action'])
+
+    def test_resume_after_interruption(self):
+        complete = self.score(os.path.join(self.dir, 'sensors'), chunk_size=8, stride=10)
+        os.remove(self.output)
+
+        # Interrupted after 10 rows, in the middle of writing the 11th
+        self.score(os.path.join(self.dir, 'sensors', 'session.npz'), chunk_size=10, stride=10)
+        with open(self.output) as f:
+            lines = f.readlines()
+        with open(self.output, 'w') as f:
+            f.writelines(lines[:11])
+            f.write(lines[11][:15])
+
+        self.predictor._model.calls.clear()
+        resumed = self.score(os.path.join(self.dir, 'sensors'), chunk_size=8, stride=10, resume=True)
+        self.assertEqual(sorted(row['sample_id'] for row in resumed), sorted(row['sample_id'] for row in complete))
+        self.assertEqual(sum(self.predictor._model.calls), len(complete) - 10)
+
+    def test_resume_with_other_inputs(self):
+        self.score(os.path.join(self.dir, 'sensors'), stride=10)
+        os.makedirs(os.path.join(self.dir, 'more'))
+        np.save(os.path.join(self.dir, 'more', 'extra.npy'), self.windows[:5])
+
+        # The same files named through a different set of inputs are not scored again
+        self.predictor._model.calls.clear()
+        rows = self.score(self.dir, stride=10, resume=True)
+        self.assertEqual(sum(self.predictor._model.calls), 5)
+        self.assertEqual(len(rows), 4 + 30 + 8 + 5)
+
+    def test_existing_output_needs_resume(self):
+        self.score(os.path.join(self.dir, 'sensors', 'flat.csv'))
+        with self.assertRaises(CommandError):
+            self.score(os.path.join(self.dir, 'sensors', 'flat.csv'))
+
+    def test_window_layouts(self):
+        self.assertEqual(as_windows(self.windows, 10).shape, (30, 50, 12))
+        self.assertEqual(as_windows(self.windows.reshape(30, -1), 10).shape, (30, 50, 12))
+        self.assertEqual(as_windows(self.recording, 35).shape, (3, 50, 12))
+        with self.assertRaises(ValueError):
+            as_windows(np.zeros((10, 7)), 10)
+
+    @unittest.skipIf(HAS_PYARROW, 'pyarrow is installed')
+    def test_parquet_needs_pyarrow(self):
+        with self.assertRaises(CommandError):
+            call_command('batch_score', self.dir, output=os.path.join(self.dir, 'out.parquet'), stdout=StringIO())
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow not installed')
+    def test_parquet_parts_resume(self):
+        import pandas as pd
+
+        output = os.path.join(self.dir, 'out.parquet')
+        sensors = os.path.join(self.dir, 'sensors', 'session.npz')
+        call_command('batch_score', sensors, output=output, chunk_size=16, stdout=StringIO())
+        os.remove(os.path.join(output, sorted(os.listdir(output))[-1]))
+        call_command('batch_score', sensors, output=output, chunk_size=16, resume=True, stdout=StringIO())
+        table = pd.read_parquet(output)
+        self.assertEqual(len(table), table['sample_id'].nunique())
+
+
+class AudioBatchTests(BatchScoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.predictor._load_audio_models()
+        self.clips = os.path.join(self.dir, 'clips')
+        os.makedirs(os.path.join(self.clips, 'night'))
+        for name in CLIPS:
+            with open(os.path.join(self.clips, 'night', f'{name}.wav'), 'wb') as f:
+                f.write(wav_bytes(load_clip(name), SAMPLE_RATE))
+        with open(os.path.join(self.clips, 'broken.wav'), 'wb') as f:
+            f.write(b'not audio')
+
+    def test_clips_match_the_predictor(self):
+        rows = {row['sample_id']: row for row in self.score(self.clips, workers=1, chunk_size=3)}
+        self.assertEqual(len(rows), len(CLIPS) + 1)
+        self.assertEqual(rows[os.path.join(self.clips, 'broken.wav')]['status'], 'ERROR')
+
+        for name in CLIPS:
+            expected = self.predictor.predict_audio(os.path.join(self.clips, 'night', f'{name}.wav'))
+            row = rows[os.path.join(self.clips, 'night', f'{name}.wav')]
+            with self.subTest(clip=name):
+                self.assertEqual(row['is_threat'], str(expected['is_threat']))
+                self.assertAlmostEqual(float(row['confidence']), expected['confidence'], places=5)
+
+    def test_worker_pool(self):
+        serial = {row['sample_id']: row for row in self.score(self.clips, workers=1)}
+        os.remove(self.output)
+        pooled = {row['sample_id']: row for row in self.score(self.clips, workers=2, chunk_size=2)}
+        self.assertEqual(pooled, serial)
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from benchmarks.baseline import (
+    IMPROVED, NEW, NOT_COMPARABLE, REGRESSION, UNCHANGED, compare, load_results, regressions, save_results,
+    summarize,
+)
+
+
+def result(p50, **params):
+    return {'unit': 'ms', 'p50': p50, 'p95': p50, 'mean': p50, 'runs': 10, 'params': params}
+
+
+class BaselineTests(SimpleTestCase):
+    def test_summarize_in_milliseconds(self):
+        summary = summarize([0.001, 0.002, 0.003], officers=1000)
+        self.assertAlmostEqual(summary['p50'], 2.0)
+        self.assertAlmostEqual(summary['mean'], 2.0)
+        self.assertEqual((summary['runs'], summary['params']), (3, {'officers': 1000}))
+
+    def test_compare(self):
+        baseline = {
+            'slower': result(10.0), 'faster': result(10.0), 'noise': result(10.0),
+            'resized': result(10.0, officers=1000), 'dropped': result(1.0),
+        }
+        current = {
+            'slower': result(12.5), 'faster': result(7.0), 'noise': result(11.0),
+            'resized': result(50.0, officers=5000), 'added': result(1.0),
+        }
+        verdicts = {name: (change, verdict) for name, _, _, change, verdict in compare(baseline, current, 0.2)}
+        self.assertEqual(verdicts['slower'], (0.25, REGRESSION))
+        self.assertEqual(verdicts['faster'][1], IMPROVED)
+        self.assertEqual(verdicts['noise'][1], UNCHANGED)
+        self.assertEqual(verdicts['resized'], (None, NOT_COMPARABLE))
+        self.assertEqual(verdicts['added'], (None, NEW))
+        self.assertNotIn('dropped', verdicts)
+        self.assertEqual(regressions(compare(baseline, current, 0.2)), ['slower'])
+        self.assertEqual(regressions(compare(baseline, current, 0.3)), [])
+
+    def test_round_trip(self):
+        folder = tempfile.mkdtemp(prefix='bench-baseline-')
+        self.addCleanup(shutil.rmtree, folder)
+        path = os.path.join(folder, 'baselines', 'host.json')
+        results = {'geo.calculate_distance': summarize([0.0015] * 5, officers=1000)}
+        save_results(path, results)
+        self.assertEqual(load_results(path), results)
@@ -0,0 +1,99 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+MOVEMENT = '[' + ','.join(['[0,0,0,0,0,0,0,0,0,0,0,0]'] * 50) + ']'
+
+
+class SlowPredictor:
+    def __init__(self, movement_seconds):
+        self.movement_seconds = movement_seconds
+        self.threads = []
+
+    def predict(self, data):
+        self.threads.append(threading.current_thread().name)
+        time.sleep(self.movement_seconds)
+        return {'action': 'walking', 'confidence': 0.9, 'is_threat': False, 'status': 'SAFE'}
+
+
+class CombinedConcurrencyTests(SimpleTestCase):
+    def post(self, predictor, audio_seconds, audio_result=None):
+        audio_threads = []
+
+        def slow_audio(predictor, audio_file):
+            audio_threads.append(threading.current_thread().name)
+            time.sleep(audio_seconds)
+            return audio_result or {'is_threat': True, 'confidence': 0.8, 'status': 'THREAT'}
+
+        with mock.patch('emergency.views.get_predictor', return_value=predictor), \
+                mock.patch('emergency.views.predict_uploaded_audio', side_effect=slow_audio):
+            start = time.perf_counter()
+            response = APIClient().post('/api/emergency/predict-combined/', {
+                'movement_data': MOVEMENT,
+                'audio_file': SimpleUploadedFile('clip.wav', b'RIFF' + b'\x00' * 100, content_type='audio/wav'),
+            })
+            elapsed = time.perf_counter() - start
+        return response, elapsed, audio_threads
+
+    def test_branches_run_concurrently(self):
+        predictor = SlowPredictor(0.3)
+        response, elapsed, audio_threads = self.post(predictor, 0.3)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'THREAT DETECTED')
+        self.assertEqual(response.json()['threat_reason'], 'audio')
+        self.assertLess(elapsed, 0.55)
+        self.assertTrue(predictor.threads[0].startswith('combined-movement'))
+        self.assertTrue(audio_threads[0].startswith('combined-audio'))
+
+    @override_settings(ML_COMBINED_CONCURRENT=False)
+    def test_sequential_when_disabled(self):
+        response, elapsed, _ = self.post(SlowPredictor(0.2), 0.2)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(elapsed, 0.4)
+
+    @override_settings(ML_COMBINED_AUDIO_TIMEOUT=0.2)
+    def test_slow_audio_returns_the_movement_verdict(self):
+        response, elapsed, _ = self.post(SlowPredictor(0.0), 1.0)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 0.6)
+        body = response.json()
+        self.assertEqual(body['audio_result']['status'], 'TIMEOUT')
+        self.assertFalse(body['audio_result']['is_threat'])
+        self.assertEqual(body['movement_result']['action'], 'walking')
+        self.assertEqual(body['status'], 'SAFE')
+
+    @override_settings(ML_COMBINED_MOVEMENT_TIMEOUT=0.2)
+    def test_slow_movement_is_a_gateway_timeout(self):
+        response, elapsed, _ = self.post(SlowPredictor(1.0), 0.0)
+        self.assertEqual(response.status_code, 504)
+        self.assertLess(elapsed, 0.6)
+
+    @override_settings(ML_COMBINED_AUDIO_TIMEOUT=0.1)
+    def test_audio_outliving_the_request_still_reads_the_upload(self):
+        clip = b'RIFF' + bytes(range(100))
+        read = []
+        done = threading.Event()
+
+        def late_reader(predictor, audio_file):
+            time.sleep(0.4)  # long after the response closed request.FILES
+            audio_file.seek(0)
+            read.append((audio_file.read(), audio_file.name, audio_file.content_type))
+            done.set()
+            return {'is_threat': False, 'confidence': 0.0, 'status': 'SAFE'}
+
+        with mock.patch('emergency.views.get_predictor', return_value=SlowPredictor(0.0)), \
+                mock.patch('emergency.views.predict_uploaded_audio', side_effect=late_reader):
+            response = APIClient().post('/api/emergency/predict-combined/', {
+                'movement_data': MOVEMENT,
+                'audio_file': SimpleUploadedFile('clip.wav', clip, content_type='audio/wav'),
+            })
+            self.assertEqual(response.json()['audio_result']['status'], 'TIMEOUT')
+            self.assertTrue(done.wait(5))
+
+        self.assertEqual(read, [(clip, 'clip.wav', 'audio/wav')])
@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import AdminUser, User
+from emergency.audio_io import decode_audio_upload
+from emergency.feature_cache import AudioFeatureCache
+from emergency.ml_predictor import FastAudioFeatureExtractor
+from emergency.reference_clips import load_clip, wav_bytes
+
+MOVEMENT = '[' + ','.join(['[0,0,0,0,0,0,0,0,0,0,0,0]'] * 50) + ']'
+
+
+def upload(name='speech_like', content_type='audio/wav'):
+    return SimpleUploadedFile('clip.wav', wav_bytes(load_clip(name), 22050), content_type=content_type)
+
+
+class FeatureCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = AudioFeatureCache()
+        self.extractor = FastAudioFeatureExtractor()
+        caches['audio_features'].clear()
+        self.addCleanup(caches['audio_features'].clear)
+
+    def test_key_depends_on_content_and_extraction_settings(self):
+        key = self.cache.key_for_upload(upload(), self.extractor)
+        self.assertEqual(key, self.cache.key_for_upload(upload(), self.extractor))
+        self.assertEqual(key, self.cache.key_for_bytes(upload().read(), self.extractor, 'audio/wav'))
+
+        self.assertNotEqual(key, self.cache.key_for_upload(upload('scream_like'), self.extractor))
+        self.assertNotEqual(key, self.cache.key_for_upload(upload(), FastAudioFeatureExtractor(tempo_mode='autocorr')))
+        with override_settings(ML_AUDIO_RESAMPLER='polyphase'):
+            self.assertNotEqual(key, self.cache.key_for_upload(upload(), self.extractor))
+
+        # Same PCM bytes at another sample rate decode to a different clip
+        pcm = b'\x00\x01' * 1000
+        self.assertNotEqual(
+            self.cache.key_for_bytes(pcm, self.extractor, 'audio/pcm', {'rate': '16000'}),
+            self.cache.key_for_bytes(pcm, self.extractor, 'audio/pcm', {'rate': '44100'}),
+        )
+
+    def test_counters(self):
+        self.cache.reset_stats()
+        self.assertIsNone(self.cache.get('audio-features:x'))
+        self.cache.set('audio-features:x', {'a': 1.0})
+        self.assertEqual(self.cache.get('audio-features:x'), {'a': 1.0})
+        self.assertEqual(self.cache.get('audio-features:x'), {'a': 1.0})
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_entries_expire(self):
+        cache = AudioFeatureCache(timeout=60)
+        with mock.patch('django.core.cache.backends.base.time.time', return_value=1000.0):
+            cache.set('audio-features:x', {'a': 1.0})
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=1059.0):
+            self.assertIsNotNone(cache.get('audio-features:x'))
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=1061.0):
+            self.assertIsNone(cache.get('audio-features:x'))
+
+    @override_settings(CACHES={'small': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'small-audio-features',
+        'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3},
+    }})
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = AudioFeatureCache(alias='small')
+        cache.reset_stats()
+        for name in 'ab':
+            cache.set(f'audio-features:{name}', {name: 1.0})
+        cache.get('audio-features:a')  # a (and the hit counter) now more recent than b
+        cache.set('audio-features:c', {'c': 1.0})
+
+        self.assertIsNone(caches['small'].get('audio-features:b'))
+        self.assertIsNotNone(caches['small'].get('audio-features:a'))
+        self.assertIsNotNone(caches['small'].get('audio-features:c'))
+
+    def test_unavailable_cache_is_a_miss(self):
+        with mock.patch.object(self.cache.cache, 'get', side_effect=ConnectionError('redis down')), \
+                mock.patch.object(self.cache.cache, 'set', side_effect=ConnectionError('redis down')):
+            self.assertIsNone(self.cache.get('audio-features:x'))
+            self.cache.set('audio-features:x', {'a': 1.0})
+
+
+class FeatureCacheViewTests(SimpleTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.predictor = mock.Mock()
+        self.predictor.predict.return_value = {'action': 'walking', 'confidence': 0.9, 'is_threat': False, 'status': 'SAFE'}
+        self.predictor.predict_audio_features.return_value = {'is_threat': False, 'confidence': 0.9, 'status': 'SAFE'}
+        patcher = mock.patch('emergency.views.get_predictor', return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caches['audio_features'].clear()
+        self.addCleanup(caches['audio_features'].clear)
+
+    def test_repeated_clip_skips_decoding_and_extraction(self):
+        with mock.patch('emergency.views.decode_audio_upload', wraps=decode_audio_upload) as decode:
+            self.client.post('/api/emergency/predict-audio/', {'file': upload()})
+            self.client.post('/api/emergency/predict-combined/', {'movement_data': MOVEMENT, 'audio_file': upload()})
+            self.client.post('/api/emergency/predict-audio/', {'file': upload('scream_like')})
+
+        self.assertEqual(decode.call_count, 2)
+        first, second, third = [call[0][0] for call in self.predictor.predict_audio_features.call_args_list]
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+
+    @override_settings(ML_AUDIO_FEATURE_CACHE='')
+    def test_cache_can_be_disabled(self):
+        with mock.patch('emergency.views.decode_audio_upload', wraps=decode_audio_upload) as decode:
+            self.client.post('/api/emergency/predict-audio/', {'file': upload()})
+            self.client.post('/api/emergency/predict-audio/', {'file': upload()})
+        self.assertEqual(decode.call_count, 2)
+
+
+class FeatureCacheStatsViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='admin', email='admin@example.com', password='x', full_name='Admin')
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/emergency/admin/audio-feature-cache/').status_code, 403)
+
+    def test_reports_counters(self):
+        AdminUser.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+        AudioFeatureCache().reset_stats()
+        AudioFeatureCache().get('audio-features:missing')
+
+        response = self.client.get('/api/emergency/admin/audio-feature-cache/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['enabled'])
+        self.assertEqual((response.json()['hits'], response.json()['misses']), (0, 1))
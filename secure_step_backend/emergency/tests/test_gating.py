@@ -0,0 +1,193 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from emergency.gating import audio_level_db, is_quiet, still_windows
+from emergency.inference_service import RemotePredictor
+from emergency.ml_predictor import MLPredictor
+from emergency.reference_clips import SAMPLE_RATE, load_clip, wav_bytes
+from emergency.tests.test_inference_batcher import make_predictor
+from emergency.tests.test_window_scoring import ProjectionModel
+
+
+def still_window(seed=0, frames=50):
+    """Phone lying flat: sensor noise around gravity"""
+    rng = np.random.default_rng(seed)
+    window = np.zeros((frames, 12), dtype=np.float32)
+    window[:, 0:3] = rng.normal(scale=0.005, size=(frames, 3))
+    window[:, 3:6] = [0.0, 0.0, 9.81] + rng.normal(scale=0.02, size=(frames, 3))
+    window[:, 8:12] = [25, 165, 60, 22]
+    return window
+
+
+def moving_window(seed=0, frames=50):
+    window = still_window(seed, frames)
+    rng = np.random.default_rng(seed + 100)
+    window[:, 0:6] += rng.normal(scale=2.0, size=(frames, 6))
+    return window
+
+
+class MovementGateTests(SimpleTestCase):
+    def test_still_and_moving_windows(self):
+        windows = np.stack([still_window(), moving_window(), still_window(1)])
+        np.testing.assert_array_equal(still_windows(windows), [True, False, True])
+
+        # Rotating in place (gyroscope only) or a single jolt is not still
+        rotating = still_window()
+        rotating[:, 2] += np.linspace(0, 1, 50)
+        jolt = still_window()
+        jolt[25, 3:6] += [3.0, 0.0, 0.0]
+        np.testing.assert_array_equal(still_windows(np.stack([rotating, jolt])), [False, False])
+
+    @override_settings(ML_GATING_ENABLED=True)
+    def test_still_window_skips_the_model(self):
+        predictor = make_predictor(ProjectionModel())
+        with mock.patch.object(MLPredictor, '_ensure_movement_models', side_effect=AssertionError('model used')):
+            result = predictor.predict(still_window().tolist())
+
+        self.assertEqual(result['status'], 'SAFE')
+        self.assertEqual(result['gated'], 'low_motion')
+        self.assertFalse(result['is_threat'])
+
+    @override_settings(ML_GATING_ENABLED=True)
+    def test_only_moving_windows_reach_the_model(self):
+        model = ProjectionModel()
+        predictor = make_predictor(model)
+        windows = [still_window(0), moving_window(1), still_window(2), moving_window(3)]
+
+        results = predictor.predict_batch(windows)
+
+        self.assertEqual(model.calls, [2])
+        self.assertEqual([r.get('gated') for r in results], ['low_motion', None, 'low_motion', None])
+        with override_settings(ML_GATING_ENABLED=False):
+            ungated = predictor.predict_batch(windows)
+        self.assertEqual(results[1], ungated[1])
+        self.assertEqual(results[3], ungated[3])
+
+    @override_settings(ML_GATING_ENABLED=True)
+    def test_long_recordings_gate_each_window(self):
+        model = ProjectionModel()
+        predictor = make_predictor(model)
+        frames = np.concatenate([still_window(0, 100), moving_window(1, 60)])
+
+        response = predictor.predict_windows(frames, stride=10)
+
+        gated = [w['start_frame'] for w in response['windows'] if w.get('gated')]
+        self.assertEqual(gated, [0, 10, 20, 30, 40, 50])
+        self.assertEqual(sum(model.calls), len(response['windows']) - len(gated))
+
+    def test_disabled_by_default(self):
+        model = ProjectionModel()
+        predictor = make_predictor(model)
+        self.assertNotIn('gated', predictor.predict(still_window().tolist()))
+        self.assertEqual(model.calls, [1])
+
+    @override_settings(ML_GATING_ENABLED=True)
+    def test_gated_window_is_safe_in_predict_combined(self):
+        predictor = make_predictor(ProjectionModel())
+        with mock.patch('emergency.views.get_predictor', return_value=predictor):
+            response = APIClient().post('/api/emergency/predict-combined/', {
+                'movement_data': json.dumps(still_window().tolist()),
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'SAFE')
+        self.assertEqual(response.json()['movement_result']['gated'], 'low_motion')
+
+    @override_settings(ML_GATING_ENABLED=True)
+    def test_remote_predictor_gates_before_calling_the_service(self):
+        client = mock.Mock()
+        client.call.side_effect = lambda kind, batch: [{'action': 'walking', 'status': 'SAFE'}] * len(batch)
+        predictor = RemotePredictor(client)
+
+        self.assertEqual(predictor.predict(still_window())['gated'], 'low_motion')
+        client.call.assert_not_called()
+
+        results = predictor.predict_batch([still_window(), moving_window()])
+        self.assertEqual(len(client.call.call_args[0][1]), 1)
+        self.assertEqual([r['action'] for r in results], ['idle', 'walking'])
+
+
+class AudioGateTests(SimpleTestCase):
+    def test_levels(self):
+        self.assertLess(audio_level_db(load_clip('near_silence')), -70)
+        self.assertGreater(audio_level_db(load_clip('scream_like')), -10)
+        self.assertEqual(audio_level_db(np.zeros(1000)), -120.0)
+        self.assertTrue(is_quiet(load_clip('near_silence'), threshold_db=-50))
+
+    def test_short_burst_in_silence_is_not_quiet(self):
+        audio = load_clip('near_silence').astype(np.float32)
+        audio[-1500:] += 0.3 * np.sin(np.arange(1500) / 3.0)  # shorter than one block, at the very end
+        self.assertFalse(is_quiet(audio, threshold_db=-50))
+
+    @override_settings(ML_GATING_ENABLED=True)
+    def test_quiet_upload_skips_feature_extraction(self):
+        predictor = mock.Mock()
+        self.addCleanup(caches['audio_features'].clear)
+        upload = SimpleUploadedFile('clip.wav', wav_bytes(load_clip('near_silence'), SAMPLE_RATE, 'FLOAT'),
+                                    content_type='audio/wav')
+
+        with mock.patch('emergency.views.get_predictor', return_value=predictor), \
+                mock.patch('emergency.ml_predictor.FastAudioFeatureExtractor.extract_features',
+                           side_effect=AssertionError('features extracted')):
+            response = APIClient().post('/api/emergency/predict-audio/', {'file': upload})
+
+        self.assertEqual(response.json()['gated'], 'silence')
+        self.assertEqual(response.json()['status'], 'SAFE')
+        predictor.predict_audio_features.assert_not_called()
+
+    @override_settings(ML_GATING_ENABLED=True)
+    def test_predict_audio_signal_gates(self):
+        with mock.patch.object(MLPredictor, 'load_models'):
+            predictor = MLPredictor()
+        self.assertEqual(predictor.predict_audio_signal(load_clip('near_silence'), SAMPLE_RATE)['gated'], 'silence')
+
+
+class EvaluateGatingCommandTests(SimpleTestCase):
+    def test_report(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            for kind, folder, items in (
+                ('audio', 'threat', {'scream_like.wav': load_clip('scream_like')}),
+                ('audio', 'safe', {'near_silence.wav': load_clip('near_silence'), 'tone.wav': load_clip('tone')}),
+                ('movement', 'threat', {'attack.npy': moving_window(0, 120)}),
+                ('movement', 'safe', {'desk.csv': still_window(1, 80), 'walk.npy': moving_window(2, 80)}),
+            ):
+                os.makedirs(os.path.join(data_dir, kind, folder))
+                for name, data in items.items():
+                    path = os.path.join(data_dir, kind, folder, name)
+                    if name.endswith('.wav'):
+                        sf.write(path, data, SAMPLE_RATE, subtype='FLOAT')
+                    elif name.endswith('.csv'):
+                        np.savetxt(path, data, delimiter=',', header=','.join(f'c{i}' for i in range(12)), comments='')
+                    else:
+                        np.save(path, data)
+
+            # Real audio model, fake movement model
+            real = MLPredictor.get_instance()
+            if not real._audio_models_loaded():
+                self.skipTest('Audio model files not available')
+            predictor = make_predictor(ProjectionModel())
+            predictor._audio_model, predictor._audio_scaler = real._audio_model, real._audio_scaler
+
+            out = StringIO()
+            with mock.patch.object(MLPredictor, 'get_instance', return_value=predictor):
+                call_command('evaluate_gating', data_dir, '--audio-rms-db=-60,-30',
+                             '--gyro-std', '0.05', '--accel-range', '0.5,5', stdout=out)
+
+        report = out.getvalue()
+        self.assertIn('3 audio clips (1 threat, 2 safe)', report)
+        self.assertIn('3 movement recordings (1 threat, 2 safe)', report)
+        for row in ('-60 dBFS', '-30 dBFS', 'gyro<0.05 accel<0.5', 'gyro<0.05 accel<5'):
+            self.assertIn(row, report)
+        # Only the desk recording is still: its 4 windows out of 8 + 4 + 4
+        self.assertIn('25.0%', report)
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from emergency.golden import (
+    FEATURE_ATOL, FEATURE_RTOL, PROBABILITY_ATOL, SCALED_ATOL, feature_deviations, file_sha256, load_golden,
+    model_paths, movement_probabilities, reference_clips, signal_sha256, synthetic_windows,
+)
+from emergency.ml_predictor import FastAudioFeatureExtractor, MLPredictor
+from emergency.movement_backends import scaler_affine
+from emergency.reference_features import ReferenceAudioFeatureExtractor
+
+
+class PerturbedExtractor(FastAudioFeatureExtractor):
+    """An 'optimization' that changes one feature by 0.1%"""
+
+    def extract_features(self, audio, sr):
+        features = super().extract_features(audio, sr)
+        features['spec_cent_mean'] *= 1.001
+        return features
+
+
+class GoldenTestCase(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.audio, cls.movement = load_golden()
+        cls.clips = reference_clips()
+        cls.names = list(cls.audio['clips'])
+        cls.predictor = MLPredictor.get_instance()
+        cls.checksums = {name: file_sha256(path) for name, path in model_paths(cls.predictor).items()}
+
+    def assert_features_match(self, extractor):
+        for name in self.names:
+            with self.subTest(clip=name):
+                expected = self.audio['clips'][name]['features']
+                actual = extractor.extract_features(*self.clips[name])
+                self.assertEqual(list(actual), list(expected))
+                for key, value in expected.items():
+                    np.testing.assert_allclose(actual[key], value, rtol=FEATURE_RTOL, atol=FEATURE_ATOL, err_msg=key)
+
+
+class GoldenInputTests(GoldenTestCase):
+    def test_reference_inputs_are_unchanged(self):
+        for name in self.names:
+            with self.subTest(clip=name):
+                self.assertEqual(signal_sha256(self.clips[name][0]), self.audio['clips'][name]['signal_sha256'])
+        np.testing.assert_array_equal(synthetic_windows(), self.movement['windows'][:len(synthetic_windows())])
+
+
+class AudioGoldenTests(GoldenTestCase):
+    def test_fast_extractor(self):
+        self.assert_features_match(FastAudioFeatureExtractor())
+
+    def test_reference_extractor(self):
+        # Pins librosa / scipy: a library upgrade that moves the training-time features fails here
+        self.assert_features_match(ReferenceAudioFeatureExtractor())
+
+    def test_scaled_rows_and_probabilities(self):
+        if not self.predictor._audio_models_loaded():
+            self.skipTest('Audio model files not available')
+        if self.checksums['audio_scaler'] != self.audio['audio_scaler_sha256']:
+            self.skipTest('feature_scaler.pkl differs from the goldens')
+
+        scorer = self.predictor._get_audio_scorer()
+        matrix = scorer.matrix([self.audio['clips'][name]['features'] for name in self.names])
+        scaled = [self.audio['clips'][name]['scaled'] for name in self.names]
+        np.testing.assert_allclose(scorer.scale_rows(matrix), scaled, atol=SCALED_ATOL)
+
+        if self.checksums['audio_model'] != self.audio['audio_model_sha256']:
+            self.skipTest('audio model differs from the goldens')
+        probabilities = [self.audio['clips'][name]['threat_probability'] for name in self.names]
+        np.testing.assert_allclose(scorer.threat_probabilities(matrix), probabilities, atol=PROBABILITY_ATOL)
+
+        # The per-request path gives the same numbers
+        for name, p in zip(self.names, probabilities):
+            result = self.predictor.score_audio_features(self.audio['clips'][name]['features'])
+            self.assertAlmostEqual(result['threat_probability'], p, delta=PROBABILITY_ATOL)
+
+
+class MovementGoldenTests(GoldenTestCase):
+    def setUp(self):
+        if self.predictor._scaler is None:
+            self.skipTest('scaler.pkl not available')
+        if self.checksums['movement_scaler'] != self.movement['movement_scaler_sha256']:
+            self.skipTest('scaler.pkl differs from the goldens')
+        self.windows = self.movement['windows']
+
+    def test_scaler(self):
+        scaled = self.predictor._scaler.transform(self.windows.reshape(-1, 12)).reshape(self.windows.shape)
+        np.testing.assert_allclose(scaled, self.movement['scaled'], atol=SCALED_ATOL)
+
+    def test_folded_scaler(self):
+        # The affine form the quantized backends bake into their graph
+        gain, offset = scaler_affine(self.predictor._scaler)
+        np.testing.assert_allclose(self.windows * gain + offset, self.movement['scaled'], atol=SCALED_ATOL)
+
+    def test_probabilities(self):
+        if self.predictor._model is None:
+            self.skipTest('Movement model not available')
+        if self.checksums['movement_model'] != self.movement.get('movement_model_sha256'):
+            self.skipTest('No goldens for this movement model')
+        np.testing.assert_allclose(movement_probabilities(self.predictor, self.windows),
+                                   self.movement['probabilities'], atol=PROBABILITY_ATOL)
+
+
+class GoldenParityCommandTests(SimpleTestCase):
+    def run_command(self, **options):
+        out = StringIO()
+        call_command('golden_parity', stdout=out, **options)
+        return out.getvalue()
+
+    def test_current_pipeline_passes(self):
+        output = self.run_command()
+        self.assertIn('✅ audio features', output)
+        self.assertNotIn('❌', output)
+
+    def test_drift_is_reported(self):
+        with self.assertRaisesRegex(CommandError, 'audio features'):
+            self.run_command(new='emergency.tests.test_golden:PerturbedExtractor')
+
+    def test_side_by_side(self):
+        output = self.run_command(old='fast', new='emergency.tests.test_golden:PerturbedExtractor', top=1)
+        first_row = output.splitlines()[2]
+        self.assertTrue(first_row.startswith('spec_cent_mean'))
+        self.assertAlmostEqual(float(first_row.split()[-1]), 1e-3, places=6)
+
+    def test_unknown_extractor(self):
+        with self.assertRaises(CommandError):
+            self.run_command(new='turbo')
+
+    def test_update_writes_loadable_goldens(self):
+        golden_dir = tempfile.mkdtemp(prefix='golden-')
+        self.addCleanup(shutil.rmtree, golden_dir)
+        self.run_command(update=True, golden_dir=golden_dir)
+        audio, movement = load_golden(golden_dir)
+        self.assertEqual(set(audio['clips']), set(reference_clips()))
+        self.assertEqual(movement['windows'].shape[1:], (50, 12))
+        self.assertIn('✅', self.run_command(golden_dir=golden_dir))
+
+    def test_update_refuses_a_failing_beat_tracker(self):
+        golden_dir = tempfile.mkdtemp(prefix='golden-')
+        self.addCleanup(shutil.rmtree, golden_dir)
+        with mock.patch('librosa.beat.beat_track', side_effect=AttributeError('hann')), \
+                self.assertRaisesRegex(CommandError, 'tempo 0 for every clip'):
+            self.run_command(update=True, golden_dir=golden_dir)
+        self.assertEqual(os.listdir(golden_dir), [])
+
+    def test_deviations(self):
+        deviations = feature_deviations([{'a': 1.0, 'b': 2.0, 'c': float('nan')}],
+                                        [{'a': 1.5, 'b': 2.0, 'c': 1.0, 'd': 0.0}])
+        self.assertEqual(deviations['a'], (0.5, 0.5))
+        self.assertEqual(deviations['b'], (0.0, 0.0))
+        self.assertEqual(deviations['c'], (np.inf, np.inf))
+        self.assertEqual(deviations['d'], (np.inf, np.inf))
@@ -0,0 +1,127 @@
+import threading
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from emergency.inference_batcher import InferenceBatcher
+from emergency.ml_predictor import MLPredictor
+
+
+class RecordingModel:
+    """Stand-in for the Keras model that records every batch it sees"""
+
+    def __init__(self, num_classes=3):
+        self.num_classes = num_classes
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self.lock:
+            self.batch_sizes.append(len(batch))
+        # Encode the first value of each window into the output so callers
+        # can check they received their own row back
+        out = np.zeros((len(batch), self.num_classes))
+        for i, window in enumerate(batch):
+            out[i, int(window.flat[0]) % self.num_classes] = 1.0
+        return out
+
+    def predict(self, batch, verbose=0):
+        return self(batch)
+
+
+class InferenceBatcherTests(SimpleTestCase):
+    def test_single_item_round_trip(self):
+        model = RecordingModel()
+        batcher = InferenceBatcher(model, max_batch_size=8, max_wait_ms=1)
+        try:
+            result = batcher.predict(np.full((50, 12), 2.0), timeout=5)
+        finally:
+            batcher.close()
+
+        self.assertEqual(int(np.argmax(result)), 2)
+        self.assertEqual(model.batch_sizes, [1])
+
+    def test_concurrent_requests_share_a_batch(self):
+        model = RecordingModel()
+        batcher = InferenceBatcher(model, max_batch_size=16, max_wait_ms=200)
+        results = {}
+        start = threading.Barrier(8)
+
+        def worker(i):
+            start.wait()
+            results[i] = batcher.predict(np.full((50, 12), float(i)), timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        batcher.close()
+
+        for i, row in results.items():
+            self.assertEqual(int(np.argmax(row)), i % model.num_classes)
+        self.assertLess(len(model.batch_sizes), 8)
+        self.assertEqual(sum(model.batch_sizes), 8)
+
+    def test_batch_size_is_capped(self):
+        model = RecordingModel()
+        batcher = InferenceBatcher(model, max_batch_size=2, max_wait_ms=50)
+        futures = [batcher.submit(np.zeros((50, 12))) for _ in range(5)]
+        for future in futures:
+            future.result(timeout=5)
+        batcher.close()
+
+        self.assertTrue(all(size <= 2 for size in model.batch_sizes))
+
+    def test_errors_propagate_to_every_caller(self):
+        def broken(batch):
+            raise ValueError("model exploded")
+
+        batcher = InferenceBatcher(broken, max_wait_ms=1)
+        future = batcher.submit(np.zeros((50, 12)))
+        with self.assertRaises(ValueError):
+            future.result(timeout=5)
+        batcher.close()
+
+
+def make_predictor(model):
+    """MLPredictor wired to a fake model and the real scaler/label encoder"""
+    with mock.patch.object(MLPredictor, 'load_models'):
+        predictor = MLPredictor()
+
+    encoder = mock.Mock()
+    encoder.inverse_transform.side_effect = lambda idx: [MLPredictor.THREAT_LABELS[idx[0]]]
+    scaler = mock.Mock()
+    scaler.transform.side_effect = lambda x: x
+
+    predictor._model = model
+    predictor._scaler = scaler
+    predictor._label_encoder = encoder
+    return predictor
+
+
+class MLPredictorBatchingTests(SimpleTestCase):
+    @override_settings(ML_BATCHING_ENABLED=True, ML_BATCH_MAX_WAIT_MS=1)
+    def test_predict_goes_through_batcher(self):
+        model = RecordingModel()
+        predictor = make_predictor(model)
+        try:
+            result = predictor.predict(np.full((50, 12), 1.0).tolist())
+        finally:
+            predictor._batcher.close()
+
+        self.assertEqual(result['action'], MLPredictor.THREAT_LABELS[1])
+        self.assertEqual(result['status'], 'THREAT')
+
+    @override_settings(ML_BATCHING_ENABLED=False)
+    def test_predict_batch_matches_predict(self):
+        model = RecordingModel()
+        predictor = make_predictor(model)
+        windows = [np.full((50, 12), float(i)) for i in range(3)]
+
+        batched = predictor.predict_batch(windows)
+        single = [predictor.predict(w) for w in windows]
+
+        self.assertEqual(batched, single)
+        self.assertEqual(model.batch_sizes, [3, 1, 1, 1])
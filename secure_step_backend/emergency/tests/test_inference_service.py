@@ -0,0 +1,275 @@
+import os
+import signal
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from emergency.inference_service import (
+    InferenceClient, InferenceService, InferenceServiceError, InferenceTimeout, RemotePredictor,
+)
+from emergency.ml_predictor import MLPredictor, get_predictor
+from emergency.model_state import FAILED, ModelState, ModelUnavailable
+from emergency.views import model_unavailable_response
+
+FEATURE_NAMES = ['audio_mean', 'audio_std', 'tempo']
+UNAVAILABLE = 99.0  # first value of a window the fake movement model refuses
+
+
+class FakePredictor:
+    """Loaded inside the service workers instead of the real models"""
+
+    def predict(self, data):
+        if data[0, 0] == UNAVAILABLE:
+            state = ModelState('movement')
+            state.state, state.error, state.next_retry_at = FAILED, 'bilstm_action_model.h5 missing', time.time() + 30
+            raise ModelUnavailable(state)
+        if data[0, 0] < 0:
+            time.sleep(float(-data[0, 0]))
+        return {'action': 'walking', 'confidence': float(data.mean()), 'is_threat': False, 'shape': list(data.shape)}
+
+    def predict_batch(self, windows):
+        return [self.predict(window) for window in windows]
+
+    def audio_feature_names(self):
+        return FEATURE_NAMES
+
+    def score_audio_features(self, features):
+        if features['tempo'] < 0:
+            raise ValueError('bad tempo')
+        return {'features': features, 'status': 'SAFE'}
+
+    def model_status(self):
+        return {'movement': {'state': 'ready'}, 'audio': {'state': 'failed'}}
+
+    def score_audio_batch(self, rows):
+        return [self.score_audio_features(dict(zip(FEATURE_NAMES, row.tolist()))) for row in rows]
+
+
+def fake_predictor():
+    return FakePredictor()
+
+
+class InferenceServiceTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.service = InferenceService(
+            address='127.0.0.1:0',
+            pool_size=2,
+            timeout=2.0,
+            predictor_factory='emergency.tests.test_inference_service.fake_predictor',
+        ).start()
+        cls.service.serve_in_background()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+        super().tearDownClass()
+
+    def make_client(self, timeout=2.0):
+        client = InferenceClient(address=self.service.address, timeout=timeout)
+        self.addCleanup(client.close)
+        return client
+
+    def test_workers_are_separate_processes(self):
+        import os
+
+        pids = self.service.worker_pids
+        self.assertEqual(len(set(pids)), 2)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_movement_round_trip(self):
+        predictor = RemotePredictor(self.make_client())
+        window = np.full((50, 12), 0.25).tolist()
+
+        result = predictor.predict(window)
+
+        self.assertEqual(result['action'], 'walking')
+        self.assertAlmostEqual(result['confidence'], 0.25, places=6)
+        self.assertEqual(result['shape'], [50, 12])
+
+    def test_batch_round_trip(self):
+        predictor = RemotePredictor(self.make_client())
+        windows = [np.full((50, 12), float(i)) for i in range(3)]
+
+        results = predictor.predict_batch(windows)
+
+        self.assertEqual([r['confidence'] for r in results], [0.0, 1.0, 2.0])
+
+    def test_windows_round_trip(self):
+        predictor = RemotePredictor(self.make_client())
+        frames = np.repeat(np.arange(80, dtype=np.float32), 12).reshape(80, 12)
+
+        response = predictor.predict_windows(frames, stride=15)
+
+        self.assertEqual([w['start_frame'] for w in response['windows']], [0, 15, 30])
+        self.assertEqual([w['confidence'] for w in response['windows']], [24.5, 39.5, 54.5])
+        self.assertEqual(response['aggregate']['num_windows'], 3)
+
+    def test_audio_features_keep_their_names(self):
+        predictor = RemotePredictor(self.make_client())
+
+        result = predictor.score_audio_features({'audio_mean': 0.1, 'audio_std': 0.2, 'tempo': 120.0})
+
+        self.assertEqual(result['features'], {'audio_mean': 0.1, 'audio_std': 0.2, 'tempo': 120.0})
+
+    def test_audio_features_are_sent_in_scaler_order(self):
+        predictor = RemotePredictor(self.make_client())
+
+        result = predictor.score_audio_features({'tempo': 120.0, 'audio_std': 0.2, 'audio_mean': 0.1})
+        self.assertEqual(result['features'], {'audio_mean': 0.1, 'audio_std': 0.2, 'tempo': 120.0})
+
+        results = predictor.score_audio_batch([{'tempo': 90.0, 'audio_mean': 0.3, 'audio_std': 0.4}])
+        self.assertEqual(results[0]['features'], {'audio_mean': 0.3, 'audio_std': 0.4, 'tempo': 90.0})
+
+    def test_audio_features_must_match_the_scaler(self):
+        predictor = RemotePredictor(self.make_client())
+        for features in ({'audio_mean': 0.1, 'audio_std': 0.2},
+                         {'audio_mean': 0.1, 'audio_std': 0.2, 'tempo': 1.0, 'zcr_mean': 0.0},
+                         {'audio_mean': 0.1, 'audio_std': 0.2, 'bpm': 1.0}):
+            with self.subTest(features=features), self.assertRaises(ValueError):
+                predictor.score_audio_features(features)
+
+    def test_audio_feature_batch(self):
+        predictor = RemotePredictor(self.make_client())
+        rows = [{'audio_mean': 0.1, 'audio_std': 0.2, 'tempo': 120.0},
+                {'audio_mean': 0.3, 'audio_std': 0.4, 'tempo': 90.0}]
+
+        results = predictor.score_audio_batch(rows)
+
+        self.assertEqual([r['features'] for r in results], rows)
+        self.assertEqual(predictor.score_audio_batch([]), [])
+
+    def test_model_status(self):
+        predictor = RemotePredictor(self.make_client())
+        self.assertEqual(predictor.model_status()['audio'], {'state': 'failed'})
+
+    def test_worker_errors_are_reported(self):
+        client = self.make_client()
+        with self.assertRaises(InferenceServiceError):
+            client.call('audio_features', np.array([0.0, 0.0, -1.0]))
+        # The connection stays usable
+        self.assertEqual(client.call('movement', np.zeros((50, 12), dtype=np.float32))['action'], 'walking')
+
+    def test_model_unavailable_is_raised_on_the_client(self):
+        window = np.zeros((50, 12), dtype=np.float32)
+        window[0, 0] = UNAVAILABLE
+        with self.assertRaises(ModelUnavailable) as raised:
+            self.make_client().call('movement', window)
+
+        state = raised.exception.state
+        self.assertEqual((state.name, state.state, state.error), ('movement', FAILED, 'bilstm_action_model.h5 missing'))
+        response = model_unavailable_response(raised.exception)
+        self.assertEqual(response.status_code, 503)
+        self.assertGreater(int(response['Retry-After']), 20)
+
+    def test_timeout_does_not_poison_the_pool(self):
+        client = self.make_client(timeout=0.2)
+        slow = np.full((50, 12), -1.0, dtype=np.float32)
+        with self.assertRaises(InferenceTimeout):
+            client.call('movement', slow)
+
+        # Subsequent requests still get their own answers
+        for value in (0.5, 0.75, 1.0):
+            result = self.make_client().call('movement', np.full((50, 12), value, dtype=np.float32))
+            self.assertAlmostEqual(result['confidence'], value, places=6)
+
+    def test_unreachable_service(self):
+        client = InferenceClient(address='127.0.0.1:1', timeout=0.5)
+        with self.assertRaises(InferenceServiceError):
+            client.call('movement', np.zeros((50, 12), dtype=np.float32))
+
+
+class WorkerRecoveryTests(SimpleTestCase):
+    def setUp(self):
+        self.service = InferenceService(
+            address='127.0.0.1:0',
+            pool_size=2,
+            timeout=60.0,
+            predictor_factory='emergency.tests.test_inference_service.fake_predictor',
+        ).start()
+        self.service.serve_in_background()
+        self.addCleanup(self.service.close)
+        self.client = InferenceClient(address=self.service.address, timeout=60.0)
+        self.addCleanup(self.client.close)
+
+    def kill_workers(self):
+        pids = self.service.worker_pids
+        for pid in pids:
+            os.kill(pid, signal.SIGKILL)
+        for worker in self.service._workers:
+            worker.process.join(timeout=5)
+        return pids
+
+    def assert_serves(self):
+        result = self.client.call('movement', np.full((50, 12), 0.5, dtype=np.float32))
+        self.assertAlmostEqual(result['confidence'], 0.5, places=6)
+
+    def test_idle_workers_killed(self):
+        pids = self.kill_workers()
+
+        self.assert_serves()
+        self.assert_serves()
+        new_pids = self.service.worker_pids
+        self.assertEqual(len(new_pids), 2)
+        self.assertFalse(set(pids) & set(new_pids))
+
+    def test_worker_killed_mid_request(self):
+        errors = []
+
+        def slow_request():
+            try:
+                self.client.call('movement', np.full((50, 12), -30.0, dtype=np.float32))
+            except InferenceServiceError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=slow_request)
+        thread.start()
+        time.sleep(0.5)
+        self.kill_workers()
+        thread.join(timeout=10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertIn('died', str(errors[0]))
+        for _ in range(3):
+            self.assert_serves()
+
+    def test_wedged_workers_are_replaced(self):
+        pids = self.service.worker_pids
+        client = InferenceClient(address=self.service.address, timeout=0.3)
+        self.addCleanup(client.close)
+        # Each worker hangs far beyond the request timeout
+        for _ in range(2):
+            with self.assertRaises(InferenceTimeout):
+                client.call('movement', np.full((50, 12), -300.0, dtype=np.float32))
+
+        for _ in range(3):
+            self.assert_serves()
+        self.assertFalse(set(pids) & set(self.service.worker_pids))
+
+
+class InferenceTimeoutViewTests(SimpleTestCase):
+    def test_timeout_is_a_gateway_timeout(self):
+        predictor = mock.Mock()
+        predictor.predict.side_effect = InferenceTimeout('Inference did not finish within 2.0s')
+        with mock.patch('emergency.views.get_predictor', return_value=predictor):
+            response = APIClient().post('/api/emergency/predict/', {'data': np.ones((50, 12)).tolist()},
+                                        format='json')
+        self.assertEqual(response.status_code, 504)
+        self.assertIn('2.0s', response.json()['error'])
+
+
+class GetPredictorTests(SimpleTestCase):
+    @override_settings(ML_INFERENCE_MODE='in_process')
+    def test_in_process_mode(self):
+        with mock.patch.object(MLPredictor, 'get_instance', return_value='local') as get_instance:
+            self.assertEqual(get_predictor(), 'local')
+        get_instance.assert_called_once()
+
+    @override_settings(ML_INFERENCE_MODE='service')
+    def test_service_mode(self):
+        self.assertIsInstance(get_predictor(), RemotePredictor)
@@ -0,0 +1,87 @@
+import json
+import subprocess
+import sys
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from emergency.ml_predictor import MLPredictor
+
+HEAVY_MODULES = ['tensorflow', 'xgboost', 'librosa', 'scipy', 'pandas', 'sklearn']
+
+# Generous enough for a cold CI box; importing TensorFlow alone blows well past it
+IMPORT_BUDGET_SECONDS = 4.0
+
+PROBE = """
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'secure_step_backend.settings')
+start = time.perf_counter()
+import django
+django.setup()
+import emergency.views
+import emergency.urls
+import emergency.tasks
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+class ImportBudgetTests(SimpleTestCase):
+    def test_views_do_not_import_ml_stack(self):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+
+        self.assertEqual(report['loaded'], [], f"Eagerly imported: {report['loaded']}")
+        self.assertLess(report['elapsed'], IMPORT_BUDGET_SECONDS)
+
+
+class GetInstanceTests(SimpleTestCase):
+    def setUp(self):
+        self._saved = MLPredictor._instance
+        MLPredictor._instance = None
+
+    def tearDown(self):
+        MLPredictor._instance = self._saved
+
+    def test_concurrent_first_calls_load_once(self):
+        barrier = threading.Barrier(8)
+        instances = []
+
+        def slow_load(predictor):
+            threading.Event().wait(0.05)
+
+        def worker():
+            barrier.wait()
+            instances.append(MLPredictor.get_instance())
+
+        with mock.patch.object(MLPredictor, 'load_models', autospec=True, side_effect=slow_load) as load:
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(load.call_count, 1)
+        self.assertTrue(all(instance is instances[0] for instance in instances))
+
+
+class WarmUpTests(SimpleTestCase):
+    def test_warm_up_runs_dummy_movement_inference(self):
+        with mock.patch.object(MLPredictor, 'load_models'):
+            predictor = MLPredictor()
+        predictor._model = mock.Mock()
+        predictor._audio_model = None
+
+        predictor.warm_up()
+
+        batch = predictor._model.predict.call_args[0][0]
+        self.assertEqual(batch.shape, (1, 50, 12))
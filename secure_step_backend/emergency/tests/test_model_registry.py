@@ -0,0 +1,220 @@
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from emergency.model_registry import (
+    DEFAULT_VERSION, ModelRegistry, ModelVersionError, RoutedPredictor, cohort_version, parse_version_header,
+)
+from emergency.model_state import READY, ModelState
+from emergency.ml_predictor import AUDIO_MODEL_NATIVE_FILE, FastAudioFeatureExtractor, MLPredictor
+from emergency.reference_clips import CLIPS, SAMPLE_RATE, load_clip
+
+ML_MODELS = os.path.join(settings.BASE_DIR, 'ml_models')
+
+
+class FakeVersion:
+    """Stand-in for an MLPredictor over one version directory"""
+
+    memory_mb = 40.0
+
+    def __init__(self, base_path, groups):
+        self.base_path = base_path
+        self.version = os.path.basename(base_path)
+        self.model_states = {}
+        for group in groups:
+            self.model_states[group] = ModelState(group)
+            self.model_states[group].state = READY
+            self.model_states[group].memory_mb = self.memory_mb
+        self.close = mock.Mock()
+
+    def predict(self, data):
+        # v2 disagrees with the default on every other window
+        action = 'punch' if self.version == 'v2' and data[0][0] % 2 else 'walking'
+        return {'action': action, 'confidence': 0.5 if self.version == 'v2' else 0.9}
+
+    def predict_audio_features(self, features):
+        return {'is_threat': False, 'confidence': 0.8, 'version': self.version}
+
+
+def write_version(root, name, groups):
+    """A version directory holding 1 MB placeholder files for `groups`"""
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    files = {'movement': ('scaler.pkl', 'label_encoder.pkl', 'bilstm_action_model.h5'),
+             'audio': ('feature_scaler.pkl', AUDIO_MODEL_NATIVE_FILE)}
+    for group in groups:
+        for filename in files[group]:
+            with open(os.path.join(path, filename), 'wb') as f:
+                f.truncate(1024 * 1024)
+    return path
+
+
+class RegistryTestCase(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write_version(self.root, 'v2', ('movement', 'audio'))
+        write_version(self.root, 'v3', ('audio',))
+
+        self.default = FakeVersion(ML_MODELS, ('movement', 'audio'))
+        for patcher in (
+            override_settings(ML_MODEL_VERSIONS_DIR=self.root, ML_MODEL_COHORTS={}, ML_MODEL_SHADOW={},
+                              ML_MODEL_MEMORY_BUDGET_MB=0),
+            mock.patch('emergency.model_registry.MLPredictor', mock.Mock(
+                side_effect=FakeVersion, get_instance=mock.Mock(return_value=self.default))),
+        ):
+            patcher.start() if hasattr(patcher, 'start') else patcher.enable()
+            self.addCleanup(patcher.stop if hasattr(patcher, 'stop') else patcher.disable)
+        self.registry = ModelRegistry()
+
+    def request(self, header=None, user_id=None):
+        meta = {'HTTP_X_MODEL_VERSION': header} if header else {}
+        user = SimpleNamespace(pk=user_id, is_authenticated=user_id is not None)
+        return SimpleNamespace(META=meta, user=user)
+
+
+class SelectionTests(RegistryTestCase):
+    def test_parse_header(self):
+        self.assertEqual(parse_version_header('v2'), {'*': 'v2'})
+        self.assertEqual(parse_version_header('movement=v2, audio=v3'), {'movement': 'v2', 'audio': 'v3'})
+        with self.assertRaises(ModelVersionError):
+            parse_version_header('gesture=v2')
+
+    def test_versions_per_group(self):
+        self.assertEqual(self.registry.versions('movement'), [DEFAULT_VERSION, 'v2'])
+        self.assertEqual(self.registry.versions('audio'), [DEFAULT_VERSION, 'v2', 'v3'])
+
+    def test_versions_are_scanned_once_per_ttl(self):
+        with mock.patch('emergency.model_registry.os.listdir', wraps=os.listdir) as listdir:
+            for _ in range(5):
+                self.registry.select(self.request('v2'))
+            self.assertEqual(listdir.call_count, 1)
+
+            # A new version waits for the TTL, or for an explicit refresh
+            write_version(self.root, 'v4', ('audio',))
+            with self.assertRaises(ModelVersionError):
+                self.registry.select(self.request('v4'))
+            self.registry.refresh_versions()
+            self.assertEqual(self.registry.select(self.request('v4'))['audio'], 'v4')
+
+            with override_settings(ML_MODEL_VERSIONS_TTL=0):
+                write_version(self.root, 'v5', ('audio',))
+                self.assertEqual(self.registry.select(self.request('v5'))['audio'], 'v5')
+
+    def test_header_selects_versions(self):
+        self.assertEqual(self.registry.select(self.request()), {'movement': 'default', 'audio': 'default'})
+        self.assertEqual(self.registry.select(self.request('v3')), {'movement': 'default', 'audio': 'v3'})
+        self.assertEqual(self.registry.select(self.request('audio=v2')), {'movement': 'default', 'audio': 'v2'})
+
+    def test_unknown_version_is_an_error(self):
+        for header in ('v9', 'movement=v3'):
+            with self.subTest(header=header), self.assertRaises(ModelVersionError):
+                self.registry.select(self.request(header))
+
+    def test_cohorts_are_stable_and_sized(self):
+        with override_settings(ML_MODEL_COHORTS={'movement': {'v2': 10}}):
+            chosen = [cohort_version('movement', user_id) for user_id in range(2000)]
+            self.assertEqual(chosen, [cohort_version('movement', user_id) for user_id in range(2000)])
+            self.assertAlmostEqual(chosen.count('v2') / len(chosen), 0.10, delta=0.03)
+
+            user = next(user_id for user_id, version in enumerate(chosen) if version == 'v2')
+            self.assertEqual(self.registry.select(self.request(user_id=user))['movement'], 'v2')
+            # Anonymous requests stay on the default
+            self.assertEqual(self.registry.select(self.request())['movement'], DEFAULT_VERSION)
+
+    def test_default_requests_use_the_singleton(self):
+        self.assertIs(self.registry.predictor_for(self.request()), self.default)
+        routed = self.registry.predictor_for(self.request('v2'))
+        self.assertIsInstance(routed, RoutedPredictor)
+        self.assertEqual(routed.predict_audio_features({})['version'], 'v2')
+
+    def test_view_rejects_unknown_version(self):
+        with mock.patch('emergency.model_registry.get_model_registry', return_value=self.registry):
+            response = APIClient().post('/api/emergency/predict/', {'data': np.ones((50, 12)).tolist()},
+                                        format='json', HTTP_X_MODEL_VERSION='v9')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('v9', response.json()['error'])
+
+
+class ResidencyTests(RegistryTestCase):
+    @override_settings(ML_MODEL_MEMORY_BUDGET_MB=100)
+    def test_least_recently_used_version_is_evicted(self):
+        v2 = self.registry.get('movement', 'v2')
+        audio_v2 = self.registry.get('audio', 'v2')
+        self.assertIs(self.registry.get('movement', 'v2'), v2)  # now the most recent
+
+        self.registry.get('audio', 'v3')  # 3 x 40 MB > 100 MB
+        loaded = [(entry['group'], entry['version']) for entry in self.registry.report()['loaded']]
+        self.assertEqual(loaded, [('movement', 'v2'), ('audio', 'v3')])
+        audio_v2.close.assert_called_once()
+        v2.close.assert_not_called()
+
+    @override_settings(ML_MODEL_MEMORY_BUDGET_MB=41)
+    def test_shadow_loads_never_evict(self):
+        self.registry.get('movement', 'v2')  # 40 MB, and v3's files are 2 MB
+        self.assertIsNone(self.registry.get('audio', 'v3', evict=False))
+        self.assertEqual(len(self.registry.report()['loaded']), 1)
+
+    def test_default_is_never_loaded_twice(self):
+        self.assertIs(self.registry.get('movement', DEFAULT_VERSION), self.default)
+        self.assertEqual(self.registry.report()['loaded'], [])
+
+
+class ShadowTests(RegistryTestCase):
+    def wait_for_shadow(self):
+        deadline = time.monotonic() + 5
+        while self.registry._shadow_pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    @override_settings(ML_MODEL_SHADOW={'movement': 'v2'}, ML_MODEL_SHADOW_RATE=1.0)
+    def test_shadow_agreement_is_recorded(self):
+        predictor = self.registry.predictor_for(self.request())
+        for i in range(4):
+            result = predictor.predict([[i] * 12] * 50)
+            self.wait_for_shadow()
+            # The caller always gets the serving version's answer
+            self.assertEqual(result, {'action': 'walking', 'confidence': 0.9})
+
+        [shadow] = self.registry.report()['shadow']
+        self.assertEqual((shadow['group'], shadow['shadow_version'], shadow['serving_version']),
+                         ('movement', 'v2', 'default'))
+        self.assertEqual((shadow['compared'], shadow['agreed'], shadow['agreement']), (4, 2, 0.5))
+        self.assertAlmostEqual(shadow['confidence_delta'], 0.4)
+
+    @override_settings(ML_MODEL_SHADOW={'movement': 'v2'}, ML_MODEL_SHADOW_RATE=0.0)
+    def test_shadow_rate(self):
+        self.registry.predictor_for(self.request()).predict([[1] * 12] * 50)
+        self.assertEqual(self.registry.report()['shadow'], [])
+
+
+class NativeAudioModelTests(SimpleTestCase):
+    """A version exported with `manage.py export_audio_model` scores like the pickle"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_native_model_matches_pickle(self):
+        with open(os.path.join(ML_MODELS, 'xgboost_threat_model.pkl'), 'rb') as f:
+            pickle.load(f).save_model(os.path.join(self.root, AUDIO_MODEL_NATIVE_FILE))
+        shutil.copy(os.path.join(ML_MODELS, 'feature_scaler.pkl'), self.root)
+
+        native = MLPredictor(base_path=self.root, groups=('audio',))
+        pickled = MLPredictor(base_path=ML_MODELS, groups=('audio',))
+        self.assertEqual(native.model_status()['audio']['state'], READY)
+        self.assertNotIn('movement', native.model_status())
+
+        extractor = FastAudioFeatureExtractor()
+        rows = [extractor.extract_features(load_clip(name), SAMPLE_RATE) for name in CLIPS]
+        for ours, theirs in zip(native.score_audio_batch(rows), pickled.score_audio_batch(rows)):
+            self.assertEqual(ours['is_threat'], theirs['is_threat'])
+            self.assertAlmostEqual(ours['confidence'], theirs['confidence'], places=6)
@@ -0,0 +1,127 @@
+import threading
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from emergency.ml_predictor import MLPredictor
+from emergency.model_state import FAILED, LOADING, READY, ModelState, ModelUnavailable
+from emergency.tests.test_inference_batcher import make_predictor
+from emergency.tests.test_window_scoring import ProjectionModel
+
+
+def unloaded_predictor():
+    """MLPredictor whose models never loaded"""
+    with mock.patch.object(MLPredictor, 'load_models'):
+        return MLPredictor()
+
+
+class ModelStateTests(SimpleTestCase):
+    @override_settings(ML_MODEL_RETRY_BASE=5.0, ML_MODEL_RETRY_MAX=30.0)
+    def test_backoff_doubles_up_to_the_cap(self):
+        state = ModelState('movement')
+        delays = []
+        for attempts in range(1, 6):
+            state.attempts = attempts
+            delays.append(state.retry_delay())
+        self.assertEqual(delays, [5.0, 10.0, 20.0, 30.0, 30.0])
+
+    @override_settings(ML_MODEL_RETRY_BASE=0.01)
+    def test_failed_load_is_retried_in_the_background(self):
+        state = ModelState('audio')
+        self.assertEqual(state.state, LOADING)
+        outcomes = iter([OSError('disk not mounted'), OSError('still not mounted'), None])
+        recovered = threading.Event()
+
+        def loader():
+            error = next(outcomes)
+            if error:
+                raise error
+
+        def retry():
+            if state.load(loader, on_retry=retry):
+                recovered.set()
+
+        self.assertFalse(state.load(loader, on_retry=retry))
+        self.assertEqual(state.state, FAILED)
+        self.assertEqual(state.snapshot()['error'], 'disk not mounted')
+
+        self.assertTrue(recovered.wait(5))
+        snapshot = state.snapshot()
+        self.assertEqual((snapshot['state'], snapshot['attempts'], snapshot['error']), (READY, 3, None))
+        self.assertIsNotNone(snapshot['load_seconds'])
+        self.assertIsNone(snapshot['retry_in_seconds'])
+
+    def test_unavailable_message(self):
+        state = ModelState('movement')
+        state.load(mock.Mock(side_effect=FileNotFoundError('scaler.pkl')), on_retry=None)
+        self.assertIn('movement models failed', str(ModelUnavailable(state)))
+        self.assertIn('scaler.pkl', str(ModelUnavailable(state)))
+
+
+class FastFailTests(SimpleTestCase):
+    @override_settings(ML_MODEL_RETRY_BASE=60.0)
+    def test_missing_models_are_not_reloaded_per_request(self):
+        with mock.patch.object(MLPredictor, '_load_movement_models', side_effect=FileNotFoundError('h5')) as load, \
+                mock.patch.object(MLPredictor, '_load_audio_models'):
+            predictor = MLPredictor()
+            self.addCleanup(predictor.model_states['movement'].cancel_retry)
+            for _ in range(5):
+                with self.assertRaises(ModelUnavailable):
+                    predictor.predict(np.ones((50, 12)).tolist())
+
+        load.assert_called_once()
+        self.assertEqual(predictor.model_status()['movement']['state'], FAILED)
+        self.assertEqual(predictor.model_status()['audio']['state'], READY)
+
+    def test_views_answer_503(self):
+        predictor = unloaded_predictor()
+        with mock.patch('emergency.views.get_predictor', return_value=predictor):
+            response = APIClient().post('/api/emergency/predict/', {'data': np.ones((50, 12)).tolist()}, format='json')
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response)
+            self.assertEqual(response.json()['model_state']['state'], LOADING)
+
+            response = APIClient().post('/api/emergency/predict-combined/', {
+                'movement_data': '[' + ','.join(['[1,1,1,1,1,1,1,1,1,1,1,1]'] * 50) + ']',
+            })
+            self.assertEqual(response.status_code, 503)
+
+    def test_predict_audio_unavailable(self):
+        result = unloaded_predictor().predict_audio_signal(np.ones(22050, dtype=np.float32) * 0.1, 22050)
+        self.assertEqual(result['status'], 'UNAVAILABLE')
+        self.assertFalse(result['is_threat'])
+
+
+class ReadinessTests(SimpleTestCase):
+    def predictor(self, movement, audio):
+        predictor = make_predictor(ProjectionModel())
+        predictor.model_states['movement'].state = movement
+        predictor.model_states['audio'].state = audio
+        return predictor
+
+    def get(self, predictor):
+        with mock.patch.object(MLPredictor, '_instance', predictor):
+            return APIClient().get('/api/emergency/ready/')
+
+    def test_ready(self):
+        response = self.get(self.predictor(READY, READY))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['ready'])
+        self.assertEqual(set(response.json()['models']), {'movement', 'audio'})
+
+    def test_not_ready(self):
+        response = self.get(self.predictor(FAILED, READY))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['models']['movement']['state'], FAILED)
+
+        with override_settings(ML_READINESS_MODELS=['audio']):
+            self.assertEqual(self.get(self.predictor(FAILED, READY)).status_code, 200)
+
+    def test_unloaded_worker_starts_loading_in_the_background(self):
+        with mock.patch('emergency.ml_predictor.start_background_warm_up') as warm_up:
+            response = self.get(None)
+        warm_up.assert_called_once()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['models']['audio'], {'state': LOADING})
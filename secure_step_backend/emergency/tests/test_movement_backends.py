@@ -0,0 +1,91 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from emergency.movement_backends import MODEL_FILES, load_movement_backend
+
+HAS_ONNX = all(importlib.util.find_spec(m) for m in ('tf2onnx', 'onnxruntime'))
+
+NUM_CLASSES = 20
+
+
+def build_small_bilstm():
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(7)
+    return tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(50, 12)),
+        tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(16)),
+        tf.keras.layers.Dense(NUM_CLASSES, activation='softmax'),
+    ])
+
+
+class MovementBackendParityTests(SimpleTestCase):
+    """Every fast backend must agree with the Keras model on a reference set"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model_dir = tempfile.mkdtemp(prefix='movement-backends-')
+        build_small_bilstm().save(os.path.join(cls.model_dir, MODEL_FILES['keras']))
+
+        backends = ['tf_function', 'tflite'] + (['onnx'] if HAS_ONNX else [])
+        call_command(
+            'convert_movement_model',
+            input=os.path.join(cls.model_dir, MODEL_FILES['keras']),
+            backends=','.join(backends),
+            stdout=open(os.devnull, 'w'),
+        )
+
+        # Reference set: already-scaled windows, as the scaler outputs them
+        rng = np.random.default_rng(0)
+        cls.reference = rng.normal(size=(32, 50, 12)).astype(np.float32)
+        cls.expected = load_movement_backend('keras', cls.model_dir).predict(cls.reference)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def assert_parity(self, backend_name, atol):
+        backend = load_movement_backend(backend_name, self.model_dir)
+        self.assertIsNotNone(backend)
+        probabilities = backend.predict(self.reference)
+
+        self.assertEqual(probabilities.shape, self.expected.shape)
+        np.testing.assert_array_equal(probabilities.argmax(axis=1), self.expected.argmax(axis=1))
+        np.testing.assert_allclose(probabilities.max(axis=1), self.expected.max(axis=1), atol=atol)
+
+    def test_tf_function_parity(self):
+        self.assert_parity('tf_function', atol=1e-6)
+
+    def test_tflite_parity(self):
+        self.assert_parity('tflite', atol=1e-4)
+
+    @unittest.skipUnless(HAS_ONNX, 'tf2onnx / onnxruntime not installed')
+    def test_onnx_parity(self):
+        self.assert_parity('onnx', atol=1e-5)
+
+    def test_tf_function_without_saved_model_traces_keras(self):
+        only_h5 = tempfile.mkdtemp(prefix='movement-h5-')
+        self.addCleanup(shutil.rmtree, only_h5, True)
+        shutil.copy(os.path.join(self.model_dir, MODEL_FILES['keras']), only_h5)
+
+        backend = load_movement_backend('tf_function', only_h5)
+        np.testing.assert_allclose(backend.predict(self.reference), self.expected, atol=1e-6)
+
+    def test_missing_files_return_none(self):
+        empty = tempfile.mkdtemp(prefix='movement-empty-')
+        self.addCleanup(shutil.rmtree, empty, True)
+        for name in MODEL_FILES:
+            self.assertIsNone(load_movement_backend(name, empty))
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            load_movement_backend('tensorrt', self.model_dir)
@@ -0,0 +1,129 @@
+import json
+from unittest import mock
+
+import numpy as np
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+from django.urls import path
+
+from emergency.consumers import MovementStreamConsumer
+from emergency.sensor_codec import encode_sensor_window
+
+application = URLRouter([
+    path('ws/movement/<int:user_id>/', MovementStreamConsumer.as_asgi()),
+])
+
+
+class RecordingPredictor:
+    def __init__(self):
+        self.windows = []
+
+    def predict(self, data):
+        self.windows.append(np.array(data))
+        return {'action': 'walking', 'confidence': 0.9, 'is_threat': False, 'status': 'SAFE'}
+
+
+def frames(start, count):
+    """Frames whose first channel is their sequence number"""
+    block = np.zeros((count, 12), dtype=np.float32)
+    block[:, 0] = np.arange(start, start + count)
+    return block
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    ML_STREAM_INFERENCE_STRIDE=10,
+    ML_STREAM_MAX_FRAMES_PER_MESSAGE=60,
+)
+class MovementStreamConsumerTests(SimpleTestCase):
+    def setUp(self):
+        self.predictor = RecordingPredictor()
+        patcher = mock.patch('emergency.consumers.get_predictor', return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(application, '/ws/movement/7/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def send_frames(self, communicator, block):
+        await communicator.send_to(text_data=json.dumps({'type': 'frames', 'frames': block.tolist()}))
+
+    async def test_predicts_every_stride_once_window_is_full(self):
+        communicator = await self.connect()
+
+        # 49 single frames: buffer not full yet, nothing comes back
+        for i in range(49):
+            await communicator.send_to(text_data=json.dumps({'frame': frames(i, 1)[0].tolist()}))
+        self.assertTrue(await communicator.receive_nothing())
+
+        await self.send_frames(communicator, frames(49, 1))
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'prediction')
+        self.assertEqual(message['frames_received'], 50)
+        self.assertEqual(message['result']['action'], 'walking')
+
+        # 9 more frames is below the stride; the 10th triggers a prediction
+        await self.send_frames(communicator, frames(50, 9))
+        self.assertTrue(await communicator.receive_nothing())
+        await self.send_frames(communicator, frames(59, 1))
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['frames_received'], 60)
+
+        await communicator.disconnect()
+
+        self.assertEqual(len(self.predictor.windows), 2)
+        np.testing.assert_array_equal(self.predictor.windows[0][:, 0], np.arange(0, 50))
+        np.testing.assert_array_equal(self.predictor.windows[1][:, 0], np.arange(10, 60))
+
+    async def test_ring_buffer_wraps_in_order(self):
+        communicator = await self.connect()
+        sent = 0
+        for size in (7, 13, 29, 3, 11, 17, 23):
+            await self.send_frames(communicator, frames(sent, size))
+            sent += size
+            if sent >= 50:
+                await communicator.receive_json_from()
+                np.testing.assert_array_equal(self.predictor.windows[-1][:, 0], np.arange(sent - 50, sent))
+        await communicator.disconnect()
+
+    async def test_accepts_binary_frames(self):
+        communicator = await self.connect()
+        block = np.random.default_rng(0).normal(size=(50, 12)).astype(np.float32)
+        await communicator.send_to(bytes_data=encode_sensor_window(block))
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'prediction')
+        np.testing.assert_array_equal(self.predictor.windows[0], block)
+        await communicator.disconnect()
+
+    async def test_rejects_bad_and_oversized_messages(self):
+        communicator = await self.connect()
+
+        await communicator.send_to(text_data=json.dumps({'frames': [[1, 2, 3]]}))
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+
+        await communicator.send_to(text_data='not json')
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+
+        await self.send_frames(communicator, frames(0, 61))
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'error')
+        self.assertIn('60 frames', message['message'])
+
+        await communicator.disconnect()
+        self.assertEqual(self.predictor.windows, [])
+
+    async def test_reset_clears_the_buffer(self):
+        communicator = await self.connect()
+        await self.send_frames(communicator, frames(0, 40))
+        await communicator.send_to(text_data=json.dumps({'type': 'reset'}))
+        await self.send_frames(communicator, frames(100, 40))
+        self.assertTrue(await communicator.receive_nothing())
+        await self.send_frames(communicator, frames(140, 10))
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['frames_received'], 50)
+        np.testing.assert_array_equal(self.predictor.windows[0][:, 0], np.arange(100, 150))
+        await communicator.disconnect()
@@ -0,0 +1,144 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler, StandardScaler
+
+from emergency.management.commands.movement_quantization_report import compare_predictions
+from emergency.ml_predictor import MLPredictor
+from emergency.movement_backends import MODEL_FILES, load_movement_backend, scaler_affine
+from emergency.tests.test_movement_backends import NUM_CLASSES
+
+CLASS_NAMES = ['walking', 'punch', 'jogging', 'slap'] + [f'action {i}' for i in range(NUM_CLASSES - 4)]
+
+
+def build_quantizable_bilstm():
+    """Like test_movement_backends' model, with LSTM weights large enough for TFLite to quantize"""
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(7)
+    return tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(50, 12)),
+        tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(32)),
+        tf.keras.layers.Dense(NUM_CLASSES, activation='softmax'),
+    ])
+
+
+def sensor_frames(rng, count):
+    """Raw frames with sensor-like offsets and ranges, so the scaler matters"""
+    return rng.normal(size=(count, 12)) * [1, 1, 1, 5, 5, 5, 40, 90, 5, 10, 15, 3] + [0, 0, 0, 0, 0, 9.8, 0, 0, 25, 170, 70, 24]
+
+
+class ScalerFoldingTests(SimpleTestCase):
+    def test_affine_scalers_fold(self):
+        frames = sensor_frames(np.random.default_rng(1), 200)
+        for scaler in (StandardScaler().fit(frames), MinMaxScaler().fit(frames)):
+            with self.subTest(scaler=type(scaler).__name__):
+                gain, offset = scaler_affine(scaler)
+                np.testing.assert_allclose(frames * gain + offset, scaler.transform(frames), rtol=1e-5, atol=1e-5)
+
+    def test_non_affine_scaler_is_rejected(self):
+        scaler = mock.Mock(transform=lambda x: np.tanh(x))
+        with self.assertRaises(ValueError):
+            scaler_affine(scaler)
+
+
+class QuantizedBackendTests(SimpleTestCase):
+    """The quantized exports take raw windows and agree with the float model on scaled ones"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        cls.model_dir = tempfile.mkdtemp(prefix='movement-quantized-')
+        build_quantizable_bilstm().save(os.path.join(cls.model_dir, MODEL_FILES['keras']))
+        cls.scaler = StandardScaler().fit(sensor_frames(rng, 5000))
+        with open(os.path.join(cls.model_dir, 'scaler.pkl'), 'wb') as f:
+            pickle.dump(cls.scaler, f)
+        with open(os.path.join(cls.model_dir, 'label_encoder.pkl'), 'wb') as f:
+            pickle.dump(LabelEncoder().fit(CLASS_NAMES), f)
+
+        call_command(
+            'convert_movement_model',
+            input=os.path.join(cls.model_dir, MODEL_FILES['keras']),
+            backends='tflite_fp16,tflite_int8',
+            stdout=open(os.devnull, 'w'),
+        )
+
+        cls.raw = sensor_frames(rng, 64 * 50).reshape(64, 50, 12).astype(np.float32)
+        scaled = cls.scaler.transform(cls.raw.reshape(-1, 12)).reshape(cls.raw.shape).astype(np.float32)
+        cls.expected = load_movement_backend('keras', cls.model_dir).predict(scaled)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_float16_parity(self):
+        backend = load_movement_backend('tflite_fp16', self.model_dir)
+        self.assertTrue(backend.takes_raw_windows)
+        probabilities = backend.predict(self.raw)
+        np.testing.assert_array_equal(probabilities.argmax(axis=1), self.expected.argmax(axis=1))
+        np.testing.assert_allclose(probabilities, self.expected, atol=5e-3)
+
+    def test_int8_agreement(self):
+        probabilities = load_movement_backend('tflite_int8', self.model_dir).predict(self.raw)
+        agreement = (probabilities.argmax(axis=1) == self.expected.argmax(axis=1)).mean()
+        self.assertGreaterEqual(agreement, 0.9)
+        np.testing.assert_allclose(probabilities, self.expected, atol=0.05)
+
+    def test_int8_file_is_smaller(self):
+        sizes = {name: os.path.getsize(os.path.join(self.model_dir, MODEL_FILES[name]))
+                 for name in ('tflite_fp16', 'tflite_int8')}
+        self.assertLess(sizes['tflite_int8'], sizes['tflite_fp16'])
+        # The LSTM kernels themselves are stored as int8
+        self.assertLess(sizes['tflite_int8'], 0.6 * os.path.getsize(os.path.join(self.model_dir, MODEL_FILES['keras'])))
+
+    def test_predictor_skips_the_scaler(self):
+        with mock.patch.object(MLPredictor, 'load_models'):
+            predictor = MLPredictor()
+        predictor._model = load_movement_backend('tflite_fp16', self.model_dir)
+        predictor._scaler = mock.Mock(transform=mock.Mock(side_effect=AssertionError('scaled twice')))
+        predictor._label_encoder = LabelEncoder().fit(CLASS_NAMES)
+
+        window = self.raw[0] + np.linspace(0, 1, 50)[:, np.newaxis]  # not gated as idle
+        result = predictor.predict(window.tolist())
+        expected = predictor._label_encoder.inverse_transform([int(self.expected[0].argmax())])[0]
+        self.assertEqual(result['action'], expected)
+        self.assertEqual(len(predictor.predict_windows(np.concatenate(self.raw[:3]), 50)['windows']), 3)
+
+    def test_report(self):
+        report_path = os.path.join(self.model_dir, 'report.json')
+        call_command('movement_quantization_report', input_dir=self.model_dir, windows=32, requests=3,
+                     json=report_path, stdout=open(os.devnull, 'w'))
+        with open(report_path) as f:
+            report = json.load(f)
+
+        self.assertEqual(set(report['models']), {'keras', 'tflite', 'tflite_fp16', 'tflite_int8'})
+        self.assertEqual(report['models']['keras']['agreement'], 1.0)
+        fp16 = report['models']['tflite_fp16']
+        self.assertGreaterEqual(fp16['agreement'], 0.9)
+        self.assertTrue(fp16['per_class']['punch']['threat'])
+        self.assertFalse(fp16['per_class']['walking']['threat'])
+        for key in ('size_mb', 'load_seconds', 'p50_ms', 'p99_ms'):
+            self.assertGreater(fp16[key], 0)
+
+
+class ComparePredictionsTests(SimpleTestCase):
+    def test_agreement_per_class(self):
+        names = ['walking', 'punch', 'slap']
+        reference = np.eye(3)[[0, 0, 1, 1, 2]]
+        candidate = np.eye(3)[[0, 1, 1, 2, 2]]
+        report = compare_predictions(reference, candidate, names, MLPredictor.THREAT_LABELS)
+
+        self.assertEqual(report['agreement'], 0.6)
+        # walking -> punch flips the verdict, punch -> slap does not
+        self.assertEqual(report['threat_agreement'], 0.8)
+        self.assertEqual(report['per_class']['walking'], {'windows': 2, 'agreement': 0.5, 'threat': False})
+        self.assertEqual(report['per_class']['slap'], {'windows': 1, 'agreement': 1.0, 'threat': True})
@@ -0,0 +1,26 @@
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+
+from secure_step_backend.asgi import application
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class WebsocketRoutingTests(SimpleTestCase):
+    async def assert_connects(self, path):
+        communicator = WebsocketCommunicator(application, path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected, path)
+        await communicator.disconnect()
+
+    async def test_officer_socket(self):
+        # The path the police companion app connects to
+        await self.assert_connects('/ws/police/7/')
+
+    async def test_dashboard_socket(self):
+        await self.assert_connects('/ws/police/')
+
+    async def test_user_socket(self):
+        await self.assert_connects('/ws/user/3/')
+
+    async def test_movement_stream_socket(self):
+        await self.assert_connects('/ws/movement/3/')
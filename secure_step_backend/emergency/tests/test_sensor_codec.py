@@ -0,0 +1,143 @@
+import gzip
+import json
+from unittest import mock
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+
+from emergency.sensor_codec import (
+    HEADER, MAGIC, MAX_DECODED_BYTES, SensorPayloadError, decode_sensor_window, encode_sensor_window,
+)
+
+
+def random_window(frames=50, seed=0):
+    return np.random.default_rng(seed).normal(scale=4.0, size=(frames, 12)).astype(np.float32)
+
+
+class SensorCodecTests(SimpleTestCase):
+    def test_raw_float32_round_trip(self):
+        window = random_window()
+        decoded = decode_sensor_window(window.astype('<f4').tobytes())
+        np.testing.assert_array_equal(decoded, window)
+        self.assertEqual(decoded.dtype, np.float32)
+
+    def test_framed_float32_round_trip(self):
+        window = random_window()
+        for compress in (False, True):
+            decoded = decode_sensor_window(encode_sensor_window(window, compress=compress))
+            np.testing.assert_array_equal(decoded, window)
+
+    def test_whole_payload_gzip(self):
+        window = random_window()
+        body = gzip.compress(encode_sensor_window(window))
+        np.testing.assert_array_equal(decode_sensor_window(body), window)
+        np.testing.assert_array_equal(decode_sensor_window(body, content_encoding='gzip'), window)
+
+    def test_int16_round_trip_within_quantization_error(self):
+        window = random_window()
+        payload = encode_sensor_window(window, dtype='int16')
+        self.assertLess(len(payload), window.nbytes)
+
+        decoded = decode_sensor_window(payload)
+        step = np.abs(window).max(axis=0) / 32767.0
+        self.assertTrue(np.all(np.abs(decoded - window) <= step))
+
+    def test_int16_handles_silent_channel(self):
+        window = random_window()
+        window[:, 3] = 0.0
+        decoded = decode_sensor_window(encode_sensor_window(window, dtype='int16'))
+        self.assertTrue(np.all(decoded[:, 3] == 0.0))
+
+    def test_rejects_partial_frames(self):
+        with self.assertRaises(SensorPayloadError):
+            decode_sensor_window(b'\x00' * 50)
+        with self.assertRaises(SensorPayloadError):
+            decode_sensor_window(b'')
+
+    def test_rejects_bad_headers(self):
+        with self.assertRaises(SensorPayloadError):
+            decode_sensor_window(HEADER.pack(MAGIC, 1, 0, 50, 9, 0))
+        with self.assertRaises(SensorPayloadError):
+            decode_sensor_window(HEADER.pack(MAGIC, 7, 0, 50, 12, 0))
+        with self.assertRaises(SensorPayloadError):
+            decode_sensor_window(encode_sensor_window(random_window())[:-4])
+
+    def test_rejects_oversized_and_corrupt_gzip(self):
+        bomb = gzip.compress(b'\x00' * (MAX_DECODED_BYTES + 48))
+        with self.assertRaises(SensorPayloadError):
+            decode_sensor_window(bomb, content_encoding='gzip')
+        with self.assertRaises(SensorPayloadError):
+            decode_sensor_window(b'\x1f\x8b' + b'\x00' * 46, content_encoding='gzip')
+
+    def test_raw_window_starting_with_gzip_magic(self):
+        # Without Content-Encoding, 1f 8b at the start of a raw window is data
+        window = random_window()
+        window[0, 0] = np.frombuffer(b'\x1f\x8b\x10\x3f', dtype='<f4')[0]
+        body = window.astype('<f4').tobytes()
+        self.assertEqual(body[:2], b'\x1f\x8b')
+        np.testing.assert_array_equal(decode_sensor_window(body), window)
+
+        # A gzipped raw window needs the header
+        np.testing.assert_array_equal(decode_sensor_window(gzip.compress(body), content_encoding='gzip'), window)
+
+
+class BinaryPredictionViewTests(SimpleTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.predictor = mock.Mock()
+        self.predictor.predict.return_value = {
+            'action': 'walking', 'confidence': 0.9, 'is_threat': False, 'status': 'SAFE',
+        }
+        patcher = mock.patch('emergency.views.get_predictor', return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def received_window(self):
+        return np.asarray(self.predictor.predict.call_args[0][0], dtype=np.float32)
+
+    def test_predict_accepts_binary_window(self):
+        window = random_window()
+        response = self.client.post(
+            '/api/emergency/predict/', encode_sensor_window(window, compress=True),
+            content_type='application/octet-stream',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['action'], 'walking')
+        np.testing.assert_array_equal(self.received_window(), window)
+
+    def test_predict_accepts_gzip_content_encoding(self):
+        window = random_window()
+        response = self.client.post(
+            '/api/emergency/predict/', gzip.compress(window.tobytes()),
+            content_type='application/octet-stream', HTTP_CONTENT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 200)
+        np.testing.assert_array_equal(self.received_window(), window)
+
+    def test_predict_rejects_malformed_binary(self):
+        response = self.client.post(
+            '/api/emergency/predict/', b'\x00' * 50, content_type='application/octet-stream',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.predictor.predict.assert_not_called()
+
+    def test_predict_still_accepts_json(self):
+        window = random_window()
+        response = self.client.post('/api/emergency/predict/', {'data': window.tolist()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        np.testing.assert_allclose(self.received_window(), window)
+
+    def test_predict_combined_accepts_binary_movement_part(self):
+        window = random_window()
+        upload = SimpleUploadedFile('movement.bin', encode_sensor_window(window, dtype='int16'))
+        response = self.client.post('/api/emergency/predict-combined/', {'movement_data': upload})
+        self.assertEqual(response.status_code, 200)
+        np.testing.assert_allclose(self.received_window(), window, atol=np.abs(window).max() / 32767.0)
+
+    def test_predict_combined_still_accepts_json_string(self):
+        window = random_window()
+        response = self.client.post('/api/emergency/predict-combined/', {'movement_data': json.dumps(window.tolist())})
+        self.assertEqual(response.status_code, 200)
+        np.testing.assert_allclose(self.received_window(), window)
@@ -0,0 +1,102 @@
+import json
+import os
+import pickle
+import subprocess
+import sys
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from emergency import thread_budget
+from emergency.thread_budget import apply_thread_budget, limit_xgboost_threads, thread_limits
+
+PROBE = """
+import json, os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'secure_step_backend.settings')
+import django
+django.setup()
+import numpy
+if %(import_tf)r:
+    import tensorflow as tf
+from emergency.thread_budget import apply_thread_budget
+apply_thread_budget()
+from threadpoolctl import threadpool_info
+report = {
+    'env': {k: os.environ.get(k) for k in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')},
+    'blas': sorted({pool['num_threads'] for pool in threadpool_info()}),
+    'tensorflow': 'tensorflow' in sys.modules,
+}
+if %(import_tf)r:
+    report['tf'] = [tf.config.threading.get_intra_op_parallelism_threads(),
+                    tf.config.threading.get_inter_op_parallelism_threads()]
+print(json.dumps(report))
+"""
+
+
+def probe(import_tf, **env):
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE % {'import_tf': import_tf}],
+        cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=120,
+        env=dict(os.environ, **env),
+    )
+    if result.returncode != 0:
+        raise AssertionError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class ThreadLimitsTests(SimpleTestCase):
+    @override_settings(ML_THREADS=0, ML_TF_INTRA_OP_THREADS=0, ML_TF_INTER_OP_THREADS=0,
+                       ML_XGB_THREADS=0, ML_BLAS_THREADS=0)
+    def test_defaults_leave_libraries_alone(self):
+        self.assertEqual(set(thread_limits().values()), {None})
+
+    @override_settings(ML_THREADS=2, ML_TF_INTRA_OP_THREADS=0, ML_TF_INTER_OP_THREADS=0,
+                       ML_XGB_THREADS=1, ML_BLAS_THREADS=0)
+    def test_budget_with_an_override(self):
+        self.assertEqual(thread_limits(), {'tf_intra_op': 2, 'tf_inter_op': 1, 'xgboost': 1, 'blas': 2})
+
+    @override_settings(ML_THREADS=2)
+    def test_applied_once_per_process(self):
+        with mock.patch.object(thread_budget, '_applied', None), \
+                mock.patch.object(thread_budget, '_limit_blas') as blas, \
+                mock.patch.object(thread_budget, '_limit_tensorflow') as tensorflow:
+            first = apply_thread_budget()
+            with override_settings(ML_THREADS=4):
+                self.assertIs(apply_thread_budget(), first)
+        blas.assert_called_once_with(2)
+        tensorflow.assert_called_once_with(2, 1)
+
+    @override_settings(ML_XGB_THREADS=2)
+    def test_xgboost_model(self):
+        path = os.path.join(settings.BASE_DIR, 'ml_models', 'xgboost_threat_model.pkl')
+        if not os.path.exists(path):
+            self.skipTest('Audio model files not available')
+        with open(path, 'rb') as f:
+            model = limit_xgboost_threads(pickle.load(f))
+        config = json.loads(model.get_booster().save_config())
+        self.assertEqual(config['learner']['generic_param']['nthread'], '2')
+
+        other = object()
+        self.assertIs(limit_xgboost_threads(other), other)
+
+
+class ProcessLimitsTests(SimpleTestCase):
+    def test_blas_limited_without_importing_tensorflow(self):
+        report = probe(False, ML_THREADS='2')
+        self.assertEqual(report['blas'], [2])
+        self.assertEqual(report['env'], {'OMP_NUM_THREADS': '2', 'TF_NUM_INTRAOP_THREADS': '2',
+                                         'TF_NUM_INTEROP_THREADS': '1'})
+        self.assertFalse(report['tensorflow'])
+
+    def test_tensorflow_pools_when_already_imported(self):
+        report = probe(True, ML_THREADS='3', ML_TF_INTER_OP_THREADS='2')
+        self.assertEqual(report['tf'], [3, 2])
+
+    def test_nothing_changes_by_default(self):
+        env = {name: '0' for name in ('ML_THREADS', 'ML_TF_INTRA_OP_THREADS', 'ML_TF_INTER_OP_THREADS', 'ML_BLAS_THREADS')}
+        with mock.patch.dict(os.environ, {}, clear=False):
+            for name in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+                os.environ.pop(name, None)
+            report = probe(False, **env)
+        self.assertEqual(set(report['env'].values()), {None})
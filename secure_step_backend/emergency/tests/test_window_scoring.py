@@ -0,0 +1,139 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from emergency.ml_predictor import (
+    MLPredictor, aggregate_window_results, sliding_windows, window_starts,
+)
+from emergency.tests.test_inference_batcher import make_predictor
+
+
+class ProjectionModel:
+    """Deterministic stand-in: class scores are a fixed projection of the window"""
+
+    def __init__(self, num_classes=len(MLPredictor.THREAT_LABELS)):
+        self.weights = np.random.default_rng(1).normal(size=(50 * 12, num_classes))
+        self.calls = []
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float64)
+        self.calls.append(len(batch))
+        logits = batch.reshape(len(batch), -1) @ self.weights
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def test_windows_align_to_the_end(self):
+        np.testing.assert_array_equal(window_starts(50, 10), [0])
+        np.testing.assert_array_equal(window_starts(100, 10), [0, 10, 20, 30, 40, 50])
+        np.testing.assert_array_equal(window_starts(57, 5), [2, 7])
+
+    def test_rejects_short_recordings_and_bad_stride(self):
+        with self.assertRaises(ValueError):
+            window_starts(49, 10)
+        with self.assertRaises(ValueError):
+            window_starts(60, 0)
+
+    def test_windows_are_a_view(self):
+        frames = np.arange(123 * 12, dtype=np.float32).reshape(123, 12)
+        windows = sliding_windows(frames, 7)
+        self.assertTrue(np.shares_memory(windows, frames))
+
+        starts = window_starts(123, 7)
+        self.assertEqual(windows.shape, (len(starts), 50, 12))
+        for start, window in zip(starts, windows):
+            np.testing.assert_array_equal(window, frames[start:start + 50])
+
+    def test_aggregate_prefers_any_threat(self):
+        safe = {'action': 'walking', 'confidence': 0.9, 'is_threat': False}
+        threat = {'action': 'punching', 'confidence': 0.6, 'is_threat': True}
+        verdict = aggregate_window_results([safe, safe, threat])
+        self.assertTrue(verdict['is_threat'])
+        self.assertEqual(verdict['action'], 'punching')
+        self.assertEqual(verdict['threat_windows'], 1)
+        self.assertEqual(verdict['num_windows'], 3)
+
+        verdict = aggregate_window_results([safe, safe, dict(safe, action='running', confidence=0.99)])
+        self.assertFalse(verdict['is_threat'])
+        self.assertEqual(verdict['action'], 'walking')
+        self.assertAlmostEqual(verdict['confidence'], 0.9)
+
+
+class PredictWindowsTests(SimpleTestCase):
+    def setUp(self):
+        self.model = ProjectionModel()
+        self.predictor = make_predictor(self.model)
+        self.predictor._scaler.transform.side_effect = lambda x: (np.asarray(x) - 1.5) / 3.0
+
+    def test_matches_scoring_each_window_separately(self):
+        frames = np.random.default_rng(0).normal(size=(137, 12)).astype(np.float32)
+        response = self.predictor.predict_windows(frames, stride=10)
+
+        starts = window_starts(137, 10)
+        self.assertEqual(self.model.calls, [len(starts)])
+        self.assertEqual(len(response['windows']), len(starts))
+
+        for start, window in zip(starts, response['windows']):
+            expected = self.predictor.predict(frames[start:start + 50])
+            self.assertEqual(window['start_frame'], start)
+            self.assertEqual(window['end_frame'], start + 50)
+            self.assertEqual(window['action'], expected['action'])
+            self.assertAlmostEqual(window['confidence'], expected['confidence'], places=5)
+
+        self.assertEqual(response['aggregate'], aggregate_window_results(response['windows']))
+
+    def test_long_recordings_are_scored_in_chunks(self):
+        frames = np.zeros((50 + 299, 12), dtype=np.float32)
+        with mock.patch('emergency.ml_predictor.MAX_WINDOWS_PER_PASS', 128):
+            response = self.predictor.predict_windows(frames, stride=1)
+        self.assertEqual(self.model.calls, [128, 128, 44])
+        self.assertEqual(response['aggregate']['num_windows'], 300)
+
+
+@override_settings(ML_WINDOW_STRIDE=25)
+class PredictWindowsViewTests(SimpleTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.predictor = make_predictor(ProjectionModel())
+        self.predictor._scaler.transform.side_effect = lambda x: np.asarray(x)
+        patcher = mock.patch('emergency.views.get_predictor', return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, frames, **params):
+        query = ''.join(f'?{k}={v}' for k, v in params.items())
+        return self.client.post(f'/api/emergency/predict/{query}', {'data': frames.tolist()}, format='json')
+
+    def test_fifty_frames_keep_the_single_result_shape(self):
+        response = self.post(np.zeros((50, 12)))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('action', response.json())
+        self.assertNotIn('windows', response.json())
+
+    def test_long_recording_uses_default_stride(self):
+        response = self.post(np.zeros((150, 12)))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['stride'], 25)
+        self.assertEqual([w['start_frame'] for w in body['windows']], [0, 25, 50, 75, 100])
+
+    def test_stride_from_query_string(self):
+        body = self.post(np.zeros((150, 12)), stride=50).json()
+        self.assertEqual(body['aggregate']['num_windows'], 3)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.post(np.zeros((150, 12)), stride=0).status_code, 400)
+        self.assertEqual(self.post(np.zeros((150, 12)), stride='abc').status_code, 400)
+        self.assertEqual(self.post(np.zeros((30, 12)), stride=5).status_code, 400)
+
+    def test_other_shapes_are_rejected(self):
+        # A flat list of 600 values is not 50 frames
+        self.assertEqual(self.post(np.zeros(600)).status_code, 400)
+        self.assertEqual(self.post(np.zeros((30, 12))).status_code, 400)
+        self.assertEqual(self.post(np.zeros((50, 10))).status_code, 400)
+        self.assertEqual(self.post(np.zeros((2, 50, 12))).status_code, 400)
+        ragged = self.client.post('/api/emergency/predict/', {'data': [[0.0] * 12, [0.0] * 5]}, format='json')
+        self.assertEqual(ragged.status_code, 400)
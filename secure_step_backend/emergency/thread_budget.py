@@ -0,0 +1,110 @@
+"""
+Per-process thread limits for the inference libraries.
+
+By default every library sizes its thread pools to the whole machine:
+TensorFlow's intra- and inter-op pools, XGBoost (the audio model was
+trained with n_jobs=-1), and the OpenMP/BLAS pools behind NumPy, SciPy
+and librosa. With several server processes on one box, every request can
+start a thread per core in each library. ML_THREADS caps all of them per
+process, and each one can also be set on its own:
+
+    ML_TF_INTRA_OP_THREADS   TensorFlow intra-op pool, TFLite and ONNX Runtime
+    ML_TF_INTER_OP_THREADS   TensorFlow inter-op pool (1 under ML_THREADS)
+    ML_XGB_THREADS           XGBoost nthread
+    ML_BLAS_THREADS          OpenMP / BLAS pools
+    ML_AUDIO_SEGMENT_WORKERS feature extraction pool for long clips
+
+0 leaves a library at its default. MLPredictor.load_models applies the
+limits once per process, before the models load.
+"""
+import logging
+import os
+import sys
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Read by TensorFlow when its runtime starts, and by OpenMP/BLAS libraries
+# when they are first loaded
+TF_ENV = {'tf_intra_op': 'TF_NUM_INTRAOP_THREADS', 'tf_inter_op': 'TF_NUM_INTEROP_THREADS'}
+BLAS_ENV = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS')
+
+_applied = None
+_apply_lock = threading.Lock()
+
+
+def thread_limits():
+    """Thread count per library, None where the library keeps its default"""
+    budget = getattr(settings, 'ML_THREADS', 0)
+
+    def limit(name, derived):
+        value = getattr(settings, name, 0)
+        return value or derived or None
+
+    return {
+        'tf_intra_op': limit('ML_TF_INTRA_OP_THREADS', budget),
+        'tf_inter_op': limit('ML_TF_INTER_OP_THREADS', 1 if budget else 0),
+        'xgboost': limit('ML_XGB_THREADS', budget),
+        'blas': limit('ML_BLAS_THREADS', budget),
+    }
+
+
+def apply_thread_budget():
+    """
+    Apply thread_limits() to this process. Runs once; later calls return
+    the limits applied the first time.
+    """
+    global _applied
+    if _applied is None:
+        with _apply_lock:
+            if _applied is None:
+                limits = thread_limits()
+                _limit_blas(limits['blas'])
+                _limit_tensorflow(limits['tf_intra_op'], limits['tf_inter_op'])
+                _applied = limits
+    return _applied
+
+
+def limit_xgboost_threads(model):
+    """Set nthread on a loaded XGBoost model (a no-op for other models)"""
+    threads = thread_limits()['xgboost']
+    if threads and hasattr(model, 'get_booster'):
+        # Also sets nthread on the fitted booster
+        model.set_params(n_jobs=threads)
+    return model
+
+
+def _limit_blas(threads):
+    if not threads:
+        return
+    for name in BLAS_ENV:
+        os.environ[name] = str(threads)
+    # Pools of libraries that are already loaded (NumPy's BLAS is)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        logger.warning("threadpoolctl not installed; BLAS limit only applies to libraries loaded later")
+        return
+    threadpool_limits(limits=threads)
+
+
+def _limit_tensorflow(intra_op, inter_op):
+    for key, threads in (('tf_intra_op', intra_op), ('tf_inter_op', inter_op)):
+        if threads:
+            os.environ[TF_ENV[key]] = str(threads)
+
+    # The environment is enough until TensorFlow is imported; after that
+    # the pools can still be set until the first op runs
+    if 'tensorflow' not in sys.modules:
+        return
+    import tensorflow as tf
+
+    try:
+        if intra_op:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        if inter_op:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError as e:
+        logger.warning(f"TensorFlow already initialized, thread limits not applied: {e}")
@@ -15,6 +15,7 @@ urlpatterns = [
     path('predict/', views.predict_movement, name='predict_movement'),
     path('predict-audio/', views.predict_audio, name='predict_audio'),
     path('predict-combined/', views.predict_combined, name='predict_combined'),  # ✅ ADDED THIS
+    path('ready/', views.model_readiness, name='model_readiness'),
     
     # Emergency Settings
     path('settings/', views.EmergencySettingsView.as_view(), name='emergency_settings'),
@@ -22,6 +23,8 @@ urlpatterns = [
     # Admin Views
     path('admin/alerts/', views.admin_emergency_alerts, name='admin_emergency_alerts'),
     path('admin/contacts/', views.admin_all_contacts, name='admin_all_contacts'),
+    path('admin/audio-feature-cache/', views.audio_feature_cache_stats, name='audio_feature_cache_stats'),
+    path('admin/model-registry/', views.model_registry_report, name='model_registry_report'),
     path('high-risk-zones/', views.get_high_risk_zones, name='high_risk_zones'),
 
     # Police API Endpoints
@@ -1,8 +1,9 @@
-import os
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.shortcuts import get_object_or_404
 from .models import EmergencyContact, EmergencyAlert, EmergencySettings
 from .models import OfficerLocation
@@ -17,8 +18,19 @@ import logging
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.utils import timezone
+from django.conf import settings
 import time, threading
-from .ml_predictor import MLPredictor
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import numpy as np
+from .ml_predictor import FastAudioFeatureExtractor, get_model_status, get_predictor, window_starts
+from .model_registry import ModelVersionError, get_model_registry
+from .model_state import READY, ModelUnavailable
+from .audio_io import AudioDecodeError, decode_audio_upload
+from .feature_cache import get_audio_feature_cache
+from .inference_service import InferenceTimeout
+from .gating import gate_audio
+from .parsers import SensorWindowParser
+from .sensor_codec import SensorPayloadError, decode_sensor_window
 
 logger = logging.getLogger(__name__)
 
@@ -325,23 +337,147 @@ def admin_all_contacts(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@parser_classes([JSONParser, FormParser, MultiPartParser, SensorWindowParser])
 def predict_movement(request):
     """
-    Predict movement action from sensor data
+    Predict movement action from sensor data.
+    Accepts JSON {"data": [[...12 values], ...]} or a binary window
+    (Content-Type: application/octet-stream, see sensor_codec).
+
+    A (50, 12) window returns a single prediction. Longer (N, 12)
+    recordings (or an explicit `stride`, in the body or query string) are
+    scored as overlapping 50-frame windows every `stride` frames and return
+    per-window results plus an aggregate verdict. Any other shape is a 400.
     """
+    # Parsed outside the try so a malformed payload surfaces as DRF's 400
+    payload = request.data
     try:
-        data = request.data.get('data')
-        if not data:
+        data = payload if isinstance(payload, np.ndarray) else payload.get('data')
+        if data is None or len(data) == 0:
             return Response({'error': 'No data provided'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        predictor = MLPredictor.get_instance()
-        result = predictor.predict(data)
-        return Response(result)
+
+        stride = request.query_params.get('stride')
+        if stride is None and not isinstance(payload, np.ndarray):
+            stride = payload.get('stride')
+
+        try:
+            frames = np.asarray(data, dtype=np.float32)
+        except (TypeError, ValueError) as e:
+            return Response({'error': f'Invalid sensor data: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        if frames.ndim != 2 or frames.shape[1] != 12 or (stride is None and frames.shape[0] < 50):
+            return Response({'error': f'Expected 50 or more frames of 12 values, got shape {list(frames.shape)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        predictor = get_predictor(request)
+        if stride is None and frames.shape[0] == 50:
+            return Response(predictor.predict(data))
+
+        try:
+            stride = int(stride) if stride is not None else settings.ML_WINDOW_STRIDE
+            window_starts(len(frames), stride)
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(predictor.predict_windows(frames, stride))
+    except ModelVersionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ModelUnavailable as e:
+        return model_unavailable_response(e)
+    except InferenceTimeout as e:
+        return Response({'error': str(e)}, status=status.HTTP_504_GATEWAY_TIMEOUT)
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def model_unavailable_response(error):
+    """503 while a model group is loading or waiting to retry a failed load"""
+    retry_after = max(1, round(error.state.retry_in())) if error.state.state != READY else 1
+    return Response({'error': str(error), 'model_state': error.state.snapshot()},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(retry_after)})
+
+
+def detach_upload(upload):
+    """
+    An in-memory copy of an UploadedFile for work that may outlive the
+    request. Django closes (and for spooled uploads deletes) request.FILES
+    once the response is sent, so a background branch must not read them.
+    """
+    upload.seek(0)
+    copy = SimpleUploadedFile(upload.name, upload.read(), content_type=getattr(upload, 'content_type', None))
+    copy.content_type_extra = getattr(upload, 'content_type_extra', None)
+    return copy
+
+
+def predict_uploaded_audio(predictor, audio_file):
+    """
+    Decode an uploaded clip in memory (no temp file) and score it. Features
+    of a clip seen before come from the feature cache, skipping decoding
+    and extraction; quiet clips are answered by the silence gate.
+    """
+    extractor = FastAudioFeatureExtractor()
+    cache = get_audio_feature_cache()
+    key = cache.key_for_upload(audio_file, extractor) if cache is not None else None
+    features = cache.get(key) if key else None
+
+    if features is None:
+        try:
+            audio, sr = decode_audio_upload(audio_file, extractor.sample_rate, extractor.decode_duration)
+            gated = gate_audio(audio)
+            if gated is not None:
+                return gated
+            features = extractor.extract_clip_features(audio, sr)
+        except AudioDecodeError as e:
+            logger.error(f"Audio decode error: {e}")
+            return {'error': str(e), 'is_threat': False, 'confidence': 0.0, 'status': 'ERROR'}
+        except Exception as e:
+            logger.error(f"Audio feature extraction error: {e}")
+            return {'error': str(e), 'is_threat': False, 'confidence': 0.0, 'status': 'ERROR'}
+        if key:
+            cache.set(key, features)
+
+    return predictor.predict_audio_features(features)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def audio_feature_cache_stats(request):
+    """Admin view: hit/miss counters of the audio feature cache"""
+    from accounts.models import AdminUser
+
+    try:
+        AdminUser.objects.get(user=request.user)
+    except AdminUser.DoesNotExist:
+        return Response({'error': 'Admin access required'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    cache = get_audio_feature_cache()
+    if cache is None:
+        return Response({'enabled': False})
+    return Response({'enabled': True, **cache.stats()})
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def model_registry_report(request):
+    """
+    Admin view: model versions, which are loaded and their memory, shadow
+    agreement. POST rescans the versions directory first.
+    """
+    from accounts.models import AdminUser
+
+    try:
+        AdminUser.objects.get(user=request.user)
+    except AdminUser.DoesNotExist:
+        return Response({'error': 'Admin access required'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    registry = get_model_registry()
+    if request.method == 'POST':
+        registry.refresh_versions()
+    return Response(registry.report())
+
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def predict_audio(request):
@@ -353,32 +489,41 @@ def predict_audio(request):
             return Response({'error': 'No audio file provided'}, status=status.HTTP_400_BAD_REQUEST)
             
         audio_file = request.FILES['file']
-        
-        # Save temp file
-        import tempfile
-        import shutil
-        
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.m4a') as tmp:
-            for chunk in audio_file.chunks():
-                tmp.write(chunk)
-            tmp_path = tmp.name
-            
-        try:
-            predictor = MLPredictor.get_instance()
-            result = predictor.predict_audio(tmp_path)
-            return Response(result)
-        finally:
-            # Clean up temp file
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-                
+
+        predictor = get_predictor(request)
+        result = predict_uploaded_audio(predictor, audio_file)
+        if result.get('status') == 'UNAVAILABLE':
+            return Response(result, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(result)
+
+    except ModelVersionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Audio prediction error: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 
+_branch_executors = {}
+_branch_executors_lock = threading.Lock()
+
+
+def get_branch_executor(branch):
+    """
+    Thread pool predict_combined runs its 'movement' or 'audio' branch on.
+    Separate pools, so movement never queues behind audio work that is
+    still running after its request gave up on it.
+    """
+    if branch not in _branch_executors:
+        with _branch_executors_lock:
+            if branch not in _branch_executors:
+                _branch_executors[branch] = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'ML_COMBINED_WORKERS', 4),
+                    thread_name_prefix=f'combined-{branch}',
+                )
+    return _branch_executors[branch]
+
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def predict_combined(request):
@@ -390,34 +535,70 @@ def predict_combined(request):
     - Non-threat actions: jogging, jumping, falling, dancing, walking, running
     - Any other action = THREAT
     - Audio threat OR Movement threat = OVERALL THREAT
+    - Both models run concurrently; audio slower than ML_COMBINED_AUDIO_TIMEOUT
+      is reported with status TIMEOUT and the movement verdict stands
     """
     try:
         import json
         
-        # Get movement data (JSON string)
-        movement_data_str = request.data.get('movement_data')
-        if movement_data_str:
-            movement_data = json.loads(movement_data_str) if isinstance(movement_data_str, str) else movement_data_str
+        # Get movement data (JSON string, or a binary window sent as a file part)
+        movement_file = request.FILES.get('movement_data')
+        if movement_file:
+            try:
+                movement_data = decode_sensor_window(movement_file.read())
+            except SensorPayloadError as e:
+                return Response({'error': f'Invalid sensor payload: {e}'}, status=status.HTTP_400_BAD_REQUEST)
         else:
-            movement_data = None
+            movement_data_str = request.data.get('movement_data')
+            if movement_data_str:
+                movement_data = json.loads(movement_data_str) if isinstance(movement_data_str, str) else movement_data_str
+            else:
+                movement_data = None
         
         # Get audio file
         audio_file = request.FILES.get('audio_file')
         
-        if not movement_data:
+        if movement_data is None or len(movement_data) == 0:
             return Response({'error': 'No movement data provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        predictor = MLPredictor.get_instance()
+        predictor = get_predictor(request)
         
         # ============================================
-        # 1. PREDICT MOVEMENT
+        # 1. START BOTH MODELS
         # ============================================
-        movement_result = predictor.predict(movement_data)
+        # Movement and audio are independent, so they run at the same time
+        # on the branch pool, each with its own deadline
+        started = time.monotonic()
+        concurrent = getattr(settings, 'ML_COMBINED_CONCURRENT', True)
+        audio_future = None
+        if audio_file and concurrent:
+            # Read on the request thread: the branch may still be running
+            # after the response has gone and request.FILES is closed
+            audio_future = get_branch_executor('audio').submit(
+                predict_uploaded_audio, predictor, detach_upload(audio_file),
+            )
+
+        # ============================================
+        # 2. PREDICT MOVEMENT
+        # ============================================
+        if concurrent:
+            movement_future = get_branch_executor('movement').submit(predictor.predict, movement_data)
+            movement_timeout = getattr(settings, 'ML_COMBINED_MOVEMENT_TIMEOUT', 5.0)
+            try:
+                movement_result = movement_future.result(timeout=movement_timeout)
+            except FuturesTimeoutError:
+                movement_future.cancel()
+                logger.error(f"Movement prediction did not finish within {movement_timeout}s")
+                return Response({'error': f'Movement prediction did not finish within {movement_timeout}s'},
+                                status=status.HTTP_504_GATEWAY_TIMEOUT)
+        else:
+            movement_result = predictor.predict(movement_data)
         
         # Define non-threat actions
         NON_THREAT_ACTIONS = [
             'jogging', 'jumping', 'falling', 
-            'dancing', 'walking', 'running'
+            'dancing', 'walking', 'running',
+            'idle',  # still windows answered by the gate (see gating.py)
         ]
         
         # Check if action is a threat (case-insensitive)
@@ -431,28 +612,34 @@ def predict_combined(request):
         logger.info(f"Movement detected: {detected_action} - Threat: {movement_is_threat}")
         
         # ============================================
-        # 2. PREDICT AUDIO (if provided)
+        # 3. PREDICT AUDIO (if provided)
         # ============================================
         audio_result = {'is_threat': False, 'confidence': 0.0, 'status': 'NO_AUDIO'}
         
-        if audio_file:
-            import tempfile
-            import os
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.m4a') as tmp:
-                for chunk in audio_file.chunks():
-                    tmp.write(chunk)
-                tmp_path = tmp.name
-                
+        if audio_future is not None:
+            # Don't hold back the movement verdict for a slow audio branch. If
+            # it already started it runs to completion, and its features still
+            # land in the feature cache for a retry
+            audio_timeout = getattr(settings, 'ML_COMBINED_AUDIO_TIMEOUT', 3.0)
             try:
-                audio_result = predictor.predict_audio(tmp_path)
-                logger.info(f"Audio prediction: Threat={audio_result['is_threat']}, Confidence={audio_result.get('confidence', 0)}")
-            finally:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
+                audio_result = audio_future.result(timeout=max(0.0, started + audio_timeout - time.monotonic()))
+            except FuturesTimeoutError:
+                audio_future.cancel()  # drops it if it never started
+                logger.warning(f"Audio prediction did not finish within {audio_timeout}s")
+                audio_result = {
+                    'error': f'Audio analysis did not finish within {audio_timeout}s',
+                    'is_threat': False,
+                    'confidence': 0.0,
+                    'status': 'TIMEOUT',
+                }
+        elif audio_file:
+            audio_result = predict_uploaded_audio(predictor, audio_file)
+
+        if audio_file:
+            logger.info(f"Audio prediction: Threat={audio_result['is_threat']}, Confidence={audio_result.get('confidence', 0)}")
         
         # ============================================
-        # 3. COMBINED THREAT ASSESSMENT
+        # 4. COMBINED THREAT ASSESSMENT
         # ============================================
         # Threat if EITHER movement OR audio detects threat
         is_threat = movement_result['is_threat'] or audio_result['is_threat']
@@ -477,6 +664,12 @@ def predict_combined(request):
             'threat_reason': 'movement' if movement_result['is_threat'] else ('audio' if audio_result['is_threat'] else 'none')
         })
         
+    except ModelVersionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ModelUnavailable as e:
+        return model_unavailable_response(e)
+    except InferenceTimeout as e:
+        return Response({'error': str(e)}, status=status.HTTP_504_GATEWAY_TIMEOUT)
     except Exception as e:
         logger.error(f"Combined prediction error: {e}")
         import traceback
@@ -484,6 +677,25 @@ def predict_combined(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def model_readiness(request):
+    """
+    Readiness probe for load balancers: 200 when the model groups in
+    ML_READINESS_MODELS are loaded in this worker, 503 otherwise. The body
+    has each group's state, load time and memory.
+    """
+    try:
+        models = get_model_status()
+    except Exception as e:
+        logger.error(f"Readiness check failed: {e}")
+        return Response({'ready': False, 'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    required = getattr(settings, 'ML_READINESS_MODELS', ['movement', 'audio'])
+    ready = all(models.get(name, {}).get('state') == READY for name in required)
+    return Response({'ready': ready, 'models': models},
+                    status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -1,9 +1,11 @@
 from django.urls import path
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from emergency.consumers import UserConsumer, PoliceConsumer
+from emergency.consumers import UserConsumer, PoliceConsumer, MovementStreamConsumer
 
 websocket_urlpatterns = [
     path('ws/user/<int:user_id>/', UserConsumer.as_asgi()),
+    path('ws/police/<int:officer_id>/', PoliceConsumer.as_asgi()),
     path('ws/police/', PoliceConsumer.as_asgi()),
+    path('ws/movement/<int:user_id>/', MovementStreamConsumer.as_asgi()),
 ]
\ No newline at end of file
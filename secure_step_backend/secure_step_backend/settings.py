@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from decouple import config
+import json
 from datetime import timedelta
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -218,4 +219,143 @@ EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
-EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
\ No newline at end of file
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+
+# ML Inference Configuration
+# Micro-batching groups concurrent /predict/ calls into one BiLSTM forward pass.
+# A request waits at most ML_BATCH_MAX_WAIT_MS for others to join its batch.
+ML_BATCHING_ENABLED = config('ML_BATCHING_ENABLED', default=False, cast=bool)
+ML_BATCH_MAX_SIZE = config('ML_BATCH_MAX_SIZE', default=32, cast=int)
+ML_BATCH_MAX_WAIT_MS = config('ML_BATCH_MAX_WAIT_MS', default=10, cast=float)
+
+# Runtime for the BiLSTM movement model: 'keras', 'tf_function', 'tflite', 'onnx', or the
+# quantized 'tflite_fp16' / 'tflite_int8' (scaler folded in; compare them with
+# `python manage.py movement_quantization_report` before switching).
+# Run `python manage.py convert_movement_model` to create the non-Keras files.
+ML_MOVEMENT_BACKEND = config('ML_MOVEMENT_BACKEND', default='keras')
+
+# Load the ML models and run a dummy inference at startup, in the background.
+# Enable this only on processes that serve /predict*/ endpoints (e.g. daphne).
+ML_WARMUP_ON_STARTUP = config('ML_WARMUP_ON_STARTUP', default=False, cast=bool)
+
+# 'in_process' runs the models inside each Django worker. 'service' sends sensor
+# windows and audio feature vectors to `python manage.py run_inference_service`,
+# a pool of ML_SERVICE_POOL_SIZE processes that own the models.
+ML_INFERENCE_MODE = config('ML_INFERENCE_MODE', default='in_process')
+ML_SERVICE_ADDRESS = config('ML_SERVICE_ADDRESS', default='127.0.0.1:8765')
+ML_SERVICE_POOL_SIZE = config('ML_SERVICE_POOL_SIZE', default=2, cast=int)
+ML_SERVICE_TIMEOUT = config('ML_SERVICE_TIMEOUT', default=2.0, cast=float)
+ML_SERVICE_AUTHKEY = config('ML_SERVICE_AUTHKEY', default='')
+
+# WebSocket movement streams (ws/movement/<user_id>/) run the model on the last
+# 50 frames every ML_STREAM_INFERENCE_STRIDE new frames (10 = once a second at 10 Hz).
+ML_STREAM_INFERENCE_STRIDE = config('ML_STREAM_INFERENCE_STRIDE', default=10, cast=int)
+ML_STREAM_MAX_FRAMES_PER_MESSAGE = config('ML_STREAM_MAX_FRAMES_PER_MESSAGE', default=50, cast=int)
+
+# /predict/ scores recordings longer than 50 frames as overlapping windows taken
+# every ML_WINDOW_STRIDE frames, unless the request passes its own `stride`.
+ML_WINDOW_STRIDE = config('ML_WINDOW_STRIDE', default=10, cast=int)
+
+# How the audio `tempo` feature is computed: 'beat_track' (as in training),
+# 'autocorr' (same tempo estimate without the beat-tracking pass) or 'constant'
+# (imputed with the scaler mean). `python manage.py evaluate_tempo_modes` compares them.
+ML_AUDIO_TEMPO_MODE = config('ML_AUDIO_TEMPO_MODE', default='beat_track')
+
+# Resampler for audio clips not recorded at 22.05 kHz: 'soxr_hq' (librosa's default,
+# what the audio model was trained with), a faster soxr quality ('soxr_mq', 'soxr_lq',
+# 'soxr_qq') or 'polyphase' (scipy resample_poly with cached filters). Check the drift in
+# the model inputs with `python -m benchmarks.bench_audio_resampling` before switching;
+# soxr_lq/soxr_qq move some features by several standard deviations.
+ML_AUDIO_RESAMPLER = config('ML_AUDIO_RESAMPLER', default='soxr_hq')
+
+# Extracted audio features are cached by a hash of the uploaded clip, so retries and
+# the same clip sent to /predict-audio/ then /predict-combined/ skip decoding and
+# extraction. Set ML_AUDIO_FEATURE_CACHE to '' to disable. Without a URL each worker
+# keeps its own LRU of ML_AUDIO_FEATURE_CACHE_MAX_ENTRIES clips; with a redis:// URL
+# the workers share one cache (bound it with Redis' maxmemory + allkeys-lru policy).
+ML_AUDIO_FEATURE_CACHE = config('ML_AUDIO_FEATURE_CACHE', default='audio_features')
+ML_AUDIO_FEATURE_CACHE_URL = config('ML_AUDIO_FEATURE_CACHE_URL', default='')
+ML_AUDIO_FEATURE_CACHE_TTL = config('ML_AUDIO_FEATURE_CACHE_TTL', default=600, cast=int)
+ML_AUDIO_FEATURE_CACHE_MAX_ENTRIES = config('ML_AUDIO_FEATURE_CACHE_MAX_ENTRIES', default=1000, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'audio_features': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': ML_AUDIO_FEATURE_CACHE_URL,
+        'TIMEOUT': ML_AUDIO_FEATURE_CACHE_TTL,
+    } if ML_AUDIO_FEATURE_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'audio-features',
+        'TIMEOUT': ML_AUDIO_FEATURE_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': ML_AUDIO_FEATURE_CACHE_MAX_ENTRIES},
+    },
+}
+
+# Gating answers idle inputs SAFE (with a 'gated' reason) before the models run: movement
+# windows where every gyroscope axis has a std below ML_GATE_GYRO_STD (rad/s) and
+# |acceleration| varies by less than ML_GATE_ACCEL_RANGE (m/s^2), and audio clips whose
+# loudest block is below ML_GATE_AUDIO_RMS_DB (dBFS). Tune the thresholds on recorded
+# data with `python manage.py evaluate_gating <data_dir>` before enabling it.
+ML_GATING_ENABLED = config('ML_GATING_ENABLED', default=False, cast=bool)
+ML_GATE_GYRO_STD = config('ML_GATE_GYRO_STD', default=0.05, cast=float)
+ML_GATE_ACCEL_RANGE = config('ML_GATE_ACCEL_RANGE', default=0.5, cast=float)
+ML_GATE_AUDIO_RMS_DB = config('ML_GATE_AUDIO_RMS_DB', default=-50.0, cast=float)
+
+# /predict-combined/ runs the movement and audio models at the same time, each on its own
+# pool of ML_COMBINED_WORKERS threads. If audio is not done ML_COMBINED_AUDIO_TIMEOUT seconds
+# after the request started, the movement verdict is returned with an audio status of
+# 'TIMEOUT'; a movement model slower than ML_COMBINED_MOVEMENT_TIMEOUT gives a 504.
+ML_COMBINED_CONCURRENT = config('ML_COMBINED_CONCURRENT', default=True, cast=bool)
+ML_COMBINED_WORKERS = config('ML_COMBINED_WORKERS', default=4, cast=int)
+ML_COMBINED_AUDIO_TIMEOUT = config('ML_COMBINED_AUDIO_TIMEOUT', default=3.0, cast=float)
+ML_COMBINED_MOVEMENT_TIMEOUT = config('ML_COMBINED_MOVEMENT_TIMEOUT', default=5.0, cast=float)
+
+# With ML_AUDIO_SEGMENTED the whole clip (up to ML_AUDIO_MAX_DURATION seconds) is scored
+# instead of only its first 5 seconds: 5-second segments every ML_AUDIO_SEGMENT_HOP seconds
+# share one STFT, are scored in one XGBoost batch, and the clip is a threat if any segment
+# is. Clips with at least ML_AUDIO_PARALLEL_SEGMENTS segments extract features on a pool of
+# ML_AUDIO_SEGMENT_WORKERS threads (0 = ML_THREADS, or one per CPU).
+ML_AUDIO_SEGMENTED = config('ML_AUDIO_SEGMENTED', default=False, cast=bool)
+ML_AUDIO_SEGMENT_HOP = config('ML_AUDIO_SEGMENT_HOP', default=2.5, cast=float)
+ML_AUDIO_MAX_DURATION = config('ML_AUDIO_MAX_DURATION', default=60.0, cast=float)
+ML_AUDIO_SEGMENT_WORKERS = config('ML_AUDIO_SEGMENT_WORKERS', default=0, cast=int)
+ML_AUDIO_PARALLEL_SEGMENTS = config('ML_AUDIO_PARALLEL_SEGMENTS', default=4, cast=int)
+
+# Threads per server process for the inference libraries (see emergency/thread_budget.py).
+# ML_THREADS caps TensorFlow, XGBoost, OpenMP/BLAS and the audio segment pool together;
+# the other settings override one library. 0 keeps the library's default (all cores).
+# With several workers on one box, workers x ML_THREADS should not exceed the cores:
+# compare configurations with `python -m benchmarks.bench_thread_budget`.
+ML_THREADS = config('ML_THREADS', default=0, cast=int)
+ML_TF_INTRA_OP_THREADS = config('ML_TF_INTRA_OP_THREADS', default=0, cast=int)
+ML_TF_INTER_OP_THREADS = config('ML_TF_INTER_OP_THREADS', default=0, cast=int)
+ML_XGB_THREADS = config('ML_XGB_THREADS', default=0, cast=int)
+ML_BLAS_THREADS = config('ML_BLAS_THREADS', default=0, cast=int)
+
+# A model group (movement, audio) that is missing or fails to load is retried in the
+# background after ML_MODEL_RETRY_BASE seconds, doubling up to ML_MODEL_RETRY_MAX; until
+# then its requests get a 503 instead of reloading the models. /api/emergency/ready/
+# answers 200 once the groups in ML_READINESS_MODELS are loaded.
+ML_MODEL_RETRY_BASE = config('ML_MODEL_RETRY_BASE', default=5.0, cast=float)
+ML_MODEL_RETRY_MAX = config('ML_MODEL_RETRY_MAX', default=300.0, cast=float)
+ML_READINESS_MODELS = config('ML_READINESS_MODELS', default='movement,audio',
+                             cast=lambda v: [name.strip() for name in v.split(',') if name.strip()])
+
+# Model versions besides ml_models/ live in ML_MODEL_VERSIONS_DIR/<version>/ (default
+# ml_models/versions/) with the same file names, and load on first use (see
+# emergency/model_registry.py). Requests pick one with an X-Model-Version header, or by
+# cohort: ML_MODEL_COHORTS = {"movement": {"v2": 10}} sends 10% of users to movement v2.
+# Loaded versions other than the default stay within ML_MODEL_MEMORY_BUDGET_MB (0 = no
+# limit), least recently used first out. ML_MODEL_SHADOW = {"movement": "v2"} also scores
+# ML_MODEL_SHADOW_RATE of the requests on v2 in the background and records agreement.
+# The directory is rescanned every ML_MODEL_VERSIONS_TTL seconds, or on a POST to
+# /api/emergency/admin/model-registry/.
+ML_MODEL_VERSIONS_DIR = config('ML_MODEL_VERSIONS_DIR', default='')
+ML_MODEL_VERSIONS_TTL = config('ML_MODEL_VERSIONS_TTL', default=60.0, cast=float)
+ML_MODEL_MEMORY_BUDGET_MB = config('ML_MODEL_MEMORY_BUDGET_MB', default=0, cast=float)
+ML_MODEL_COHORTS = config('ML_MODEL_COHORTS', default='{}', cast=json.loads)
+ML_MODEL_SHADOW = config('ML_MODEL_SHADOW', default='{}', cast=json.loads)
+ML_MODEL_SHADOW_RATE = config('ML_MODEL_SHADOW_RATE', default=0.1, cast=float)